@@ -4,21 +4,36 @@
 The goal of this package is to provide a Git interface for Subversion with
 workarounds to handle svn:externals.
 
-The package __init__.py is also the script to be run as git-svnhack.
+The package __init__.py is also the script to be run as git-svnhack. Most
+git-svnhack invocations are commands that are simply passed on to git-svn,
+so those are recognized here, with the names in GitSvnHack.cmdnames, and
+run before anything else is imported; the rest of the package is only
+loaded for the commands it wraps.
 
 """
 
+import os
+import sys
+
+from GitSvnHack import cmdnames
+
+
+_wrapped_commands = frozenset(cmdnames.wrapped_commands)
+_global_opts = frozenset(cmdnames.global_opts)
+
+def _is_pass_through(arguments):
+    # True if arguments can go straight to git-svn.
+    if not arguments:
+        return True
+    first = arguments[0]
+    return first not in _wrapped_commands and \
+        first.partition("=")[0] not in _global_opts
+
+def _main(arguments):
+    if _is_pass_through(arguments):
+        os.execvp("git", ["git", "svn"]+arguments)
+    from GitSvnHack import commands
+    commands.main(arguments)
+
 if __name__ == "__main__":
-    import GitSvnHack.commands
-    import os
-    import sys
-    # Handle being called with no arguments. Should really print an
-    # svnhack-specific message here.
-    if len(sys.argv) == 1:
-        os.execvp("git", ["git", "svn"])
-    if sys.argv[1] == "init":
-        commands.init(sys.argv[2:])
-    if sys.argv[1] == "clone":
-        commands.clone(sys.argv[2:])
-    else:
-        commands.default(sys.argv[1:])
+    _main(sys.argv[1:])
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""Asynchronous counterparts of GitSvnRepo operations.
+
+The coroutines in this module run git and svn with asyncio subprocesses,
+so that many repositories can be updated from one event loop without a
+thread for each. They plan fetches with the same code as the blocking
+GitSvnRepo methods, and record commands in the repository's runner.
+
+Output is streamed line by line to an optional callback, which is called
+as output_callback(stream_name, line) with stream_name "stdout" or
+"stderr". Without a callback, output is copied to sys.stdout and
+sys.stderr. If a coroutine is cancelled, the running process is killed.
+
+As in the blocking methods, a Subversion mirror is synchronized first and
+an SvnRepo's log_cache is used to plan fetches; those steps call the
+blocking SvnRepo methods in the event loop's default executor.
+Repositories with other remotes are not supported, and are rejected with
+ValueError.
+
+Unlike the rest of the package, this module requires Python 3.5 or later.
+
+Functions:
+async_get_svn_revision - Get the current upstream Subversion revision.
+async_update_rev_index - Add newly fetched trunk commits to rev_index.
+async_plan_fetch - Plan the fetch commands for a range of revisions.
+async_clone - Use "git svn clone" to create a repository.
+async_rebase - Use "git svn rebase" to update a repository.
+
+"""
+
+import asyncio
+import functools
+import subprocess
+import sys
+import time
+
+from GitSvnHack.revisions import FetchPlan
+from GitSvnHack.runner import CommandRecord
+
+
+# Longest output line that is read in one piece. asyncio's default of
+# 64 KiB is too small for e.g. "git log" of a commit with a huge message;
+# a line over the limit raises LimitOverrunError and fails the command.
+_stream_limit = 64*1024*1024
+
+
+async def _run_blocking(function, *args, **kwargs):
+    # Run a blocking call in the event loop's default executor.
+    return await asyncio.get_event_loop().run_in_executor(
+        None, functools.partial(function, *args, **kwargs)
+    )
+
+
+def _check_remotes(repo):
+    # Raise ValueError for repositories with remotes, which aren't
+    # handled here.
+    if repo.remotes:
+        raise ValueError("repository {0} has other remotes, which "
+                         "can't be fetched asynchronously".format(repo.name))
+
+
+async def _sync_mirror(repo, env):
+    # Update the mirror of the Subversion repository, if it has one.
+    if repo.svn_repo.mirror_path is not None:
+        await _run_blocking(repo.svn_repo.sync_mirror, env=env)
+
+
+async def _read_stream(stream, stream_name, sink, output_callback):
+    while True:
+        line = await stream.readline()
+        if not line:
+            break
+        text = line.decode("utf-8", "replace")
+        if sink is not None:
+            sink.append(text)
+        elif output_callback is not None:
+            output_callback(stream_name, text)
+        else:
+            getattr(sys, stream_name).write(text)
+
+
+async def _run_command(runner, argv, *, cwd=None, env=None,
+                       output_callback=None, capture=False):
+    """Run a command, streaming its output, and record it in runner.
+
+    If "capture" is true, stdout is returned instead of being streamed.
+    Raises subprocess.CalledProcessError if the exit status is non-zero.
+
+    """
+    start_time = time.time()
+    returncode = None
+    output = []
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *argv, cwd=cwd, env=env, limit=_stream_limit,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        try:
+            await asyncio.gather(
+                _read_stream(process.stdout, "stdout",
+                             output if capture else None, output_callback),
+                _read_stream(process.stderr, "stderr",
+                             None, output_callback),
+            )
+            returncode = await process.wait()
+        except asyncio.CancelledError:
+            if process.returncode is None:
+                process.kill()
+            returncode = await process.wait()
+            raise
+    finally:
+        output_text = "".join(output)
+        runner.add_record(CommandRecord(
+            argv, cwd, start_time, time.time()-start_time, returncode,
+            len(output_text.encode("utf-8")) if capture else None,
+        ))
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, argv, output_text)
+    return output_text
+
+
+async def async_update_rev_index(repo, *, env=None):
+    """Add trunk commits that are not yet in repo.rev_index.
+
+    See GitSvnRepo.update_rev_index.
+
+    """
+    try:
+        git_log = await _run_command(
+            repo.runner, repo.rev_index_log_argv(),
+            cwd=repo.path, env=env, capture=True,
+        )
+    except subprocess.CalledProcessError:
+        return
+    repo.update_rev_index_from_log(git_log)
+
+
+async def async_get_svn_revision(repo, git_args=[], *, env=None):
+    """Get the Subversion revision upstream of a GitSvnRepo.
+
+    See GitSvnRepo.get_svn_revision.
+
+    """
+    svn_remote_hash = repo.read_ref(repo.trunk_ref)
+    if svn_remote_hash is None:
+        return 0
+
+    svn_revision = repo.find_indexed_revision(svn_remote_hash)
+    if svn_revision is None:
+        await async_update_rev_index(repo, env=env)
+        svn_revision = repo.find_indexed_revision(svn_remote_hash)
+    if svn_revision is None:
+        repo.rev_index.clear()
+        await async_update_rev_index(repo, env=env)
+        svn_revision = repo.find_indexed_revision(svn_remote_hash)
+    if svn_revision is not None:
+        return svn_revision
+
+    svn_revision = await _run_command(
+        repo.runner, ["git", "svn", "find-rev", svn_remote_hash]+git_args,
+        cwd=repo.path, env=env, capture=True,
+    )
+    return int(svn_revision)
+
+
+async def async_plan_fetch(repo, start, end=None, *, env=None):
+    """Plan the "git svn fetch" commands for a range of revisions.
+
+    See GitSvnRepo.plan_fetch. If the SvnRepo has a log_cache, it answers
+    the query, as for SvnRepo.get_changed_revisions.
+
+    """
+    plan = FetchPlan(repo.ignore_revs, start, end)
+    if plan.naive_count > 1:
+        svn_repo = repo.svn_repo
+        end_arg = "HEAD" if end is None else end
+        if svn_repo.log_cache is not None:
+            try:
+                changed_revs = await _run_blocking(
+                    svn_repo.get_changed_revisions, start, end_arg, env=env
+                )
+            except subprocess.CalledProcessError:
+                return plan
+            return FetchPlan(repo.ignore_revs, start, end, changed_revs)
+        try:
+            svn_log = await _run_command(
+                svn_repo.runner,
+                svn_repo.changed_revisions_argv(start, end_arg),
+                env=env, capture=True,
+            )
+        except subprocess.CalledProcessError:
+            return plan
+        plan = FetchPlan(repo.ignore_revs, start, end,
+                         svn_repo.parse_changed_revisions(svn_log))
+    return plan
+
+
+async def async_rebase(repo, revision=None, git_args=[], *, env=None,
+                       sync_mirror=True, output_callback=None):
+    """Update a GitSvnRepo from its Subversion upstream.
+
+    See GitSvnRepo.rebase. Raises ValueError if repo has other remotes.
+
+    """
+    _check_remotes(repo)
+    if sync_mirror:
+        await _sync_mirror(repo, env)
+    next_revision = repo.rebase_start(
+        await async_get_svn_revision(repo, env=env)
+    )
+
+    if not isinstance(revision, int):
+        revision = None
+    plan = await async_plan_fetch(repo, next_revision, revision, env=env)
+    for start, end in plan.windows:
+        await _run_command(
+            repo.runner, repo.fetch_argv(start, end, git_args),
+            cwd=repo.path, env=env, output_callback=output_callback,
+        )
+
+    await async_update_rev_index(repo, env=env)
+
+    await _run_command(
+        repo.runner, repo.rebase_local_argv(),
+        cwd=repo.path, env=env, output_callback=output_callback,
+    )
+    return plan
+
+
+async def async_clone(repo, revision=None, git_args=[], *, env=None,
+                      sync_mirror=True, output_callback=None):
+    """Create a Git clone of a Subversion repository with git-svn.
+
+    See GitSvnRepo.clone. The chunked clone mode is not available here.
+
+    Raises ValueError if revision is older than repo's base_revision, or
+    if repo has other remotes.
+
+    """
+    repo.check_clone_revision(revision)
+    _check_remotes(repo)
+    if sync_mirror:
+        await _sync_mirror(repo, env)
+    clone_revision, rebase_revision = repo.clone_revisions(revision)
+    await _run_command(
+        repo.runner, repo.clone_argv(clone_revision, git_args),
+        env=env, output_callback=output_callback,
+    )
+    if rebase_revision is not None:
+        return await async_rebase(repo, revision=rebase_revision, env=env,
+                                  sync_mirror=False,
+                                  output_callback=output_callback)
+    await async_update_rev_index(repo, env=env)
+    return None
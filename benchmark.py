@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""Benchmarks of git-svn operations on generated Subversion repositories.
+
+A local Subversion repository is generated with a given number of trunk
+revisions, files and tags, and then clone, rebase and get_svn_revision are
+timed on a GitSvnRepo that ignores some of its revisions. The startup
+time of the git-svnhack script is also timed, since most of its uses are
+commands passed straight on to git-svn. Each run produces
+one JSON object, so that results from different versions can be kept in a
+JSON lines file and compared.
+
+Usage: python3 -m GitSvnHack.benchmark [options]
+
+--revisions=N - Number of trunk commits (default 100).
+--files=N - Number of files the commits are spread over (default 10).
+--tags=N - Number of tags, spread evenly over the history (default 2).
+--ignore-every=N - Ignore every Nth revision (default 0, meaning none).
+--rebase-revisions=N - Clone all but the last N revisions, then time a
+                       rebase onto them (default 10).
+--lookups=N - Number of get_svn_revision calls to time (default 100).
+--startups=N - Number of times to time the git-svnhack entry point on a
+               command passed through to git-svn (default 20).
+--output=FILE - Append the result to FILE instead of printing it.
+--compare=FILE - Also compare the result to the last one in FILE.
+
+Classes:
+BenchmarkSpec - Shape of a generated repository and of a benchmark run.
+
+Functions:
+build_svn_repo - Generate a local Subversion repository.
+run_benchmark - Time clone, rebase, get_svn_revision and startup.
+compare_results - Compare two benchmark results.
+main - Run a benchmark from the command line.
+
+"""
+
+from getopt import gnu_getopt
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from GitSvnHack.fixtures import SvnRepoFixture
+from GitSvnHack.repository import SvnRepo, GitSvnRepo
+from GitSvnHack.revisions import RevisionSet
+from GitSvnHack.runner import CommandRunner
+
+
+# Phases timed by run_benchmark, in the order they are run.
+_phases = ("clone", "rebase", "get_svn_revision", "startup")
+
+# Directory of the GitSvnHack package, whose __init__.py is the
+# git-svnhack script.
+_package_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+class BenchmarkSpec:
+
+    """Shape of a generated repository and of a benchmark run.
+
+    Revisions 1 and 2 create the trunk and tags directories. They are
+    followed by the trunk commits, with the tags interleaved.
+
+    Public instance variables:
+    revisions - Number of trunk commits.
+    files - Number of files the trunk commits are spread over.
+    tags - Number of tags.
+    ignore_every - Every revision divisible by this is ignored, or 0.
+    rebase_revisions - Number of revisions left for the rebase.
+    lookups - Number of get_svn_revision calls.
+    startups - Number of runs of the git-svnhack script.
+    head_revision - Latest revision of the generated repository.
+    ignore_revs - RevisionSet of the ignored revisions.
+
+    Public methods:
+    to_dict - Return a dictionary suitable for JSON serialization.
+
+    """
+
+    def __init__(self, revisions=100, files=10, tags=2, ignore_every=0,
+                 rebase_revisions=10, lookups=100, startups=20):
+        self._revisions = revisions
+        self._files = files
+        self._tags = tags
+        self._ignore_every = ignore_every
+        self._rebase_revisions = rebase_revisions
+        self._lookups = lookups
+        self._startups = startups
+
+    @property
+    def revisions(self):
+        """Number of trunk commits."""
+        return self._revisions
+
+    @property
+    def files(self):
+        """Number of files the trunk commits are spread over."""
+        return self._files
+
+    @property
+    def tags(self):
+        """Number of tags made from the trunk."""
+        return self._tags
+
+    @property
+    def ignore_every(self):
+        """Every revision divisible by this is ignored; 0 for none."""
+        return self._ignore_every
+
+    @property
+    def rebase_revisions(self):
+        """Number of revisions fetched by the rebase, not the clone."""
+        return self._rebase_revisions
+
+    @property
+    def lookups(self):
+        """Number of times get_svn_revision is called."""
+        return self._lookups
+
+    @property
+    def startups(self):
+        """Number of times the git-svnhack script is run."""
+        return self._startups
+
+    @property
+    def head_revision(self):
+        """Latest revision of the generated repository."""
+        return 2 + self.revisions + self.tags
+
+    @property
+    def ignore_revs(self):
+        """RevisionSet of the revisions the GitSvnRepo ignores."""
+        if self.ignore_every <= 0:
+            return RevisionSet()
+        return RevisionSet(
+            revision for revision in range(3, self.head_revision+1)
+            if revision % self.ignore_every == 0
+        )
+
+    def to_dict(self):
+        """Return a dictionary suitable for JSON serialization."""
+        return {
+            "revisions": self.revisions,
+            "files": self.files,
+            "tags": self.tags,
+            "ignore_every": self.ignore_every,
+            "rebase_revisions": self.rebase_revisions,
+            "lookups": self.lookups,
+            "startups": self.startups,
+        }
+
+
+def build_svn_repo(spec, path, runner=None):
+    """Generate a local Subversion repository and return an SvnRepo.
+
+    The history is built as an SvnRepoFixture and loaded in one step.
+
+    Arguments:
+    spec - BenchmarkSpec describing the repository.
+    path - Local path for the new repository, which must be empty or not
+           exist.
+    runner - CommandRunner used for svnadmin, or None for the default.
+
+    """
+    svn_repo = SvnRepo(name="benchmark_svn",
+                       path="file://"+os.path.abspath(path),
+                       trunk_head="trunk", trunk_tags="tags/*",
+                       runner=runner)
+    fixture = SvnRepoFixture(svn_repo)
+
+    tag_interval = spec.revisions // (spec.tags+1)
+    tags_made = 0
+    for i in range(spec.revisions):
+        file_name = "file{0}.txt".format(i % spec.files)
+        fixture.trunk_import(file_name, "Change {0}.\n".format(i),
+                             "Change {0}.".format(i))
+        if tags_made < spec.tags and tag_interval > 0 and \
+           (i+1) % tag_interval == 0:
+            tags_made += 1
+            fixture.make_trunk_tag("tag{0}".format(tags_made))
+    # Too few commits to spread the tags out; put the rest at the end.
+    while tags_made < spec.tags:
+        tags_made += 1
+        fixture.make_trunk_tag("tag{0}".format(tags_made))
+
+    fixture.load()
+    return svn_repo
+
+
+def _time_phase(runner, function):
+    # Call function(), and return a dictionary describing the time taken
+    # and the commands run.
+    first_record = len(runner.records)
+    start_time = time.time()
+    function()
+    wall_time = time.time() - start_time
+    records = runner.records[first_record:]
+    return {
+        "wall_time": wall_time,
+        "commands": len(records),
+        "command_time": sum(record.wall_time for record in records),
+    }
+
+
+def _tool_version(argv):
+    try:
+        output = subprocess.check_output(argv, universal_newlines=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.splitlines()[0]
+
+
+def _startup_env(work_dir):
+    # Environment in which "git" exits at once, so that running a
+    # pass-through command only measures git-svnhack itself.
+    bin_dir = os.path.join(work_dir, "bin")
+    os.mkdir(bin_dir)
+    os.symlink(shutil.which("true"), os.path.join(bin_dir, "git"))
+    env = dict(os.environ)
+    env["PATH"] = bin_dir
+    env["PYTHONPATH"] = os.path.dirname(_package_dir)
+    return env
+
+
+def run_benchmark(spec, work_dir=None):
+    """Time clone, rebase, get_svn_revision and startup.
+
+    Startup is the time to run the git-svnhack script with "--version",
+    with git-svn itself replaced by a command that does nothing.
+
+    Arguments:
+    spec - BenchmarkSpec describing the repository and run.
+    work_dir - Directory for the generated repositories. Defaults to None,
+               meaning that a temporary directory is used and removed
+               afterward.
+
+    Returns a dictionary suitable for JSON serialization.
+
+    """
+    if work_dir is None:
+        temp_dir = tempfile.mkdtemp()
+        try:
+            return run_benchmark(spec, temp_dir)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    built_repo = build_svn_repo(spec, os.path.join(work_dir, "svn"),
+                                runner=CommandRunner())
+
+    # Only commands run from here on are counted.
+    runner = CommandRunner()
+    svn_repo = SvnRepo(name=built_repo.name, path=built_repo.path,
+                       trunk_head="trunk", trunk_tags="tags/*",
+                       runner=runner)
+    repo = GitSvnRepo(name="benchmark", path=os.path.join(work_dir, "git"),
+                      svn_repo=svn_repo, ignore_revs=spec.ignore_revs,
+                      runner=runner)
+    quiet = {"stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+    clone_revision = max(spec.head_revision-spec.rebase_revisions, 1)
+
+    def lookups():
+        for i in range(spec.lookups):
+            repo.get_svn_revision(**quiet)
+
+    results = {}
+    results["clone"] = _time_phase(
+        runner, lambda: repo.clone(revision=clone_revision, **quiet)
+    )
+    results["rebase"] = _time_phase(runner, lambda: repo.rebase(**quiet))
+    results["get_svn_revision"] = _time_phase(runner, lookups)
+
+    startup_argv = [sys.executable, os.path.join(_package_dir, "__init__.py"),
+                    "--version"]
+    startup_env = _startup_env(work_dir)
+
+    def startups():
+        for i in range(spec.startups):
+            runner.check_call(startup_argv, env=startup_env, **quiet)
+
+    results["startup"] = _time_phase(runner, startups)
+
+    return {
+        "spec": spec.to_dict(),
+        "time": time.time(),
+        "python": platform.python_version(),
+        "git": _tool_version(["git", "--version"]),
+        "svn": _tool_version(["svn", "--version", "--quiet"]),
+        "results": results,
+    }
+
+
+def compare_results(old, new):
+    """Compare two results of run_benchmark.
+
+    Returns a list of lines giving the old and new wall time of each
+    phase, and the ratio between them.
+
+    """
+    lines = []
+    if old["spec"] != new["spec"]:
+        lines.append("Warning: the benchmarks used different parameters.")
+    for phase in _phases:
+        # Results from older versions may lack some phases.
+        if phase not in old["results"] or phase not in new["results"]:
+            continue
+        old_time = old["results"][phase]["wall_time"]
+        new_time = new["results"][phase]["wall_time"]
+        if old_time > 0:
+            ratio = "{0:.2f}x".format(new_time / old_time)
+        else:
+            ratio = "n/a"
+        lines.append("{0}: {1:.2f}s -> {2:.2f}s ({3})".format(
+            phase, old_time, new_time, ratio
+        ))
+    return lines
+
+
+_spec_opts = {
+    "--revisions": "revisions",
+    "--files": "files",
+    "--tags": "tags",
+    "--ignore-every": "ignore_every",
+    "--rebase-revisions": "rebase_revisions",
+    "--lookups": "lookups",
+    "--startups": "startups",
+}
+
+def main(arguments):
+    """Run a benchmark, using command line arguments."""
+    opts, args = gnu_getopt(
+        arguments, "",
+        [opt[2:]+"=" for opt in _spec_opts]+["output=", "compare="]
+    )
+    spec_args = {}
+    output_path = None
+    compare_path = None
+    for opt, value in opts:
+        if opt in _spec_opts:
+            spec_args[_spec_opts[opt]] = int(value)
+        elif opt == "--output":
+            output_path = value
+        elif opt == "--compare":
+            compare_path = value
+
+    # Read the old result first, in case it is in the output file.
+    old_result = None
+    if compare_path is not None:
+        with open(compare_path) as compare_file:
+            old_lines = [line for line in compare_file if line.strip()]
+        if old_lines:
+            old_result = json.loads(old_lines[-1])
+
+    result = run_benchmark(BenchmarkSpec(**spec_args))
+    result_line = json.dumps(result, sort_keys=True)
+    if output_path is None:
+        print(result_line)
+    else:
+        with open(output_path, "a") as output_file:
+            output_file.write(result_line+"\n")
+
+    if old_result is not None:
+        for line in compare_results(old_result, result):
+            print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
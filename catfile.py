@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""Persistent "git cat-file" processes for reading many Git objects.
+
+Starting git once per object is far too slow when thousands of objects
+are needed, so a CatFile keeps one "git cat-file --batch" process for
+object contents, and one "git cat-file --batch-check" process for object
+types and sizes, and feeds them requests for as long as it is open.
+Requests for many objects are pipelined: a bounded number of requests is
+written before the answers are read, so the processes are never idle
+waiting for the next request, and neither side can fill up a pipe. The
+contents of recently read objects are kept in a least recently used
+cache.
+
+Classes:
+CatFile - Read Git objects through long-lived "git cat-file" processes.
+
+"""
+
+from collections import OrderedDict
+import re
+import subprocess
+import threading
+import time
+
+from GitSvnHack import runner as _runner
+from GitSvnHack.runner import CommandRecord
+
+
+# Maximum number of requests written before their answers are read. The
+# requests then always fit in the pipe buffer, even if git is busy.
+_pipeline_depth = 64
+
+# Maximum number of bytes read from git at once.
+_read_chunk_size = 65536
+
+# A full object hash, which names the same object for good, unlike refs.
+_hash_regex = re.compile("^[0-9a-f]{40}$")
+
+# Last word of the answer for an object that can't be read. The name
+# before it may contain spaces.
+_missing_words = frozenset(["missing", "ambiguous"])
+
+
+def _parse_header(header):
+    # Parse the line "git cat-file" writes for each request into a
+    # (hash, type, size) tuple, or None if there is no such object.
+    line = header.decode("utf-8", "replace").rstrip("\n")
+    if line.rsplit(" ", 1)[-1] in _missing_words:
+        return None
+    obj_hash, obj_type, size = line.rsplit(" ", 2)
+    return (obj_hash, obj_type, int(size))
+
+
+class _BatchProcess:
+
+    # One "git cat-file" process, used by one thread at a time.
+
+    def __init__(self, path, mode, runner):
+        self._argv = ["git", "cat-file", mode]
+        self._path = path
+        self._runner = runner
+        self._process = None
+        self._start_time = None
+        self._output_bytes = 0
+        self.lock = threading.Lock()
+
+    def _start(self):
+        if self._process is None:
+            self._start_time = time.time()
+            self._output_bytes = 0
+            self._process = subprocess.Popen(
+                self._argv, cwd=self._path, stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE, bufsize=_read_chunk_size
+            )
+        return self._process
+
+    def request(self, names, read_answer):
+        # Call read_answer(info, stdout) for each name, in order, where
+        # info is the parsed header, and return a list of the results.
+        for name in names:
+            if "\n" in name:
+                raise ValueError("object name contains a newline: " +
+                                 repr(name))
+        process = self._start()
+        answers = []
+        try:
+            for i in range(0, len(names), _pipeline_depth):
+                chunk = names[i:i+_pipeline_depth]
+                process.stdin.write(
+                    "".join(name+"\n" for name in chunk).encode("utf-8")
+                )
+                process.stdin.flush()
+                for name in chunk:
+                    header = process.stdout.readline()
+                    if not header:
+                        raise subprocess.CalledProcessError(
+                            process.poll(), self._argv
+                        )
+                    self._output_bytes += len(header)
+                    answers.append(read_answer(_parse_header(header),
+                                               process.stdout))
+        except BaseException:
+            # Answers may be left unread in the pipe, so the process is
+            # unusable now; start again next time.
+            self.close()
+            raise
+        return answers
+
+    def read_exact(self, stdout, size):
+        # Read size bytes, at most _read_chunk_size at a time.
+        chunks = []
+        remaining = size
+        while remaining > 0:
+            chunk = stdout.read(min(remaining, _read_chunk_size))
+            if not chunk:
+                raise subprocess.CalledProcessError(None, self._argv)
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        self._output_bytes += size
+        return b"".join(chunks)
+
+    def close(self):
+        process = self._process
+        if process is None:
+            return
+        self._process = None
+        returncode = None
+        try:
+            process.stdin.close()
+            returncode = process.wait()
+        except (IOError, OSError):
+            process.kill()
+            returncode = process.wait()
+        finally:
+            process.stdout.close()
+            self._runner.add_record(CommandRecord(
+                self._argv, self._path, self._start_time,
+                time.time()-self._start_time, returncode,
+                self._output_bytes,
+            ))
+
+
+class CatFile:
+
+    """Read Git objects through long-lived "git cat-file" processes.
+
+    The processes are started when first needed, and run until close() is
+    called. A CatFile may be used from several threads; each process
+    serves one request at a time.
+
+    Objects are identified by any name that "git cat-file" accepts, e.g. a
+    hash or "HEAD:README". Only the contents of objects requested by full
+    hash are served from the cache, since other names can change meaning.
+
+    Public instance variables:
+    path - Path of the Git repository.
+    cache_size - Number of objects kept in the cache.
+    max_cached_size - Size of the largest object that is cached.
+
+    Public methods:
+    get_info - Get the hash, type and size of an object.
+    get_infos - Get the hash, type and size of many objects.
+    read - Read an object.
+    read_many - Read many objects.
+    close - Stop the git processes.
+
+    """
+
+    def __init__(self, path, cache_size=256, max_cached_size=1048576,
+                 runner=None):
+        """Set the repository to read from.
+
+        Arguments:
+        path - Sets the "path" attribute.
+
+        Keyword arguments:
+        cache_size - Sets the "cache_size" attribute.
+        max_cached_size - Sets the "max_cached_size" attribute. Defaults
+                          to 1 MiB.
+        runner - CommandRunner that the processes are recorded in when
+                 they are closed. Defaults to None, meaning that the
+                 default runner is used.
+
+        """
+        self._path = path
+        self._cache_size = cache_size
+        self._max_cached_size = max_cached_size
+        if runner is None:
+            runner = _runner.get_default_runner()
+        self._batch = _BatchProcess(path, "--batch", runner)
+        self._batch_check = _BatchProcess(path, "--batch-check", runner)
+        # Hash -> (type, contents), least recently used first.
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    @property
+    def path(self):
+        """Path of the Git repository the objects are read from."""
+        return self._path
+
+    @property
+    def cache_size(self):
+        """Maximum number of objects kept in the cache."""
+        return self._cache_size
+
+    @property
+    def max_cached_size(self):
+        """Size in bytes of the largest object that is cached."""
+        return self._max_cached_size
+
+    def get_info(self, name):
+        """Get information about an object.
+
+        Returns a (hash, type, size) tuple, or None if there is no such
+        object.
+
+        """
+        return self.get_infos([name])[0]
+
+    def get_infos(self, names):
+        """Get information about many objects, using pipelined requests.
+
+        Returns a list holding, for each name, a (hash, type, size) tuple
+        or None if there is no such object. Raises ValueError if a name
+        contains a newline.
+
+        """
+        def read_answer(info, stdout):
+            return info
+        with self._batch_check.lock:
+            return self._batch_check.request(list(names), read_answer)
+
+    def read(self, name):
+        """Read an object.
+
+        Returns a (hash, type, contents) tuple, with the contents as bytes,
+        or None if there is no such object.
+
+        """
+        return self.read_many([name])[0]
+
+    def read_many(self, names):
+        """Read many objects, using pipelined requests.
+
+        Returns a list holding, for each name, a (hash, type, contents)
+        tuple or None if there is no such object. Raises ValueError if a
+        name contains a newline.
+
+        """
+        names = list(names)
+        results = [None] * len(names)
+        to_read = []
+        with self._cache_lock:
+            for i, name in enumerate(names):
+                cached = self._cache.get(name)
+                if cached is not None and _hash_regex.match(name):
+                    self._cache.move_to_end(name)
+                    results[i] = (name,)+cached
+                else:
+                    to_read.append(i)
+        if not to_read:
+            return results
+
+        batch = self._batch
+        def read_answer(info, stdout):
+            if info is None:
+                return None
+            obj_hash, obj_type, size = info
+            contents = batch.read_exact(stdout, size)
+            # Each object is followed by a newline.
+            batch.read_exact(stdout, 1)
+            return (obj_hash, obj_type, contents)
+        with batch.lock:
+            answers = batch.request([names[i] for i in to_read],
+                                    read_answer)
+
+        with self._cache_lock:
+            for i, answer in zip(to_read, answers):
+                results[i] = answer
+                if answer is not None and \
+                   len(answer[2]) <= self.max_cached_size:
+                    self._cache[answer[0]] = answer[1:]
+                    self._cache.move_to_end(answer[0])
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return results
+
+    def close(self):
+        """Stop the git processes. They are started again if needed."""
+        for process in (self._batch, self._batch_check):
+            with process.lock:
+                process.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
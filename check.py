@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+"""Verification that Git trees match the Subversion trees they came from.
+
+The trunk and every tag of a GitSvnRepo are compared with Subversion by
+listing both sides: "svn list -R --xml" is parsed as it streams in, and
+compared with "git ls-tree -r -l", so file paths, sizes and types are
+checked without transferring any file contents. Optionally, contents are
+compared too, by exporting each Subversion tree once and hashing the
+files as Git blobs.
+
+A listing can't tell apart files that differ only in content, so only
+trees whose contents were compared are remembered as verified, by
+Subversion revision and Git tree hash. Checking again then only examines
+tags that are new or changed.
+
+Classes:
+CheckResult - Outcome of checking one tree.
+RepoChecker - Check the trunk and tags of a GitSvnRepo.
+
+Functions:
+list_svn_tree - List the files in a Subversion tree.
+list_git_tree - List the files in a Git tree.
+compare_trees - Compare listings of a Subversion and a Git tree.
+format_check_results - Format a list of CheckResult objects for printing.
+
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from xml.etree import ElementTree
+
+from GitSvnHack import svnprops
+
+
+# Git file modes.
+_symlink_mode = "120000"
+_gitlink_mode = "160000"
+
+# Subversion stores a symlink as a file holding "link TARGET".
+_svn_link_prefix = "link "
+
+# Options that make "svn export" write files as git-svn stores them.
+# Files whose svn:eol-style is "CRLF" or "CR" are still exported with
+# those line endings, so they are converted back before hashing.
+_export_argv = ["svn", "export", "-q", "--force", "--ignore-keywords",
+                "--native-eol", "LF"]
+
+# Line endings that svn:eol-style values give exported files.
+_exported_eols = {"CRLF": b"\r\n", "CR": b"\r"}
+
+
+class _SvnListTarget:
+
+    # ElementTree parser target that keeps only the files of an "svn list
+    # --xml" listing, so that the element tree is never built.
+
+    def __init__(self):
+        self.files = {}
+        self._text = []
+        self._kind = None
+        self._name = None
+        self._size = None
+
+    def start(self, tag, attrib):
+        self._text = []
+        if tag == "entry":
+            self._kind = attrib.get("kind")
+            self._name = None
+            self._size = None
+
+    def data(self, data):
+        self._text.append(data)
+
+    def end(self, tag):
+        if tag == "name":
+            self._name = "".join(self._text)
+        elif tag == "size":
+            self._size = int("".join(self._text))
+        elif tag == "entry" and self._kind == "file":
+            self.files[self._name] = self._size
+
+    def close(self):
+        return self.files
+
+
+def list_svn_tree(runner, url, revision, **args):
+    """List the files in a Subversion tree.
+
+    The output of "svn list -R --xml" is parsed as it is read, so memory
+    use does not depend on the size of the XML.
+
+    Arguments:
+    runner - CommandRunner used to run svn.
+    url - URL of the tree.
+    revision - Revision of the tree.
+
+    Any additional keyword arguments are passed to subprocess.Popen(),
+    except for stdout.
+
+    Returns a dictionary mapping file paths to sizes.
+
+    """
+    target = _SvnListTarget()
+    parser = ElementTree.XMLParser(target=target)
+    runner.check_lines(
+        ["svn", "list", "-R", "--xml", url+"@"+str(revision)],
+        parser.feed,
+        **args
+    )
+    return parser.close()
+
+
+def list_git_tree(runner, path, tree, **args):
+    """List the files in a Git tree.
+
+    Arguments:
+    runner - CommandRunner used to run git.
+    path - Path of the Git repository.
+    tree - Tree, commit or ref to list.
+
+    Any additional keyword arguments are passed to
+    subprocess.check_output(), except for stdout.
+
+    Returns a dictionary mapping file paths to (mode, blob hash, size)
+    tuples. Submodules are left out.
+
+    """
+    output_args = args.copy()
+    output_args.pop("stdout", None)
+    output = runner.check_output(
+        ["git", "ls-tree", "-r", "-l", "-z", tree],
+        cwd=path,
+        universal_newlines=True,
+        **output_args
+    )
+    files = {}
+    for record in output.split("\0"):
+        if not record:
+            continue
+        info, _, file_path = record.partition("\t")
+        mode, obj_type, obj_hash, size = info.split()
+        if mode != _gitlink_mode:
+            files[file_path] = (mode, obj_hash, int(size))
+    return files
+
+
+def compare_trees(svn_files, git_files):
+    """Compare listings of a Subversion and a Git tree.
+
+    Arguments:
+    svn_files - Dictionary returned by list_svn_tree.
+    git_files - Dictionary returned by list_git_tree.
+
+    Returns a sorted list of strings describing the differences.
+
+    """
+    problems = []
+    for path in sorted(set(svn_files) | set(git_files)):
+        if path not in git_files:
+            problems.append(path+": not in Git")
+        elif path not in svn_files:
+            problems.append(path+": not in Subversion")
+        else:
+            mode, obj_hash, git_size = git_files[path]
+            if mode == _symlink_mode:
+                git_size += len(_svn_link_prefix)
+            if git_size != svn_files[path]:
+                problems.append("{0}: {1} bytes in Subversion, {2} in "
+                                "Git".format(path, svn_files[path],
+                                             git_size))
+    return problems
+
+
+def _blob_hash(content):
+    # Hash file contents as a Git blob.
+    blob = hashlib.sha1()
+    blob.update("blob {0}\0".format(len(content)).encode("ascii"))
+    blob.update(content)
+    return blob.hexdigest()
+
+def _compare_contents(export_dir, git_files, eol_styles):
+    # Compare exported files with Git blob hashes. eol_styles maps paths
+    # to their svn:eol-style.
+    problems = []
+    for path, (mode, obj_hash, size) in sorted(git_files.items()):
+        file_path = os.path.join(export_dir, path)
+        if mode == _symlink_mode:
+            content = os.readlink(file_path).encode("utf-8")
+        else:
+            with open(file_path, "rb") as export_file:
+                content = export_file.read()
+            eol = _exported_eols.get(eol_styles.get(path))
+            if eol is not None:
+                # The repository, and so git-svn, stores LF.
+                content = content.replace(eol, b"\n")
+        if _blob_hash(content) != obj_hash:
+            problems.append(path+": contents differ")
+    return problems
+
+
+class CheckResult:
+
+    """Outcome of checking one tree.
+
+    Public instance variables:
+    name - "trunk", or the name of a tag.
+    revision - Subversion revision checked, or None if there is none.
+    tree - Git tree hash checked, or None if there is none.
+    problems - List of strings describing differences.
+    cached - True if the tree was verified by an earlier check.
+    content_checked - True if file contents were compared, or were by the
+                      earlier check, rather than only sizes.
+    error - Exception raised while checking, or None.
+    succeeded - True if the tree was checked and no differences found.
+
+    """
+
+    def __init__(self, name, revision, tree, problems=(), cached=False,
+                 error=None, content_checked=False):
+        self._name = name
+        self._revision = revision
+        self._tree = tree
+        self._problems = list(problems)
+        self._cached = cached
+        self._error = error
+        self._content_checked = content_checked or cached
+
+    @property
+    def name(self):
+        """"trunk", or the name of a tag."""
+        return self._name
+
+    @property
+    def revision(self):
+        """Subversion revision that was checked, or None."""
+        return self._revision
+
+    @property
+    def tree(self):
+        """Hash of the Git tree that was checked, or None."""
+        return self._tree
+
+    @property
+    def problems(self):
+        """List of strings describing differences between the trees."""
+        return self._problems
+
+    @property
+    def cached(self):
+        """True if the result was taken from an earlier check."""
+        return self._cached
+
+    @property
+    def error(self):
+        """Exception raised while checking, if any."""
+        return self._error
+
+    @property
+    def content_checked(self):
+        """True if file contents were compared, not only sizes."""
+        return self._content_checked
+
+    @property
+    def succeeded(self):
+        """True if the trees were compared and found to match."""
+        return self._error is None and not self._problems
+
+
+class RepoChecker:
+
+    """Check the trunk and tags of a GitSvnRepo against Subversion.
+
+    The trunk is checked at the last fetched revision, and each tag at the
+    last revision that changed it. Subversion trees are read from the
+    repository's mirror, if it has one. Several trees are checked at
+    once. The (revision, tree hash) of every tree whose contents are found
+    to match is saved in the repository, so that it is skipped by later
+    checks. Trees whose listings match are reported, but not saved, since
+    files of the same size may still differ.
+
+    Public instance variables:
+    repo - The GitSvnRepo to check.
+    max_workers - Number of trees checked at once.
+    content - If True, file contents are compared as well.
+    cache_path - Path of the file holding verified trees.
+
+    Public methods:
+    check - Check the trunk and all tags.
+
+    """
+
+    def __init__(self, repo, max_workers=4, content=False):
+        """Set the repository to check.
+
+        Keyword arguments:
+        max_workers - Sets the "max_workers" attribute.
+        content - Sets the "content" attribute. Defaults to False.
+
+        """
+        self._repo = repo
+        self._max_workers = max_workers
+        self._content = content
+
+    @property
+    def repo(self):
+        """The GitSvnRepo to check."""
+        return self._repo
+
+    @property
+    def max_workers(self):
+        """Number of trees checked at once."""
+        return self._max_workers
+
+    @property
+    def content(self):
+        """True if file contents are compared, not only listings."""
+        return self._content
+
+    @property
+    def cache_path(self):
+        """Path of the JSON file holding the trees already verified."""
+        return os.path.join(self.repo.git_dir, "svnhack",
+                            self.repo.prefix+"check.json")
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path) as cache_file:
+                return json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _save_cache(self, verified):
+        cache_dir = os.path.dirname(self.cache_path)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        temp_path = self.cache_path+".tmp"
+        with open(temp_path, "w") as cache_file:
+            json.dump(verified, cache_file)
+        os.rename(temp_path, self.cache_path)
+
+    def _svn_url(self, relative_path):
+        return self.repo.svn_repo.fetch_url.rstrip("/")+"/"+relative_path
+
+    def _svn_tags(self, **args):
+        # Map tag names to the last revision that changed them.
+        tags_root = self.repo.svn_repo.trunk_branch.tags_root
+        if tags_root is None:
+            return {}
+        output_args = args.copy()
+        output_args.pop("stdout", None)
+        try:
+            svn_list = self.repo.runner.check_output(
+                ["svn", "list", "--xml", self._svn_url(tags_root)],
+                universal_newlines=True,
+                **output_args
+            )
+        except subprocess.CalledProcessError:
+            # No tags directory.
+            return {}
+        tags = {}
+        for entry in ElementTree.fromstring(svn_list).iter("entry"):
+            if entry.get("kind") == "dir":
+                tags[entry.findtext("name")] = \
+                    int(entry.find("commit").get("revision"))
+        return tags
+
+    def _git_trees(self, **args):
+        # Map "trunk" and tag names to the trees of their refs.
+        tags_prefix = "refs/remotes/"+self.repo.prefix+"tags/"
+        output_args = args.copy()
+        output_args.pop("stdout", None)
+        output = self.repo.runner.check_output(
+            ["git", "for-each-ref", "--format=%(refname) %(tree)",
+             self.repo.trunk_ref, tags_prefix],
+            cwd=self.repo.path,
+            universal_newlines=True,
+            **output_args
+        )
+        trees = {}
+        for line in output.splitlines():
+            ref_name, _, tree = line.partition(" ")
+            if ref_name == self.repo.trunk_ref:
+                trees["trunk"] = tree
+            elif ref_name.startswith(tags_prefix):
+                name = ref_name[len(tags_prefix):]
+                # git-svn keeps the history of replaced tags as NAME@REV.
+                if "@" not in name:
+                    trees[name] = tree
+        return trees
+
+    def _check_tree(self, name, svn_path, revision, tree, **args):
+        runner = self.repo.runner
+        try:
+            url = self._svn_url(svn_path)
+            git_files = list_git_tree(runner, self.repo.path, tree, **args)
+            problems = compare_trees(
+                list_svn_tree(runner, url, revision, **args), git_files
+            )
+            if self.content and not problems:
+                eol_styles = dict(
+                    (target[len(url)+1:], value) for target, value
+                    in svnprops.get_property(runner, "svn:eol-style", url,
+                                             revision, **args).items()
+                )
+                export_dir = tempfile.mkdtemp()
+                try:
+                    runner.check_call(
+                        _export_argv+[url+"@"+str(revision), export_dir],
+                        **args
+                    )
+                    problems = _compare_contents(export_dir, git_files,
+                                                 eol_styles)
+                finally:
+                    shutil.rmtree(export_dir)
+        except Exception as e:
+            return CheckResult(name, revision, tree, error=e)
+        return CheckResult(name, revision, tree, problems,
+                           content_checked=self.content)
+
+    def check(self, use_cache=True, **args):
+        """Check the trunk and all tags.
+
+        Arguments:
+        use_cache - If False, check trees even if they were verified
+                    before. Defaults to True.
+
+        Any additional keyword arguments are passed to the git and svn
+        commands run, except for stdout.
+
+        Returns a list of CheckResult objects, for the trunk and then for
+        the tags in order of name. Tags that only exist on one side are
+        reported as problems. Only trees whose contents were compared are
+        saved as verified.
+
+        """
+        branch = self.repo.svn_repo.trunk_branch
+        git_trees = self._git_trees(**args)
+        svn_trees = dict((name, (branch.tags_root+"/"+name, revision))
+                         for name, revision
+                         in self._svn_tags(**args).items())
+        if "trunk" in git_trees:
+            svn_trees["trunk"] = (branch.head,
+                                  self.repo.get_svn_revision(**args))
+
+        verified = self._load_cache() if use_cache else {}
+        names = sorted(set(svn_trees) | set(git_trees),
+                       key=lambda name: (name != "trunk", name))
+        results = {}
+        to_check = []
+        for name in names:
+            tree = git_trees.get(name)
+            if name not in svn_trees:
+                results[name] = CheckResult(name, None, tree,
+                                            ["not in Subversion"])
+                continue
+            svn_path, revision = svn_trees[name]
+            if tree is None:
+                results[name] = CheckResult(name, revision, None,
+                                            ["not in Git"])
+            elif verified.get(name) == [revision, tree]:
+                results[name] = CheckResult(name, revision, tree,
+                                            cached=True)
+            else:
+                to_check.append((name, svn_path, revision, tree))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(self._check_tree, *tree_args, **args)
+                       for tree_args in to_check]
+            for future in futures:
+                result = future.result()
+                results[result.name] = result
+
+        verified = dict((name, [result.revision, result.tree])
+                        for name, result in results.items()
+                        if result.succeeded and result.content_checked)
+        self._save_cache(verified)
+        return [results[name] for name in names]
+
+
+def format_check_results(repo_name, results, max_problems=10):
+    """Return a list of lines describing a list of CheckResult objects.
+
+    At most max_problems differences are listed for each tree.
+
+    """
+    lines = []
+    for result in results:
+        if result.error is not None:
+            status = "FAILED: "+str(result.error)
+        elif result.problems:
+            status = "MISMATCH"
+        elif result.cached:
+            status = "ok (cached)"
+        elif not result.content_checked:
+            status = "ok (sizes only)"
+        else:
+            status = "ok"
+        lines.append("{0} {1}: {2}".format(repo_name, result.name, status))
+        for problem in result.problems[:max_problems]:
+            lines.append("    "+problem)
+        if len(result.problems) > max_problems:
+            lines.append("    ... {0} more".format(
+                len(result.problems)-max_problems
+            ))
+    return lines
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""Names of the commands and global options that git-svnhack handles.
+
+Everything else on a git-svnhack command line is passed on to git-svn.
+This module is imported by the git-svnhack script before anything else in
+the package, to tell the two apart, so it must stay free of imports.
+
+Variables:
+wrapped_commands - Commands run by GitSvnHack.commands, in the order they
+                   are documented there.
+global_opts - Options that may precede any command.
+
+"""
+
+
+wrapped_commands = ("init", "clone", "sync-all", "watch", "check",
+                    "suggest-ignore-revs")
+
+global_opts = ("--profile", "--trace")
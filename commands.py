@@ -6,22 +6,51 @@ The following git-svn commands have wrappers:
 init
 clone
 
+The following commands are specific to git-svnhack:
+
+sync-all
+watch
+check
+suggest-ignore-revs
+
 There's also a "default" command, which will pass any other command to
 git-svn.
 
+The "main" function dispatches to these commands, after handling global
+git-svnhack options that precede the command name:
+
+--profile[=N] - Print the N (default 10) most expensive git/svn commands
+                to stderr on exit.
+--trace=FILE - Append a JSON line describing each git/svn command to FILE.
+
+With either option, commands passed to git-svn are run as a child process,
+so that they can be measured, rather than replacing git-svnhack.
+
+The command and option names are listed in GitSvnHack.cmdnames. The rest
+of the package is imported by each command as it runs, so that a command
+only loads the modules it needs.
+
 """
 
-from GitSvnHack.repository import SvnRepo, GitSvnRepo
+from GitSvnHack import cmdnames
 
+from collections import deque
 from getopt import gnu_getopt
 from functools import wraps
 from itertools import chain
 import os
+import subprocess
+import sys
+import time
 
 class ParsedArgs:
 
     """Container for the passed arguments, after option parsing.
 
+    Options are kept in their original order, with an index from each
+    option name to the positions where it occurs, so that finding or
+    popping an option does not scan the whole list.
+
     Public methods:
     get_string_list - Get all arguments in a list of strings.
     pop_any_opt_of - Pop the value of the first option match.
@@ -31,13 +60,18 @@ class ParsedArgs:
     """
 
     def __init__(self, opts, args):
-        self._opts = opts
-        self._args = args
+        # Popped options are replaced with None in self._opts.
+        self._opts = list(opts)
+        self._args = deque(args)
+        self._index = {}
+        for i, opt in enumerate(self._opts):
+            self._index.setdefault(opt[0], deque()).append(i)
 
     def get_string_list(self):
         """Collapse parsed arguments back into a list of strings."""
         is_valid_argument = lambda x: x is not None and x != ""
-        flattened_opts = chain.from_iterable(self._opts)
+        remaining_opts = filter(None, self._opts)
+        flattened_opts = chain.from_iterable(remaining_opts)
         arg_list = list(filter(is_valid_argument, flattened_opts))
         arg_list += self._args
         return arg_list
@@ -61,10 +95,13 @@ class ParsedArgs:
         argument, and None for a non-present argument.
 
         """
-
-        pop_operation = lambda i: self._opts.pop(i)[1]
-
-        return self._apply_to_any_of(pop_operation, *opts_to_pop)
+        positions = self._first_positions(opts_to_pop)
+        if positions is None:
+            return None
+        i = positions.popleft()
+        value = self._opts[i][1]
+        self._opts[i] = None
+        return value
 
     @_fix_empty_opt
     def get_any_opt_of(self, *opts_to_get):
@@ -74,18 +111,20 @@ class ParsedArgs:
         argument, and None for a non-present argument.
 
         """
-
-        get_operation = lambda i: self._opts[i][1]
-
-        return self._apply_to_any_of(get_operation, *opts_to_get)
-
-    def _apply_to_any_of(self, find_operation, *opts_to_find):
-
-        for i in range(len(self._opts)):
-            if self._opts[i][0] in opts_to_find:
-                return find_operation(i)
-
-        return None
+        positions = self._first_positions(opts_to_get)
+        if positions is None:
+            return None
+        return self._opts[positions[0]][1]
+
+    def _first_positions(self, opts_to_find):
+        # Return the deque of positions of whichever option occurs first,
+        # or None if none of them are left.
+        first = None
+        for opt in opts_to_find:
+            positions = self._index.get(opt)
+            if positions and (first is None or positions[0] < first[0]):
+                first = positions
+        return first
 
     # The _fix_empty_opt function does not do anything meaningful outside
     # of this class definition.
@@ -94,7 +133,7 @@ class ParsedArgs:
     def pop_arg(self):
         """Pop the first non-option argument from the list."""
         if len(self._args) > 0:
-            return self._args.pop(0)
+            return self._args.popleft()
         else:
             return None
 
@@ -165,15 +204,33 @@ _fetch_opts = OptSpec("r:", [
     "log-window-size=", "use-log-author",
 ])
 
-# git-svn clone options
+# git-svn clone options, plus the git-svnhack options "chunk-size",
+# "progress", "since-rev" and "last". "--since-rev" takes a revision or a
+# tag name, and "--last N" keeps the last N revisions; history before that
+# floor is not fetched.
 _clone_opts = OptSpec("", [
-    "preserve-empty-dirs", "placeholder-filename="
+    "preserve-empty-dirs", "placeholder-filename=",
+    "chunk-size=", "progress", "since-rev=", "last=",
 ])
 
+# Options that fetch revisions, which "git svn clone" and "git svn fetch"
+# accept but "git svn init" rejects. They are passed to GitSvnRepo.clone
+# separately, so that chunked clones can give them to every fetch.
+_fetch_only_opt_names = (
+    "-A", "--authors-file", "--authors-prog", "-q", "--quiet",
+    "--repack", "--repack-flags", "--localtime", "--parent",
+    "--log-window-size", "--use-log-author",
+    "--preserve-empty-dirs", "--placeholder-filename",
+)
+
+# Complete option tables of the wrapped git-svn commands, combined once
+# here rather than on every call.
+_init_cmd_opts = _init_opts+_gen_opts
+_clone_cmd_opts = _clone_opts+_fetch_opts+_init_opts+_gen_opts
+
 def init(arguments):
     """GitSvnHack init command."""
-    opt_spec = _init_opts+_gen_opts
-    parsed_args = ParsedArgs(*opt_spec.parse(arguments))
+    parsed_args = ParsedArgs(*_init_cmd_opts.parse(arguments))
 
     opts_d = _make_init_opts_dict(parsed_args)
 
@@ -200,7 +257,7 @@ def _make_init_opts_dict(parsed_args):
 
     opts_d["trunk"] = parsed_args.pop_any_opt_of("-T", "--trunk")
     opts_d["trunk_tags"] = parsed_args.pop_any_opt_of("-t", "--tags")
-    opts_d["ignore_revs"] = parsed_args.pop_any_opt_of("--ignore-revs")
+    opts_d["ignore_revs"] = _pop_all_opts_of(parsed_args, "--ignore-revs")
     opts_d["name"] = parsed_args.pop_any_opt_of("--config-name")
     if parsed_args.get_any_opt_of("-s", "--stdlayout"):
         opts_d["trunk"] = "trunk"
@@ -209,12 +266,14 @@ def _make_init_opts_dict(parsed_args):
     return opts_d
 
 def _git_svn_repo_from_dict(opts_d):
+    from GitSvnHack.repository import SvnRepo, GitSvnRepo
 
     # Make the "--config-name" argument optional.
     _dict_set_default(opts_d, "name", "unknown")
 
-    # Treate --ignore-revs as a comma-separated list.
-    opts_d["ignore_revs"] = _comma_str_to_int_list(opts_d["ignore_revs"])
+    # Treat --ignore-revs as a comma-separated list of revisions and
+    # ranges.
+    opts_d["ignore_revs"] = _str_list_to_revision_set(opts_d["ignore_revs"])
 
     svn_repo = SvnRepo(
         name=opts_d["name"]+"_svn",
@@ -228,20 +287,43 @@ def _git_svn_repo_from_dict(opts_d):
         path=opts_d["git_path"],
         svn_repo=svn_repo,
         ignore_revs=opts_d["ignore_revs"],
+        base_revision=_resolve_base_revision(
+            svn_repo, opts_d.get("since_rev"), opts_d.get("last")
+        ),
     )
 
     return git_svn_repo
 
-def _comma_str_to_int_list(string):
-    if string is not None:
-        return [int(i) for i in string.split(",")]
-    else:
-        return []
+def _resolve_base_revision(svn_repo, since_rev, last):
+    # Turn "--since-rev" and "--last" into a revision floor, or None. If
+    # both are given, the later floor wins.
+    floors = []
+    if since_rev is not None:
+        if since_rev.isdigit():
+            floors.append(int(since_rev))
+        else:
+            floors.append(svn_repo.get_tag_revision(since_rev))
+    if last is not None:
+        floors.append(max(svn_repo.get_current_revision()-int(last)+1, 1))
+    return max(floors) if floors else None
+
+def _pop_all_opts_of(parsed_args, *opts_to_pop):
+    values = []
+    value = parsed_args.pop_any_opt_of(*opts_to_pop)
+    while value is not None:
+        values.append(value)
+        value = parsed_args.pop_any_opt_of(*opts_to_pop)
+    return values
+
+def _str_list_to_revision_set(strings):
+    from GitSvnHack.revisions import RevisionSet
+    return RevisionSet.from_string(",".join(strings))
 
 def clone(arguments):
     """GitSvnHack clone command."""
-    opt_spec = _clone_opts+_fetch_opts+_init_opts+_gen_opts
-    parsed_args = ParsedArgs(*opt_spec.parse(arguments))
+    from GitSvnHack.progress import FetchProgress
+
+    parsed_args = ParsedArgs(*_clone_cmd_opts.parse(arguments))
 
     opts_d = _make_clone_opts_dict(parsed_args)
 
@@ -249,24 +331,304 @@ def clone(arguments):
 
     git_svn_repo = _git_svn_repo_from_dict(opts_d)
 
-    # Make the "-r" argument optional.
-    if opts_d["revision"] is not None:
-        opts_d["revision"] = int(opts_d["revision"])
+    # Make the "-r" and "--chunk-size" arguments optional.
+    for key in ("revision", "chunk_size"):
+        if opts_d[key] is not None:
+            opts_d[key] = int(opts_d[key])
 
+    # With "--progress", git-svn's output is replaced by a status line.
+    progress = None
+    if opts_d["progress"]:
+        progress = FetchProgress(callback=_print_progress)
+
+    fetch_args = _pop_fetch_only_args(parsed_args)
     git_svn_repo.clone(
         revision=opts_d["revision"],
         git_args=parsed_args.get_string_list(),
+        fetch_args=fetch_args,
+        chunk_size=opts_d["chunk_size"],
+        progress=progress,
     )
+    if progress is not None:
+        print(file=sys.stderr)
+
+def _pop_fetch_only_args(parsed_args):
+    fetch_args = []
+    for opt in _fetch_only_opt_names:
+        for value in _pop_all_opts_of(parsed_args, opt):
+            fetch_args.append(opt)
+            if value is not True:
+                fetch_args.append(value)
+    return fetch_args
+
+def _print_progress(progress):
+    print("\r"+progress.format(), end="", file=sys.stderr)
+    sys.stderr.flush()
 
 def _make_clone_opts_dict(parsed_args):
     opts_d = _make_init_opts_dict(parsed_args)
 
     opts_d["revision"] = parsed_args.pop_any_opt_of("-r", "--revision")
+    opts_d["chunk_size"] = parsed_args.pop_any_opt_of("--chunk-size")
+    opts_d["progress"] = parsed_args.pop_any_opt_of("--progress")
+    opts_d["since_rev"] = parsed_args.pop_any_opt_of("--since-rev")
+    opts_d["last"] = parsed_args.pop_any_opt_of("--last")
     return opts_d
 
 def _url_basename(url):
     return url.split("/")[-1]
 
+# git-svnhack sync-all options
+_sync_all_opts = OptSpec("j:q", [
+    "jobs=", "host-limit=", "quiet",
+])
+
+def sync_all(arguments):
+    """GitSvnHack sync-all command.
+
+    Clone or rebase every repository in a definition file, several at a
+    time, then print a summary. Exits with status 1 if any repository
+    failed.
+
+    """
+    from GitSvnHack.parsedef import GitSvnDefParser
+    from GitSvnHack.sync import RepoSyncer, format_summary
+
+    parsed_args = ParsedArgs(*_sync_all_opts.parse(arguments))
+
+    jobs = parsed_args.pop_any_opt_of("-j", "--jobs")
+    host_limit = parsed_args.pop_any_opt_of("--host-limit")
+    quiet = parsed_args.pop_any_opt_of("-q", "--quiet")
+    def_path = parsed_args.pop_arg()
+
+    def_parser = GitSvnDefParser()
+    def_parser.read(def_path)
+
+    syncer = RepoSyncer(
+        max_workers=int(jobs) if jobs is not None else 4,
+        host_limit=int(host_limit) if host_limit is not None else None,
+    )
+
+    start_time = time.time()
+    if quiet:
+        with open(os.devnull, "w") as devnull:
+            results = syncer.sync(def_parser.get_repos(),
+                                  stdout=devnull, stderr=devnull)
+    else:
+        results = syncer.sync(def_parser.get_repos())
+
+    for line in format_summary(results, time.time()-start_time):
+        print(line)
+
+    if not all(result.succeeded for result in results):
+        sys.exit(1)
+
+# git-svnhack watch options
+_watch_opts = OptSpec("j:q", [
+    "jobs=", "host-limit=", "quiet",
+    "interval=", "max-backoff=", "state=",
+])
+
+def watch(arguments):
+    """GitSvnHack watch command.
+
+    Poll the Subversion servers of every repository in a definition file,
+    and rebase or clone repositories whenever their project changes. Runs
+    until interrupted, printing a summary after each synchronization.
+
+    """
+    from GitSvnHack.daemon import SyncDaemon
+    from GitSvnHack.parsedef import GitSvnDefParser
+    from GitSvnHack.sync import RepoSyncer, format_summary
+
+    parsed_args = ParsedArgs(*_watch_opts.parse(arguments))
+
+    jobs = parsed_args.pop_any_opt_of("-j", "--jobs")
+    host_limit = parsed_args.pop_any_opt_of("--host-limit")
+    quiet = parsed_args.pop_any_opt_of("-q", "--quiet")
+    interval = parsed_args.pop_any_opt_of("--interval")
+    max_backoff = parsed_args.pop_any_opt_of("--max-backoff")
+    state_path = parsed_args.pop_any_opt_of("--state")
+    def_path = parsed_args.pop_arg()
+
+    def_parser = GitSvnDefParser()
+    def_parser.read(def_path)
+
+    daemon = SyncDaemon(
+        def_parser.get_repos(),
+        interval=int(interval) if interval is not None else 60,
+        max_backoff=int(max_backoff) if max_backoff is not None else 3600,
+        syncer=RepoSyncer(
+            max_workers=int(jobs) if jobs is not None else 4,
+            host_limit=int(host_limit) if host_limit is not None else None,
+        ),
+        state_path=state_path,
+    )
+
+    def print_summary(results):
+        for line in format_summary(results):
+            print(line)
+        sys.stdout.flush()
+
+    try:
+        if quiet:
+            with open(os.devnull, "w") as devnull:
+                daemon.run(result_callback=print_summary,
+                           stdout=devnull, stderr=devnull)
+        else:
+            daemon.run(result_callback=print_summary)
+    except KeyboardInterrupt:
+        pass
+
+# git-svnhack check options
+_check_opts = OptSpec("j:", [
+    "jobs=", "content", "recheck",
+])
+
+def check(arguments):
+    """GitSvnHack check command.
+
+    Check that the trunk and tags of repositories in a definition file
+    match Subversion, optionally only for the repositories named after the
+    definition file. Exits with status 1 if anything does not match.
+
+    """
+    from GitSvnHack.check import RepoChecker, format_check_results
+    from GitSvnHack.parsedef import GitSvnDefParser
+
+    parsed_args = ParsedArgs(*_check_opts.parse(arguments))
+
+    jobs = parsed_args.pop_any_opt_of("-j", "--jobs")
+    content = parsed_args.pop_any_opt_of("--content")
+    recheck = parsed_args.pop_any_opt_of("--recheck")
+    def_path = parsed_args.pop_arg()
+    names = set(iter(parsed_args.pop_arg, None))
+
+    def_parser = GitSvnDefParser()
+    def_parser.read(def_path)
+
+    all_ok = True
+    for repo in def_parser.get_repos():
+        if names and repo.name not in names:
+            continue
+        checker = RepoChecker(
+            repo,
+            max_workers=int(jobs) if jobs is not None else 4,
+            content=bool(content),
+        )
+        results = checker.check(use_cache=not recheck)
+        for line in format_check_results(repo.name, results):
+            print(line)
+        all_ok = all_ok and all(result.succeeded for result in results)
+
+    if not all_ok:
+        sys.exit(1)
+
+# git-svnhack suggest-ignore-revs options
+_suggest_ignore_revs_opts = OptSpec("", [
+    "max-paths=", "pattern=", "write",
+])
+
+def suggest_ignore_revs(arguments):
+    """GitSvnHack suggest-ignore-revs command.
+
+    Scan the Subversion history of repositories in a definition file,
+    optionally only for the repositories named after the definition file,
+    and print the revisions that could be added to ignore_revs. With
+    --write, they are added to the ignore_revs of the definition file,
+    leaving the rest of the file as it is.
+
+    """
+    from GitSvnHack.ignorescan import IgnoreRevsScanner, format_suggestions
+    from GitSvnHack.parsedef import GitSvnDefParser
+
+    parsed_args = ParsedArgs(*_suggest_ignore_revs_opts.parse(arguments))
+
+    max_paths = parsed_args.pop_any_opt_of("--max-paths")
+    patterns = _pop_all_opts_of(parsed_args, "--pattern")
+    write = parsed_args.pop_any_opt_of("--write")
+    def_path = parsed_args.pop_arg()
+    names = set(iter(parsed_args.pop_arg, None))
+
+    def_parser = GitSvnDefParser()
+    def_parser.read(def_path)
+
+    scanner = IgnoreRevsScanner(
+        max_paths=int(max_paths) if max_paths is not None else None,
+        path_patterns=patterns,
+    )
+    suggestions = [scanner.scan(repo) for repo in def_parser.get_repos()
+                   if not names or repo.name in names]
+    for line in format_suggestions(suggestions):
+        print(line)
+
+    if write is not None:
+        def_parser.update_ignore_revs(
+            def_path,
+            [suggestion.merged_repo() for suggestion in suggestions]
+        )
+
+def _pop_global_opts(arguments):
+    # Global options come before the command name. getopt can't be used
+    # here, since any other leading option is passed through to git-svn.
+    # The options handled must be those in cmdnames.global_opts.
+    profile_top = None
+    trace_path = None
+    while arguments:
+        opt, sep, value = arguments[0].partition("=")
+        if opt == "--profile":
+            profile_top = int(value) if sep else 10
+        elif opt == "--trace" and sep:
+            trace_path = value
+        elif opt == "--trace" and len(arguments) > 1:
+            trace_path = arguments.pop(1)
+        else:
+            break
+        arguments.pop(0)
+    return profile_top, trace_path
+
+# Each command in cmdnames.wrapped_commands is run by the function of the
+# same name, with "-" replaced by "_".
+_commands = dict((name, globals()[name.replace("-", "_")])
+                 for name in cmdnames.wrapped_commands)
+
+def main(arguments):
+    """Handle global options, then run the command named in arguments."""
+    arguments = arguments[:]
+    profile_top, trace_path = _pop_global_opts(arguments)
+
+    runner = None
+    if profile_top is not None or trace_path is not None:
+        from GitSvnHack.runner import CommandRunner, set_default_runner
+        # Tracing alone only needs the trace file, not records in memory.
+        runner = CommandRunner(
+            trace_path=trace_path,
+            max_records=None if profile_top is not None else 0,
+        )
+        set_default_runner(runner)
+
+    # With no arguments, git-svn prints its usage. Should really print an
+    # svnhack-specific message here.
+    try:
+        if arguments and arguments[0] in _commands:
+            _commands[arguments[0]](arguments[1:])
+        elif runner is not None:
+            _run_default(runner, arguments)
+        else:
+            default(arguments)
+    finally:
+        if profile_top is not None:
+            for line in runner.summary(profile_top):
+                print(line, file=sys.stderr)
+
+def _run_default(runner, arguments):
+    # Like default, but in a child process run through runner, exiting
+    # with its status if it fails.
+    try:
+        runner.check_call(["git", "svn"]+arguments)
+    except subprocess.CalledProcessError as e:
+        sys.exit(e.returncode)
+
 def default(arguments):
     """"Default command that simply calls git svn with all arguments."""
     os.execvp("git", ["git", "svn"]+arguments)
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""Long-running synchronization of git-svn repositories.
+
+Instead of trying a full fetch for every repository at a fixed interval,
+a SyncDaemon asks each Subversion server for the last changed revision of
+all its projects with a single "svn info", and only rebases repositories
+whose project changed since it was last seen. Failures are retried with
+exponential backoff, per repository and per server.
+
+Classes:
+SyncDaemon - Poll Subversion and synchronize repositories on change.
+
+"""
+
+import json
+import os
+import subprocess
+import time
+
+from GitSvnHack.svninfo import SvnInfoCache
+from GitSvnHack.sync import RepoSyncer, svn_host
+
+
+class SyncDaemon:
+
+    """Poll Subversion servers and synchronize repositories on change.
+
+    The last changed revision seen for each repository is remembered, and
+    optionally saved to a JSON file so that it survives restarts. Before a
+    repository has been seen, its last fetched revision is used, so a
+    daemon starting on up-to-date repositories does not fetch anything.
+
+    Public instance variables:
+    repos - The GitSvnRepo objects being watched.
+    interval - Seconds between polls.
+    max_backoff - Longest delay in seconds before retrying a failure.
+    state_path - Path of the JSON file for last seen revisions, or None.
+
+    Public methods:
+    poll_once - Poll every server once and synchronize changed repos.
+    run - Poll repeatedly.
+
+    """
+
+    def __init__(self, repos, interval=60, max_backoff=3600, syncer=None,
+                 info_cache=None, state_path=None, clock=time.time,
+                 sleep=time.sleep):
+        """Set up a daemon for a list of repositories.
+
+        Arguments:
+        repos - Sets the "repos" attribute.
+
+        Keyword arguments:
+        interval - Sets the "interval" attribute. Defaults to 60 seconds.
+        max_backoff - Sets the "max_backoff" attribute. Defaults to an
+                      hour.
+        syncer - RepoSyncer used to rebase or clone changed repositories.
+                 Defaults to a RepoSyncer with its default limits.
+        info_cache - SvnInfoCache used to poll. Defaults to a cache whose
+                     results are never reused.
+        state_path - Sets the "state_path" attribute.
+        clock - Function returning the current time in seconds.
+        sleep - Function used to wait between polls.
+
+        """
+        self._repos = list(repos)
+        self._interval = interval
+        self._max_backoff = max_backoff
+        self._syncer = syncer if syncer is not None else RepoSyncer()
+        self._info_cache = info_cache if info_cache is not None \
+            else SvnInfoCache(ttl=-1)
+        self._state_path = state_path
+        self._clock = clock
+        self._sleep = sleep
+        # Repo name -> last seen revision, and key -> (failures, retry
+        # time) for repos and hosts that are backing off.
+        self._last_seen = {}
+        self._failures = {}
+        if state_path is not None and os.path.exists(state_path):
+            with open(state_path) as state_file:
+                self._last_seen = json.load(state_file)
+
+    @property
+    def repos(self):
+        """The GitSvnRepo objects being watched."""
+        return self._repos
+
+    @property
+    def interval(self):
+        """Seconds between polls."""
+        return self._interval
+
+    @property
+    def max_backoff(self):
+        """Longest delay before retrying a repository or server."""
+        return self._max_backoff
+
+    @property
+    def state_path(self):
+        """Path of the JSON file holding last seen revisions, or None."""
+        return self._state_path
+
+    def _save_state(self):
+        if self.state_path is None:
+            return
+        temp_path = self.state_path+".tmp"
+        with open(temp_path, "w") as state_file:
+            json.dump(self._last_seen, state_file)
+        os.rename(temp_path, self.state_path)
+
+    def _backing_off(self, key, now):
+        failure = self._failures.get(key)
+        return failure is not None and now < failure[1]
+
+    def _record_failure(self, key, now):
+        failures = self._failures.get(key, (0, now))[0] + 1
+        delay = min(self.interval * 2**(failures-1), self.max_backoff)
+        self._failures[key] = (failures, now+delay)
+
+    def _last_seen_revision(self, repo, **args):
+        last_seen = self._last_seen.get(repo.name)
+        if last_seen is None and repo.exists():
+            try:
+                last_seen = repo.get_svn_revision(**args)
+            except (OSError, subprocess.CalledProcessError):
+                # Let the sync attempt find out what is wrong.
+                return None
+        return last_seen
+
+    def _poll_host(self, host, repos, now, **args):
+        # Return the repos on one server whose project has changed.
+        urls = [repo.svn_repo.path for repo in repos]
+        try:
+            infos = self._info_cache.query(urls, **args)
+        except (OSError, subprocess.CalledProcessError):
+            self._record_failure(("host", host), now)
+            return [], {}
+        self._failures.pop(("host", host), None)
+
+        changed = []
+        changed_revs = {}
+        for repo in repos:
+            info = infos.get(repo.svn_repo.path)
+            if info is None:
+                self._record_failure(("repo", repo.name), now)
+                continue
+            last_seen = self._last_seen_revision(repo, **args)
+            if last_seen is None or info.last_changed_rev > last_seen:
+                changed.append(repo)
+                changed_revs[repo.name] = info.last_changed_rev
+        return changed, changed_revs
+
+    def poll_once(self, **args):
+        """Poll every server once, and synchronize repos that changed.
+
+        Each server is sent one "svn info" for all of its projects, unless
+        it is backing off after a failure. Repositories that are backing
+        off are not polled either.
+
+        Any additional keyword arguments are passed to the svn info query
+        and to the RepoSyncer.
+
+        Returns the list of SyncResult objects for the repositories that
+        were synchronized.
+
+        """
+        now = self._clock()
+        by_host = {}
+        for repo in self.repos:
+            if self._backing_off(("repo", repo.name), now):
+                continue
+            host = svn_host(repo.svn_repo)
+            if self._backing_off(("host", host), now):
+                continue
+            by_host.setdefault(host, []).append(repo)
+
+        to_sync = []
+        changed_revs = {}
+        for host, repos in sorted(by_host.items()):
+            host_changed, host_revs = self._poll_host(host, repos, now,
+                                                      **args)
+            to_sync.extend(host_changed)
+            changed_revs.update(host_revs)
+        if not to_sync:
+            return []
+
+        results = self._syncer.sync(to_sync, **args)
+        for result in results:
+            name = result.repo.name
+            if result.succeeded:
+                self._last_seen[name] = changed_revs[name]
+                self._failures.pop(("repo", name), None)
+            else:
+                self._record_failure(("repo", name), now)
+        self._save_state()
+        return results
+
+    def run(self, iterations=None, result_callback=None, **args):
+        """Poll repeatedly, sleeping for "interval" between polls.
+
+        Keyword arguments:
+        iterations - Number of polls, or None to poll forever.
+        result_callback - If given, called with the list of SyncResult
+                          objects after each poll that synchronized any
+                          repositories.
+
+        Other keyword arguments are passed to poll_once.
+
+        """
+        count = 0
+        while iterations is None or count < iterations:
+            if count > 0:
+                self._sleep(self.interval)
+            results = self.poll_once(**args)
+            if results and result_callback is not None:
+                result_callback(results)
+            count += 1
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""Resolution of svn:externals definitions.
+
+The svn:externals properties of a whole tree are read with one "svn
+propget -R --xml" process, and kept per (URL, revision). When a later
+revision of a tree is needed, the cached definitions of the nearest
+earlier revision are updated instead: "svn log -v" tells which
+directories changed in between, and only those are read again.
+
+Classes:
+SvnExternal - One external definition.
+ExternalsCache - Cache of the externals of trees, and of the graph they
+                 form.
+
+Functions:
+parse_externals - Parse the value of an svn:externals property.
+
+"""
+
+import json
+import os
+import posixpath
+import shlex
+import threading
+from urllib import parse as _urlparse
+
+from GitSvnHack import runner as _runner
+from GitSvnHack import svninfo
+from GitSvnHack import svnprops
+
+
+class SvnExternal:
+
+    """One external definition.
+
+    Public instance variables:
+    owner - URL of the directory with the svn:externals property.
+    local_path - Path of the external, relative to the owner.
+    url - Absolute URL of the external.
+    revision - Operative revision given with -r, or None.
+    peg_revision - Peg revision given with URL@REV, or None.
+    operative_revision - The revision to check out, or None for HEAD.
+
+    """
+
+    def __init__(self, owner, local_path, url, revision=None,
+                 peg_revision=None):
+        self._owner = owner
+        self._local_path = local_path
+        self._url = url
+        self._revision = revision
+        self._peg_revision = peg_revision
+
+    @property
+    def owner(self):
+        """URL of the directory with the svn:externals property."""
+        return self._owner
+
+    @property
+    def local_path(self):
+        """Path of the external, relative to the owner directory."""
+        return self._local_path
+
+    @property
+    def url(self):
+        """Absolute URL of the external."""
+        return self._url
+
+    @property
+    def revision(self):
+        """Operative revision given with -r, or None."""
+        return self._revision
+
+    @property
+    def peg_revision(self):
+        """Peg revision given with URL@REV, or None."""
+        return self._peg_revision
+
+    @property
+    def operative_revision(self):
+        """The revision to check out, or None if the external is unpinned.
+
+        As in Subversion, the operative revision defaults to the peg
+        revision.
+
+        """
+        if self.revision is not None:
+            return self.revision
+        return self.peg_revision
+
+    def to_dict(self):
+        """Return a dictionary suitable for JSON serialization."""
+        return {
+            "owner": self.owner,
+            "local_path": self.local_path,
+            "url": self.url,
+            "revision": self.revision,
+            "peg_revision": self.peg_revision,
+        }
+
+    @classmethod
+    def from_dict(cls, external_d):
+        """Construct an SvnExternal from the output of to_dict."""
+        return cls(external_d["owner"], external_d["local_path"],
+                   external_d["url"], external_d["revision"],
+                   external_d["peg_revision"])
+
+    def __repr__(self):
+        return "SvnExternal({0!r}, {1!r}, {2!r}, {3!r}, {4!r})".format(
+            self.owner, self.local_path, self.url, self.revision,
+            self.peg_revision
+        )
+
+
+def _is_url(text):
+    return "://" in text or text.startswith(("^/", "/", "../"))
+
+def _parse_revision(text):
+    # Numbers only; HEAD, dates and the like leave the external unpinned.
+    return int(text) if text.isdigit() else None
+
+def _resolve_url(owner, url, root):
+    # Make a URL from an svn:externals definition absolute.
+    if "://" in url:
+        return url.rstrip("/")
+    owner_parts = _urlparse.urlsplit(owner)
+    if url.startswith("^/"):
+        root_parts = _urlparse.urlsplit(root)
+        path = posixpath.join(root_parts.path.rstrip("/"), url[2:])
+        return _urlparse.urlunsplit(
+            root_parts[:2]+(posixpath.normpath(path), "", "")
+        )
+    if url.startswith("//"):
+        return owner_parts.scheme+":"+url.rstrip("/")
+    if url.startswith("/"):
+        path = url
+    else:
+        path = posixpath.join(owner_parts.path, url)
+    return _urlparse.urlunsplit(
+        owner_parts[:2]+(posixpath.normpath(path), "", "")
+    )
+
+def parse_externals(owner, value, root):
+    """Parse the value of an svn:externals property.
+
+    Both the current format, "[-r REV] URL[@PEG] LOCAL_PATH", and the
+    format from before Subversion 1.5, "LOCAL_PATH [-r REV] URL", are
+    understood, as are relative URLs.
+
+    Arguments:
+    owner - URL of the directory with the property.
+    value - Value of the property.
+    root - URL of the root of the repository containing the owner.
+
+    Returns a list of SvnExternal, in the order of the definitions.
+
+    """
+    externals = []
+    for line in value.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        tokens = shlex.split(line)
+        revision = None
+        words = []
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            if token == "-r" and i+1 < len(tokens):
+                revision = _parse_revision(tokens[i+1])
+                i += 1
+            elif token.startswith("-r"):
+                revision = _parse_revision(token[2:])
+            else:
+                words.append(token)
+            i += 1
+        if len(words) != 2:
+            raise ValueError("invalid svn:externals definition: "+line)
+        peg_revision = None
+        if _is_url(words[0]):
+            url, local_path = words
+            base, sep, peg = url.rpartition("@")
+            if sep and peg.isdigit():
+                url, peg_revision = base, int(peg)
+        else:
+            local_path, url = words
+        externals.append(SvnExternal(
+            owner, local_path, _resolve_url(owner, url, root), revision,
+            peg_revision
+        ))
+    return externals
+
+
+class ExternalsCache:
+
+    """Cache of the externals of trees, and of the graph they form.
+
+    The raw svn:externals values of a tree are kept per (URL, revision).
+    A revision that is not cached yet is worked out from the latest
+    earlier revision of the same URL that is, by reading again only the
+    directories that "svn log -v" lists as changed in between. Without an
+    earlier revision, the whole tree is read with one "svn propget -R".
+
+    Public instance variables:
+    path - Path of the JSON file used to persist the cache, or None.
+    info_cache - SvnInfoCache used to find repository roots.
+
+    Public methods:
+    get_externals - Get the externals defined in a tree.
+    get_root - Get the repository root URL of a tree.
+    get_graph - Get the externals of a tree, and of its externals.
+    get_target_revision - Get the revision of an external to use for a
+                          tree.
+    invalidate - Forget all cached results.
+
+    """
+
+    def __init__(self, path=None, runner=None, info_cache=None):
+        """Create a cache.
+
+        Keyword arguments:
+        path - Sets the "path" attribute. If the file exists, the cache is
+               loaded from it. Defaults to None, meaning that the cache
+               exists only in memory.
+        runner - CommandRunner used to run svn. Defaults to None, meaning
+                 that the default runner is used.
+        info_cache - Sets the "info_cache" attribute. Defaults to a new
+                     SvnInfoCache using the same runner.
+
+        """
+        self._path = path
+        self._runner = runner
+        if info_cache is None:
+            info_cache = svninfo.SvnInfoCache(runner=runner)
+        self._info_cache = info_cache
+        self._lock = threading.Lock()
+        # (URL, revision) -> {owner URL: svn:externals value}
+        self._trees = {}
+        if path is not None and os.path.exists(path):
+            self._load()
+
+    @property
+    def path(self):
+        """Path of the file used to persist the cache, or None."""
+        return self._path
+
+    @property
+    def runner(self):
+        """CommandRunner used to run svn."""
+        if self._runner is not None:
+            return self._runner
+        return _runner.get_default_runner()
+
+    @property
+    def info_cache(self):
+        """SvnInfoCache used to find repository roots."""
+        return self._info_cache
+
+    def _load(self):
+        with open(self.path) as cache_file:
+            cache_d = json.load(cache_file)
+        for url, revision, values in cache_d["trees"]:
+            self._trees[(url, revision)] = values
+
+    def _save(self):
+        cache_d = {
+            "trees": [[url, revision, values]
+                      for (url, revision), values
+                      in sorted(self._trees.items())],
+        }
+        temp_path = self.path+".tmp"
+        with open(temp_path, "w") as cache_file:
+            json.dump(cache_d, cache_file)
+        os.rename(temp_path, self.path)
+
+    def get_root(self, url, **args):
+        """Get the repository root URL of a tree, without a trailing slash.
+
+        Any additional keyword arguments are passed to
+        subprocess.check_output(), except for stdout.
+
+        Raises LookupError if the URL does not exist at HEAD.
+
+        """
+        info = self.info_cache.query([url], **args).get(url)
+        if info is None:
+            raise LookupError("no Subversion information for "+url)
+        return info.root.rstrip("/")
+
+    def _get_values(self, url, revision, **args):
+        url = url.rstrip("/")
+        with self._lock:
+            values = self._trees.get((url, revision))
+            if values is not None:
+                return values
+            earlier = [cached_revision
+                       for cached_url, cached_revision in self._trees
+                       if cached_url == url and cached_revision < revision]
+            if earlier:
+                old_revision = max(earlier)
+                old_values = dict(self._trees[(url, old_revision)])
+        if earlier:
+            root = self.get_root(url, **args)
+            values = svnprops.update_property(
+                self.runner, "svn:externals", url, root, old_values,
+                old_revision, revision, **args
+            )
+        else:
+            values = svnprops.get_property(self.runner, "svn:externals",
+                                           url, revision, **args)
+        with self._lock:
+            self._trees[(url, revision)] = values
+            if self.path is not None:
+                self._save()
+        return values
+
+    def get_externals(self, url, revision, **args):
+        """Get the externals defined anywhere in a tree.
+
+        Arguments:
+        url - URL of the tree.
+        revision - Revision of the tree.
+
+        Any additional keyword arguments are passed to
+        subprocess.check_output(), except for stdout.
+
+        Returns a list of SvnExternal, sorted by owner directory.
+
+        """
+        values = self._get_values(url, revision, **args)
+        if not values:
+            return []
+        root = self.get_root(url, **args)
+        externals = []
+        for owner in sorted(values):
+            externals.extend(parse_externals(owner, values[owner], root))
+        return externals
+
+    def get_target_revision(self, external, revision, root, **args):
+        """Get the revision of an external to use for a tree.
+
+        Arguments:
+        external - An SvnExternal defined in the tree.
+        revision - Revision of the tree.
+        root - Repository root URL of the tree, as returned by get_root.
+
+        Pinned externals use their operative revision. Unpinned externals
+        on the same repository as the tree are taken at the same revision,
+        so that a tree and its externals describe one point in history;
+        other unpinned externals are taken at the latest revision of their
+        repository.
+
+        Any additional keyword arguments are passed to
+        subprocess.check_output(), except for stdout.
+
+        """
+        if external.operative_revision is not None:
+            return external.operative_revision
+        root = root.rstrip("/")
+        if external.url == root or external.url.startswith(root+"/"):
+            return revision
+        return self.info_cache.get_revision(external.url, **args)
+
+    def get_graph(self, url, revision, **args):
+        """Get the externals of a tree, and of its externals, and so on.
+
+        Arguments:
+        url - URL of the tree.
+        revision - Revision of the tree.
+
+        Any additional keyword arguments are passed to
+        subprocess.check_output(), except for stdout.
+
+        Returns a dictionary mapping each (URL, revision) reached,
+        starting with the tree itself, to a list of (SvnExternal, (URL,
+        revision)) pairs, one for each external defined in it, with
+        revisions as given by get_target_revision.
+
+        """
+        graph = {}
+        pending = [(url.rstrip("/"), revision)]
+        while pending:
+            node = pending.pop()
+            if node in graph:
+                continue
+            node_url, node_revision = node
+            externals = self.get_externals(node_url, node_revision, **args)
+            if externals:
+                root = self.get_root(node_url, **args)
+            edges = []
+            for external in externals:
+                target = (external.url, self.get_target_revision(
+                    external, node_revision, root, **args
+                ))
+                edges.append((external, target))
+                if target not in graph:
+                    pending.append(target)
+            graph[node] = edges
+        return graph
+
+    def invalidate(self):
+        """Forget all cached results."""
+        with self._lock:
+            self._trees.clear()
+            if self.path is not None and os.path.exists(self.path):
+                os.remove(self.path)
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""Fast construction of Subversion repositories for tests and benchmarks.
+
+Rather than running one svn process per commit, the history is described
+in Python, written out as a Subversion dump stream, and loaded with a
+single "svnadmin load".
+
+Classes:
+SvnDumpBuilder - Build a dump stream one revision at a time.
+SvnRepoFixture - Build the history of an SvnRepo with trunk helpers.
+
+"""
+
+import hashlib
+import re
+import tempfile
+import time
+from uuid import uuid4
+
+from GitSvnHack import runner as _runner
+
+
+# Timestamp of revision 0; each later revision is one second newer.
+_base_time = 1356998400
+
+def _svn_date(revision):
+    return time.strftime("%Y-%m-%dT%H:%M:%S.000000Z",
+                         time.gmtime(_base_time+revision))
+
+
+def _props_block(props):
+    """Encode a list of (name, value) pairs as a dump property block."""
+    parts = []
+    for name, value in props:
+        name = name.encode("utf-8")
+        value = value.encode("utf-8")
+        parts.append(b"K "+str(len(name)).encode()+b"\n"+name+b"\n")
+        parts.append(b"V "+str(len(value)).encode()+b"\n"+value+b"\n")
+    parts.append(b"PROPS-END\n")
+    return b"".join(parts)
+
+
+def _parent_paths(path):
+    """List the proper ancestors of a repository path, outermost first."""
+    parts = path.split("/")
+    return ["/".join(parts[:i]) for i in range(1, len(parts))]
+
+
+class SvnDumpBuilder:
+
+    """Build a Subversion dump stream one revision at a time.
+
+    Changes are queued with add_dir, add_file, change_file, delete and
+    copy, and become a revision when commit is called. Parent directories
+    are added automatically. Paths are relative to the repository root and
+    use "/" as a separator.
+
+    Public instance variables:
+    uuid - UUID written to the dump.
+    revision - Number of the latest committed revision.
+
+    Public methods:
+    add_dir - Add a directory.
+    add_file - Add a file.
+    change_file - Replace the contents of a file.
+    delete - Delete a file or directory.
+    copy - Copy a path from the latest revision.
+    exists - Check whether a path exists, including pending changes.
+    commit - Turn the pending changes into a revision.
+    write - Write the dump stream to a binary file.
+    load - Load the dump into a new repository.
+
+    """
+
+    def __init__(self, uuid=None):
+        """Start a dump containing only revision 0.
+
+        Keyword arguments:
+        uuid - Sets the "uuid" attribute. Defaults to a random UUID.
+
+        """
+        self._uuid = uuid if uuid is not None else str(uuid4())
+        # Encoded revisions, the pending nodes, and path -> kind for the
+        # state including pending changes and for the last commit.
+        self._revisions = [self._revision_record(0, [("svn:date",
+                                                      _svn_date(0))])]
+        self._nodes = []
+        self._paths = {}
+        self._committed_paths = {}
+
+    @property
+    def uuid(self):
+        """UUID of the repository described by the dump."""
+        return self._uuid
+
+    @property
+    def revision(self):
+        """Number of the latest committed revision."""
+        return len(self._revisions) - 1
+
+    def exists(self, path):
+        """Check whether a path exists, counting uncommitted changes."""
+        return path.strip("/") in self._paths
+
+    def _add_parents(self, path):
+        for parent in _parent_paths(path):
+            if parent not in self._paths:
+                self._add_node(parent, "dir")
+
+    def _add_node(self, path, kind, content=None):
+        headers = [("Node-path", path), ("Node-kind", kind),
+                   ("Node-action", "add")]
+        self._nodes.append(self._node_record(headers, [], content))
+        self._paths[path] = kind
+
+    def add_dir(self, path):
+        """Add a directory, and any missing parents."""
+        path = path.strip("/")
+        self._add_parents(path)
+        self._add_node(path, "dir")
+
+    def add_file(self, path, content):
+        """Add a file with the given text or bytes as its contents."""
+        path = path.strip("/")
+        self._add_parents(path)
+        self._add_node(path, "file", content)
+
+    def change_file(self, path, content):
+        """Replace the contents of an existing file."""
+        path = path.strip("/")
+        headers = [("Node-path", path), ("Node-kind", "file"),
+                   ("Node-action", "change")]
+        self._nodes.append(self._node_record(headers, None, content))
+
+    def delete(self, path):
+        """Delete a file or directory, including everything below it."""
+        path = path.strip("/")
+        self._nodes.append(self._node_record(
+            [("Node-path", path), ("Node-action", "delete")], None, None
+        ))
+        for other_path in list(self._paths):
+            if other_path == path or other_path.startswith(path+"/"):
+                del self._paths[other_path]
+
+    def copy(self, from_path, to_path):
+        """Copy a path as it was in the latest committed revision."""
+        from_path = from_path.strip("/")
+        to_path = to_path.strip("/")
+        kind = self._committed_paths[from_path]
+        self._add_parents(to_path)
+        headers = [("Node-path", to_path), ("Node-kind", kind),
+                   ("Node-action", "add"),
+                   ("Node-copyfrom-rev", str(self.revision)),
+                   ("Node-copyfrom-path", from_path)]
+        self._nodes.append(self._node_record(headers, None, None))
+        for path, path_kind in self._committed_paths.items():
+            if path == from_path or path.startswith(from_path+"/"):
+                self._paths[to_path+path[len(from_path):]] = path_kind
+
+    def commit(self, msg="", author="svnhack"):
+        """Turn the pending changes into a revision and return its number.
+
+        Each revision is dated one second after the one before it, so the
+        same history always produces the same dump.
+
+        """
+        revision = self.revision + 1
+        record = self._revision_record(revision, [
+            ("svn:log", msg), ("svn:author", author),
+            ("svn:date", _svn_date(revision)),
+        ])
+        self._revisions.append(record+b"".join(self._nodes))
+        self._nodes = []
+        self._committed_paths = dict(self._paths)
+        return revision
+
+    def _revision_record(self, revision, props):
+        props_block = _props_block(props)
+        return ("Revision-number: {0}\n"
+                "Prop-content-length: {1}\n"
+                "Content-length: {1}\n\n").format(
+                    revision, len(props_block)
+                ).encode() + props_block + b"\n"
+
+    def _node_record(self, headers, props, content):
+        # "props" is None to leave properties alone, or a list of pairs.
+        # "content" is None to leave the text alone.
+        body = b""
+        header_lines = ["{0}: {1}".format(name, value)
+                        for name, value in headers]
+        if props is not None:
+            props_block = _props_block(props)
+            header_lines.append(
+                "Prop-content-length: {0}".format(len(props_block))
+            )
+            body += props_block
+        if content is not None:
+            if isinstance(content, str):
+                content = content.encode("utf-8")
+            header_lines.append(
+                "Text-content-length: {0}".format(len(content))
+            )
+            header_lines.append(
+                "Text-content-md5: "+hashlib.md5(content).hexdigest()
+            )
+            body += content
+        if props is not None or content is not None:
+            header_lines.append("Content-length: {0}".format(len(body)))
+        return ("\n".join(header_lines)+"\n\n").encode() + body + b"\n\n"
+
+    def write(self, dump_file):
+        """Write the committed revisions to a binary file object."""
+        dump_file.write(b"SVN-fs-dump-format-version: 2\n\n")
+        dump_file.write(("UUID: "+self.uuid+"\n\n").encode())
+        for record in self._revisions:
+            dump_file.write(record)
+
+    def load(self, local_path, runner=None, **args):
+        """Create a repository at local_path and load the dump into it.
+
+        The directory may exist, but must be empty. Any additional keyword
+        arguments are passed to subprocess.check_call(), except for stdin.
+
+        """
+        if runner is None:
+            runner = _runner.get_default_runner()
+        runner.check_call(["svnadmin", "create", local_path], **args)
+        load_args = args.copy()
+        load_args.pop("stdin", None)
+        with tempfile.TemporaryFile() as dump_file:
+            self.write(dump_file)
+            dump_file.seek(0)
+            runner.check_call(["svnadmin", "load", "-q", local_path],
+                              stdin=dump_file, **load_args)
+
+
+class SvnRepoFixture(SvnDumpBuilder):
+
+    """Build the history of an SvnRepo without running svn for each commit.
+
+    The methods mirror the testing methods of SvnRepo, and each one makes
+    one revision, so a fixture loaded with load() matches a repository
+    built with SvnRepo.create(), trunk_import(), trunk_rm() and
+    make_trunk_tag(). As with SvnRepo.create(), the SvnRepo's path must be
+    a "file://" URL for the root of a new repository.
+
+    Public instance variables:
+    svn_repo - The SvnRepo being built.
+
+    Public methods:
+    trunk_import - Add or replace a file in the trunk.
+    trunk_rm - Remove a file from the trunk.
+    make_trunk_tag - Copy the trunk into the tags directory.
+    load - Create the repository from the fixture.
+
+    """
+
+    def __init__(self, svn_repo, **args):
+        """Start a fixture with the trunk and tags directories.
+
+        Like SvnRepo.create(), this makes revision 1 for the trunk head
+        and revision 2 for the tags directory. Keyword arguments are passed
+        to the SvnDumpBuilder constructor.
+
+        """
+        super().__init__(**args)
+        self._svn_repo = svn_repo
+        self.add_dir(svn_repo.trunk_branch.head)
+        self.commit("Creating trunk directory.")
+        self.add_dir(svn_repo.trunk_branch.tags_root)
+        self.commit("Creating trunk tags directory.")
+
+    @property
+    def svn_repo(self):
+        """The SvnRepo whose history is being built."""
+        return self._svn_repo
+
+    def trunk_import(self, repo_path, content, msg="Importing file."):
+        """Add a file to the trunk, or replace its contents.
+
+        Accepts a path relative to the trunk's root. Returns the revision.
+
+        """
+        path = self.svn_repo.trunk_branch.head+"/"+repo_path
+        if self.exists(path):
+            self.change_file(path, content)
+        else:
+            self.add_file(path, content)
+        return self.commit(msg)
+
+    def trunk_rm(self, repo_path, msg="Removing file."):
+        """Remove a file from the trunk, and return the revision."""
+        self.delete(self.svn_repo.trunk_branch.head+"/"+repo_path)
+        return self.commit(msg)
+
+    def make_trunk_tag(self, tag_name, msg="Making tag."):
+        """Copy the trunk into the tags directory, and return the revision.
+        """
+        trunk_branch = self.svn_repo.trunk_branch
+        self.copy(trunk_branch.head, trunk_branch.tags_root+"/"+tag_name)
+        return self.commit(msg)
+
+    def load(self, **args):
+        """Create the SvnRepo's repository from the fixture.
+
+        Keyword arguments are passed to subprocess.check_call(), except for
+        stdin.
+
+        """
+        local_path = re.sub("^file://", "", self.svn_repo.path)
+        super().load(local_path, runner=self.svn_repo.runner, **args)
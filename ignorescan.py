@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""Suggestions for the ignore_revs of a repository definition.
+
+The Subversion log of a project is read once, as it streams in, and each
+revision is either kept or suggested for ignore_revs. Only the suggested
+revisions are held, as a RevisionSet, so memory use depends on the number
+of ranges rather than the length of the history.
+
+A revision is suggested if it touches neither the trunk head nor the
+trunk tags, since git-svn fetches nothing from it, or if it matches one
+of the configured heuristics for problem revisions:
+
+- it changes more than a given number of paths in the project;
+- it adds or replaces a path matching a glob pattern, e.g. "*.iso".
+
+"svn log" does not report file sizes, so the number of changed paths and
+the path patterns stand in for "huge binary drops".
+
+Classes:
+IgnoreSuggestion - Revisions suggested for one repository.
+IgnoreRevsScanner - Scan Subversion history for revisions to ignore.
+
+Functions:
+format_suggestions - Describe suggestions in human-readable lines.
+
+"""
+
+from fnmatch import fnmatchcase
+
+from GitSvnHack.revisions import RevisionSet
+from GitSvnHack.svninfo import parse_info_xml
+from GitSvnHack.svnlog import stream_log
+
+
+class IgnoreSuggestion:
+
+    """Revisions suggested for the ignore_revs of one repository.
+
+    Public instance variables:
+    repo - The GitSvnRepo that was scanned.
+    start - First revision scanned.
+    end - Last revision scanned.
+    revisions - RevisionSet of the suggested revisions.
+    flagged - List of (revision, reason) tuples for the suggested
+              revisions that do touch the trunk head or tags.
+
+    Public methods:
+    merged_repo - Get a copy of repo that also ignores the suggestions.
+
+    """
+
+    def __init__(self, repo, start, end, revisions, flagged):
+        self._repo = repo
+        self._start = start
+        self._end = end
+        self._revisions = revisions
+        self._flagged = flagged
+
+    @property
+    def repo(self):
+        """The GitSvnRepo that was scanned."""
+        return self._repo
+
+    @property
+    def start(self):
+        """First revision scanned."""
+        return self._start
+
+    @property
+    def end(self):
+        """Last revision scanned."""
+        return self._end
+
+    @property
+    def revisions(self):
+        """RevisionSet of the suggested revisions."""
+        return self._revisions
+
+    @property
+    def flagged(self):
+        """List of (revision, reason) tuples for in-scope suggestions."""
+        return self._flagged
+
+    def merged_repo(self):
+        """Get a copy of repo whose ignore_revs include the suggestions.
+
+        The copy can be passed to GitSvnDefParser.update_ignore_revs.
+
+        """
+        ignore_revs = RevisionSet(self.repo.ignore_revs)
+        for start, end in self.revisions.ranges():
+            ignore_revs.add_range(start, end)
+        return self.repo.replace(ignore_revs=ignore_revs)
+
+
+class IgnoreRevsScanner:
+
+    """Scan Subversion history for revisions worth adding to ignore_revs.
+
+    Public instance variables:
+    max_paths - Revisions changing more paths than this in the project are
+                suggested, or None for no limit.
+    path_patterns - Tuple of glob patterns. Revisions that add or replace a
+                    matching path are suggested. Patterns are matched
+                    against paths relative to the project, e.g.
+                    "trunk/dist/big.iso", and "*" also matches "/".
+
+    Public methods:
+    scan - Suggest revisions to ignore for a GitSvnRepo.
+
+    """
+
+    def __init__(self, max_paths=None, path_patterns=()):
+        self._max_paths = max_paths
+        self._path_patterns = tuple(path_patterns)
+
+    @property
+    def max_paths(self):
+        """Largest number of changed paths before a revision is suggested."""
+        return self._max_paths
+
+    @property
+    def path_patterns(self):
+        """Glob patterns for added paths that make a revision suggested."""
+        return self._path_patterns
+
+    def _get_head(self, svn_repo, **args):
+        # Latest revision at the URL that is fetched from, which may be a
+        # mirror that lags behind "path".
+        output_args = args.copy()
+        output_args.pop("stdout", None)
+        svn_info = svn_repo.runner.check_output(
+            ["svn", "info", "--xml", svn_repo.fetch_url],
+            universal_newlines=True,
+            **output_args
+        )
+        return parse_info_xml(svn_info)[0].revision
+
+    def _check_heuristics(self, entry, project):
+        # Return the reason a revision is a problem revision, or None.
+        paths = [(action, path[len(project)+1:])
+                 for action, kind, path, copyfrom_path, copyfrom_rev
+                 in entry.paths if path.startswith(project+"/")]
+        if self.max_paths is not None and len(paths) > self.max_paths:
+            return "changes {0} paths".format(len(paths))
+        for action, path in paths:
+            if action not in ("A", "R"):
+                continue
+            for pattern in self.path_patterns:
+                if fnmatchcase(path, pattern):
+                    return "adds {0}".format(path)
+        return None
+
+    def scan(self, repo, start=None, end=None, **args):
+        """Suggest revisions to ignore for a GitSvnRepo.
+
+        If the SvnRepo has a log_cache, it is brought up to date and the
+        log is read from it. Otherwise the log of the fetch URL is
+        streamed from the server.
+
+        Arguments:
+        repo - GitSvnRepo to scan.
+        start - First revision to scan. Defaults to None, meaning the
+                repo's base_revision, or 1.
+        end - Last revision to scan. Defaults to None, meaning the latest
+              revision.
+
+        Any additional keyword arguments are passed to subprocess.Popen(),
+        except for stdout.
+
+        Returns an IgnoreSuggestion.
+
+        """
+        svn_repo = repo.svn_repo
+        if start is None:
+            start = repo.base_revision or 1
+        if end is None:
+            end = self._get_head(svn_repo, **args)
+        project = svn_repo.path[len(svn_repo.get_root(**args)):].rstrip("/")
+        tops = [(project+"/"+path.strip("/")).rstrip("/")
+                for path in svn_repo.trunk_branch.paths]
+
+        def in_scope(path):
+            # Changes at, below or above the trunk head or tags root.
+            for top in tops:
+                if path == top or path.startswith(top+"/") or \
+                   top.startswith(path+"/"):
+                    return True
+            return False
+
+        revisions = RevisionSet()
+        flagged = []
+        # Revisions after last_kept and before the current entry are not
+        # in the log, so they don't touch the project at all.
+        last_kept = [start-1]
+
+        def add_entry(entry):
+            revision = entry.revision
+            if revision < start or revision > end:
+                return
+            if not any(in_scope(path[2]) for path in entry.paths):
+                return
+            reason = self._check_heuristics(entry, project)
+            if reason is not None:
+                flagged.append((revision, reason))
+                return
+            if revision > last_kept[0]+1:
+                revisions.add_range(last_kept[0]+1, revision-1)
+            last_kept[0] = revision
+
+        if end >= start:
+            log_cache = svn_repo.log_cache
+            if log_cache is not None:
+                log_cache.update(end, **args)
+                for entry in log_cache.get_entries(start, end):
+                    add_entry(entry)
+            else:
+                stream_log(svn_repo.runner, svn_repo.fetch_url, start, end,
+                           add_entry, **args)
+            if end > last_kept[0]:
+                revisions.add_range(last_kept[0]+1, end)
+
+        return IgnoreSuggestion(repo, start, end, revisions, flagged)
+
+
+def format_suggestions(suggestions):
+    """Describe IgnoreSuggestion objects in human-readable lines.
+
+    Returns a list of strings, one per repository followed by one per
+    flagged revision.
+
+    """
+    lines = []
+    for suggestion in suggestions:
+        lines.append("{0}: r{1}-r{2}: suggest ignore_revs {3}".format(
+            suggestion.repo.name, suggestion.start, suggestion.end,
+            str(suggestion.revisions) or "(none)"
+        ))
+        for revision, reason in suggestion.flagged:
+            lines.append("  r{0} {1}".format(revision, reason))
+    return lines
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""Typed options for the git-svn commands run by a GitSvnRepo.
+
+The command line wrappers pass git-svn options through as strings, but
+programs that already have structured data can build a GitSvnOptions
+object directly, and give it to a GitSvnRepo. The git-svn arguments for
+each command are only worked out once per object, and the object can be
+pickled, e.g. to send it to a process pool.
+
+Classes:
+GitSvnOptions - Options for "git svn init", "clone" and "fetch".
+
+"""
+
+
+# Commands whose options are described here. "git svn rebase" is not
+# listed, since GitSvnRepo.rebase runs "git svn fetch" itself.
+_commands = ("init", "clone", "fetch")
+
+_init_commands = frozenset(["init", "clone"])
+_fetch_commands = frozenset(["clone", "fetch"])
+# "git svn clone" rejects options that only make sense for an existing
+# repository, e.g. "--parent".
+_existing_commands = frozenset(["fetch"])
+_all_commands = frozenset(_commands)
+
+# Each option is described by the attribute name, the git-svn option, True
+# if the option takes a value rather than being a flag, and the commands
+# that accept it.
+_option_table = (
+    ("shared", "--shared", True, _init_commands),
+    ("template", "--template", True, _init_commands),
+    ("use_svm_props", "--use-svm-props", False, _init_commands),
+    ("use_svnsync_props", "--use-svnsync-props", False, _init_commands),
+    ("rewrite_uuid", "--rewrite-uuid", True, _init_commands),
+    ("no_minimize_url", "--no-minimize-url", False, _init_commands),
+    ("username", "--username", True, _all_commands),
+    ("ignore_paths", "--ignore-paths", True, _all_commands),
+    ("authors_file", "--authors-file", True, _fetch_commands),
+    ("authors_prog", "--authors-prog", True, _fetch_commands),
+    ("quiet", "--quiet", False, _fetch_commands),
+    ("repack", "--repack", True, _fetch_commands),
+    ("repack_flags", "--repack-flags", True, _fetch_commands),
+    ("localtime", "--localtime", False, _fetch_commands),
+    ("parent", "--parent", False, _existing_commands),
+    ("log_window_size", "--log-window-size", True, _fetch_commands),
+    ("use_log_author", "--use-log-author", False, _fetch_commands),
+    ("preserve_empty_dirs", "--preserve-empty-dirs", False,
+     _fetch_commands),
+    ("placeholder_filename", "--placeholder-filename", True,
+     _fetch_commands),
+)
+
+
+class GitSvnOptions:
+
+    """Options for the git-svn commands run by a GitSvnRepo.
+
+    Objects are immutable; use replace() to get a modified copy. Options
+    that take a value default to None, meaning that they are not passed,
+    and flags default to False.
+
+    Public instance variables:
+    One read-only attribute per option, named after the git-svn option
+    with dashes replaced by underscores, e.g. "authors_file" for
+    "--authors-file". See _option_table for the full list.
+
+    Public methods:
+    args_for - Get the git-svn arguments for one command.
+    replace - Copy these options, changing some of them.
+    to_dict - Return a dictionary of the options that are set.
+
+    """
+
+    def __init__(self, **options):
+        """Set options by keyword, e.g. authors_file="authors.txt".
+
+        Raises TypeError for an unknown option.
+
+        """
+        unknown = set(options) - set(entry[0] for entry in _option_table)
+        if unknown:
+            raise TypeError("unknown git-svn options: " +
+                            ", ".join(sorted(unknown)))
+        self._values = {}
+        for name, opt, takes_value, commands in _option_table:
+            default = None if takes_value else False
+            self._values[name] = options.get(name, default)
+        # Command -> tuple of arguments, filled in by args_for.
+        self._args = {}
+
+    def args_for(self, command):
+        """Get the git-svn arguments for a command.
+
+        Arguments:
+        command - "init", "clone" or "fetch".
+
+        Returns a new list of strings, holding only the options that are
+        set and that the command accepts.
+
+        """
+        if command not in _all_commands:
+            raise ValueError("no options for git svn "+command)
+        args = self._args.get(command)
+        if args is None:
+            args = []
+            for name, opt, takes_value, commands in _option_table:
+                value = self._values[name]
+                if command not in commands:
+                    continue
+                if takes_value and value is not None:
+                    args.append(opt+"="+str(value))
+                elif not takes_value and value:
+                    args.append(opt)
+            args = tuple(args)
+            self._args[command] = args
+        return list(args)
+
+    def replace(self, **changes):
+        """Return a copy of these options, with some of them changed."""
+        options = dict(self._values)
+        options.update(changes)
+        return GitSvnOptions(**options)
+
+    def to_dict(self):
+        """Return a dictionary holding the options that are set."""
+        return dict((name, value) for name, value in self._values.items()
+                    if value is not None and value is not False)
+
+    def __eq__(self, other):
+        if not isinstance(other, GitSvnOptions):
+            return NotImplemented
+        return self._values == other._values
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    def __repr__(self):
+        return "GitSvnOptions(" + ", ".join(
+            name+"="+repr(value)
+            for name, value in sorted(self.to_dict().items())
+        ) + ")"
+
+
+def _option_property(name):
+    return property(lambda self: self._values[name],
+                    doc="Value of the git-svn option for "+name+".")
+
+for _entry in _option_table:
+    setattr(GitSvnOptions, _entry[0], _option_property(_entry[0]))
+del _entry
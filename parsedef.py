@@ -2,8 +2,22 @@
 """Classes corresponding to configuration files."""
 
 from configparser import ConfigParser, ExtendedInterpolation
+import os
+import re
 
 from GitSvnHack.repository import SvnBranch, SvnRepo, GitSvnRepo
+from GitSvnHack.revisions import RevisionSet
+from GitSvnHack.svnlog import SvnLogCache
+
+
+# Lines of a definition file that start a section, or set ignore_revs.
+_section_regex = re.compile(r"^\[(?P<name>[^\]]+)\]")
+_ignore_revs_regex = re.compile(r"^ignore_revs\s*=", re.IGNORECASE)
+
+
+def _escape(value):
+    # Protect "$" from ExtendedInterpolation.
+    return value.replace("$", "$$")
 
 
 class GitSvnDefParser:
@@ -15,47 +29,168 @@ class GitSvnDefParser:
             empty_lines_in_values=False,
             interpolation=ExtendedInterpolation()
         )
+        self._cache_dir = None
+
+    @property
+    def cache_dir(self):
+        """Directory for caches of the defined repos, or None.
+
+        This is ".svnhack-cache" next to the last definition file read.
+        Caches are kept outside the repos' paths, so that nothing is
+        created there before they are cloned.
+
+        """
+        return self._cache_dir
 
     def read(self, path):
         "Read a definition file."
         self._cfg_parse.read(path)
+        self._cache_dir = os.path.join(
+            os.path.dirname(os.path.abspath(path)), ".svnhack-cache"
+        )
 
     def write(self, path):
         "Write out the definition file."
         with open(path, "w+") as def_file:
             self._cfg_parse.write(def_file)
 
-    def get_repos(self):
-        """Read definition file into repository objects."""
+    def get_repos(self, info_cache=None):
+        """Read definition file into repository objects.
+
+        If given, "info_cache" is shared by all of the SvnRepo objects.
+
+        If a definition file was read, each SvnRepo gets an SvnLogCache of
+        its URL, kept in cache_dir and named after the repo, so that fetch
+        planning and ignore_revs suggestions only download revisions they
+        haven't seen before.
+
+        """
         repo_names = self._cfg_parse.sections()
         repos = []
         for name in repo_names:
             repo_dict = self._cfg_parse[name]
             trunk_head, trunk_tags = repo_dict["svn_trunk"].split(",")
+            log_cache = None
+            if self.cache_dir is not None:
+                log_cache = SvnLogCache(
+                    repo_dict["svn_url"],
+                    os.path.join(self.cache_dir, name+".svnlog.jsonl")
+                )
             svn_repo = SvnRepo(name="svn_"+name,
                                path=repo_dict["svn_url"],
                                trunk_head=trunk_head,
-                               trunk_tags=trunk_tags)
-            ignore_revs = [int(s) for s in
-                           repo_dict["ignore_revs"].split(",")]
+                               trunk_tags=trunk_tags,
+                               info_cache=info_cache,
+                               log_cache=log_cache,
+                               mirror_path=repo_dict.get("svn_mirror"))
+            ignore_revs = RevisionSet.from_string(
+                repo_dict.get("ignore_revs", "")
+            )
+            base_revision = repo_dict.get("base_revision")
+            if base_revision is not None:
+                base_revision = int(base_revision)
             repos.append(
                 GitSvnRepo(name=name,
                            path=repo_dict["path"],
                            ignore_revs=ignore_revs,
+                           base_revision=base_revision,
                            svn_repo=svn_repo)
             )
         return repos
 
     def set_repos(self, repos):
-        "Set a list of repos whose definitions will be written."
+        """Set a list of repos whose definitions will be written.
+
+        Repos that are already defined are replaced.
+
+        """
         for repo in repos:
+            if self._cfg_parse.has_section(repo.name):
+                self._cfg_parse.remove_section(repo.name)
             self._cfg_parse.add_section(repo.name)
             self._cfg_parse.set(
                 repo.name, "svn_trunk",
-                ",".join([repo.svn_repo.trunk_head,
-                          repo.svn_repo.trunk_tags])
+                _escape(",".join([repo.svn_repo.trunk_branch.head,
+                                  repo.svn_repo.trunk_branch.tags]))
             )
-            self._cfg_parse.set(repo.name, "svn_url", repo.svn_repo.path)
-            self._cfg_parse.set(repo.name, "path", repo.path)
+            self._cfg_parse.set(repo.name, "svn_url",
+                                _escape(repo.svn_repo.path))
+            if repo.svn_repo.mirror_path is not None:
+                self._cfg_parse.set(repo.name, "svn_mirror",
+                                    _escape(repo.svn_repo.mirror_path))
+            self._cfg_parse.set(repo.name, "path", _escape(repo.path))
             self._cfg_parse.set(repo.name, "ignore_revs",
-                                ",".join(str(i) for i in repo.ignore_revs))
+                                str(RevisionSet(repo.ignore_revs)))
+            if repo.base_revision is not None:
+                self._cfg_parse.set(repo.name, "base_revision",
+                                    str(repo.base_revision))
+
+    def update_ignore_revs(self, path, repos):
+        """Rewrite only the ignore_revs of some repos in a definition file.
+
+        Everything else in the file is left as it is, including comments
+        and values that use interpolation. Each repo must already have a
+        section in the file; its ignore_revs line is replaced, or added at
+        the end of the section.
+
+        Arguments:
+        path - Path of the definition file.
+        repos - Iterable of GitSvnRepo objects whose ignore_revs are
+                written.
+
+        Raises KeyError if a repo has no section in the file.
+
+        """
+        values = dict((repo.name, str(RevisionSet(repo.ignore_revs)))
+                      for repo in repos)
+        with open(path) as def_file:
+            lines = def_file.readlines()
+        if lines and not lines[-1].endswith("\n"):
+            lines[-1] += "\n"
+
+        new_lines = []
+        section = None
+        section_start = 0
+        found = set()
+        skipping = False
+        def end_section():
+            # Add ignore_revs after the last value of a section that
+            # doesn't have it, before any blank lines or comments that
+            # lead into the next section.
+            if section in values and section not in found:
+                insert_at = len(new_lines)
+                while insert_at > section_start and \
+                      new_lines[insert_at-1].strip()[:1] in ("", "#"):
+                    insert_at -= 1
+                new_lines.insert(insert_at,
+                                 "ignore_revs = "+values[section]+"\n")
+                found.add(section)
+        for line in lines:
+            if skipping:
+                # Continuation lines of the old value are indented.
+                if line.strip() and line[0] in " \t":
+                    continue
+                skipping = False
+            match = _section_regex.match(line)
+            if match is not None:
+                end_section()
+                section = match.group("name")
+                section_start = len(new_lines)+1
+            elif section in values and _ignore_revs_regex.match(line):
+                new_lines.append("ignore_revs = "+values[section]+"\n")
+                found.add(section)
+                skipping = True
+                continue
+            new_lines.append(line)
+        end_section()
+
+        missing = set(values) - found
+        if missing:
+            raise KeyError("no definition for "+", ".join(sorted(missing)))
+        temp_path = path+".tmp"
+        with open(temp_path, "w") as def_file:
+            def_file.writelines(new_lines)
+        os.rename(temp_path, path)
+        for name, value in values.items():
+            if self._cfg_parse.has_section(name):
+                self._cfg_parse.set(name, "ignore_revs", value)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""Progress reporting for git-svn fetches.
+
+While fetching, git-svn prints a line like
+
+r12345 = 0123456789abcdef0123456789abcdef01234567 (refs/remotes/trunk)
+
+for every commit it creates. A FetchProgress reads these lines one at a
+time as they are printed, and keeps track of how fast revisions arrive and
+how long the fetch has left to go.
+
+Classes:
+FetchProgress - Track a fetch from the output of git-svn.
+
+Functions:
+parse_fetch_line - Parse one line of git-svn fetch output.
+
+"""
+
+import re
+import time
+
+
+# Regular expression for the line printed for each new git-svn commit.
+# Older versions of git-svn print the ref without "refs/remotes/".
+_fetch_line_regex = re.compile(
+    "^r(?P<revision>\\d+) = (?P<commit>[0-9a-f]{40})"
+    "(?: \\((?P<ref>[^)]+)\\))?\\s*$"
+)
+
+
+def parse_fetch_line(line):
+    """Parse a line of git-svn fetch output.
+
+    Returns a (revision, commit, ref) tuple if the line announces a new
+    commit, or None otherwise. The ref is None if git-svn did not print
+    one.
+
+    """
+    match = _fetch_line_regex.match(line)
+    if match is None:
+        return None
+    return (int(match.group("revision")), match.group("commit"),
+            match.group("ref"))
+
+
+def _format_duration(seconds):
+    seconds = int(seconds)
+    return "{0}:{1:02}:{2:02}".format(seconds // 3600, seconds // 60 % 60,
+                                      seconds % 60)
+
+
+class FetchProgress:
+
+    """Track the progress of git-svn fetches from their output.
+
+    Lines are passed to feed() as they are printed. One FetchProgress can
+    follow several fetch commands in a row, e.g. the windows of a rebase
+    or the chunks of a chunked clone.
+
+    Public instance variables:
+    target_revision - Revision the fetch is expected to end at, or None.
+    start_revision - Revision before the first one fetched, or None.
+    current_revision - Latest revision fetched, or None.
+    commits - Number of commits created so far.
+    elapsed - Seconds since the first line was fed or start() was called.
+    rate - Revisions per second, or None if unknown.
+    eta - Estimated seconds left, or None if unknown.
+
+    Public methods:
+    start - Set the revision range and start the clock.
+    feed - Process one line of git-svn output.
+    format - Describe the progress in one line.
+
+    """
+
+    def __init__(self, callback=None, output=None, clock=time.time):
+        """Create a progress tracker.
+
+        Keyword arguments:
+        callback - If given, called with this object after every commit.
+        output - If given, a text file that every line fed is copied to.
+        clock - Function returning the current time in seconds.
+
+        """
+        self._callback = callback
+        self._output = output
+        self._clock = clock
+        self._start_time = None
+        self._start_revision = None
+        self._target_revision = None
+        self._current_revision = None
+        self._commits = 0
+
+    @property
+    def target_revision(self):
+        """Revision the fetch is expected to end at, or None."""
+        return self._target_revision
+
+    @property
+    def start_revision(self):
+        """Latest revision present before the fetch, or None."""
+        return self._start_revision
+
+    @property
+    def current_revision(self):
+        """Latest revision fetched so far, or None."""
+        return self._current_revision
+
+    @property
+    def commits(self):
+        """Number of commits git-svn has reported so far."""
+        return self._commits
+
+    @property
+    def elapsed(self):
+        """Seconds since the fetch started."""
+        if self._start_time is None:
+            return 0.0
+        return self._clock() - self._start_time
+
+    @property
+    def rate(self):
+        """Revisions fetched per second, or None if not yet known.
+
+        This counts revisions rather than commits, since revisions that
+        don't touch the fetched paths take time to skip too.
+
+        """
+        if self._current_revision is None or \
+           self._start_revision is None:
+            return None
+        elapsed = self.elapsed
+        if elapsed <= 0:
+            return None
+        return (self._current_revision - self._start_revision) / elapsed
+
+    @property
+    def eta(self):
+        """Estimated seconds until target_revision, or None."""
+        rate = self.rate
+        if not rate or self._target_revision is None:
+            return None
+        return max(self._target_revision - self._current_revision, 0) / rate
+
+    def start(self, start_revision, target_revision):
+        """Set the revision range of the fetch and start the clock.
+
+        Arguments:
+        start_revision - Latest revision present before fetching.
+        target_revision - Revision the fetch will end at, or None.
+
+        The clock is only started the first time, so that the rate covers
+        the whole of a fetch made with several commands.
+
+        """
+        if self._start_revision is None:
+            self._start_revision = start_revision
+        self._target_revision = target_revision
+        if self._start_time is None:
+            self._start_time = self._clock()
+
+    def feed(self, line):
+        """Process one line of git-svn output.
+
+        Returns the result of parse_fetch_line for the line.
+
+        """
+        if self._output is not None:
+            self._output.write(line)
+        fetched = parse_fetch_line(line)
+        if fetched is None:
+            return None
+        if self._start_time is None:
+            self._start_time = self._clock()
+        if self._start_revision is None:
+            self._start_revision = fetched[0] - 1
+        self._current_revision = fetched[0]
+        self._commits += 1
+        if self._callback is not None:
+            self._callback(self)
+        return fetched
+
+    def format(self):
+        """Describe the progress in one line, e.g. for a status display."""
+        if self._current_revision is None:
+            return "waiting for the first revision"
+        parts = ["r"+str(self._current_revision)]
+        if self._target_revision is not None:
+            parts[0] += "/"+str(self._target_revision)
+        rate = self.rate
+        if rate is not None:
+            parts.append("{0:.1f} rev/s".format(rate))
+        eta = self.eta
+        if eta is not None:
+            parts.append("ETA "+_format_duration(eta))
+        return ", ".join(parts)
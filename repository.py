@@ -10,14 +10,105 @@ GitSvnRepo - git-svn repository class.
 
 """
 
+import os
 import re
+import shutil
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree import ElementTree
+
+from GitSvnHack import runner as _runner
+from GitSvnHack.catfile import CatFile
+from GitSvnHack.options import GitSvnOptions
+from GitSvnHack.revindex import RevIndex
+from GitSvnHack.revisions import FetchPlan, RevisionSet
+from GitSvnHack.svnignore import SvnIgnoreConverter
+from GitSvnHack.svninfo import parse_info_xml
 
 
 # Regular expression used to get the current revision from "svn info".
 # Also works for "git svn info".
 _svn_info_regex = re.compile("Revision: (?P<revision>\d+)")
 
+# Regular expression used to get the revision from a git-svn commit
+# message.
+_git_svn_id_regex = re.compile(
+    "^git-svn-id: \\S+@(?P<revision>\\d+) \\S+$", re.MULTILINE
+)
+
+# Configuration key used to record the progress of a chunked clone.
+_clone_checkpoint_key = "svnhack.clone-checkpoint"
+
+# Arguments used to rebase onto fetched revisions.
+_rebase_local_argv = ["git", "svn", "rebase", "--local"]
+
+
+# Hook that lets svnsync set revision properties on a mirror.
+_mirror_hook_script = "#!/bin/sh\nexit 0\n"
+
+# Locks that stop threads from synchronizing the same mirror at once,
+# keyed by absolute mirror path.
+_mirror_locks = {}
+_mirror_locks_lock = threading.Lock()
+
+# Locks that stop threads from running git-svn fetches in the same
+# repository at once, keyed by absolute repository path. Every fetch
+# writes .git/svn/.metadata through "git config --file", which fails if
+# another process holds the lock on it, and may run "git gc --auto".
+_fetch_locks = {}
+_fetch_locks_lock = threading.Lock()
+
+# CatFile objects shared by every GitRepo on the same repository, keyed by
+# absolute path.
+_cat_files = {}
+_cat_files_lock = threading.Lock()
+
+
+def _output_args(args):
+    """Copy keyword arguments for check_call, dropping "stdout".
+
+    This allows the same arguments to be used for commands whose output
+    we need to capture.
+
+    """
+    output_args = args.copy()
+    if "stdout" in output_args:
+        del output_args["stdout"]
+    return output_args
+
+
+def _parse_log_revisions(svn_log):
+    """Get a sorted list of revisions from "svn log --xml" output."""
+    return sorted(int(entry.get("revision")) for entry in
+                  ElementTree.fromstring(svn_log).iter("logentry"))
+
+
+def _tags_args(svn_branch):
+    """Get the git-svn options for the tags of an SvnBranch, if any."""
+    if svn_branch.tags is None:
+        return []
+    return ["-t", svn_branch.tags]
+
+
+def _parse_copy_revision(svn_log):
+    """Get the revision a path was copied from, from "svn log --xml -v".
+
+    The log should be made with "--stop-on-copy", so that its oldest entry
+    is the one that created the path. Returns the revision the path was
+    copied from, or the revision that created it if it was not a copy.
+
+    """
+    entries = list(ElementTree.fromstring(svn_log).iter("logentry"))
+    if not entries:
+        raise LookupError("empty Subversion log")
+    oldest = min(entries, key=lambda entry: int(entry.get("revision")))
+    for path in oldest.iter("path"):
+        copy_revision = path.get("copyfrom-rev")
+        if copy_revision is not None:
+            return int(copy_revision)
+    return int(oldest.get("revision"))
+
 
 class Repo:
 
@@ -26,19 +117,23 @@ class Repo:
     Public instance variables:
     name - The repository's name.
     path - The repository's path or URL.
+    runner - The CommandRunner used to run git and svn commands.
 
     """
 
-    def __init__(self, *, name, path, **args):
+    def __init__(self, *, name, path, runner=None, **args):
         """Construct a Repo using identifying strings.
 
         Keyword arguments:
         name - Sets the "name" attribute.
         path - Sets the "path" attribute.
+        runner - Sets the "runner" attribute. Defaults to None, which means
+                 that the default runner is used.
 
         """
         self._name = name
         self._path = path
+        self._runner = runner
         super().__init__(**args)
 
     @property
@@ -51,6 +146,18 @@ class Repo:
         """The path or URL that will be used to access the repository."""
         return self._path
 
+    @property
+    def runner(self):
+        """CommandRunner for this repository's commands.
+
+        Unless a runner was given to the constructor, this is the runner
+        returned by runner.get_default_runner() at the time of use.
+
+        """
+        if self._runner is not None:
+            return self._runner
+        return _runner.get_default_runner()
+
 
 class SvnBranch:
 
@@ -58,7 +165,11 @@ class SvnBranch:
 
     Public instance variables:
     head - Relative path to the branch's head.
-    tags - Glob expression for relative paths to the branch's tags.
+    tags - Glob expression for relative paths to the branch's tags, or
+           None.
+    tags_root - Relative path to the directory containing all tags, or
+                None.
+    paths - List of the head and the tags root, if there is one.
 
     """
 
@@ -67,7 +178,8 @@ class SvnBranch:
 
         Keyword arguments:
         head - Sets the "head" attribute.
-        tags - Sets the "tags" attribute.
+        tags - Sets the "tags" attribute. None means that the branch has
+               no tags.
 
         """
         self._head = head
@@ -89,11 +201,42 @@ class SvnBranch:
 
         This expression is relative to the root directory of the project.
         It should be comprehensible to git-svn, which means that it can
-        only use globs and brace expansion to specify multiple paths.
+        only use globs and brace expansion to specify multiple paths. It
+        is None if the branch has no tags.
 
         """
         return self._tags
 
+    @property
+    def tags_root(self):
+        """Path to the directory containing all of the branch's tags.
+
+        This is the part of the tags expression before the first glob or
+        brace expansion, without a trailing "/", or None if the branch
+        has no tags.
+
+        """
+        if self._tags is None:
+            return None
+        # A smarter version would also handle directories in braces.
+        tags_root = self._tags
+        for glob_char in ("*", "{"):
+            glob_part_idx = tags_root.find(glob_char)
+            if glob_part_idx >= 0:
+                tags_root = tags_root[:glob_part_idx]
+        return tags_root.rstrip("/")
+
+    @property
+    def paths(self):
+        """List of the paths holding the branch's head and tags.
+
+        This is the head followed by the tags root, if there are tags.
+
+        """
+        if self.tags_root is None:
+            return [self.head]
+        return [self.head, self.tags_root]
+
 
 class SvnRepo(Repo):
 
@@ -111,12 +254,32 @@ class SvnRepo(Repo):
 
     Public instance variables:
     trunk_head - URL for the head of the repo's trunk
-    trunk_tags - An expression used to find the repo's trunk tags.
+    trunk_tags - An expression used to find the repo's trunk tags, or
+                 None.
     trunk_branch - An SvnBranch object corresponding to the project's
                    trunk.
+    info_cache - SvnInfoCache used for get_current_revision, or None.
+    log_cache - SvnLogCache used for get_changed_revisions, or None.
+    mirror_path - Local path of an svnsync mirror of the repository, or
+                  None.
+    mirror_url - "file://" URL of the mirror, or None.
+    fetch_url - URL that git-svn should fetch from; the project's space
+                in the mirror if there is one, otherwise "path".
 
     Public methods:
     get_current_revision - Query the latest revision number.
+    get_changed_revisions - Query which revisions changed the trunk or
+                            its tags.
+    get_root - Query the URL of the repository root.
+    get_uuid - Query the UUID of the repository.
+    get_tag_revision - Query the trunk revision a tag was made from.
+    sync_mirror - Create or update the svnsync mirror.
+
+    Methods for callers that run the commands themselves, e.g. the
+    coroutines in GitSvnHack.aio:
+    changed_revisions_argv - Get the "svn log" command used by
+                             get_changed_revisions.
+    parse_changed_revisions - Read the output of that command.
 
     There are also some methods used to interact with the repository, but
     they are fragile and really just meant for testing.
@@ -130,13 +293,25 @@ class SvnRepo(Repo):
 
     """
 
-    def __init__(self, *, trunk_head, trunk_tags, **args):
+    def __init__(self, *, trunk_head, trunk_tags, info_cache=None,
+                 log_cache=None, mirror_path=None, **args):
         """Extend the Repo constructor with trunk information.
 
         New keyword arguments:
         trunk_head - Trunk head location, relative to the "path" argument.
         trunk_tags - Git-svn-compatible glob expression to find trunk_tags,
-                     relative to the "path" argument.
+                     relative to the "path" argument, or None if the
+                     trunk has no tags.
+        info_cache - An SvnInfoCache used by get_current_revision. Defaults
+                     to None, meaning that the repository is queried every
+                     time.
+        log_cache - An SvnLogCache of "path" or "fetch_url", used by
+                    get_changed_revisions. Defaults to None, meaning that
+                    "svn log" is run for every query.
+        mirror_path - Sets the "mirror_path" attribute. Defaults to None,
+                      meaning that git-svn fetches from "path" directly.
+                      Several SvnRepo objects on the same Subversion
+                      repository may share one mirror.
 
         Other keyword arguments are passed to the Repo constructor. The
         "path" argument should contain the URL used to access the
@@ -144,6 +319,11 @@ class SvnRepo(Repo):
 
         """
         self._trunk_branch = SvnBranch(trunk_head, trunk_tags)
+        self._info_cache = info_cache
+        self._log_cache = log_cache
+        self._mirror_path = mirror_path
+        self._root = None
+        self._uuid = None
         super().__init__(**args)
 
     @property
@@ -153,7 +333,9 @@ class SvnRepo(Repo):
 
     @property
     def trunk_tags(self):
-        """Glob expression for URLs corresponding to the trunk's tags."""
+        """Glob expression for URLs of the trunk's tags, or None."""
+        if self._trunk_branch.tags is None:
+            return None
         return self.path+"/"+self._trunk_branch.tags
 
     @property
@@ -161,16 +343,214 @@ class SvnRepo(Repo):
         """SvnBranch object corresponding to the project's trunk."""
         return self._trunk_branch
 
+    @property
+    def info_cache(self):
+        """SvnInfoCache used to look up the latest revision, or None."""
+        return self._info_cache
+
+    @property
+    def log_cache(self):
+        """SvnLogCache used to find changed revisions, or None."""
+        return self._log_cache
+
+    @property
+    def mirror_path(self):
+        """Local path of the svnsync mirror, or None."""
+        return self._mirror_path
+
+    @property
+    def mirror_url(self):
+        """The "file://" URL of the svnsync mirror, or None."""
+        if self.mirror_path is None:
+            return None
+        return "file://"+os.path.abspath(self.mirror_path)
+
+    @property
+    def fetch_url(self):
+        """URL of the project's space for git-svn to fetch from.
+
+        This is "path", unless there is a mirror, in which case it is the
+        same location within the mirror. Finding that location requires
+        the repository root, so the first use may run "svn info".
+
+        """
+        if self.mirror_path is None:
+            return self.path
+        return self.mirror_url+self.path[len(self.get_root()):]
+
     def get_current_revision(self):
-        """Gets the latest revision number from the repository."""
+        """Gets the latest revision number from the repository.
+
+        If this repository has an info_cache, a cached answer may be used.
+
+        """
+        if self.info_cache is not None:
+            return self.info_cache.get_revision(self.path)
 
         # Parse the output of "svn info" to get the current revision.
-        svn_info = subprocess.check_output(
+        svn_info = self.runner.check_output(
             ["svn", "info", self.path],
             universal_newlines=True,
         )
         return int(_svn_info_regex.search(svn_info).group("revision"))
 
+    def get_changed_revisions(self, start, end="HEAD", **args):
+        """Get the revisions that change the trunk head or trunk tags.
+
+        This uses a single "svn log" query for both paths. If there is a
+        log_cache, only the revisions it lacks are downloaded, and it
+        answers the query.
+
+        Arguments:
+        start - First revision to check.
+        end - Last revision to check. Defaults to "HEAD".
+
+        Any additional keyword arguments are passed to
+        subprocess.check_output(), except for stdout.
+
+        Returns a sorted list of revision numbers.
+
+        """
+        if self.log_cache is not None:
+            self.log_cache.update(end, **_output_args(args))
+            project = self.path[len(self.get_root(**args)):].rstrip("/")
+            return self.log_cache.get_revisions(
+                [project+"/"+path for path in self.trunk_branch.paths],
+                start, end if end != "HEAD" else None
+            )
+        svn_log = self.runner.check_output(
+            self.changed_revisions_argv(start, end),
+            universal_newlines=True,
+            **_output_args(args)
+        )
+        return self.parse_changed_revisions(svn_log)
+
+    def changed_revisions_argv(self, start, end="HEAD"):
+        """Get the "svn log" command that get_changed_revisions runs.
+
+        The log_cache is not used. Returns a new list of strings.
+
+        """
+        return ["svn", "log", "-q", "--xml",
+                "-r", str(start)+":"+str(end), self.fetch_url]+ \
+            self.trunk_branch.paths
+
+    def parse_changed_revisions(self, svn_log):
+        """Get the sorted revisions in changed_revisions_argv output."""
+        return _parse_log_revisions(svn_log)
+
+    def get_tag_revision(self, tag_name, **args):
+        """Get the trunk revision that a tag was made from.
+
+        Arguments:
+        tag_name - Name of the tag, relative to the root of trunk_tags.
+
+        Any additional keyword arguments are passed to
+        subprocess.check_output(), except for stdout.
+
+        Returns the revision the tag was copied from, or the revision that
+        created it if it was not made by copying.
+
+        """
+        svn_log = self.runner.check_output(
+            ["svn", "log", "--xml", "-v", "--stop-on-copy",
+             self.path+"/"+self.trunk_branch.tags_root+"/"+tag_name],
+            universal_newlines=True,
+            **_output_args(args)
+        )
+        return _parse_copy_revision(svn_log)
+
+    def get_root(self, **args):
+        """Get the URL of the root of the repository containing "path".
+
+        The answer is remembered, so "svn info" is run at most once. If
+        there is an info_cache, it is used for the query.
+
+        Any additional keyword arguments are passed to
+        subprocess.check_output(), except for stdout.
+
+        """
+        if self._root is None:
+            if self.info_cache is not None:
+                info = self.info_cache.query([self.path], **args).get(
+                    self.path
+                )
+                if info is None:
+                    raise LookupError("no Subversion information for " +
+                                      self.path)
+            else:
+                svn_info = self.runner.check_output(
+                    ["svn", "info", "--xml", self.path],
+                    universal_newlines=True,
+                    **_output_args(args)
+                )
+                info = parse_info_xml(svn_info)[0]
+            self._uuid = info.uuid
+            self._root = info.root.rstrip("/")
+        return self._root
+
+    def get_uuid(self, **args):
+        """Get the UUID of the repository containing "path".
+
+        This comes from the same query as get_root, and is remembered in
+        the same way.
+
+        Any additional keyword arguments are passed to
+        subprocess.check_output(), except for stdout.
+
+        """
+        self.get_root(**args)
+        return self._uuid
+
+    def sync_mirror(self, **args):
+        """Create the svnsync mirror if necessary, then update it.
+
+        The whole repository containing "path" is mirrored, so that other
+        projects on the same repository can share the mirror. A new mirror
+        is built under a temporary name and only moved into place once
+        "svnsync initialize" has succeeded. Threads in this process take
+        turns updating any one mirror.
+
+        Any additional keyword arguments provided are passed to
+        subprocess.check_call().
+
+        """
+        mirror_path = os.path.abspath(self.mirror_path)
+        with _mirror_locks_lock:
+            mirror_lock = _mirror_locks.setdefault(mirror_path,
+                                                   threading.Lock())
+        with mirror_lock:
+            if not os.path.isdir(mirror_path):
+                self._create_mirror(mirror_path, **args)
+            self.runner.check_call(
+                ["svnsync", "synchronize", "--non-interactive",
+                 self.mirror_url],
+                **args
+            )
+
+    def _create_mirror(self, mirror_path, **args):
+        root = self.get_root(**args)
+        temp_path = mirror_path+".tmp"
+        if os.path.isdir(temp_path):
+            shutil.rmtree(temp_path)
+        self.runner.check_call(["svnadmin", "create", temp_path], **args)
+        # Give the mirror the upstream UUID, so that anything reading it
+        # sees the same repository.
+        self.runner.check_call(
+            ["svnadmin", "setuuid", temp_path, self.get_uuid(**args)],
+            **args
+        )
+        hook_path = os.path.join(temp_path, "hooks", "pre-revprop-change")
+        with open(hook_path, "w") as hook_file:
+            hook_file.write(_mirror_hook_script)
+        os.chmod(hook_path, 0o755)
+        self.runner.check_call(
+            ["svnsync", "initialize", "--non-interactive",
+             "file://"+temp_path, root],
+            **args
+        )
+        os.rename(temp_path, mirror_path)
+
     def create(self):
         """Create the repository.
 
@@ -178,26 +558,20 @@ class SvnRepo(Repo):
 
         """
         local_path = re.sub("^file://", "", self.path)
-        subprocess.check_call(["svnadmin", "create", local_path])
+        self.runner.check_call(["svnadmin", "create", local_path])
 
         # Create top level directories (trunk_head, then trunk_tags).
-        subprocess.check_call(
+        self.runner.check_call(
             ["svn", "mkdir", self.trunk_head, "-q", \
              "-m", "Creating trunk directory."]
         )
+        if self.trunk_branch.tags_root is None:
+            return
         # This is to ensure we only create until the first "*" or brace
-        # expansion. A smarter version would also create all directories
-        # in braces.
-        my_tags_dir = self.trunk_tags
-        glob_part_idx = my_tags_dir.find("*")
-        if glob_part_idx >= 0:
-            my_tags_dir = my_tags_dir[:glob_part_idx]
-        glob_part_idx = my_tags_dir.find("{")
-        if glob_part_idx >= 0:
-            my_tags_dir = my_tags_dir[:glob_part_idx]
-        subprocess.check_call(
-            ["svn", "mkdir", my_tags_dir, "-q", \
-             "-m", "Creating trunk tags directory."]
+        # expansion.
+        self.runner.check_call(
+            ["svn", "mkdir", self.path+"/"+self.trunk_branch.tags_root,
+             "-q", "-m", "Creating trunk tags directory."]
         )
 
     def trunk_import(self, file_path, repo_path, msg="Importing file."):
@@ -208,7 +582,7 @@ class SvnRepo(Repo):
         Should only be used for testing.
 
         """
-        subprocess.check_call(
+        self.runner.check_call(
             ["svn", "import", file_path, self.trunk_head+"/"+repo_path,
              "-q", "-m", msg]
         )
@@ -221,7 +595,7 @@ class SvnRepo(Repo):
         Should only be used for testing.
 
         """
-        subprocess.check_call(
+        self.runner.check_call(
             ["svn", "rm", self.trunk_head+"/"+repo_path,
              "-q", "-m", msg]
         )
@@ -232,16 +606,10 @@ class SvnRepo(Repo):
         Should only be used for testing.
 
         """
-        # Deal with globs and such, as above.
-        my_tags_dir = self.trunk_tags
-        glob_part_idx = my_tags_dir.find("*")
-        if glob_part_idx >= 0:
-            my_tags_dir = my_tags_dir[:glob_part_idx]
-        glob_part_idx = my_tags_dir.find("{")
-        if glob_part_idx >= 0:
-            my_tags_dir = my_tags_dir[:glob_part_idx]
-        # Copy to the tag name.
-        subprocess.check_call(
+        # Copy to the tag name, ignoring globs and such in the tags
+        # expression.
+        my_tags_dir = self.path+"/"+self.trunk_branch.tags_root
+        self.runner.check_call(
             ["svn", "cp", self.trunk_head, my_tags_dir+"/"+tag_name,
              "-q", "-m", msg]
         )
@@ -259,8 +627,15 @@ class GitRepo(Repo):
     detect whether a repository already exists before running init or
     clone.
 
+    Public instance variables:
+    git_dir - Path to the ".git" directory.
+    cat_file - CatFile for reading objects without a process per object.
+
     Public methods:
+    exists - Check whether the repository has been created.
     init - Create the repository.
+    read_ref - Read the commit hash for a ref without running git.
+    close_cat_file - Stop the processes used by cat_file.
 
     """
 
@@ -268,6 +643,69 @@ class GitRepo(Repo):
         """Wrap the Repo constructor."""
         super().__init__(**args)
 
+    @property
+    def git_dir(self):
+        """Path to the repository's ".git" directory."""
+        return os.path.join(self.path, ".git")
+
+    def exists(self):
+        """Check whether the repository has been created.
+
+        Only a Git directory with a HEAD counts, so a leftover directory,
+        e.g. from a failed clone, is not taken for a repository.
+
+        """
+        return os.path.isfile(os.path.join(self.git_dir, "HEAD"))
+
+    @property
+    def cat_file(self):
+        """CatFile for reading objects from this repository.
+
+        GitRepo objects with the same path share one CatFile, and its git
+        processes keep running until close_cat_file is called.
+
+        """
+        key = os.path.abspath(self.path)
+        with _cat_files_lock:
+            cat_file = _cat_files.get(key)
+            if cat_file is None:
+                cat_file = CatFile(self.path, runner=self.runner)
+                _cat_files[key] = cat_file
+        return cat_file
+
+    def close_cat_file(self):
+        """Stop the git processes used by cat_file, if there are any."""
+        with _cat_files_lock:
+            cat_file = _cat_files.pop(os.path.abspath(self.path), None)
+        if cat_file is not None:
+            cat_file.close()
+
+    def read_ref(self, ref_name):
+        """Get the commit hash for a fully qualified ref name.
+
+        This reads loose and packed refs directly, to avoid the cost of
+        starting a git process. Symbolic refs are not followed.
+
+        Returns None if the ref does not exist.
+
+        """
+        try:
+            with open(os.path.join(self.git_dir, ref_name)) as ref_file:
+                ref_hash = ref_file.read().strip()
+            if not ref_hash.startswith("ref:"):
+                return ref_hash
+        except (IOError, OSError):
+            pass
+        try:
+            with open(os.path.join(self.git_dir, "packed-refs")) as packed:
+                for line in packed:
+                    fields = line.split()
+                    if len(fields) == 2 and fields[1] == ref_name:
+                        return fields[0]
+        except (IOError, OSError):
+            pass
+        return None
+
     def init(self, git_args=[], **args):
         """Initialize a Git repository.
 
@@ -284,7 +722,7 @@ class GitRepo(Repo):
         """
         # TODO: Perhaps this function should also write the repository name
         # to ".git/description"?
-        subprocess.check_call(
+        self.runner.check_call(
             ["git", "init", self.path]+git_args,
             **args
         )
@@ -297,33 +735,119 @@ class GitSvnRepo(GitRepo):
     Extend GitRepo with information about an upstream Subversion
     repository, and methods that interact with git-svn.
 
-    git-svn repositories with multiple Subversion remotes are currently not
-    handled.
+    A repository can track several Subversion repositories, each as a
+    separate git-svn remote with its own ref prefix. One GitSvnRepo object
+    describes each remote, and the one for the remote that the working
+    branch follows holds the others in "remotes". Its clone and rebase
+    methods then update all of the remotes concurrently. Planning and
+    indexing overlap, but the git-svn fetches themselves take turns, since
+    they share the git-svn metadata of the repository.
 
     Public instance variables:
     svn_repo - An SvnRepo object corresponding to the upstream repo.
+    ignore_revs - Upstream revisions that are never fetched.
+    base_revision - Revision that history starts from, or None.
+    options - GitSvnOptions passed to every git-svn command.
+    remote_name - Name of the git-svn remote, or None for the default.
+    prefix - Prefix of the git-svn refs under "refs/remotes/".
+    remotes - GitSvnRepo objects for the other remotes in this repository.
+    trunk_ref - Ref that git-svn fetches the trunk into.
+    rev_index - A RevIndex mapping trunk revisions to commits.
 
     Public methods:
     get_svn_revision - Get the current upstream Subversion revision.
+    update_rev_index - Add newly fetched trunk commits to rev_index.
+    plan_fetch - Plan the fetch commands for a range of revisions.
+    get_clone_checkpoint - Get the last revision fetched by an unfinished
+                           chunked clone.
     init - Use "git svn init" to initialize this repository.
     clone - Use "git svn clone" to create this repository.
     rebase - Use "git svn rebase" to update this repository.
+    convert_svn_ignore - Write .gitignore files for svn:ignore properties.
+    replace - Copy this object, changing some of its attributes.
+
+    Methods for callers that run the commands themselves, e.g. the
+    coroutines in GitSvnHack.aio:
+    check_clone_revision - Reject a clone revision before base_revision.
+    find_indexed_revision - Look up a trunk commit in rev_index.
+    rev_index_log_argv - Get the "git log" command used by
+                         update_rev_index.
+    update_rev_index_from_log - Add the commits in its output to rev_index.
+    rebase_start - Get the first revision a rebase fetches.
+    clone_revisions - Split a clone into "git svn clone" and a rebase.
+    clone_argv - Get a "git svn clone" command.
+    fetch_argv - Get a "git svn fetch" command.
+    rebase_local_argv - Get the command that rebases onto fetched
+                        revisions.
 
     """
 
-    def __init__(self, *, svn_repo, ignore_revs=(), **args):
+    def __init__(self, *, svn_repo, ignore_revs=(), base_revision=None,
+                 options=None, remote_name=None, prefix="", remotes=(),
+                 **args):
         """Extend the GitRepo constructor by accepting a SvnRepo.
 
         New keyword arguments:
         svn_repo - An SvnRepo object defining the upstream Subversion
                    repository.
-        ignore_revs - A sequence containing upstream revisions to ignore.
-                      Defaults to an empty tuple.
+        ignore_revs - A RevisionSet or iterable containing upstream
+                      revisions to ignore. Defaults to an empty tuple.
+        base_revision - Sets the "base_revision" attribute. Defaults to
+                        None, meaning that the whole history is fetched.
+        options - A GitSvnOptions object whose options are added to every
+                  "git svn init", "clone" and "fetch" command, before any
+                  git_args. Defaults to no options.
+        remote_name - Sets the "remote_name" attribute. Defaults to None,
+                      meaning git-svn's default remote.
+        prefix - Sets the "prefix" attribute. Defaults to no prefix.
+        remotes - Sets the "remotes" attribute. Each must have the same
+                  path as this repository, and a distinct remote_name and
+                  prefix. Defaults to no other remotes.
+
+        Raises ValueError if the remotes don't fit together.
 
         """
         self._svn_repo = svn_repo
-        self._ignore_revs = sorted(ignore_revs)
+        self._ignore_revs = RevisionSet(ignore_revs)
+        self._base_revision = base_revision
+        self._options = options if options is not None else GitSvnOptions()
+        self._remote_name = remote_name
+        self._prefix = prefix
+        self._remotes = tuple(remotes)
         super().__init__(**args)
+        names = set([remote_name])
+        prefixes = set([prefix])
+        for remote in self._remotes:
+            if remote.path != self.path:
+                raise ValueError("remote "+str(remote.remote_name)+
+                                 " is not in "+self.path)
+            if remote.remote_name in names or remote.prefix in prefixes:
+                raise ValueError("remote "+str(remote.remote_name)+
+                                 " has a duplicate name or prefix")
+            names.add(remote.remote_name)
+            prefixes.add(remote.prefix)
+
+    def replace(self, **changes):
+        """Return a copy of this object, with some attributes changed.
+
+        The keyword arguments are those of the constructor. Attributes
+        that are not changed are shared with this object.
+
+        """
+        args = {
+            "name": self.name,
+            "path": self.path,
+            "runner": self._runner,
+            "svn_repo": self.svn_repo,
+            "ignore_revs": self.ignore_revs,
+            "base_revision": self.base_revision,
+            "options": self.options,
+            "remote_name": self.remote_name,
+            "prefix": self.prefix,
+            "remotes": self.remotes,
+        }
+        args.update(changes)
+        return type(self)(**args)
 
     @property
     def svn_repo(self):
@@ -332,12 +856,57 @@ class GitSvnRepo(GitRepo):
 
     @property
     def ignore_revs(self):
-        """Subversion repository upstream of this GitSvnRepo."""
+        """RevisionSet of revisions that are skipped when fetching."""
         return self._ignore_revs
 
+    @property
+    def base_revision(self):
+        """Revision that history starts from, or None for all of it.
+
+        Revisions before this one are never fetched, by clone or rebase.
+
+        """
+        return self._base_revision
+
+    @property
+    def options(self):
+        """GitSvnOptions added to the git-svn commands that are run."""
+        return self._options
+
+    @property
+    def remote_name(self):
+        """Name of the git-svn remote, or None for git-svn's default."""
+        return self._remote_name
+
+    @property
+    def prefix(self):
+        """Prefix of this remote's refs, below "refs/remotes/"."""
+        return self._prefix
+
+    @property
+    def remotes(self):
+        """Tuple of GitSvnRepo objects for the other remotes."""
+        return self._remotes
+
+    @property
+    def trunk_ref(self):
+        """Fully qualified ref that git-svn fetches the trunk into."""
+        return "refs/remotes/"+self.prefix+"trunk"
+
+    @property
+    def rev_index(self):
+        """RevIndex for the commits on the Subversion trunk."""
+        return RevIndex(os.path.join(self.git_dir, "svnhack",
+                                     self.prefix+"trunk.revidx"))
+
     def get_svn_revision(self, git_args=[], **args):
         """Get the Subversion revision upstream of the working copy.
 
+        The trunk ref is read directly and looked up in rev_index, so in
+        the common case no process is started. If the index is stale, it
+        is brought up to date first, and "git svn find-rev" is only used
+        as a last resort.
+
         Arguments:
         git_args - An iterable yielding additional arguments for the git
                    commands.
@@ -349,36 +918,98 @@ class GitSvnRepo(GitRepo):
         class.
 
         """
-        # Parse the output of "git svn info" to get the current revision.
-        # It's not clear whether we should really do this, or use git
-        # rev-list. It's better to script around plumbing rather than
-        # porcelain, but the nature of this project requires making an
-        # exception for git-svn anyway.
-        #
-        # Since we have to capture this output, strip stdout from args we
-        # were given.
-        output_args = args.copy()
-        if "stdout" in output_args:
-            del output_args["stdout"]
-        try:
-            svn_remote_hash = subprocess.check_output(
-                ["git", "show-ref", "remotes/trunk", "--hash"]+git_args,
-                cwd=self.path,
-                universal_newlines=True,
-                **output_args
-            )
-        except subprocess.CalledProcessError:
+        svn_remote_hash = self.read_ref(self.trunk_ref)
+        if svn_remote_hash is None:
             return 0
 
-        svn_revision = subprocess.check_output(
-            ["git", "svn", "find-rev", svn_remote_hash.strip()]+git_args,
+        svn_revision = self.find_indexed_revision(svn_remote_hash)
+        if svn_revision is None:
+            self.update_rev_index(**args)
+            svn_revision = self.find_indexed_revision(svn_remote_hash)
+        if svn_revision is None:
+            # The index disagrees with the repository (e.g. after "git svn
+            # reset"), so rebuild it from scratch.
+            self.rev_index.clear()
+            self.update_rev_index(**args)
+            svn_revision = self.find_indexed_revision(svn_remote_hash)
+        if svn_revision is not None:
+            return svn_revision
+
+        # Parse the output of "git svn find-rev" to get the revision. It's
+        # better to script around plumbing rather than porcelain, but the
+        # nature of this project requires making an exception for git-svn
+        # anyway.
+        svn_revision = self.runner.check_output(
+            ["git", "svn", "find-rev", svn_remote_hash]+git_args,
             cwd=self.path,
             universal_newlines=True,
-            **output_args
+            **_output_args(args)
         )
 
         return int(svn_revision)
 
+    def update_rev_index(self, **args):
+        """Add trunk commits that are not yet in rev_index.
+
+        The revision for each commit is read from its "git-svn-id" line,
+        using a single "git log" over the commits fetched since the index
+        was last updated.
+
+        All keyword arguments are passed to subprocess.check_output(),
+        except for stdout.
+
+        """
+        try:
+            git_log = self.runner.check_output(
+                self.rev_index_log_argv(),
+                cwd=self.path,
+                universal_newlines=True,
+                **_output_args(args)
+            )
+        except subprocess.CalledProcessError:
+            return
+        self.update_rev_index_from_log(git_log)
+
+    def find_indexed_revision(self, svn_remote_hash):
+        """Look up the revision of a trunk commit in rev_index.
+
+        If the commit is found, later entries are dropped, since the
+        trunk may have been rewound. Returns None if it is not found.
+
+        """
+        rev_index = self.rev_index
+        svn_revision = rev_index.get_revision(svn_remote_hash)
+        if svn_revision is not None:
+            # If trunk was rewound, later entries are no longer valid.
+            rev_index.truncate(svn_revision)
+        return svn_revision
+
+    def rev_index_log_argv(self):
+        """Get the "git log" command listing trunk commits not indexed.
+
+        Its output can be passed to update_rev_index_from_log. Returns a
+        new list of strings.
+
+        """
+        rev_index = self.rev_index
+        last_commit = rev_index.get_commit(rev_index.last_revision())
+        if last_commit is None:
+            log_range = self.trunk_ref
+        else:
+            log_range = last_commit+".."+self.trunk_ref
+        return ["git", "log", "--reverse", "--format=%x00%H%n%B",
+                log_range, "--"]
+
+    def update_rev_index_from_log(self, git_log):
+        """Add the commits listed by rev_index_log_argv to rev_index."""
+        entries = []
+        for commit_text in git_log.split("\0")[1:]:
+            commit, _, message = commit_text.partition("\n")
+            match = _git_svn_id_regex.search(message)
+            if match is not None:
+                entries.append((int(match.group("revision")), commit))
+        self.rev_index.update(entries)
+
     def init(self, git_args=[], **args):
         """Initialize a git-svn repository with Subversion information.
 
@@ -391,14 +1022,76 @@ class GitSvnRepo(GitRepo):
 
         """
         svn_trunk = self.svn_repo.trunk_branch
-        subprocess.check_call(
-            ["git", "svn", "init", self.svn_repo.path,
-             "-T", svn_trunk.head, "-t", svn_trunk.tags,
-             self.path]+git_args,
+        self.runner.check_call(
+            ["git", "svn", "init", self.svn_repo.fetch_url,
+             "-T", svn_trunk.head]+_tags_args(svn_trunk)+
+            self._remote_args(init=True)+
+            self._rewrite_root_args()+self.options.args_for("init")+
+            [self.path]+git_args,
             **args
         )
 
-    def clone(self, revision=None, git_args=[], **args):
+    def _remote_args(self, init=False):
+        # Select this remote, and set its prefix when creating it.
+        remote_args = []
+        if self.remote_name is not None:
+            remote_args.append("--svn-remote="+self.remote_name)
+        if init and self.prefix:
+            remote_args.append("--prefix="+self.prefix)
+        return remote_args
+
+    def _rewrite_root_args(self):
+        # When fetching from a mirror, make git-svn record the upstream URL
+        # and UUID in commit metadata. git-svn shortens the URL it is given
+        # to the repository root, unless told not to, and the rewritten
+        # root replaces whatever URL it ends up with.
+        svn_repo = self.svn_repo
+        if svn_repo.mirror_path is None:
+            return []
+        if self.options.no_minimize_url:
+            rewrite_args = ["--rewrite-root="+svn_repo.path]
+        else:
+            rewrite_args = ["--rewrite-root="+svn_repo.get_root()]
+        if self.options.rewrite_uuid is None:
+            rewrite_args.append("--rewrite-uuid="+svn_repo.get_uuid())
+        return rewrite_args
+
+    def get_clone_checkpoint(self, **args):
+        """Get the last revision fetched by an unfinished chunked clone.
+
+        Returns None if there is no repository, or no chunked clone is in
+        progress.
+
+        All keyword arguments are passed to subprocess.check_output(),
+        except for stdout.
+
+        """
+        if not os.path.isdir(self.git_dir):
+            return None
+        try:
+            checkpoint = self.runner.check_output(
+                ["git", "config", "--get", _clone_checkpoint_key],
+                cwd=self.path,
+                universal_newlines=True,
+                **_output_args(args)
+            )
+        except subprocess.CalledProcessError:
+            return None
+        return int(checkpoint)
+
+    def _set_clone_checkpoint(self, revision, **args):
+        if revision is None:
+            config_args = ["--unset", _clone_checkpoint_key]
+        else:
+            config_args = [_clone_checkpoint_key, str(revision)]
+        self.runner.check_call(
+            ["git", "config"]+config_args,
+            cwd=self.path,
+            **args
+        )
+
+    def clone(self, revision=None, git_args=[], chunk_size=None,
+              sync_mirror=True, progress=None, fetch_args=[], **args):
         """Create a Git clone of a Subversion repository with git-svn.
 
         Arguments:
@@ -406,39 +1099,302 @@ class GitSvnRepo(GitRepo):
                    will be cloned.
         git_args - An iterable yielding additional arguments for the git
                    clone command.
+        chunk_size - If given, fetch at most this many revisions at a time,
+                     recording a checkpoint after each one, and resume from
+                     the last checkpoint if a previous chunked clone did not
+                     finish. In this mode, git_args are passed to "git svn
+                     init" rather than "git svn clone".
+        sync_mirror - If any Subversion repository has a mirror, update it
+                      first. Defaults to True.
+        progress - If given, a FetchProgress that the output of git-svn is
+                   streamed through. Trunk commits are then added to
+                   rev_index as soon as git-svn reports them.
+        fetch_args - An iterable yielding additional arguments for every
+                     command that fetches revisions: "git svn clone", each
+                     "git svn fetch" of a chunked clone, and any fetch that
+                     skips ignored revisions. Unlike git_args, these are
+                     never passed to "git svn init", so they may include
+                     options that only fetching accepts, e.g.
+                     "--authors-file".
 
         Any additional keyword arguments provided are passed to
         subprocess.check_call().
 
+        Returns the FetchPlan used to skip ignored revisions, or None if
+        no revisions needed to be skipped.
+
+        Raises ValueError if revision is older than base_revision.
+
+        """
+        self.check_clone_revision(revision)
+        if sync_mirror:
+            self._sync_mirrors(**args)
+
+        if chunk_size is not None:
+            return self._chunked_clone(revision, chunk_size, git_args,
+                                       fetch_args, progress, **args)
+
+        clone_revision, rebase_revision = self.clone_revisions(revision)
+        if progress is not None:
+            progress.start(self._floor_revision()-1,
+                           self._target_revision(clone_revision))
+        self._run_fetch(
+            self.clone_argv(clone_revision,
+                             list(git_args)+list(fetch_args)),
+            progress, **args
+        )
+        self._init_remotes(**args)
+        if rebase_revision is not None:
+            return self.rebase(revision=rebase_revision,
+                               git_args=list(fetch_args), sync_mirror=False,
+                               progress=progress, **args)
+        self._fetch_with_remotes(lambda: self.update_rev_index(**args),
+                                 **args)
+        return None
+
+    def _sync_mirrors(self, **args):
+        # Update the mirrors of this remote and the others, once each.
+        synced = set()
+        for repo in (self,)+self.remotes:
+            mirror_path = repo.svn_repo.mirror_path
+            if mirror_path is not None and mirror_path not in synced:
+                repo.svn_repo.sync_mirror(**args)
+                synced.add(mirror_path)
+
+    def _init_remotes(self, **args):
+        # Add the other remotes to a newly created repository, unless they
+        # are there already. This is done one at a time, since each one
+        # writes to the Git config.
+        for remote in self.remotes:
+            if not remote._has_svn_remote(**args):
+                remote.init(**args)
+
+    def _has_svn_remote(self, **args):
+        # True if "git svn init" has already set up this remote.
+        if not os.path.isdir(self.git_dir):
+            return False
+        try:
+            self.runner.check_output(
+                ["git", "config", "--get",
+                 "svn-remote."+(self.remote_name or "svn")+".url"],
+                cwd=self.path,
+                universal_newlines=True,
+                **_output_args(args)
+            )
+        except subprocess.CalledProcessError:
+            return False
+        return True
+
+    def _fetch_with_remotes(self, fetch_self, **args):
+        # Call fetch_self() while every other remote fetches all of its
+        # new revisions, each in its own thread, and return the result of
+        # fetch_self(). The git-svn commands take turns in _run_fetch. The
+        # first exception raised is passed on, after all of the fetches
+        # have finished.
+        if not self.remotes:
+            return fetch_self()
+        with ThreadPoolExecutor(max_workers=len(self.remotes)+1) as pool:
+            own_future = pool.submit(fetch_self)
+            remote_futures = [
+                pool.submit(remote._fetch_new, None, [], None, **args)
+                for remote in self.remotes
+            ]
+        result = own_future.result()
+        for future in remote_futures:
+            future.result()
+        return result
+
+    def _floor_revision(self):
+        # First revision that may be fetched: the earliest revision from
+        # base_revision on that is not ignored.
+        return self.ignore_revs.windows(self.base_revision or 1)[0][0]
+
+    def rebase_start(self, svn_revision):
+        """Get the first revision to fetch after a fetched revision."""
+        return max(svn_revision+1, self.base_revision or 1)
+
+    def check_clone_revision(self, revision):
+        """Check that a clone up to a revision can include base_revision.
+
+        Raises ValueError if revision is older than base_revision.
+
+        """
+        if isinstance(revision, int) and self.base_revision is not None \
+           and revision < self.base_revision:
+            raise ValueError("revision {0} is older than the base revision "
+                             "{1}".format(revision, self.base_revision))
+
+    def clone_revisions(self, revision):
+        """Split a clone at the first ignored revision.
+
+        "git svn clone" can't skip revisions, so it only fetches up to the
+        first ignored revision, and a rebase fetches the rest.
+
+        Arguments:
+        revision - Latest revision to clone, or None for HEAD.
+
+        Returns a tuple of the revision to clone up to, and the revision to
+        rebase onto afterwards, or None if no rebase is needed.
+
         """
         rebase_revision = None
-        if len(self.ignore_revs) > 0:
+        first_window_end = self.ignore_revs.windows(
+            self._floor_revision()
+        )[0][1]
+        first_ignored = None
+        if first_window_end != "HEAD":
+            first_ignored = first_window_end + 1
+        if first_ignored is not None:
             if revision is not None:
-                if revision >= self.ignore_revs[0]:
-                    clone_revision = self.ignore_revs[0] - 1
+                if revision >= first_ignored:
+                    clone_revision = first_ignored - 1
                     rebase_revision = revision
                 else:
                     clone_revision = revision
             else:
-                clone_revision = self.ignore_revs[0] - 1
+                clone_revision = first_ignored - 1
                 rebase_revision = "HEAD"
         else:
             if revision is not None:
                 clone_revision = revision
             else:
                 clone_revision = "HEAD"
+        return clone_revision, rebase_revision
+
+    def clone_argv(self, clone_revision, git_args):
+        """Get the "git svn clone" command for a clone up to a revision.
+
+        Returns a new list of strings, ending with git_args.
+
+        """
         svn_trunk = self.svn_repo.trunk_branch
-        subprocess.check_call(
-            ["git", "svn", "clone", self.svn_repo.path,
-             "-T", svn_trunk.head, "-t", svn_trunk.tags,
-             "-r", "BASE:"+str(clone_revision),
-             self.path]+git_args,
+        clone_start = "BASE"
+        if self.base_revision is not None:
+            clone_start = str(self._floor_revision())
+        return ["git", "svn", "clone", self.svn_repo.fetch_url,
+                "-T", svn_trunk.head]+_tags_args(svn_trunk)+ \
+            ["-r", clone_start+":"+str(clone_revision)]+ \
+            self._remote_args(init=True)+self._rewrite_root_args()+ \
+            self.options.args_for("clone")+[self.path]+git_args
+
+    def fetch_argv(self, start, end, git_args=[]):
+        """Get the "git svn fetch" command for a range of revisions.
+
+        Returns a new list of strings, ending with git_args.
+
+        """
+        return ["git", "svn", "fetch"]+self._remote_args()+ \
+            ["-r", str(start)+":"+str(end)]+ \
+            self.options.args_for("fetch")+git_args
+
+    def rebase_local_argv(self):
+        """Get the command that rebases onto fetched revisions.
+
+        Returns a new list of strings.
+
+        """
+        return list(_rebase_local_argv)
+
+    def _target_revision(self, revision):
+        # Resolve the end of a fetch for progress reporting.
+        if isinstance(revision, int):
+            return revision
+        return self.svn_repo.get_current_revision()
+
+    def _run_fetch(self, argv, progress, **args):
+        # Run a git-svn command that fetches revisions. With a progress
+        # tracker, its output is streamed through the tracker, and trunk
+        # commits are indexed as they arrive. Only one fetch runs in a
+        # repository at a time.
+        repo_path = os.path.abspath(self.path)
+        with _fetch_locks_lock:
+            fetch_lock = _fetch_locks.setdefault(repo_path, threading.Lock())
+        with fetch_lock:
+            if progress is None:
+                self.runner.check_call(argv, **args)
+                return
+            rev_index = self.rev_index
+            # git-svn prints the trunk ref with or without "refs/remotes/".
+            trunk_ref_names = (self.trunk_ref, self.prefix+"trunk")
+            def handle_line(line):
+                fetched = progress.feed(line)
+                if fetched is not None and fetched[2] in trunk_ref_names:
+                    rev_index.update([fetched[:2]])
+            self.runner.check_lines(argv, handle_line, **args)
+
+    def plan_fetch(self, start, end=None, **args):
+        """Plan the "git svn fetch" commands for a range of revisions.
+
+        If ignored revisions split the range into more than one window,
+        "svn log" is consulted once to find which revisions change the
+        trunk or its tags, so that windows without such revisions can be
+        dropped and windows separated only by irrelevant revisions can be
+        merged.
+
+        Arguments:
+        start - First revision to fetch.
+        end - Last revision to fetch, or None for HEAD.
+
+        Any additional keyword arguments are passed to
+        subprocess.check_output(), except for stdout.
+
+        Returns a FetchPlan.
+
+        """
+        plan = FetchPlan(self.ignore_revs, start, end)
+        if plan.naive_count > 1:
+            try:
+                changed_revs = self.svn_repo.get_changed_revisions(
+                    start, "HEAD" if end is None else end, **args
+                )
+            except subprocess.CalledProcessError:
+                return plan
+            plan = FetchPlan(self.ignore_revs, start, end, changed_revs)
+        return plan
+
+    def _chunked_clone(self, revision, chunk_size, git_args, fetch_args,
+                       progress, **args):
+        checkpoint = self.get_clone_checkpoint(**args)
+        if checkpoint is None:
+            # A run that stopped before its first checkpoint may have got
+            # as far as "git svn init", which can't be run twice.
+            if not self._has_svn_remote(**args):
+                self.init(git_args=git_args, **args)
+            self._init_remotes(**args)
+            checkpoint = self._floor_revision() - 1
+            self._set_clone_checkpoint(checkpoint, **args)
+
+        # Chunks need a definite end, so look up HEAD now.
+        if not isinstance(revision, int):
+            revision = self.svn_repo.get_current_revision()
+
+        if progress is not None:
+            progress.start(checkpoint, revision)
+        plan = self.plan_fetch(checkpoint+1, revision, **args)
+        for start, end in plan.windows:
+            for chunk_start in range(start, end+1, chunk_size):
+                chunk_end = min(chunk_start+chunk_size-1, end)
+                self._run_fetch(
+                    self.fetch_argv(chunk_start, chunk_end,
+                                     list(fetch_args)),
+                    progress,
+                    cwd=self.path,
+                    **args
+                )
+                self._set_clone_checkpoint(chunk_end, **args)
+
+        self._fetch_with_remotes(lambda: self.update_rev_index(**args),
+                                 **args)
+        self.runner.check_call(
+            _rebase_local_argv,
+            cwd=self.path,
             **args
         )
-        if rebase_revision is not None:
-            self.rebase(revision=rebase_revision, **args)
+        self._set_clone_checkpoint(None, **args)
+        return plan
 
-    def rebase(self, revision=None, git_args=[], **args):
+    def rebase(self, revision=None, git_args=[], sync_mirror=True,
+               progress=None, **args):
         """Update this repository from its Subversion upstream.
 
         Arguments:
@@ -446,43 +1402,71 @@ class GitSvnRepo(GitRepo):
                    revision and HEAD. Defaults to HEAD.
         git_args - An iterable yielding additional arguments for the git
                    fetch command(s).
+        sync_mirror - If any Subversion repository has a mirror, update it
+                      first. Defaults to True.
+        progress - If given, a FetchProgress that the output of git-svn is
+                   streamed through. Trunk commits are then added to
+                   rev_index as soon as git-svn reports them.
 
         Any additional keyword arguments provided are passed to
         subprocess.check_call().
 
-        """
-        svn_trunk = self.svn_repo.trunk_branch
+        If there are other remotes, they fetch their new revisions at the
+        same time, before the rebase.
 
-        next_revision = self.get_svn_revision(**args) + 1
-
-        for irev in self.ignore_revs:
-            if isinstance(revision, int) and irev > revision:
-                break
-            if irev < next_revision:
-                continue
-            if irev == next_revision:
-                next_revision += 1
-                continue
-            subprocess.check_call(
-                ["git", "svn", "fetch",
-                 "-r", str(next_revision)+":"+str(irev-1)]+git_args,
-                cwd=self.path,
-                **args
-            )
-            next_revision = irev+1
+        Returns the FetchPlan that was used for this remote.
 
-        if revision is None:
-            revision = "HEAD"
-        subprocess.check_call(
-            ["git", "svn", "fetch",
-             "-r", str(next_revision)+":"+str(revision)]+git_args,
-            cwd=self.path,
+        """
+        if sync_mirror:
+            self._sync_mirrors(**args)
+
+        plan = self._fetch_with_remotes(
+            lambda: self._fetch_new(revision, git_args, progress, **args),
             **args
         )
 
         # Finally, rebase.
-        subprocess.check_call(
-            ["git", "svn", "rebase", "--local"],
+        self.runner.check_call(
+            _rebase_local_argv,
             cwd=self.path,
             **args
         )
+
+        return plan
+
+    def _fetch_new(self, revision, git_args, progress, **args):
+        # Fetch the revisions after the last one fetched, up to revision
+        # or HEAD, and return the FetchPlan.
+        next_revision = self.rebase_start(self.get_svn_revision(**args))
+
+        # Fetch everything up to the target revision, except for the
+        # ignored revisions.
+        if not isinstance(revision, int):
+            revision = None
+        if progress is not None:
+            progress.start(next_revision-1, self._target_revision(revision))
+        plan = self.plan_fetch(next_revision, revision, **args)
+        for start, end in plan.windows:
+            self._run_fetch(
+                self.fetch_argv(start, end, git_args), progress,
+                cwd=self.path,
+                **args
+            )
+
+        self.update_rev_index(**args)
+        return plan
+
+    def convert_svn_ignore(self, **args):
+        """Write .gitignore files equivalent to the trunk's svn:ignore.
+
+        Only directories whose properties may have changed since the last
+        conversion are read from Subversion; see SvnIgnoreConverter.
+
+        Any keyword arguments are passed to subprocess.check_output(),
+        except for stdout.
+
+        Returns a tuple of the lists of .gitignore files written and
+        removed, relative to the top of the repository.
+
+        """
+        return SvnIgnoreConverter(self).convert(**args)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""On-disk index mapping Subversion revisions to Git commits.
+
+Classes:
+RevIndex - Array-backed, memory-mapped revision to commit index.
+
+"""
+
+import binascii
+import mmap
+import os
+
+
+# Size of a binary SHA-1 commit hash, which is also the size of one slot.
+_SLOT_SIZE = 20
+
+# An unused slot; no Git object has this hash.
+_EMPTY_SLOT = b"\0" * _SLOT_SIZE
+
+
+class RevIndex:
+
+    """Map between Subversion revisions and Git commit hashes.
+
+    The index is a file containing a dense array of binary SHA-1 hashes,
+    where the slot at offset 20*N holds the commit created for revision N,
+    or zeros if that revision did not produce a commit. Looking up a
+    revision is therefore a single read from a memory map. The file is
+    never longer than needed to hold the last revision, so the latest
+    commit is also found in constant time.
+
+    The file is opened for each operation rather than held open, so
+    RevIndex objects are cheap to create and safe to pickle.
+
+    Public instance variables:
+    path - Path to the index file.
+
+    Public methods:
+    last_revision - Get the highest revision in the index.
+    get_commit - Get the commit for a revision.
+    find_commit - Get the latest commit at or before a revision.
+    get_revision - Get the revision for a commit.
+    update - Add revision/commit pairs to the index.
+    truncate - Remove entries after a revision.
+    clear - Remove all entries from the index.
+
+    """
+
+    def __init__(self, path):
+        """Set the location of the index file.
+
+        The file and its parent directory are created when first updated.
+
+        """
+        self._path = path
+
+    @property
+    def path(self):
+        """Path to the index file."""
+        return self._path
+
+    def _read_map(self):
+        """Return a read-only mmap of the index, or None if it is empty."""
+        try:
+            with open(self.path, "rb") as index_file:
+                if os.fstat(index_file.fileno()).st_size == 0:
+                    return None
+                return mmap.mmap(index_file.fileno(), 0,
+                                 access=mmap.ACCESS_READ)
+        except (IOError, OSError):
+            return None
+
+    def last_revision(self):
+        """Get the highest revision in the index, or 0 if it is empty."""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return 0
+        return max(size // _SLOT_SIZE - 1, 0)
+
+    def get_commit(self, revision):
+        """Get the hex commit hash for a revision, or None if not present."""
+        index_map = self._read_map()
+        if index_map is None:
+            return None
+        try:
+            offset = revision * _SLOT_SIZE
+            if revision < 0 or offset + _SLOT_SIZE > len(index_map):
+                return None
+            slot = index_map[offset:offset+_SLOT_SIZE]
+        finally:
+            index_map.close()
+        if slot == _EMPTY_SLOT:
+            return None
+        return binascii.hexlify(slot).decode("ascii")
+
+    def find_commit(self, revision):
+        """Get the hex commit hash for the latest revision up to revision.
+
+        This is the commit holding the trunk as it was at that revision,
+        even if the revision itself did not change the trunk. Returns None
+        if there is no such commit in the index.
+
+        """
+        index_map = self._read_map()
+        if index_map is None:
+            return None
+        try:
+            offset = min(revision, len(index_map) // _SLOT_SIZE - 1) * \
+                _SLOT_SIZE
+            while offset >= 0:
+                slot = index_map[offset:offset+_SLOT_SIZE]
+                if slot != _EMPTY_SLOT:
+                    return binascii.hexlify(slot).decode("ascii")
+                offset -= _SLOT_SIZE
+        finally:
+            index_map.close()
+        return None
+
+    def get_revision(self, commit):
+        """Get the revision for a hex commit hash, or None if not present.
+
+        The last revision is checked first, since that is by far the most
+        common query; otherwise the index is searched.
+
+        """
+        target = binascii.unhexlify(commit.encode("ascii"))
+        index_map = self._read_map()
+        if index_map is None:
+            return None
+        try:
+            last_offset = len(index_map) - _SLOT_SIZE
+            if index_map[last_offset:] == target:
+                return last_offset // _SLOT_SIZE
+            offset = index_map.find(target)
+            while offset >= 0:
+                if offset % _SLOT_SIZE == 0:
+                    return offset // _SLOT_SIZE
+                offset = index_map.find(target, offset + 1)
+        finally:
+            index_map.close()
+        return None
+
+    def update(self, entries):
+        """Add entries to the index.
+
+        Arguments:
+        entries - An iterable yielding (revision, hex commit hash) pairs.
+
+        Existing entries for the same revisions are overwritten.
+
+        """
+        entries = list(entries)
+        if not entries:
+            return
+        dir_name = os.path.dirname(self.path)
+        if dir_name and not os.path.isdir(dir_name):
+            os.makedirs(dir_name)
+        mode = "r+b" if os.path.exists(self.path) else "w+b"
+        with open(self.path, mode) as index_file:
+            for revision, commit in entries:
+                index_file.seek(revision * _SLOT_SIZE)
+                index_file.write(binascii.unhexlify(commit.encode("ascii")))
+
+    def truncate(self, revision):
+        """Remove all entries for revisions after "revision"."""
+        if revision < self.last_revision():
+            with open(self.path, "r+b") as index_file:
+                index_file.truncate((revision + 1) * _SLOT_SIZE)
+
+    def clear(self):
+        """Remove all entries from the index."""
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
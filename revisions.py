@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""Sets of Subversion revisions.
+
+Classes:
+RevisionSet - Set of revisions stored as sorted, disjoint ranges.
+FetchPlan - Revision windows to pass to "git svn fetch".
+
+"""
+
+from bisect import bisect_left, bisect_right
+
+
+class RevisionSet:
+
+    """Set of Subversion revisions stored as sorted, disjoint ranges.
+
+    This is used to hold revisions that should be skipped, which can
+    include long runs of consecutive revisions. Storage and lookups depend
+    only on the number of ranges, not the number of revisions.
+
+    The string form is a comma-separated list of revisions and inclusive
+    ranges, e.g. "4,7,1200-4800".
+
+    Public methods:
+    from_string - Construct a RevisionSet from its string form.
+    add_range - Add an inclusive range of revisions.
+    ranges - Get the list of (start, end) ranges.
+    first - Get the lowest revision in the set.
+    windows - Get the ranges of revisions not in the set.
+
+    """
+
+    def __init__(self, revisions=()):
+        """Construct a RevisionSet from an iterable of revisions.
+
+        The iterable may also be another RevisionSet.
+
+        """
+        # Ranges are stored as two parallel lists so that they can be
+        # searched with bisect.
+        if isinstance(revisions, RevisionSet):
+            self._starts = revisions._starts[:]
+            self._ends = revisions._ends[:]
+            return
+        self._starts = []
+        self._ends = []
+        for revision in sorted(set(revisions)):
+            if self._ends and self._ends[-1] == revision - 1:
+                self._ends[-1] = revision
+            else:
+                self._starts.append(revision)
+                self._ends.append(revision)
+
+    @classmethod
+    def from_string(cls, string):
+        """Parse a string such as "4,7,1200-4800" into a RevisionSet.
+
+        Empty strings yield an empty set. Raises ValueError if the string
+        cannot be parsed.
+
+        """
+        rev_set = cls()
+        for item in string.split(","):
+            item = item.strip()
+            if item == "":
+                continue
+            start, sep, end = item.partition("-")
+            start = int(start)
+            end = int(end) if sep else start
+            rev_set.add_range(start, end)
+        return rev_set
+
+    def add_range(self, start, end):
+        """Add all revisions from "start" to "end", inclusive."""
+        if start > end:
+            raise ValueError("invalid revision range: {0}-{1}"
+                             .format(start, end))
+        # Find all ranges that overlap or are adjacent to the new one, and
+        # replace them with a single merged range.
+        lo = bisect_left(self._ends, start - 1)
+        hi = bisect_right(self._starts, end + 1)
+        if lo < hi:
+            start = min(start, self._starts[lo])
+            end = max(end, self._ends[hi-1])
+        self._starts[lo:hi] = [start]
+        self._ends[lo:hi] = [end]
+
+    def ranges(self):
+        """Get a list of inclusive (start, end) ranges, in order."""
+        return list(zip(self._starts, self._ends))
+
+    def first(self):
+        """Get the lowest revision in the set, or None if it is empty."""
+        if self._starts:
+            return self._starts[0]
+        return None
+
+    def windows(self, start, end=None):
+        """Get the ranges of revisions from start to end not in this set.
+
+        Arguments:
+        start - First revision to consider.
+        end - Last revision to consider. If None, there is no upper
+              bound, and the last window ends with "HEAD".
+
+        Returns a list of inclusive (start, end) pairs, suitable for
+        passing as "-r start:end" to "git svn fetch". Only the ranges that
+        overlap [start, end] are examined.
+
+        """
+        windows = []
+        next_revision = start
+        i = bisect_left(self._ends, start)
+        while i < len(self._starts):
+            range_start = self._starts[i]
+            if end is not None and range_start > end:
+                break
+            if range_start > next_revision:
+                windows.append((next_revision, range_start - 1))
+            next_revision = max(next_revision, self._ends[i] + 1)
+            i += 1
+        if end is None:
+            windows.append((next_revision, "HEAD"))
+        elif next_revision <= end:
+            windows.append((next_revision, end))
+        return windows
+
+    def __contains__(self, revision):
+        i = bisect_right(self._starts, revision) - 1
+        return i >= 0 and revision <= self._ends[i]
+
+    def __iter__(self):
+        for start, end in zip(self._starts, self._ends):
+            for revision in range(start, end + 1):
+                yield revision
+
+    def __len__(self):
+        return sum(end - start + 1
+                   for start, end in zip(self._starts, self._ends))
+
+    def __bool__(self):
+        return bool(self._starts)
+
+    def __eq__(self, other):
+        if not isinstance(other, RevisionSet):
+            return NotImplemented
+        return self._starts == other._starts and self._ends == other._ends
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __str__(self):
+        items = []
+        for start, end in zip(self._starts, self._ends):
+            if start == end:
+                items.append(str(start))
+            else:
+                items.append(str(start)+"-"+str(end))
+        return ",".join(items)
+
+    def __repr__(self):
+        return "RevisionSet.from_string("+repr(str(self))+")"
+
+
+class FetchPlan:
+
+    """Revision windows to pass to "git svn fetch".
+
+    Without further information, a fetch is needed for each window between
+    ignored revisions. If the revisions that actually change the tracked
+    paths are known, windows that contain none of them are dropped, and
+    windows separated only by ignored revisions that do not change the
+    tracked paths are merged, since fetching those revisions is harmless.
+
+    Public instance variables:
+    windows - List of inclusive (start, end) revision pairs to fetch.
+    naive_count - Number of windows needed without coalescing.
+    saved_launches - Number of processes saved by coalescing.
+
+    """
+
+    def __init__(self, ignore_revs, start, end=None, changed_revs=None):
+        """Plan fetches for the revisions from start to end.
+
+        Arguments:
+        ignore_revs - RevisionSet of revisions that must not be fetched.
+        start - First revision to fetch.
+        end - Last revision to fetch, or None for HEAD.
+        changed_revs - Sorted list of the revisions from start to end that
+                       change the tracked paths, or None if unknown.
+
+        """
+        naive_windows = ignore_revs.windows(start, end)
+        self._naive_count = len(naive_windows)
+        self._queried = changed_revs is not None
+        if changed_revs is None:
+            self._windows = naive_windows
+            return
+
+        def changes_between(low, high):
+            """Whether any changed revision is in [low, high]."""
+            i = bisect_left(changed_revs, low)
+            return i < len(changed_revs) and \
+                (high == "HEAD" or changed_revs[i] <= high)
+
+        self._windows = []
+        for window_start, window_end in naive_windows:
+            if not changes_between(window_start, window_end):
+                continue
+            if self._windows:
+                last_start, last_end = self._windows[-1]
+                if not changes_between(last_end + 1, window_start - 1):
+                    self._windows[-1] = (last_start, window_end)
+                    continue
+            self._windows.append((window_start, window_end))
+
+    @property
+    def windows(self):
+        """Inclusive (start, end) revision pairs to fetch, in order.
+
+        The last "end" may be the string "HEAD".
+
+        """
+        return self._windows
+
+    @property
+    def naive_count(self):
+        """Number of fetches needed without coalescing."""
+        return self._naive_count
+
+    @property
+    def saved_launches(self):
+        """Number of processes saved by coalescing.
+
+        This accounts for the "svn log" query used to find the changed
+        revisions, so it can be negative if the query saved nothing.
+
+        """
+        return self._naive_count - len(self._windows) - int(self._queried)
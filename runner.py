@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""Instrumented execution of external commands.
+
+All git and svn processes started by GitSvnHack go through a
+CommandRunner, which records what was run and how long it took.
+
+Classes:
+CommandRecord - Information about one finished command.
+CommandRunner - Run commands and record CommandRecord objects.
+
+Functions:
+get_default_runner - Get the runner used when none is specified.
+set_default_runner - Replace the runner used when none is specified.
+
+"""
+
+from collections import deque
+import json
+import subprocess
+import threading
+import time
+
+
+class CommandRecord:
+
+    """Information about one finished command.
+
+    Public instance variables:
+    argv - The command and its arguments.
+    cwd - Working directory of the command, or None.
+    start_time - Time the command was started, in seconds since the epoch.
+    wall_time - Time taken by the command, in seconds.
+    returncode - Exit status, or None if the command could not be run.
+    output_bytes - Size of the captured output, or None if the output was
+                   not captured.
+    name - Short name used to group similar commands, e.g. "git svn
+           fetch".
+
+    """
+
+    def __init__(self, argv, cwd, start_time, wall_time, returncode,
+                 output_bytes):
+        self._argv = list(argv)
+        self._cwd = cwd
+        self._start_time = start_time
+        self._wall_time = wall_time
+        self._returncode = returncode
+        self._output_bytes = output_bytes
+
+    @property
+    def argv(self):
+        """The command and its arguments."""
+        return self._argv
+
+    @property
+    def cwd(self):
+        """Working directory the command was run in, or None."""
+        return self._cwd
+
+    @property
+    def start_time(self):
+        """Time the command was started, in seconds since the epoch."""
+        return self._start_time
+
+    @property
+    def wall_time(self):
+        """Wall clock time taken by the command, in seconds."""
+        return self._wall_time
+
+    @property
+    def returncode(self):
+        """Exit status, or None if the command could not be started."""
+        return self._returncode
+
+    @property
+    def output_bytes(self):
+        """Number of bytes of captured output, or None."""
+        return self._output_bytes
+
+    @property
+    def name(self):
+        """Short name for the command, e.g. "git svn fetch"."""
+        # Keep one subcommand, or two for "git svn".
+        words = self._argv[:1]
+        for arg in self._argv[1:]:
+            if arg.startswith("-") or len(words) == 3:
+                break
+            words.append(arg)
+            if words[-2:] != ["git", "svn"]:
+                break
+        return " ".join(words)
+
+    def to_dict(self):
+        """Return a dictionary suitable for JSON serialization."""
+        return {
+            "argv": self.argv,
+            "cwd": self.cwd,
+            "start_time": self.start_time,
+            "wall_time": self.wall_time,
+            "returncode": self.returncode,
+            "output_bytes": self.output_bytes,
+        }
+
+
+class CommandRunner:
+
+    """Run external commands and record information about them.
+
+    The check_call and check_output methods behave like the subprocess
+    functions of the same names. A CommandRunner may be shared between
+    threads.
+
+    Public instance variables:
+    trace_path - Path of the JSON lines trace file, or None.
+    max_records - Number of records kept in memory, or None for all.
+    records - List of CommandRecord objects for the most recent finished
+              commands.
+
+    Public methods:
+    check_call - Run a command, raising an exception if it fails.
+    check_output - Run a command and return its output.
+    check_lines - Run a command, handing each line of output to a callback.
+    add_record - Record a command that was run some other way.
+    summary - Summarize the slowest commands.
+
+    """
+
+    def __init__(self, trace_path=None, max_records=None):
+        """Create a runner.
+
+        Keyword arguments:
+        trace_path - If given, each finished command is appended to this
+                     file as one line of JSON.
+        max_records - If given, only this many of the most recent records
+                      are kept in memory, so that long-running processes
+                      don't grow without bound. Defaults to None, meaning
+                      that every record is kept.
+
+        """
+        self._trace_path = trace_path
+        self._records = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    @property
+    def trace_path(self):
+        """Path of the JSON lines trace file, or None."""
+        return self._trace_path
+
+    @property
+    def max_records(self):
+        """Number of records kept in memory, or None for all of them."""
+        return self._records.maxlen
+
+    @property
+    def records(self):
+        """CommandRecord objects for the most recent finished commands."""
+        with self._lock:
+            return list(self._records)
+
+    def add_record(self, record):
+        """Record a CommandRecord for a command run outside this runner.
+
+        This is used for commands that can't be run with check_call or
+        check_output, e.g. asyncio subprocesses.
+
+        """
+        with self._lock:
+            self._records.append(record)
+            if self.trace_path is not None:
+                with open(self.trace_path, "a") as trace_file:
+                    trace_file.write(json.dumps(record.to_dict())+"\n")
+
+    def check_call(self, argv, **args):
+        """Run a command and wait for it to finish.
+
+        Keyword arguments are passed to subprocess.call(). Raises
+        subprocess.CalledProcessError if the exit status is non-zero.
+
+        """
+        start_time = time.time()
+        returncode = None
+        try:
+            returncode = subprocess.call(argv, **args)
+        finally:
+            self.add_record(CommandRecord(
+                argv, args.get("cwd"), start_time, time.time()-start_time,
+                returncode, None,
+            ))
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, argv)
+        return returncode
+
+    def check_output(self, argv, **args):
+        """Run a command and return its output.
+
+        Keyword arguments are passed to subprocess.check_output(). Raises
+        subprocess.CalledProcessError if the exit status is non-zero.
+
+        """
+        start_time = time.time()
+        returncode = None
+        output = None
+        try:
+            output = subprocess.check_output(argv, **args)
+            returncode = 0
+            return output
+        except subprocess.CalledProcessError as e:
+            returncode = e.returncode
+            output = e.output
+            raise
+        finally:
+            if isinstance(output, str):
+                output_bytes = len(output.encode("utf-8"))
+            elif output is not None:
+                output_bytes = len(output)
+            else:
+                output_bytes = None
+            self.add_record(CommandRecord(
+                argv, args.get("cwd"), start_time, time.time()-start_time,
+                returncode, output_bytes,
+            ))
+
+    def check_lines(self, argv, line_callback, **args):
+        """Run a command, passing each line of its output to a callback.
+
+        Lines are decoded as UTF-8 and passed to line_callback as soon as
+        they are read, ending in "\n" as with universal newlines. Bytes
+        that are not valid UTF-8 are replaced with U+FFFD, so one bad
+        byte in a log message or file name doesn't abort the command. If
+        the callback raises an exception, the command is killed.
+
+        Keyword arguments are passed to subprocess.Popen(), except for
+        stdout. Raises subprocess.CalledProcessError if the exit status is
+        non-zero.
+
+        """
+        popen_args = args.copy()
+        popen_args.pop("stdout", None)
+        popen_args.pop("universal_newlines", None)
+        start_time = time.time()
+        returncode = None
+        output_bytes = 0
+        try:
+            process = subprocess.Popen(argv, stdout=subprocess.PIPE,
+                                       **popen_args)
+            try:
+                for raw_line in process.stdout:
+                    output_bytes += len(raw_line)
+                    line = raw_line.decode("utf-8", "replace")
+                    if line.endswith("\r\n"):
+                        line = line[:-2]+"\n"
+                    line_callback(line)
+            except BaseException:
+                process.kill()
+                raise
+            finally:
+                process.stdout.close()
+                returncode = process.wait()
+        finally:
+            self.add_record(CommandRecord(
+                argv, args.get("cwd"), start_time, time.time()-start_time,
+                returncode, output_bytes,
+            ))
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, argv)
+        return returncode
+
+    def summary(self, top=10):
+        """Return a list of lines describing where time was spent.
+
+        Commands are grouped by name, and the "top" groups with the most
+        total time are listed, followed by the "top" slowest individual
+        commands.
+
+        """
+        records = self.records
+        groups = {}
+        for record in records:
+            group = groups.setdefault(record.name, [0, 0.0, 0])
+            group[0] += 1
+            group[1] += record.wall_time
+            group[2] += record.output_bytes or 0
+        lines = ["{0} commands, {1:.2f}s total".format(
+            len(records), sum(record.wall_time for record in records)
+        )]
+        lines.append("{0:>8} {1:>10} {2:>12}  {3}".format(
+            "count", "time (s)", "output (B)", "command"
+        ))
+        by_time = sorted(groups.items(), key=lambda item: -item[1][1])
+        for name, (count, wall_time, output_bytes) in by_time[:top]:
+            lines.append("{0:>8} {1:>10.2f} {2:>12}  {3}".format(
+                count, wall_time, output_bytes, name
+            ))
+        lines.append("Slowest commands:")
+        slowest = sorted(records, key=lambda record: -record.wall_time)
+        for record in slowest[:top]:
+            lines.append("{0:>10.2f}  {1}".format(
+                record.wall_time, " ".join(record.argv)
+            ))
+        return lines
+
+
+# Nothing reads the records of the default runner, so none are kept.
+_default_runner = CommandRunner(max_records=0)
+
+def get_default_runner():
+    """Get the CommandRunner used by objects that were not given one."""
+    return _default_runner
+
+def set_default_runner(runner):
+    """Set the CommandRunner used by objects that were not given one."""
+    global _default_runner
+    _default_runner = runner
@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""Materialization of svn:externals as Git submodules.
+
+Each Subversion URL used as an external becomes a git-svn clone of its
+own, however many projects use it, and the projects then get submodules
+pointing at the commits for the revisions they need.
+
+Classes:
+ExternalUse - One place where an external is used.
+ExternalClone - A git-svn clone of one external URL.
+SubmodulePlanner - Clone the externals of many repositories, and add
+                   them as submodules.
+
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+from GitSvnHack.externals import ExternalsCache
+from GitSvnHack.repository import GitSvnRepo, SvnRepo
+from GitSvnHack.sync import SyncResult
+
+
+# Characters that are replaced when naming a clone after its URL.
+_unsafe_name_regex = re.compile("[^A-Za-z0-9._-]+")
+
+# Commit message used when submodules are added or moved.
+_submodule_commit_message = "Update svn:externals submodules."
+
+
+def _clone_name(url):
+    # Directory name for the clone of a URL, e.g. "host_repo_libs_a".
+    parts = urlsplit(url)
+    return _unsafe_name_regex.sub("_", parts.netloc+parts.path).strip("_")
+
+def _trunk_url(repo):
+    # Upstream URL of the trunk of a GitSvnRepo.
+    svn_repo = repo.svn_repo
+    return posixpath.join(svn_repo.path.rstrip("/"),
+                          svn_repo.trunk_branch.head).rstrip("/")
+
+
+class ExternalUse:
+
+    """One place where an external is used.
+
+    Public instance variables:
+    repo - The GitSvnRepo whose trunk defines the external.
+    path - Path of the submodule in repo.
+    revision - Revision of the external to use.
+
+    """
+
+    def __init__(self, repo, path, revision):
+        self._repo = repo
+        self._path = path
+        self._revision = revision
+
+    @property
+    def repo(self):
+        """The GitSvnRepo whose trunk defines the external."""
+        return self._repo
+
+    @property
+    def path(self):
+        """Path of the submodule, relative to the top of repo."""
+        return self._path
+
+    @property
+    def revision(self):
+        """Revision of the external that the submodule points at."""
+        return self._revision
+
+
+class ExternalClone:
+
+    """A git-svn clone of one external URL.
+
+    Public instance variables:
+    url - URL of the external.
+    repo - GitSvnRepo for the clone.
+    uses - List of ExternalUse objects for every place the URL is used.
+    revision - Latest revision needed by any of the uses.
+
+    """
+
+    def __init__(self, url, repo):
+        self._url = url
+        self._repo = repo
+        self._uses = []
+
+    @property
+    def url(self):
+        """URL of the external."""
+        return self._url
+
+    @property
+    def repo(self):
+        """GitSvnRepo for the clone of the external."""
+        return self._repo
+
+    @property
+    def uses(self):
+        """List of ExternalUse objects for every use of the external."""
+        return self._uses
+
+    @property
+    def revision(self):
+        """Latest revision of the external needed by any use."""
+        return max(use.revision for use in self.uses)
+
+
+class SubmodulePlanner:
+
+    """Clone the externals of many repositories, and add them as submodules.
+
+    Externals are read from the trunk of each repository, at the revision
+    that was last fetched. Every external URL is cloned once, in
+    externals_dir, up to the latest revision any repository needs, and the
+    clones are made concurrently. Clones that exist already are rebased
+    instead.
+
+    Each repository then gets a branch, "svn-externals" by default, with
+    one commit on top of its HEAD that adds its submodules at the commits
+    of the clones for the revisions it needs. The commit is made with a
+    temporary index, so HEAD, the index and the working tree are left
+    alone, and nothing reaches Subversion on the next dcommit. Submodule
+    URLs are relative to each repository, or below url_base if it is set.
+
+    Clones use the external URL as their trunk. If its last component is
+    "trunk", tags are found with "trunk_tags" relative to the parent of
+    that URL; other externals, such as tags or branches themselves, are
+    cloned without tags. Clones are named after their URLs, and plan
+    raises ValueError if two URLs would share a name. Externals of
+    externals are not followed; the clones can be passed to materialize in
+    turn for that.
+
+    Public instance variables:
+    externals_dir - Directory that holds the clones.
+    externals_cache - ExternalsCache used to find externals.
+    max_workers - Number of clones made at once.
+    trunk_tags - Tags expression used for clones of trunks.
+    branch - Branch that gets the submodule commit.
+    url_base - URL the clones are published under, or None.
+
+    Public methods:
+    plan - Work out the clones needed for some repositories.
+    clone_all - Make or update the clones of a plan.
+    add_submodules - Add the clones of a plan to their repositories.
+    materialize - Plan, clone and add submodules in one go.
+
+    """
+
+    def __init__(self, externals_dir, externals_cache=None, max_workers=4,
+                 trunk_tags="tags/*", branch="svn-externals",
+                 url_base=None):
+        """Set where and how externals are cloned.
+
+        Arguments:
+        externals_dir - Sets the "externals_dir" attribute.
+
+        Keyword arguments:
+        externals_cache - Sets the "externals_cache" attribute. Defaults to
+                          a new ExternalsCache.
+        max_workers - Sets the "max_workers" attribute.
+        trunk_tags - Sets the "trunk_tags" attribute.
+        branch - Sets the "branch" attribute.
+        url_base - Sets the "url_base" attribute. Defaults to None, meaning
+                   that submodule URLs are paths relative to each
+                   repository, which keep working as long as the
+                   repositories and externals_dir are moved together.
+
+        """
+        self._externals_dir = externals_dir
+        if externals_cache is None:
+            externals_cache = ExternalsCache()
+        self._externals_cache = externals_cache
+        self._max_workers = max_workers
+        self._trunk_tags = trunk_tags
+        self._branch = branch
+        self._url_base = url_base
+
+    @property
+    def externals_dir(self):
+        """Directory that holds the clones of externals."""
+        return self._externals_dir
+
+    @property
+    def externals_cache(self):
+        """ExternalsCache used to find the externals of repositories."""
+        return self._externals_cache
+
+    @property
+    def max_workers(self):
+        """Number of externals cloned at once."""
+        return self._max_workers
+
+    @property
+    def trunk_tags(self):
+        """Tags expression, relative to the parent of trunk externals."""
+        return self._trunk_tags
+
+    @property
+    def branch(self):
+        """Branch that gets the commit adding the submodules."""
+        return self._branch
+
+    @property
+    def url_base(self):
+        """URL the clones are published under, e.g. on a Git server."""
+        return self._url_base
+
+    def _submodule_url(self, clone, repo):
+        # URL of a clone as a submodule of repo.
+        if self.url_base is not None:
+            return self.url_base.rstrip("/")+"/"+_clone_name(clone.url)
+        # Relative URLs are resolved against the superproject's directory
+        # when it has no remote.
+        url = os.path.relpath(clone.repo.path, repo.path) \
+            .replace(os.sep, "/")
+        if not url.startswith("../"):
+            url = "./"+url
+        return url
+
+    def _make_repo(self, url, parent):
+        name = _clone_name(url)
+        parent_url, _, head = url.rpartition("/")
+        trunk_tags = None
+        if head == "trunk":
+            trunk_tags = self.trunk_tags
+        svn_repo = SvnRepo(
+            name=name,
+            path=parent_url,
+            trunk_head=head,
+            trunk_tags=trunk_tags,
+            runner=parent.runner,
+        )
+        return GitSvnRepo(name=name,
+                          path=os.path.join(self.externals_dir, name),
+                          svn_repo=svn_repo, runner=parent.runner)
+
+    def plan(self, repos, **args):
+        """Work out the clones needed for the externals of repositories.
+
+        Arguments:
+        repos - An iterable yielding GitSvnRepo objects, which must have
+                been cloned.
+
+        Any additional keyword arguments are passed to
+        subprocess.check_output(), except for stdout.
+
+        Returns a list of ExternalClone objects, one per external URL, in
+        the order in which the URLs were first found. Raises ValueError if
+        two external URLs map to the same clone name.
+
+        """
+        clones = {}
+        names = {}
+        order = []
+        cache = self.externals_cache
+        for repo in repos:
+            trunk_url = _trunk_url(repo)
+            revision = repo.get_svn_revision(**args)
+            externals = cache.get_externals(trunk_url, revision, **args)
+            if externals:
+                root = cache.get_root(trunk_url, **args)
+            for external in externals:
+                clone = clones.get(external.url)
+                if clone is None:
+                    clone = ExternalClone(external.url,
+                                          self._make_repo(external.url,
+                                                          repo))
+                    other_url = names.setdefault(clone.repo.name,
+                                                 external.url)
+                    if other_url != external.url:
+                        raise ValueError(
+                            "externals {0} and {1} would both be cloned as "
+                            "{2}".format(other_url, external.url,
+                                         clone.repo.name)
+                        )
+                    clones[external.url] = clone
+                    order.append(clone)
+                owner_path = external.owner[len(trunk_url)+1:]
+                clone.uses.append(ExternalUse(
+                    repo,
+                    posixpath.join(owner_path, external.local_path),
+                    cache.get_target_revision(external, revision, root,
+                                              **args)
+                ))
+        return order
+
+    def _clone_one(self, clone, **args):
+        repo = clone.repo
+        revision = clone.revision
+        if repo.exists():
+            action = "rebase"
+        else:
+            action = "clone"
+        start_time = time.time()
+        try:
+            if action == "clone":
+                fetch_plan = repo.clone(revision=revision, **args)
+            elif repo.get_svn_revision(**args) < revision:
+                fetch_plan = repo.rebase(revision=revision, **args)
+            else:
+                fetch_plan = None
+        except Exception as e:
+            return SyncResult(repo, action, time.time()-start_time, e)
+        return SyncResult(repo, action, time.time()-start_time,
+                          fetch_plan=fetch_plan)
+
+    def clone_all(self, clones, **args):
+        """Make or update the clones of a plan concurrently.
+
+        Arguments:
+        clones - A list of ExternalClone objects, as returned by plan.
+
+        Any additional keyword arguments are passed to the clone/rebase
+        methods of each clone's repository.
+
+        Returns a list of SyncResult objects, in the same order as clones.
+        Failures are recorded in the results rather than raised.
+
+        """
+        if not os.path.isdir(self.externals_dir):
+            os.makedirs(self.externals_dir)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(self._clone_one, clone, **args)
+                       for clone in clones]
+            return [future.result() for future in futures]
+
+    def add_submodules(self, clones, **args):
+        """Add the clones of a plan to their repositories as submodules.
+
+        Every use of a clone becomes a submodule pointing at the commit
+        for the revision the use needs. For each repository, the branch is
+        set to a new commit on top of HEAD that adds all the submodules to
+        .gitmodules and as gitlinks, unless it already has exactly that
+        commit. Uses of clones that have no commit for the revision, e.g.
+        because the clone failed, are skipped.
+
+        Arguments:
+        clones - A list of ExternalClone objects, as returned by plan.
+
+        Any additional keyword arguments are passed to
+        subprocess.check_call() and subprocess.check_output().
+
+        Returns the list of repositories whose branch got a new commit.
+
+        """
+        # Repository path -> (GitSvnRepo, [(submodule path, URL, commit)])
+        submodules = {}
+        for clone in clones:
+            rev_index = clone.repo.rev_index
+            for use in clone.uses:
+                commit = rev_index.find_commit(use.revision)
+                if commit is None:
+                    continue
+                submodules.setdefault(use.repo.path, (use.repo, []))[1] \
+                    .append((use.path, self._submodule_url(clone, use.repo),
+                             commit))
+
+        changed = []
+        for repo, entries in submodules.values():
+            if self._commit_submodules(repo, entries, **args):
+                changed.append(repo)
+        return changed
+
+    def _commit_submodules(self, repo, entries, **args):
+        # Point the branch at a commit on top of HEAD with the submodules
+        # in entries. Returns True if the branch changed.
+        runner = repo.runner
+        output_args = args.copy()
+        output_args.pop("stdout", None)
+
+        def git_output(argv, **extra_args):
+            call_args = output_args.copy()
+            call_args.update(extra_args)
+            return runner.check_output(["git"]+argv, cwd=repo.path,
+                                       universal_newlines=True,
+                                       **call_args).strip()
+
+        temp_dir = tempfile.mkdtemp()
+        try:
+            index_args = {"env": dict(args.get("env") or os.environ,
+                                      GIT_INDEX_FILE=os.path.join(temp_dir,
+                                                                  "index"))}
+            gitmodules_path = os.path.join(temp_dir, "gitmodules")
+            head = git_output(["rev-parse", "--verify", "HEAD^{commit}"])
+            git_output(["read-tree", head], **index_args)
+            # Keep any .gitmodules the trunk has already.
+            existing = git_output(["ls-files", "-s", ".gitmodules"],
+                                  **index_args)
+            with open(gitmodules_path, "w") as gitmodules_file:
+                if existing:
+                    gitmodules_file.write(git_output(
+                        ["cat-file", "blob", existing.split()[1]]
+                    )+"\n")
+            for path, url, commit in entries:
+                for key, value in (("path", path), ("url", url)):
+                    git_output(["config", "-f", gitmodules_path,
+                                "submodule."+path+"."+key, value])
+                git_output(["update-index", "--add", "--cacheinfo",
+                            "160000", commit, path], **index_args)
+            gitmodules_hash = git_output(["hash-object", "-w",
+                                          gitmodules_path])
+            git_output(["update-index", "--add", "--cacheinfo", "100644",
+                        gitmodules_hash, ".gitmodules"], **index_args)
+            tree = git_output(["write-tree"], **index_args)
+        finally:
+            shutil.rmtree(temp_dir)
+
+        ref = "refs/heads/"+self.branch
+        current = git_output(["for-each-ref",
+                              "--format=%(tree) %(parent)", ref])
+        if current == tree+" "+head:
+            return False
+        commit = git_output(["commit-tree", tree, "-p", head, "-m",
+                             _submodule_commit_message])
+        git_output(["update-ref", ref, commit])
+        return True
+
+    def materialize(self, repos, **args):
+        """Clone the externals of repositories and add them as submodules.
+
+        Arguments:
+        repos - An iterable yielding GitSvnRepo objects, which must have
+                been cloned.
+
+        Any additional keyword arguments are passed to plan, clone_all and
+        add_submodules.
+
+        Returns a tuple of the ExternalClone list and the SyncResult list
+        for the clones.
+
+        """
+        clones = self.plan(repos, **args)
+        results = self.clone_all(clones, **args)
+        self.add_submodules(clones, **args)
+        return clones, results
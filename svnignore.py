@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""Conversion of svn:ignore properties to .gitignore files.
+
+The svn:ignore properties of the whole trunk are read with one "svn
+propget -R --xml" the first time, and kept in the Git directory with the
+revision they were read at. Later conversions only read again the
+directories that "svn log -v" lists as changed since then.
+
+Classes:
+SvnIgnoreConverter - Keep .gitignore files in step with svn:ignore.
+
+Functions:
+svn_ignore_to_gitignore - Convert the value of an svn:ignore property.
+
+"""
+
+import json
+import os
+
+from GitSvnHack import svnprops
+
+
+# First line of every generated .gitignore file. Files without it are
+# never overwritten or removed.
+_gitignore_header = "# Generated by git-svnhack from svn:ignore.\n"
+
+
+def svn_ignore_to_gitignore(value):
+    """Convert the value of an svn:ignore property to .gitignore contents.
+
+    svn:ignore patterns only apply to the directory that has the property,
+    so each becomes a pattern anchored to the directory of the .gitignore
+    file. The file also ignores itself, so that it is not committed to
+    Git, and from there to Subversion, by accident.
+
+    """
+    lines = [_gitignore_header, "/.gitignore\n"]
+    for pattern in value.splitlines():
+        pattern = pattern.strip()
+        if not pattern:
+            continue
+        if pattern[0] in "#!":
+            pattern = "\\"+pattern
+        lines.append("/"+pattern+"\n")
+    return "".join(lines)
+
+
+class SvnIgnoreConverter:
+
+    """Keep the .gitignore files of a GitSvnRepo in step with svn:ignore.
+
+    Properties are read at the last fetched trunk revision, from the
+    mirror if there is one. The .gitignore files are written to the
+    working tree, but not added to the index, since they would otherwise
+    be committed back to Subversion by "git svn dcommit".
+
+    Public instance variables:
+    repo - The GitSvnRepo to convert properties for.
+    state_path - Path of the file holding the properties last read.
+
+    Public methods:
+    convert - Bring the .gitignore files up to date.
+
+    """
+
+    def __init__(self, repo):
+        self._repo = repo
+
+    @property
+    def repo(self):
+        """The GitSvnRepo whose svn:ignore properties are converted."""
+        return self._repo
+
+    @property
+    def state_path(self):
+        """Path of the JSON file holding the properties last read."""
+        return os.path.join(self.repo.git_dir, "svnhack",
+                            self.repo.prefix+"svnignore.json")
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as state_file:
+                return json.load(state_file)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def _save_state(self, state):
+        state_dir = os.path.dirname(self.state_path)
+        if not os.path.isdir(state_dir):
+            os.makedirs(state_dir)
+        temp_path = self.state_path+".tmp"
+        with open(temp_path, "w") as state_file:
+            json.dump(state, state_file)
+        os.rename(temp_path, self.state_path)
+
+    def _read_values(self, trunk_url, revision, state, **args):
+        # Get svn:ignore for the trunk at revision, from state if possible.
+        runner = self.repo.runner
+        svn_repo = self.repo.svn_repo
+        if state is None or state["url"] != trunk_url or \
+           state["revision"] > revision:
+            return svnprops.get_property(runner, "svn:ignore", trunk_url,
+                                         revision, **args)
+        if state["revision"] == revision:
+            return state["values"]
+        if svn_repo.mirror_path is not None:
+            root = svn_repo.mirror_url
+        else:
+            root = svn_repo.get_root(**args)
+        return svnprops.update_property(
+            runner, "svn:ignore", trunk_url, root, dict(state["values"]),
+            state["revision"], revision, **args
+        )
+
+    def _is_generated(self, file_path):
+        try:
+            with open(file_path) as gitignore_file:
+                return gitignore_file.readline() == _gitignore_header
+        except (IOError, OSError):
+            return False
+
+    def convert(self, **args):
+        """Bring the .gitignore files up to date with svn:ignore.
+
+        Any keyword arguments are passed to subprocess.check_output(),
+        except for stdout.
+
+        Returns a tuple of two lists of .gitignore paths, relative to the
+        top of the repository: those written, and those removed. Existing
+        .gitignore files that were not generated are left alone.
+
+        """
+        svn_repo = self.repo.svn_repo
+        trunk_url = (svn_repo.fetch_url.rstrip("/")+"/"+
+                     svn_repo.trunk_branch.head.strip("/")).rstrip("/")
+        revision = self.repo.get_svn_revision(**args)
+        if revision == 0:
+            return [], []
+        state = self._load_state()
+        values = self._read_values(trunk_url, revision, state, **args)
+
+        wanted = {}
+        for target, value in values.items():
+            directory = target[len(trunk_url)+1:]
+            wanted[os.path.join(directory, ".gitignore")] = \
+                svn_ignore_to_gitignore(value)
+
+        written = []
+        for rel_path, contents in sorted(wanted.items()):
+            file_path = os.path.join(self.repo.path, rel_path)
+            if os.path.exists(file_path):
+                if not self._is_generated(file_path):
+                    continue
+                with open(file_path) as gitignore_file:
+                    if gitignore_file.read() == contents:
+                        continue
+            elif not os.path.isdir(os.path.dirname(file_path)):
+                os.makedirs(os.path.dirname(file_path))
+            with open(file_path, "w") as gitignore_file:
+                gitignore_file.write(contents)
+            written.append(rel_path)
+
+        removed = []
+        old_files = state["files"] if state is not None else []
+        for rel_path in sorted(set(old_files) - set(wanted)):
+            file_path = os.path.join(self.repo.path, rel_path)
+            if self._is_generated(file_path):
+                os.remove(file_path)
+                removed.append(rel_path)
+
+        self._save_state({
+            "url": trunk_url,
+            "revision": revision,
+            "values": values,
+            "files": sorted(wanted),
+        })
+        return written, removed
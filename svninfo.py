@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""Cached queries of Subversion repository information.
+
+Classes:
+SvnInfo - Information about one Subversion URL.
+SvnInfoCache - Cache of "svn info" results with a time to live.
+
+Functions:
+parse_info_xml - Parse the output of "svn info --xml".
+
+"""
+
+import json
+import os
+import subprocess
+import threading
+import time
+from xml.etree import ElementTree
+
+from GitSvnHack import runner as _runner
+
+
+class SvnInfo:
+
+    """Information about one Subversion URL.
+
+    Public instance variables:
+    url - The URL queried.
+    root - URL of the repository root.
+    uuid - UUID of the repository.
+    revision - Latest revision of the repository when queried.
+    last_changed_rev - Latest revision that changed the URL.
+
+    """
+
+    def __init__(self, url, root, uuid, revision, last_changed_rev):
+        self._url = url
+        self._root = root
+        self._uuid = uuid
+        self._revision = revision
+        self._last_changed_rev = last_changed_rev
+
+    @property
+    def url(self):
+        """The URL this information is about."""
+        return self._url
+
+    @property
+    def root(self):
+        """URL of the root of the repository containing the URL."""
+        return self._root
+
+    @property
+    def uuid(self):
+        """UUID of the repository containing the URL."""
+        return self._uuid
+
+    @property
+    def revision(self):
+        """Latest revision of the repository at the time of the query."""
+        return self._revision
+
+    @property
+    def last_changed_rev(self):
+        """Latest revision that changed anything at or below the URL."""
+        return self._last_changed_rev
+
+    def to_dict(self):
+        """Return a dictionary suitable for JSON serialization."""
+        return {
+            "url": self.url,
+            "root": self.root,
+            "uuid": self.uuid,
+            "revision": self.revision,
+            "last_changed_rev": self.last_changed_rev,
+        }
+
+    @classmethod
+    def from_dict(cls, info_d):
+        """Construct an SvnInfo from the output of to_dict."""
+        return cls(info_d["url"], info_d["root"], info_d["uuid"],
+                   info_d["revision"], info_d["last_changed_rev"])
+
+
+def parse_info_xml(text):
+    """Parse the output of "svn info --xml" into a list of SvnInfo."""
+    infos = []
+    for entry in ElementTree.fromstring(text).iter("entry"):
+        commit = entry.find("commit")
+        infos.append(SvnInfo(
+            url=entry.findtext("url"),
+            root=entry.findtext("repository/root"),
+            uuid=entry.findtext("repository/uuid"),
+            revision=int(entry.get("revision")),
+            last_changed_rev=int(commit.get("revision")),
+        ))
+    return infos
+
+
+def _normalize_url(url):
+    return url.rstrip("/")
+
+
+class SvnInfoCache:
+
+    """Cache of "svn info" results with a time to live.
+
+    Results are kept per URL, and the latest revision is also kept per
+    repository UUID. Since the latest revision is a property of the whole
+    repository, a fresh result for any URL on a repository answers
+    get_revision for every other URL known to be on the same repository.
+
+    Many URLs can be queried with a single "svn info" process by using
+    query().
+
+    Public instance variables:
+    ttl - Number of seconds for which results are reused.
+    path - Path of the JSON file used to persist the cache, or None.
+
+    Public methods:
+    query - Get SvnInfo objects for many URLs.
+    get_revision - Get the latest revision of the repository at a URL.
+    invalidate - Forget all cached results.
+
+    """
+
+    def __init__(self, ttl=60, path=None, runner=None):
+        """Create a cache.
+
+        Keyword arguments:
+        ttl - Sets the "ttl" attribute. Defaults to 60 seconds.
+        path - Sets the "path" attribute. If the file exists, the cache is
+               loaded from it. Defaults to None, meaning that the cache
+               exists only in memory.
+        runner - CommandRunner used to run "svn info". Defaults to None,
+                 meaning that the default runner is used.
+
+        """
+        self._ttl = ttl
+        self._path = path
+        self._runner = runner
+        self._lock = threading.Lock()
+        # URL -> (SvnInfo, time), and UUID -> (revision, time).
+        self._infos = {}
+        self._heads = {}
+        if path is not None and os.path.exists(path):
+            self._load()
+
+    @property
+    def ttl(self):
+        """Number of seconds for which results are reused."""
+        return self._ttl
+
+    @property
+    def path(self):
+        """Path of the file used to persist the cache, or None."""
+        return self._path
+
+    @property
+    def runner(self):
+        """CommandRunner used to run "svn info"."""
+        if self._runner is not None:
+            return self._runner
+        return _runner.get_default_runner()
+
+    def _load(self):
+        with open(self.path) as cache_file:
+            cache_d = json.load(cache_file)
+        for url, (info_d, query_time) in cache_d["infos"].items():
+            self._infos[url] = (SvnInfo.from_dict(info_d), query_time)
+        for uuid, (revision, query_time) in cache_d["heads"].items():
+            self._heads[uuid] = (revision, query_time)
+
+    def _save(self):
+        cache_d = {
+            "infos": dict((url, (info.to_dict(), query_time))
+                          for url, (info, query_time)
+                          in self._infos.items()),
+            "heads": self._heads,
+        }
+        temp_path = self.path+".tmp"
+        with open(temp_path, "w") as cache_file:
+            json.dump(cache_d, cache_file)
+        os.rename(temp_path, self.path)
+
+    def _is_fresh(self, query_time, now):
+        return now - query_time <= self.ttl
+
+    def query(self, urls, **args):
+        """Get information about several URLs.
+
+        URLs without fresh cached results are queried together, using a
+        single "svn info --xml" process.
+
+        Any additional keyword arguments are passed to
+        subprocess.check_output(), except for stdout.
+
+        Returns a dictionary mapping each URL to an SvnInfo. URLs that
+        could not be queried are left out.
+
+        """
+        now = time.time()
+        results = {}
+        to_query = []
+        with self._lock:
+            for url in urls:
+                cached = self._infos.get(_normalize_url(url))
+                if cached is not None and self._is_fresh(cached[1], now):
+                    results[url] = cached[0]
+                elif url not in to_query:
+                    to_query.append(url)
+        if not to_query:
+            return results
+
+        output_args = args.copy()
+        output_args.pop("stdout", None)
+        try:
+            svn_info = self.runner.check_output(
+                ["svn", "info", "--xml"]+to_query,
+                universal_newlines=True,
+                **output_args
+            )
+        except subprocess.CalledProcessError as e:
+            # Some URLs may have worked; svn still prints their entries.
+            svn_info = e.output
+            if not svn_info:
+                raise
+        infos = dict((_normalize_url(info.url), info)
+                     for info in parse_info_xml(svn_info))
+
+        with self._lock:
+            for info in infos.values():
+                self._infos[_normalize_url(info.url)] = (info, now)
+                head = self._heads.get(info.uuid)
+                if head is None or head[0] <= info.revision:
+                    self._heads[info.uuid] = (info.revision, now)
+            if self.path is not None:
+                self._save()
+        for url in to_query:
+            info = infos.get(_normalize_url(url))
+            if info is not None:
+                results[url] = info
+        return results
+
+    def _find_uuid(self, url):
+        # Check for the URL itself, then for a known repository root that
+        # contains it.
+        url = _normalize_url(url)
+        cached = self._infos.get(url)
+        if cached is not None:
+            return cached[0].uuid
+        for info, query_time in self._infos.values():
+            root = _normalize_url(info.root)
+            if url == root or url.startswith(root+"/"):
+                return info.uuid
+        return None
+
+    def get_revision(self, url, **args):
+        """Get the latest revision of the repository containing a URL.
+
+        If the URL is known to belong to a repository with a fresh cached
+        latest revision, no query is made. A URL is known to belong to a
+        repository if it was queried before, or if it is below the root
+        URL of a repository that was queried before.
+
+        Any additional keyword arguments are passed to
+        subprocess.check_output(), except for stdout.
+
+        """
+        now = time.time()
+        with self._lock:
+            uuid = self._find_uuid(url)
+            head = self._heads.get(uuid)
+            if head is not None and self._is_fresh(head[1], now):
+                return head[0]
+        info = self.query([url], **args).get(url)
+        if info is None:
+            raise LookupError("no Subversion information for "+url)
+        return info.revision
+
+    def invalidate(self):
+        """Forget all cached results."""
+        with self._lock:
+            self._infos.clear()
+            self._heads.clear()
+            if self.path is not None and os.path.exists(self.path):
+                os.remove(self.path)
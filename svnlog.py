@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""Local, append-only cache of Subversion history.
+
+The log of a project is downloaded once with "svn log --xml -v", parsed
+as it streams in, and appended to a file with one JSON object per line.
+Each update only asks for the revisions after the last one seen, and
+queries such as "which revisions touched this path" are answered from an
+in-memory index, without contacting the server. The entries themselves
+stay in the file and are read back as they are needed, so memory use
+doesn't grow with the length of the history.
+
+Classes:
+SvnLogEntry - One revision in a Subversion log.
+SvnLogCache - Append-only local store of the log of one URL.
+
+Functions:
+stream_log - Run "svn log --xml -v", passing each entry to a callback.
+
+"""
+
+import bisect
+import json
+import os
+import threading
+from xml.etree import ElementTree
+
+from GitSvnHack import runner as _runner
+
+
+def _encode_record(record):
+    # Encode a record as a line of the log file.
+    return (json.dumps(record)+"\n").encode("utf-8")
+
+def _parse_record(line):
+    # Decode a line of the log file, or return None for a line cut short
+    # by an interrupted update.
+    if not line.endswith(b"\n"):
+        return None
+    try:
+        return json.loads(line.decode("utf-8"))
+    except ValueError:
+        return None
+
+
+class SvnLogEntry:
+
+    """One revision in a Subversion log.
+
+    Public instance variables:
+    revision - The revision number.
+    author - Author of the revision, or None.
+    date - Date of the revision as an ISO 8601 string, or None.
+    paths - List of (action, kind, path, copyfrom_path, copyfrom_rev)
+            tuples for the changed paths. Paths are relative to the
+            repository root, e.g. "/trunk/README"; kind and the copy
+            information may be None.
+
+    """
+
+    def __init__(self, revision, author, date, paths):
+        self._revision = revision
+        self._author = author
+        self._date = date
+        self._paths = paths
+
+    @property
+    def revision(self):
+        """The revision number."""
+        return self._revision
+
+    @property
+    def author(self):
+        """Author of the revision, or None."""
+        return self._author
+
+    @property
+    def date(self):
+        """Date of the revision as an ISO 8601 string, or None."""
+        return self._date
+
+    @property
+    def paths(self):
+        """List of changed paths, as described for the class."""
+        return self._paths
+
+    def to_dict(self):
+        """Return a dictionary suitable for JSON serialization."""
+        return {
+            "revision": self.revision,
+            "author": self.author,
+            "date": self.date,
+            "paths": [list(path) for path in self.paths],
+        }
+
+    @classmethod
+    def from_dict(cls, entry_d):
+        """Construct an SvnLogEntry from the output of to_dict."""
+        return cls(entry_d["revision"], entry_d["author"], entry_d["date"],
+                   [tuple(path) for path in entry_d["paths"]])
+
+
+class _SvnLogTarget:
+
+    # ElementTree parser target that builds an SvnLogEntry for each
+    # logentry element and passes it to a callback, so that the log is
+    # never held as an element tree.
+
+    def __init__(self, entry_callback):
+        self._entry_callback = entry_callback
+        self._text = []
+        self._revision = None
+        self._author = None
+        self._date = None
+        self._paths = []
+        self._path_attrib = None
+
+    def start(self, tag, attrib):
+        self._text = []
+        if tag == "logentry":
+            self._revision = int(attrib["revision"])
+            self._author = None
+            self._date = None
+            self._paths = []
+        elif tag == "path":
+            self._path_attrib = attrib
+
+    def data(self, data):
+        self._text.append(data)
+
+    def end(self, tag):
+        if tag == "author":
+            self._author = "".join(self._text)
+        elif tag == "date":
+            self._date = "".join(self._text)
+        elif tag == "path":
+            attrib = self._path_attrib
+            copyfrom_rev = attrib.get("copyfrom-rev")
+            self._paths.append((
+                attrib.get("action"), attrib.get("kind") or None,
+                "".join(self._text), attrib.get("copyfrom-path"),
+                int(copyfrom_rev) if copyfrom_rev is not None else None,
+            ))
+        elif tag == "logentry":
+            self._entry_callback(SvnLogEntry(self._revision, self._author,
+                                             self._date, self._paths))
+
+    def close(self):
+        pass
+
+
+def stream_log(runner, url, start, end, entry_callback, **args):
+    """Run "svn log --xml -v", passing each entry to a callback.
+
+    The XML is parsed as it is read, and each SvnLogEntry is passed to
+    entry_callback as soon as it is complete, so memory use does not
+    depend on the length of the log.
+
+    Arguments:
+    runner - CommandRunner used to run svn.
+    url - URL whose log is read.
+    start - First revision.
+    end - Last revision, or "HEAD".
+    entry_callback - Function called with each SvnLogEntry, in revision
+                     order.
+
+    Any additional keyword arguments are passed to subprocess.Popen(),
+    except for stdout.
+
+    """
+    parser = ElementTree.XMLParser(target=_SvnLogTarget(entry_callback))
+    runner.check_lines(
+        ["svn", "log", "--xml", "-v", "-r", str(start)+":"+str(end), url],
+        parser.feed,
+        **args
+    )
+    parser.close()
+
+
+class SvnLogCache:
+
+    """Append-only local store of the log of one Subversion URL.
+
+    The store is a file with one JSON object per line: either a log entry,
+    or a {"checked": N} marker saying that the log is complete up to
+    revision N. An update that is interrupted leaves only whole entries
+    behind, and the next update carries on after the last of them.
+
+    Only an index is held in memory: the revisions with their offsets in
+    the file, the revisions that changed each path, and the authors.
+
+    Public instance variables:
+    url - URL whose log is stored.
+    path - Path of the file holding the log.
+    last_revision - Revision up to which the log is known to be complete.
+
+    Public methods:
+    update - Append the revisions after last_revision.
+    get_entries - Get the log entries for a range of revisions.
+    get_revisions - Get the revisions that touched some paths.
+    get_authors - Get the set of authors of all revisions.
+
+    """
+
+    def __init__(self, url, path, runner=None):
+        """Set where the log comes from and where it is kept.
+
+        Arguments:
+        url - Sets the "url" attribute.
+        path - Sets the "path" attribute. If the file exists, the log is
+               loaded from it.
+
+        Keyword arguments:
+        runner - CommandRunner used to run "svn log". Defaults to None,
+                 meaning that the default runner is used.
+
+        """
+        self._url = url
+        self._path = path
+        self._runner = runner
+        self._lock = threading.Lock()
+        # Stored revisions in order, and the offsets of their lines.
+        self._revisions = []
+        self._offsets = []
+        self._authors = set()
+        self._checked = 0
+        # Changed path -> sorted list of revisions, and the sorted list of
+        # changed paths, rebuilt when needed.
+        self._path_revisions = {}
+        self._sorted_paths = None
+        if os.path.exists(path):
+            self._load()
+
+    @property
+    def url(self):
+        """URL whose log is stored."""
+        return self._url
+
+    @property
+    def path(self):
+        """Path of the file holding the log."""
+        return self._path
+
+    @property
+    def runner(self):
+        """CommandRunner used to run "svn log"."""
+        if self._runner is not None:
+            return self._runner
+        return _runner.get_default_runner()
+
+    @property
+    def last_revision(self):
+        """Revision up to which the stored log is complete, or 0."""
+        with self._lock:
+            return self._checked
+
+    def _load(self):
+        offset = 0
+        with open(self.path, "rb") as log_file:
+            for line in log_file:
+                record = _parse_record(line)
+                if record is not None and "checked" in record:
+                    self._checked = max(self._checked, record["checked"])
+                elif record is not None:
+                    self._add(SvnLogEntry.from_dict(record), offset)
+                offset += len(line)
+
+    def _is_new(self, entry):
+        # True if entry comes after every stored revision.
+        return not self._revisions or entry.revision > self._revisions[-1]
+
+    def _add(self, entry, offset):
+        # Add an entry stored at offset to the index, unless it is
+        # already there.
+        if not self._is_new(entry):
+            return False
+        self._revisions.append(entry.revision)
+        self._offsets.append(offset)
+        if entry.author is not None:
+            self._authors.add(entry.author)
+        self._checked = max(self._checked, entry.revision)
+        for action, kind, path, copyfrom_path, copyfrom_rev in entry.paths:
+            revisions = self._path_revisions.get(path)
+            if revisions is None:
+                self._path_revisions[path] = [entry.revision]
+                self._sorted_paths = None
+            elif revisions[-1] != entry.revision:
+                revisions.append(entry.revision)
+        return True
+
+    def update(self, end="HEAD", **args):
+        """Append the revisions after last_revision to the log.
+
+        Arguments:
+        end - Last revision to fetch. Defaults to "HEAD".
+
+        Any additional keyword arguments are passed to subprocess.Popen(),
+        except for stdout.
+
+        Returns the number of log entries added.
+
+        """
+        start = self.last_revision+1
+        if end == "HEAD":
+            # "svn log -r N:HEAD" fails if N is after HEAD.
+            end = self._get_head(**args)
+        end = int(end)
+        if end < start:
+            return 0
+        log_dir = os.path.dirname(self.path)
+        if log_dir and not os.path.isdir(log_dir):
+            os.makedirs(log_dir)
+
+        torn = False
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, "rb") as log_file:
+                log_file.seek(-1, os.SEEK_END)
+                torn = log_file.read(1) != b"\n"
+
+        added = [0]
+        with open(self.path, "ab") as log_file:
+            if torn:
+                # Don't append to a line cut short by an earlier update.
+                log_file.write(b"\n")
+            def add_entry(entry):
+                with self._lock:
+                    if not self._is_new(entry):
+                        return
+                    offset = log_file.tell()
+                    log_file.write(_encode_record(entry.to_dict()))
+                    # Entries are only indexed once readers can see them.
+                    log_file.flush()
+                    self._add(entry, offset)
+                added[0] += 1
+            stream_log(self.runner, self.url, start, end, add_entry,
+                       **args)
+            log_file.write(_encode_record({"checked": end}))
+        with self._lock:
+            self._checked = max(self._checked, end)
+        return added[0]
+
+    def _get_head(self, **args):
+        # Latest revision of the repository.
+        output_args = args.copy()
+        output_args.pop("stdout", None)
+        svn_info = self.runner.check_output(
+            ["svn", "info", "--xml", self.url],
+            universal_newlines=True,
+            **output_args
+        )
+        return int(ElementTree.fromstring(svn_info).find("entry")
+                   .get("revision"))
+
+    def get_entries(self, start=1, end=None):
+        """Get the stored log entries for a range of revisions.
+
+        Arguments:
+        start - First revision. Defaults to 1.
+        end - Last revision. Defaults to None, meaning no limit.
+
+        Returns an iterator over SvnLogEntry objects in revision order.
+        Entries are read from the file as the iterator is consumed, and
+        only the entries stored when this method was called are included.
+
+        """
+        with self._lock:
+            first = bisect.bisect_left(self._revisions, start)
+            if first == len(self._revisions):
+                return iter(())
+            offset = self._offsets[first]
+            last = self._revisions[-1]
+        if end is not None:
+            last = min(last, end)
+        return self._read_entries(offset, last)
+
+    def _read_entries(self, offset, last):
+        # Yield the entries stored from offset on, up to revision last.
+        previous = None
+        with open(self.path, "rb") as log_file:
+            log_file.seek(offset)
+            for line in log_file:
+                record = _parse_record(line)
+                if record is None or "checked" in record:
+                    continue
+                entry = SvnLogEntry.from_dict(record)
+                if entry.revision > last:
+                    break
+                # Skip entries that were stored twice.
+                if previous is None or entry.revision > previous:
+                    previous = entry.revision
+                    yield entry
+
+    def get_revisions(self, paths, start=1, end=None):
+        """Get the revisions that changed anything at or below some paths.
+
+        Arguments:
+        paths - Iterable of repository paths, e.g. ["/proj/trunk"].
+        start - First revision. Defaults to 1.
+        end - Last revision. Defaults to None, meaning no limit.
+
+        Returns a sorted list of revision numbers.
+
+        """
+        found = set()
+        with self._lock:
+            if self._sorted_paths is None:
+                self._sorted_paths = sorted(self._path_revisions)
+            sorted_paths = self._sorted_paths
+            for top in paths:
+                top = top.rstrip("/")
+                # Everything below top sorts between top+"/" and top+"0",
+                # since "0" follows "/".
+                matches = [top] if top in self._path_revisions else []
+                matches += sorted_paths[
+                    bisect.bisect_left(sorted_paths, top+"/"):
+                    bisect.bisect_left(sorted_paths, top+"0")
+                ]
+                for path in matches:
+                    revisions = self._path_revisions[path]
+                    found.update(revisions[
+                        bisect.bisect_left(revisions, start):
+                        len(revisions) if end is None else
+                        bisect.bisect_right(revisions, end)
+                    ])
+        return sorted(found)
+
+    def get_authors(self):
+        """Get the set of authors of all stored revisions."""
+        with self._lock:
+            return set(self._authors)
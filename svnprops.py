@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Queries of Subversion properties.
+
+Properties such as svn:externals and svn:ignore are read for a whole tree
+with a single "svn propget -R --xml", and "svn log -v --xml" is used to
+find which directories may have had their properties changed since, so
+that only those need to be read again.
+
+Functions:
+get_property - Read one property for a tree with a single svn process.
+parse_propget_xml - Parse the output of "svn propget --xml".
+parse_dir_changes - Find directories changed in "svn log -v --xml"
+                    output.
+update_property - Bring the values of a property for a tree up to date.
+
+"""
+
+from xml.etree import ElementTree
+
+
+def parse_propget_xml(text):
+    """Parse the output of "svn propget --xml" for a single property.
+
+    Returns a dictionary mapping each target path or URL to the value of
+    the property. Targets without the property are not listed.
+
+    """
+    values = {}
+    for target in ElementTree.fromstring(text).iter("target"):
+        prop = target.find("property")
+        if prop is not None:
+            values[target.get("path")] = prop.text or ""
+    return values
+
+
+def get_property(runner, name, target, revision=None, recursive=True,
+                 **args):
+    """Read a property for a path or URL, and everything below it.
+
+    Arguments:
+    runner - CommandRunner used to run "svn propget".
+    name - Name of the property, e.g. "svn:externals".
+    target - Path or URL to read.
+    revision - Revision to read, or None for HEAD.
+    recursive - If False, only read the property of the target itself.
+
+    Any additional keyword arguments are passed to
+    subprocess.check_output(), except for stdout.
+
+    Returns a dictionary as for parse_propget_xml.
+
+    """
+    argv = ["svn", "propget", "--xml", name]
+    if recursive:
+        argv.append("-R")
+    if revision is not None:
+        target = target+"@"+str(revision)
+    output_args = args.copy()
+    output_args.pop("stdout", None)
+    return parse_propget_xml(runner.check_output(
+        argv+[target],
+        universal_newlines=True,
+        **output_args
+    ))
+
+
+def parse_dir_changes(svn_log):
+    """Find the directories changed in "svn log -v --xml" output.
+
+    Only directories can have svn:externals or svn:ignore, and a
+    directory is only ever modified by changing its properties, so these
+    are the only paths whose properties need to be read again. Paths of
+    unknown kind are treated as directories.
+
+    Returns a dictionary mapping repository paths, e.g. "/trunk/lib", to
+    the net change over the whole log: "M" if only the directory's own
+    properties changed, "A" if it was added or replaced, so that
+    everything below it may be new, or "D" if it was deleted.
+
+    """
+    changes = {}
+    entries = sorted(ElementTree.fromstring(svn_log).iter("logentry"),
+                     key=lambda entry: int(entry.get("revision")))
+    for entry in entries:
+        for path in entry.iter("path"):
+            if path.get("kind") not in (None, "", "dir"):
+                continue
+            action = path.get("action")
+            if action == "D":
+                changes[path.text] = "D"
+            elif action in ("A", "R"):
+                changes[path.text] = "A"
+            elif changes.get(path.text) != "A":
+                changes[path.text] = "M"
+    return changes
+
+
+def _is_below(path, top):
+    # True if the path or URL is top, or inside it.
+    top = top.rstrip("/")
+    return path == top or path.startswith(top+"/")
+
+
+def update_property(runner, name, url, root, values, old_revision,
+                    revision, **args):
+    """Bring the values of a property for a tree up to date.
+
+    Only the directories that "svn log -v" lists as changed between the
+    two revisions are read again: added or replaced directories with
+    everything below them, and modified directories on their own. If the
+    tree itself was copied or deleted in between, it is read again
+    completely.
+
+    Arguments:
+    runner - CommandRunner used to run svn.
+    name - Name of the property.
+    url - URL of the tree.
+    root - URL of the root of the repository containing the tree.
+    values - Dictionary returned by get_property for the tree at
+             old_revision. It is updated in place.
+    old_revision - Revision that values are for.
+    revision - Revision to update values to.
+
+    Any additional keyword arguments are passed to
+    subprocess.check_output(), except for stdout.
+
+    Returns the updated dictionary, which is values unless the tree had
+    to be read again.
+
+    """
+    output_args = args.copy()
+    output_args.pop("stdout", None)
+    svn_log = runner.check_output(
+        ["svn", "log", "-v", "--xml",
+         "-r", "{0}:{1}".format(old_revision+1, revision),
+         url+"@"+str(revision)],
+        universal_newlines=True,
+        **output_args
+    )
+    root = root.rstrip("/")
+    top = url[len(root):] or "/"
+    added = []
+    for path, action in sorted(parse_dir_changes(svn_log).items()):
+        if _is_below(top, path) and path.rstrip("/") != top.rstrip("/"):
+            # A parent of the tree changed. Only a copy or deletion of the
+            # parent can affect the tree.
+            if action != "M":
+                return get_property(runner, name, url, revision, **args)
+            continue
+        if not _is_below(path, top):
+            continue
+        if any(_is_below(path, added_path) for added_path in added):
+            continue
+        path_url = (root+path).rstrip("/")
+        if action != "M":
+            for target in list(values):
+                if _is_below(target, path_url):
+                    del values[target]
+        else:
+            values.pop(path_url, None)
+        if action == "A":
+            added.append(path)
+        if action != "D":
+            values.update(get_property(runner, name, path_url, revision,
+                                       recursive=(action == "A"), **args))
+    return values
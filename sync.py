@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""Concurrent synchronization of many git-svn repositories.
+
+Classes:
+SyncResult - Outcome of synchronizing a single repository.
+RepoSyncer - Clone or rebase many GitSvnRepo objects concurrently.
+
+Functions:
+svn_host - Get the key used to limit concurrency per Subversion server.
+format_summary - Format a list of SyncResult objects for printing.
+
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import os
+import time
+from urllib.parse import urlsplit
+
+
+def svn_host(svn_repo):
+    """Get the server name used to group requests to an SvnRepo.
+
+    Repositories accessed via "file://" URLs have no host, and are grouped
+    together under the empty string.
+
+    """
+    return urlsplit(svn_repo.path).netloc
+
+
+def _mirror_key(svn_repo):
+    # Identify a mirror by its absolute path, or return None if there is
+    # no mirror.
+    if svn_repo.mirror_path is None:
+        return None
+    return os.path.abspath(svn_repo.mirror_path)
+
+
+def _remote_svn_repos(repo):
+    # SvnRepo objects for every remote of a GitSvnRepo.
+    return [repo.svn_repo]+[remote.svn_repo for remote in repo.remotes]
+
+
+def _elapsed(results):
+    # Time spanned by a list of SyncResult objects.
+    timed = [result for result in results if result.start_time is not None]
+    if not timed:
+        return max([result.wall_time for result in results] or [0.0])
+    return max(result.start_time+result.wall_time for result in timed) - \
+        min(result.start_time for result in timed)
+
+
+class SyncResult:
+
+    """Outcome of synchronizing a single repository.
+
+    Public instance variables:
+    repo - The GitSvnRepo that was synchronized.
+    action - Either "clone" or "rebase".
+    wall_time - Time taken, in seconds.
+    start_time - Time the operation started, in seconds since the epoch,
+                 or None if unknown.
+    error - The exception raised, or None on success.
+    succeeded - True if no exception was raised.
+    fetch_plan - The FetchPlan returned by clone/rebase, if any.
+
+    """
+
+    def __init__(self, repo, action, wall_time, error=None,
+                 fetch_plan=None, start_time=None):
+        self._repo = repo
+        self._action = action
+        self._wall_time = wall_time
+        self._error = error
+        self._fetch_plan = fetch_plan
+        self._start_time = start_time
+
+    @property
+    def repo(self):
+        """The GitSvnRepo that was synchronized."""
+        return self._repo
+
+    @property
+    def action(self):
+        """The operation performed; "clone" or "rebase"."""
+        return self._action
+
+    @property
+    def wall_time(self):
+        """Wall clock time spent on this repository, in seconds."""
+        return self._wall_time
+
+    @property
+    def start_time(self):
+        """Time the operation started, or None if unknown."""
+        return self._start_time
+
+    @property
+    def error(self):
+        """Exception raised during synchronization, if any."""
+        return self._error
+
+    @property
+    def fetch_plan(self):
+        """FetchPlan used by the clone or rebase, or None."""
+        return self._fetch_plan
+
+    @property
+    def succeeded(self):
+        """True if synchronization completed without an exception."""
+        return self._error is None
+
+
+class RepoSyncer:
+
+    """Clone or rebase many GitSvnRepo objects concurrently.
+
+    Repositories that do not exist yet are cloned, and the others are
+    rebased. At most "max_workers" repositories are processed at a time,
+    and at most "host_limit" of those may talk to the same Subversion
+    server. A repository is only handed to a worker once its host has a
+    free slot, so repositories on busy hosts never keep workers from
+    repositories on other hosts.
+
+    Subversion mirrors are updated before any repository is synchronized,
+    once per mirror, however many repositories share it. If a mirror can't
+    be updated, the repositories using it fail without being touched.
+
+    Public instance variables:
+    max_workers - Size of the worker pool.
+    host_limit - Maximum concurrent operations per Subversion host.
+
+    Public methods:
+    sync - Synchronize a list of repositories.
+
+    """
+
+    def __init__(self, max_workers=4, host_limit=None):
+        """Set the concurrency limits.
+
+        Keyword arguments:
+        max_workers - Sets the "max_workers" attribute.
+        host_limit - Sets the "host_limit" attribute. Defaults to None,
+                     which means that only max_workers applies.
+
+        """
+        self._max_workers = max_workers
+        self._host_limit = host_limit
+
+    @property
+    def max_workers(self):
+        """Number of repositories synchronized at once."""
+        return self._max_workers
+
+    @property
+    def host_limit(self):
+        """Number of repositories synchronized at once per SVN host."""
+        return self._host_limit
+
+    def sync(self, repos, **args):
+        """Synchronize all repositories and return a list of SyncResults.
+
+        Results are returned in the same order as "repos". Failures are
+        recorded in the results rather than raised.
+
+        Any additional keyword arguments provided are passed to the
+        clone/rebase methods of each repository.
+
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            mirror_errors = self._sync_mirrors(pool, repos, **args)
+            results = [None]*len(repos)
+            pending = list(enumerate(repos))
+            running = {}
+            # Host -> number of running operations.
+            host_counts = {}
+            while pending or running:
+                waiting = []
+                for index, repo in pending:
+                    host = svn_host(repo.svn_repo)
+                    if len(running) >= self.max_workers or \
+                       (self.host_limit is not None and
+                        host_counts.get(host, 0) >= self.host_limit):
+                        waiting.append((index, repo))
+                        continue
+                    future = pool.submit(
+                        self._sync_one, repo,
+                        self._mirror_error(repo, mirror_errors), **args
+                    )
+                    running[future] = (index, host)
+                    host_counts[host] = host_counts.get(host, 0) + 1
+                pending = waiting
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, host = running.pop(future)
+                    host_counts[host] -= 1
+                    results[index] = future.result()
+            return results
+
+    def _sync_mirrors(self, pool, repos, **args):
+        # Update each distinct mirror once, and return a dictionary mapping
+        # the mirrors that failed to their exceptions.
+        mirror_repos = {}
+        for repo in repos:
+            for svn_repo in _remote_svn_repos(repo):
+                key = _mirror_key(svn_repo)
+                if key is not None:
+                    mirror_repos.setdefault(key, svn_repo)
+        futures = dict((key, pool.submit(svn_repo.sync_mirror, **args))
+                       for key, svn_repo in mirror_repos.items())
+        mirror_errors = {}
+        for key, future in futures.items():
+            error = future.exception()
+            if error is not None:
+                mirror_errors[key] = error
+        return mirror_errors
+
+    def _mirror_error(self, repo, mirror_errors):
+        # Return the exception from the first failed mirror that repo
+        # fetches from, or None.
+        for svn_repo in _remote_svn_repos(repo):
+            error = mirror_errors.get(_mirror_key(svn_repo))
+            if error is not None:
+                return error
+        return None
+
+    def _sync_one(self, repo, mirror_error, **args):
+        if repo.exists():
+            action = "rebase"
+            operation = repo.rebase
+        else:
+            action = "clone"
+            operation = repo.clone
+        start_time = time.time()
+        if mirror_error is not None:
+            return SyncResult(repo, action, 0.0, mirror_error,
+                              start_time=start_time)
+        try:
+            fetch_plan = operation(sync_mirror=False, **args)
+        except Exception as e:
+            return SyncResult(repo, action, time.time()-start_time, e,
+                              start_time=start_time)
+        return SyncResult(repo, action, time.time()-start_time,
+                          fetch_plan=fetch_plan, start_time=start_time)
+
+
+def format_summary(results, elapsed=None):
+    """Return a list of lines summarizing a list of SyncResult objects.
+
+    The last line gives the elapsed wall clock time, not the sum of the
+    times of each repository, which overlap.
+
+    Arguments:
+    results - List of SyncResult objects.
+    elapsed - Total time taken, in seconds. Defaults to None, meaning the
+              time from the first start to the last end among the
+              results, or the longest result if start times are unknown.
+
+    """
+    lines = []
+    for result in results:
+        if result.succeeded:
+            status = "ok"
+        else:
+            status = "FAILED: "+str(result.error)
+        if result.fetch_plan is not None and \
+           result.fetch_plan.saved_launches > 0:
+            status += " (saved {0} fetches)".format(
+                result.fetch_plan.saved_launches
+            )
+        lines.append("{0}: {1} {2:.1f}s {3}".format(
+            result.repo.name, result.action, result.wall_time, status
+        ))
+    failures = sum(1 for result in results if not result.succeeded)
+    if elapsed is None:
+        elapsed = _elapsed(results)
+    lines.append("{0} repositories, {1} failed, {2:.1f}s elapsed".format(
+        len(results), failures, elapsed
+    ))
+    return lines
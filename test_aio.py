@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""Unit test module for aio.py"""
+
+import asyncio
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from GitSvnHack import aio
+from GitSvnHack.repository import SvnRepo, GitSvnRepo
+from GitSvnHack.runner import CommandRunner
+from GitSvnHack.test_repository import git_commit, _git_cmd_args
+
+# In Python 3.2, there is no unittest.mock, but the old mock library may be
+# installed:
+if sys.version_info[0:1] < (3,3):
+    import mock
+else:
+    import unittest.mock
+
+
+def run(coroutine):
+    """Run a coroutine to completion in a new event loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class TestRunCommand(unittest.TestCase):
+
+    """Test the _run_command coroutine."""
+
+    def setUp(self):
+        self.runner = CommandRunner()
+
+    def python_argv(self, code):
+        return [sys.executable, "-c", code]
+
+    def test_output_callback(self):
+        """Check that output lines are passed to the callback."""
+        lines = []
+        run(aio._run_command(
+            self.runner,
+            self.python_argv("import sys; print('out'); "
+                             "print('err', file=sys.stderr)"),
+            output_callback=lambda name, line: lines.append((name, line)),
+        ))
+        self.assertEqual(sorted(lines),
+                         [("stderr", "err\n"), ("stdout", "out\n")])
+        self.assertEqual(self.runner.records[0].returncode, 0)
+
+    def test_capture(self):
+        """Check that captured output is returned and its size recorded."""
+        output = run(aio._run_command(
+            self.runner, self.python_argv("print('hello')"), capture=True,
+        ))
+        self.assertEqual(output, "hello\n")
+        self.assertEqual(self.runner.records[0].output_bytes, 6)
+
+    def test_long_line(self):
+        """Check that lines longer than asyncio's default limit are read."""
+        output = run(aio._run_command(
+            self.runner, self.python_argv("print('x'*200000)"), capture=True,
+        ))
+        self.assertEqual(output, "x"*200000+"\n")
+
+    def test_failure(self):
+        """Check that failed commands raise and are recorded."""
+        with self.assertRaises(subprocess.CalledProcessError):
+            run(aio._run_command(self.runner, self.python_argv("exit(3)"),
+                                 capture=True))
+        self.assertEqual(self.runner.records[0].returncode, 3)
+
+    def test_cancel(self):
+        """Check that cancelling a command kills its process."""
+        async def cancel_soon():
+            task = asyncio.ensure_future(aio._run_command(
+                self.runner, self.python_argv("import time; time.sleep(60)"),
+                capture=True,
+            ))
+            await asyncio.sleep(0.5)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        run(cancel_soon())
+        record = self.runner.records[0]
+        self.assertNotEqual(record.returncode, 0)
+        self.assertLess(record.wall_time, 30)
+
+
+class TestAsyncGetSvnRevision(unittest.TestCase):
+
+    """Test async_get_svn_revision without Subversion.
+
+    The commits that git-svn would create are simulated with plain git.
+
+    """
+
+    def setUp(self):
+        self.repo_path = tempfile.mkdtemp()
+        svn_repo = SvnRepo(name="fake_svn", path="file:///fake",
+                           trunk_head="trunk", trunk_tags="tags/*")
+        self.repo = GitSvnRepo(name="test_repo", path=self.repo_path,
+                               svn_repo=svn_repo)
+        subprocess.check_call(["git", "init", "-q", self.repo_path],
+                              **_git_cmd_args)
+
+    def tearDown(self):
+        shutil.rmtree(self.repo_path)
+
+    def svn_commit(self, revision):
+        """Simulate a git-svn commit for a trunk revision."""
+        commit = git_commit(
+            self.repo_path,
+            "Trunk change.\n\ngit-svn-id: file:///fake/trunk@" +
+            str(revision)+" 01234567-89ab-cdef-0123-456789abcdef",
+        )
+        subprocess.check_call(
+            ["git", "update-ref", "refs/remotes/trunk", commit],
+            cwd=self.repo_path,
+            **_git_cmd_args
+        )
+        return commit
+
+    def test_async_get_svn_revision(self):
+        """Check that the trunk revision is found via the index."""
+        get_svn_revision = aio.async_get_svn_revision
+        self.assertEqual(run(get_svn_revision(self.repo, env={})), 0)
+        commit3 = self.svn_commit(3)
+        self.assertEqual(run(get_svn_revision(self.repo, env={})), 3)
+        self.svn_commit(6)
+        self.assertEqual(run(get_svn_revision(self.repo, env={})), 6)
+        self.assertEqual(self.repo.rev_index.get_commit(3), commit3)
+        self.assertEqual(self.repo.rev_index.last_revision(), 6)
+
+
+class TestAsyncRebase(unittest.TestCase):
+
+    """Test the commands run by async_rebase."""
+
+    def setUp(self):
+        svn_repo = SvnRepo(name="fake_svn", path="file:///fake",
+                           trunk_head="trunk", trunk_tags="tags/*")
+        self.repo = GitSvnRepo(name="fake", path="/path/to/fake",
+                               svn_repo=svn_repo, ignore_revs=[4])
+        self.argvs = []
+
+    async def fake_get_svn_revision(self, repo, **args):
+        return 2
+
+    async def fake_run_command(self, runner, argv, **args):
+        self.argvs.append(argv)
+        if argv[:2] == ["svn", "log"]:
+            return ('<?xml version="1.0"?>\n<log>\n'
+                    '<logentry revision="3"></logentry>\n'
+                    '<logentry revision="4"></logentry>\n'
+                    '<logentry revision="5"></logentry>\n</log>\n')
+        return ""
+
+    def test_async_rebase(self):
+        """Check that fetches are planned around ignored revisions."""
+        with mock.patch.object(aio, "_run_command", self.fake_run_command), \
+             mock.patch.object(aio, "async_get_svn_revision",
+                               self.fake_get_svn_revision):
+            plan = run(aio.async_rebase(self.repo, 6))
+        self.assertEqual(plan.windows, [(3, 3), (5, 6)])
+        self.assertEqual(self.argvs[0][:2], ["svn", "log"])
+        self.assertEqual(self.argvs[1], ["git", "svn", "fetch", "-r", "3:3"])
+        self.assertEqual(self.argvs[2], ["git", "svn", "fetch", "-r", "5:6"])
+        self.assertEqual(self.argvs[-1], ["git", "svn", "rebase", "--local"])
+
+    def test_log_cache(self):
+        """Check that a log cache plans the fetches instead of "svn log"."""
+        log_cache = mock.Mock()
+        log_cache.get_revisions.return_value = [3, 4, 5]
+        svn_repo = SvnRepo(name="fake_svn", path="file:///fake",
+                           trunk_head="trunk", trunk_tags="tags/*",
+                           log_cache=log_cache)
+        repo = GitSvnRepo(name="fake", path="/path/to/fake",
+                          svn_repo=svn_repo, ignore_revs=[4])
+        with mock.patch.object(aio, "_run_command", self.fake_run_command), \
+             mock.patch.object(aio, "async_get_svn_revision",
+                               self.fake_get_svn_revision), \
+             mock.patch.object(SvnRepo, "get_root",
+                               return_value="file:///fake"):
+            plan = run(aio.async_rebase(repo, 6))
+        self.assertEqual(plan.windows, [(3, 3), (5, 6)])
+        self.assertEqual(log_cache.update.call_args[0][0], 6)
+        self.assertNotIn(["svn", "log"], [argv[:2] for argv in self.argvs])
+
+    def test_sync_mirror(self):
+        """Check that the Subversion mirror is synchronized first."""
+        with mock.patch.object(aio, "_run_command", self.fake_run_command), \
+             mock.patch.object(aio, "async_get_svn_revision",
+                               self.fake_get_svn_revision), \
+             mock.patch.object(SvnRepo, "mirror_path", "/path/to/mirror"), \
+             mock.patch.object(SvnRepo, "get_root",
+                               return_value="file:///fake"), \
+             mock.patch.object(SvnRepo, "sync_mirror") as sync_mirror:
+            run(aio.async_rebase(self.repo, 6))
+            sync_mirror.assert_called_once_with(env=None)
+            sync_mirror.reset_mock()
+            run(aio.async_rebase(self.repo, 6, sync_mirror=False))
+            self.assertFalse(sync_mirror.called)
+
+    def test_remotes(self):
+        """Check that repositories with other remotes are rejected."""
+        remote = GitSvnRepo(name="fake", path="/path/to/fake",
+                            svn_repo=self.repo.svn_repo, remote_name="other",
+                            prefix="other/")
+        repo = GitSvnRepo(name="fake", path="/path/to/fake",
+                          svn_repo=self.repo.svn_repo, remotes=[remote])
+        with mock.patch.object(aio, "_run_command", self.fake_run_command):
+            with self.assertRaises(ValueError):
+                run(aio.async_rebase(repo))
+            with self.assertRaises(ValueError):
+                run(aio.async_clone(repo))
+        self.assertEqual(self.argvs, [])
+
+    def test_clone_base_revision(self):
+        """Check that clones can't stop before the base revision."""
+        repo = GitSvnRepo(name="fake", path="/path/to/fake",
+                          svn_repo=self.repo.svn_repo, base_revision=5)
+        with mock.patch.object(aio, "_run_command", self.fake_run_command):
+            with self.assertRaises(ValueError):
+                run(aio.async_clone(repo, 4))
+        self.assertEqual(self.argvs, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
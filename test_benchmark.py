@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Unit test module for benchmark.py"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+from GitSvnHack import benchmark
+from GitSvnHack.benchmark import BenchmarkSpec, compare_results, \
+    run_benchmark
+
+# In Python 3.2, there is no unittest.mock, but the old mock library may be
+# installed:
+if sys.version_info[0:1] < (3,3):
+    import mock
+else:
+    import unittest.mock
+
+
+def make_result(spec, clone, rebase, lookups):
+    """Build a result in the format returned by run_benchmark."""
+    return {
+        "spec": spec.to_dict(),
+        "results": dict(
+            (phase, {"wall_time": wall_time, "commands": 1,
+                     "command_time": wall_time})
+            for phase, wall_time in (("clone", clone), ("rebase", rebase),
+                                     ("get_svn_revision", lookups))
+        ),
+    }
+
+
+class TestBenchmarkSpec(unittest.TestCase):
+
+    """Test the BenchmarkSpec class."""
+
+    def test_head_revision(self):
+        """Check that directories, commits and tags are all counted."""
+        self.assertEqual(BenchmarkSpec(revisions=10, tags=3).head_revision,
+                         15)
+
+    def test_ignore_revs(self):
+        """Check that every Nth generated revision is ignored."""
+        spec = BenchmarkSpec(revisions=10, tags=0, ignore_every=4)
+        self.assertEqual(list(spec.ignore_revs), [4, 8, 12])
+        self.assertEqual(len(BenchmarkSpec().ignore_revs), 0)
+
+    def test_to_dict(self):
+        """Check that the spec survives conversion to JSON."""
+        spec = BenchmarkSpec(revisions=5, ignore_every=2)
+        spec_d = json.loads(json.dumps(spec.to_dict()))
+        self.assertEqual(BenchmarkSpec(**spec_d).to_dict(), spec.to_dict())
+
+
+class TestCompareResults(unittest.TestCase):
+
+    """Test the compare_results function."""
+
+    def test_compare_results(self):
+        """Check that each phase is compared."""
+        spec = BenchmarkSpec()
+        lines = compare_results(make_result(spec, 2.0, 1.0, 0.0),
+                                make_result(spec, 1.0, 1.5, 0.1))
+        self.assertEqual(lines, [
+            "clone: 2.00s -> 1.00s (0.50x)",
+            "rebase: 1.00s -> 1.50s (1.50x)",
+            "get_svn_revision: 0.00s -> 0.10s (n/a)",
+        ])
+
+    def test_compare_different_specs(self):
+        """Check that comparing different parameters gives a warning."""
+        lines = compare_results(
+            make_result(BenchmarkSpec(revisions=5), 1.0, 1.0, 1.0),
+            make_result(BenchmarkSpec(revisions=6), 1.0, 1.0, 1.0),
+        )
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[0].startswith("Warning"))
+
+    def test_compare_missing_phase(self):
+        """Check that phases missing from either result are skipped."""
+        spec = BenchmarkSpec()
+        new = make_result(spec, 1.0, 1.0, 1.0)
+        new["results"]["startup"] = {"wall_time": 0.5, "commands": 20,
+                                     "command_time": 0.5}
+        lines = compare_results(make_result(spec, 1.0, 1.0, 1.0), new)
+        self.assertEqual(len(lines), 3)
+
+
+class TestMain(unittest.TestCase):
+
+    """Test the command line interface."""
+
+    def setUp(self):
+        fd, self.output_path = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.output_path)
+
+    @mock.patch("GitSvnHack.benchmark.run_benchmark")
+    def test_main(self, mock_run_benchmark):
+        """Check that options set the spec and results are appended."""
+        mock_run_benchmark.side_effect = \
+            lambda spec: make_result(spec, 1.0, 1.0, 1.0)
+        arguments = ["--revisions=20", "--ignore-every", "3",
+                     "--output", self.output_path,
+                     "--compare", self.output_path]
+        benchmark.main(arguments)
+        benchmark.main(arguments)
+        spec = mock_run_benchmark.call_args[0][0]
+        self.assertEqual(spec.revisions, 20)
+        self.assertEqual(spec.ignore_every, 3)
+        self.assertEqual(spec.files, 10)
+        with open(self.output_path) as output_file:
+            self.assertEqual(len(output_file.readlines()), 2)
+
+
+class TestRunBenchmark(unittest.TestCase):
+
+    """Run a small benchmark against a real Subversion repository."""
+
+    def test_run_benchmark(self):
+        """Check that every phase is timed."""
+        spec = BenchmarkSpec(revisions=6, files=2, tags=1, ignore_every=4,
+                             rebase_revisions=3, lookups=2, startups=2)
+        result = run_benchmark(spec)
+        self.assertEqual(result["spec"], spec.to_dict())
+        self.assertGreater(result["results"]["clone"]["commands"], 0)
+        self.assertGreater(result["results"]["rebase"]["commands"], 0)
+        # The lookups should be answered from the revision index.
+        self.assertEqual(
+            result["results"]["get_svn_revision"]["commands"], 0
+        )
+        self.assertEqual(result["results"]["startup"]["commands"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Unit test module for catfile.py"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import unittest
+import unittest.mock
+
+from GitSvnHack import catfile
+from GitSvnHack.catfile import CatFile
+from GitSvnHack.repository import GitRepo
+from GitSvnHack.runner import CommandRunner
+
+
+def hash_object(repo_path, contents):
+    """Write a blob to a Git repository and return its hash."""
+    return subprocess.check_output(
+        ["git", "hash-object", "-w", "--stdin"], cwd=repo_path,
+        input=contents
+    ).decode("ascii").strip()
+
+
+class TestCatFile(unittest.TestCase):
+
+    """Test the CatFile class on a real repository."""
+
+    def setUp(self):
+        self.repo_path = tempfile.mkdtemp()
+        subprocess.check_call(["git", "init", "-q", self.repo_path])
+        self.blobs = dict(
+            (contents, hash_object(self.repo_path, contents))
+            for contents in (b"one\n", b"two\n", b"", b"x"*200000)
+        )
+        self.runner = CommandRunner()
+        self.cat_file = CatFile(self.repo_path, cache_size=2,
+                                max_cached_size=1000, runner=self.runner)
+
+    def tearDown(self):
+        self.cat_file.close()
+        shutil.rmtree(self.repo_path)
+
+    def test_read(self):
+        """Check that contents are read, including large objects."""
+        for contents, obj_hash in self.blobs.items():
+            self.assertEqual(self.cat_file.read(obj_hash),
+                             (obj_hash, "blob", contents))
+        self.assertIsNone(self.cat_file.read("0"*40))
+
+    def test_odd_names(self):
+        """Check names with spaces and newlines, then reading on."""
+        for name in ("a", "b"):
+            with open(os.path.join(self.repo_path, name), "w") as new_file:
+                new_file.write(name+"\n")
+        subprocess.check_call(["git", "add", "a", "b"], cwd=self.repo_path)
+        subprocess.check_call(
+            ["git", "-c", "user.name=Test", "-c", "user.email=test@test",
+             "commit", "-q", "-m", "Add files."], cwd=self.repo_path
+        )
+        results = self.cat_file.read_many(["HEAD:no such", "HEAD:a"])
+        self.assertIsNone(results[0])
+        self.assertEqual(results[1][2], b"a\n")
+        self.assertIsNone(self.cat_file.get_info("HEAD:no such"))
+        with self.assertRaises(ValueError):
+            self.cat_file.read_many(["HEAD:a", "HEAD:\nb"])
+        self.assertEqual(self.cat_file.read("HEAD:b")[2], b"b\n")
+        # Any error while answers are pending restarts the process.
+        with unittest.mock.patch("GitSvnHack.catfile._parse_header",
+                                 side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                self.cat_file.read_many(["HEAD:a", "HEAD:b"])
+        self.assertEqual(self.cat_file.read("HEAD:b")[2], b"b\n")
+
+    def test_get_info(self):
+        """Check that types and sizes are read."""
+        obj_hash = self.blobs[b"one\n"]
+        self.assertEqual(self.cat_file.get_infos([obj_hash, "nothing"]),
+                         [(obj_hash, "blob", 4), None])
+
+    def test_pipeline(self):
+        """Check that more requests than the pipeline depth are answered."""
+        names = list(self.blobs.values()) * catfile._pipeline_depth
+        results = self.cat_file.read_many(names)
+        self.assertEqual([result[0] for result in results], names)
+        self.assertEqual(len(self.cat_file.get_infos(names)), len(names))
+
+    def test_cache(self):
+        """Check that small objects are cached, up to cache_size."""
+        one, two = self.blobs[b"one\n"], self.blobs[b"two\n"]
+        self.cat_file.read_many([one, two, self.blobs[b"x"*200000]])
+        self.assertEqual(list(self.cat_file._cache), [one, two])
+        self.cat_file.read(one)
+        self.cat_file.read(self.blobs[b""])
+        self.assertEqual(list(self.cat_file._cache),
+                         [one, self.blobs[b""]])
+
+    def test_threads(self):
+        """Check that several threads can share a CatFile."""
+        names = list(self.blobs.values())
+        errors = []
+        def read():
+            try:
+                for i in range(20):
+                    results = self.cat_file.read_many(names)
+                    if [result[0] for result in results] != names:
+                        errors.append(results)
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=read) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_close(self):
+        """Check that closed processes are recorded and restarted."""
+        obj_hash = self.blobs[b"two\n"]
+        self.cat_file.get_info(obj_hash)
+        self.cat_file.close()
+        self.assertEqual([record.argv for record in self.runner.records],
+                         [["git", "cat-file", "--batch-check"]])
+        self.assertEqual(self.runner.records[0].returncode, 0)
+        self.assertEqual(self.cat_file.get_info(obj_hash)[2], 4)
+
+    def test_git_repo(self):
+        """Check that GitRepo objects on one path share a CatFile."""
+        repo = GitRepo(name="foo", path=self.repo_path)
+        other = GitRepo(name="bar", path=self.repo_path)
+        self.assertIs(repo.cat_file, other.cat_file)
+        cat_file = repo.cat_file
+        self.assertEqual(cat_file.read(self.blobs[b"one\n"])[2], b"one\n")
+        other.close_cat_file()
+        self.assertIsNot(repo.cat_file, cat_file)
+        repo.close_cat_file()
+
+
+if __name__ == "__main__":
+    unittest.main()
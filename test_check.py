@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""Unit test module for check.py"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from GitSvnHack.check import RepoChecker, compare_trees, \
+    format_check_results, list_git_tree, list_svn_tree, _blob_hash, \
+    _compare_contents
+from GitSvnHack.repository import GitSvnRepo, SvnRepo
+
+# In Python 3.2, there is no unittest.mock, but the old mock library may be
+# installed:
+if sys.version_info[0:1] < (3,3):
+    import mock
+else:
+    import unittest.mock
+
+
+def list_xml(url, entries):
+    """Build "svn list --xml" output from (kind, name, size, rev) tuples."""
+    return '<?xml version="1.0" encoding="UTF-8"?>\n<lists>\n' + \
+        '<list path="{0}">\n'.format(url) + \
+        "".join('<entry kind="{0}">\n<name>{1}</name>\n{2}'
+                '<commit revision="{3}">\n<author>joe</author>\n'
+                '</commit>\n</entry>\n'.format(
+                    kind, name,
+                    "<size>{0}</size>\n".format(size) if size is not None
+                    else "",
+                    revision
+                )
+                for kind, name, size, revision in entries) + \
+        "</list>\n</lists>\n"
+
+def ls_tree(entries):
+    """Build "git ls-tree -r -l -z" output from (mode, hash, size, path)."""
+    return "".join("{0} {1} {2} {3:>7}\t{4}\0".format(
+        mode, "commit" if mode == "160000" else "blob", obj_hash, size,
+        path
+    ) for mode, obj_hash, size, path in entries)
+
+
+class TestListings(unittest.TestCase):
+
+    """Test the functions that list and compare trees."""
+
+    def test_list_svn_tree(self):
+        """Check that only files are listed, from streamed lines."""
+        runner = mock.Mock()
+        xml = list_xml("svn://host/repo/trunk", [
+            ("dir", "src", None, 3),
+            ("file", "src/a.c", 12, 3),
+            ("file", "README", 0, 2),
+        ])
+        def check_lines(argv, callback, **args):
+            for line in xml.splitlines(True):
+                callback(line)
+        runner.check_lines.side_effect = check_lines
+        files = list_svn_tree(runner, "svn://host/repo/trunk", 3)
+        self.assertEqual(files, {"src/a.c": 12, "README": 0})
+        self.assertEqual(runner.check_lines.call_args[0][0],
+                         ["svn", "list", "-R", "--xml",
+                          "svn://host/repo/trunk@3"])
+
+    def test_list_git_tree(self):
+        """Check that ls-tree output is parsed, without submodules."""
+        runner = mock.Mock()
+        runner.check_output.return_value = ls_tree([
+            ("100644", "a"*40, 12, "src/a b.c"),
+            ("120000", "b"*40, 4, "link"),
+            ("160000", "c"*40, "-", "ext"),
+        ])
+        files = list_git_tree(runner, "/repo", "HEAD", stdout=None)
+        self.assertEqual(files, {
+            "src/a b.c": ("100644", "a"*40, 12),
+            "link": ("120000", "b"*40, 4),
+        })
+        runner.check_output.assert_called_once_with(
+            ["git", "ls-tree", "-r", "-l", "-z", "HEAD"],
+            cwd="/repo",
+            universal_newlines=True,
+        )
+
+    def test_compare_trees(self):
+        """Check that every kind of difference is reported."""
+        svn_files = {"same": 3, "size": 4, "svn_only": 1, "link": 9}
+        git_files = {
+            "same": ("100644", "a"*40, 3),
+            "size": ("100644", "a"*40, 5),
+            "git_only": ("100755", "a"*40, 1),
+            "link": ("120000", "a"*40, 4),
+        }
+        self.assertEqual(compare_trees(svn_files, git_files), [
+            "git_only: not in Subversion",
+            "size: 4 bytes in Subversion, 5 in Git",
+            "svn_only: not in Git",
+        ])
+
+    def test_compare_contents(self):
+        """Check that exported files are compared as Git blobs."""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(temp_dir, "a"), "wb") as a_file:
+                a_file.write(b"hello\n")
+            with open(os.path.join(temp_dir, "b"), "wb") as b_file:
+                b_file.write(b"changed\n")
+            # "git hash-object" of "hello\n".
+            hello = "ce013625030ba8dba906f756967f9e9ca394464a"
+            self.assertEqual(_blob_hash(b"hello\n"), hello)
+            self.assertEqual(_compare_contents(temp_dir, {
+                "a": ("100644", hello, 6),
+                "b": ("100644", hello, 8),
+            }, {}), ["b: contents differ"])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_compare_eol_style(self):
+        """Check that files exported with CRLF or CR are compared as LF."""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            for name, content in (("crlf", b"hello\r\n"),
+                                  ("cr", b"hello\r"),
+                                  ("none", b"hello\r\n")):
+                with open(os.path.join(temp_dir, name), "wb") as out_file:
+                    out_file.write(content)
+            hello = _blob_hash(b"hello\n")
+            self.assertEqual(_compare_contents(temp_dir, {
+                "crlf": ("100644", hello, 6),
+                "cr": ("100644", hello, 6),
+                "none": ("100644", hello, 6),
+            }, {"crlf": "CRLF", "cr": "CR", "none": "native"}),
+                ["none: contents differ"])
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+class FakeRunner:
+
+    """Stand-in for CommandRunner serving a trunk and two tags."""
+
+    def __init__(self):
+        self.svn_trees = {
+            "trunk@20": [("file", "a.c", 3, 20)],
+            "tags/1.0@10": [("file", "a.c", 2, 10)],
+            "tags/2.0@15": [("file", "a.c", 3, 15)],
+        }
+        # Files as "svn export" writes them; trunk/a.c is svn:eol-style
+        # CRLF.
+        self.exports = {
+            "trunk@20": b"ab\r\n",
+            "tags/1.0@10": b"a\n",
+        }
+        self.git_trees = {
+            "t-trunk": [("100644", _blob_hash(b"ab\n"), 3, "a.c")],
+            "t-1.0": [("100644", _blob_hash(b"a\n"), 2, "a.c")],
+            "t-2.0": [("100644", "a"*40, 4, "a.c")],
+            "t-3.0": [("100644", "a"*40, 4, "a.c")],
+        }
+        self.listed = []
+        self.exported = []
+
+    def check_output(self, argv, **args):
+        if argv[:2] == ["svn", "propget"]:
+            tree = argv[-1][len("svn://host/repo/"):]
+            if not tree.startswith("trunk@"):
+                return "<properties>\n</properties>\n"
+            return ('<properties>\n<target path="svn://host/repo/trunk/a.c">'
+                    '\n<property name="svn:eol-style">CRLF</property>\n'
+                    '</target>\n</properties>\n')
+        if argv[:2] == ["svn", "list"]:
+            return list_xml(argv[-1], [("dir", "1.0", None, 10),
+                                       ("dir", "2.0", None, 15)])
+        if argv[1] == "for-each-ref":
+            return "".join(
+                "refs/remotes/{0} t-{1}\n".format(ref, ref.split("/")[-1])
+                for ref in ("trunk", "tags/1.0", "tags/2.0", "tags/3.0",
+                            "tags/1.0@9")
+            )
+        return ls_tree(self.git_trees[argv[-1]])
+
+    def check_lines(self, argv, callback, **args):
+        tree = argv[-1][len("svn://host/repo/"):]
+        self.listed.append(tree)
+        callback(list_xml(argv[-1], self.svn_trees[tree]))
+
+    def check_call(self, argv, **args):
+        tree = argv[-2][len("svn://host/repo/"):]
+        self.exported.append(tree)
+        with open(os.path.join(argv[-1], "a.c"), "wb") as out_file:
+            out_file.write(self.exports[tree])
+
+
+class TestRepoChecker(unittest.TestCase):
+
+    """Test the RepoChecker class."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.runner = FakeRunner()
+        svn_repo = SvnRepo(name="foo", path="svn://host/repo",
+                           trunk_head="trunk", trunk_tags="tags/*")
+        self.repo = GitSvnRepo(name="foo", path=self.temp_dir,
+                               svn_repo=svn_repo, runner=self.runner)
+        self.repo.get_svn_revision = mock.Mock(return_value=20)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_check(self):
+        """Check that trunk and tags are compared, and tags matched up."""
+        results = RepoChecker(self.repo, max_workers=2).check()
+        self.assertEqual(
+            [(result.name, result.revision, result.tree, result.problems)
+             for result in results],
+            [("trunk", 20, "t-trunk", []),
+             ("1.0", 10, "t-1.0", []),
+             ("2.0", 15, "t-2.0",
+              ["a.c: 3 bytes in Subversion, 4 in Git"]),
+             ("3.0", None, "t-3.0", ["not in Subversion"])]
+        )
+        self.assertEqual(sorted(self.runner.listed),
+                         ["tags/1.0@10", "tags/2.0@15", "trunk@20"])
+
+    def test_content(self):
+        """Check that contents are compared in content mode."""
+        results = RepoChecker(self.repo, content=True).check()
+        self.assertEqual([result.problems for result in results[:2]],
+                         [[], []])
+        self.assertEqual([result.content_checked for result in results],
+                         [True, True, True, False])
+        self.assertEqual(sorted(self.runner.exported),
+                         ["tags/1.0@10", "trunk@20"])
+        self.runner.exports["tags/1.0@10"] = b"b\n"
+        results = RepoChecker(self.repo, content=True).check(
+            use_cache=False)
+        self.assertEqual(results[1].problems, ["a.c: contents differ"])
+
+    def test_cache(self):
+        """Check that verified trees are not compared again."""
+        checker = RepoChecker(self.repo, content=True)
+        checker.check()
+        self.assertTrue(os.path.exists(checker.cache_path))
+        del self.runner.listed[:]
+        results = checker.check()
+        self.assertEqual(self.runner.listed, ["tags/2.0@15"])
+        self.assertEqual([result.cached for result in results],
+                         [True, True, False, False])
+        del self.runner.listed[:]
+        checker.check(use_cache=False)
+        self.assertEqual(len(self.runner.listed), 3)
+
+    def test_sizes_not_cached(self):
+        """Check that trees whose sizes match are not saved as verified."""
+        checker = RepoChecker(self.repo)
+        results = checker.check()
+        self.assertTrue(results[0].succeeded)
+        self.assertFalse(results[0].content_checked)
+        del self.runner.listed[:]
+        results = checker.check()
+        self.assertEqual(len(self.runner.listed), 3)
+        self.assertEqual([result.cached for result in results],
+                         [False, False, False, False])
+
+    def test_error(self):
+        """Check that errors are recorded in the results."""
+        del self.runner.svn_trees["tags/1.0@10"]
+        results = RepoChecker(self.repo).check()
+        self.assertIsInstance(results[1].error, KeyError)
+        self.assertFalse(results[1].succeeded)
+        self.assertTrue(results[0].succeeded)
+
+    def test_format(self):
+        """Check the printed summary."""
+        results = RepoChecker(self.repo).check()
+        lines = format_check_results("foo", results, max_problems=0)
+        self.assertEqual(lines, [
+            "foo trunk: ok (sizes only)",
+            "foo 1.0: ok (sizes only)",
+            "foo 2.0: MISMATCH",
+            "    ... 1 more",
+            "foo 3.0: MISMATCH",
+            "    ... 1 more",
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
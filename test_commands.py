@@ -2,9 +2,17 @@
 """"Tests for the GitSvnHack.commands module."""
 
 from GitSvnHack.commands import *
+from GitSvnHack.progress import FetchProgress
+from GitSvnHack.repository import GitSvnRepo
+from GitSvnHack.revisions import RevisionSet
+from GitSvnHack.runner import get_default_runner, set_default_runner
+from GitSvnHack.test_svnlog import FakeSvnServer
 
 import os
+import shutil
+import subprocess
 import sys
+import tempfile
 import unittest
 
 # In Python 3.2, there is no unittest.mock, but the old mock library may be
@@ -50,6 +58,24 @@ class TestParsedArgs(unittest.TestCase):
         self.assertTrue(test_args.pop_any_opt_of("-b", "-n", "-z"))
         self.assertIsNone(test_args.pop_any_opt_of("-b", "-n", "-z"))
 
+    def test_pop_any_opt_of_order(self):
+        """Test that options are popped in command line order."""
+        test_args = ParsedArgs([("-n", "1"), ("-b", "2"), ("-n", "3")], [])
+        self.assertEqual(test_args.pop_any_opt_of("-b", "-n"), "1")
+        self.assertEqual(test_args.get_any_opt_of("-n", "-b"), "2")
+        self.assertEqual(test_args.pop_any_opt_of("-b", "-n"), "2")
+        self.assertEqual(test_args.pop_any_opt_of("-b", "-n"), "3")
+        self.assertIsNone(test_args.get_any_opt_of("-b", "-n"))
+
+    def test_get_string_list_after_pop(self):
+        """Check that popped options are left out, and order is kept."""
+        test_args = ParsedArgs([("-a", "1"), ("-b", ""), ("-a", "2")],
+                               ["foo", "bar"])
+        self.assertEqual(test_args.pop_any_opt_of("-a"), "1")
+        self.assertEqual(test_args.pop_arg(), "foo")
+        self.assertEqual(test_args.get_string_list(),
+                         ["-b", "-a", "2", "bar"])
+
     def test_pop_any_opt_of_string(self):
         """Test popping a string argument from the option list."""
         test_args = ParsedArgs([("-s", "foo")], [])
@@ -136,8 +162,8 @@ class TestInit(unittest.TestCase):
 
     """Test the init command."""
 
-    @mock.patch('GitSvnHack.commands.GitSvnRepo')
-    @mock.patch('GitSvnHack.commands.SvnRepo')
+    @mock.patch('GitSvnHack.repository.GitSvnRepo')
+    @mock.patch('GitSvnHack.repository.SvnRepo')
     def test_init(self, mock_SvnRepo, mock_GitSvnRepo):
         """Test basic functionality of the init command.
 
@@ -162,14 +188,15 @@ class TestInit(unittest.TestCase):
             name="foo_name",
             path="git_foo",
             svn_repo=mock_SvnRepo.return_value,
-            ignore_revs=[22],
+            ignore_revs=RevisionSet([22]),
+            base_revision=None,
         )
         mock_GitSvnRepo.return_value.init.assert_called_once_with(
             git_args=["--username", "joe"],
         )
 
-    @mock.patch('GitSvnHack.commands.GitSvnRepo')
-    @mock.patch('GitSvnHack.commands.SvnRepo')
+    @mock.patch('GitSvnHack.repository.GitSvnRepo')
+    @mock.patch('GitSvnHack.repository.SvnRepo')
     def test_init_minimal(self, mock_SvnRepo, mock_GitSvnRepo):
         """Test init command with minimal arguments.
 
@@ -190,19 +217,38 @@ class TestInit(unittest.TestCase):
             name="unknown",
             path=os.getcwd(),
             svn_repo=mock_SvnRepo.return_value,
-            ignore_revs=[],
+            ignore_revs=RevisionSet(),
+            base_revision=None,
         )
         mock_GitSvnRepo.return_value.init.assert_called_once_with(
             git_args=["-s"],
         )
 
 
+    @mock.patch('GitSvnHack.repository.GitSvnRepo')
+    @mock.patch('GitSvnHack.repository.SvnRepo')
+    def test_init_ignore_revs_ranges(self, mock_SvnRepo, mock_GitSvnRepo):
+        """Test that --ignore-revs accepts ranges and repeated options."""
+        args = [
+            "file://foo", "-s",
+            "--ignore-revs", "4,1200-4800", "--ignore-revs", "9",
+        ]
+        init(args)
+        mock_GitSvnRepo.assert_called_once_with(
+            name="unknown",
+            path=os.getcwd(),
+            svn_repo=mock_SvnRepo.return_value,
+            ignore_revs=RevisionSet.from_string("4,9,1200-4800"),
+            base_revision=None,
+        )
+
+
 class TestClone(unittest.TestCase):
 
     """Test the clone command."""
 
-    @mock.patch('GitSvnHack.commands.GitSvnRepo')
-    @mock.patch('GitSvnHack.commands.SvnRepo')
+    @mock.patch('GitSvnHack.repository.GitSvnRepo')
+    @mock.patch('GitSvnHack.repository.SvnRepo')
     def test_clone(self, mock_SvnRepo, mock_GitSvnRepo):
         """Test basic functionality of the clone command.
 
@@ -227,15 +273,19 @@ class TestClone(unittest.TestCase):
             name="foo_name",
             path="git_foo",
             svn_repo=mock_SvnRepo.return_value,
-            ignore_revs=[22],
+            ignore_revs=RevisionSet([22]),
+            base_revision=None,
         )
         mock_GitSvnRepo.return_value.clone.assert_called_once_with(
             revision=25,
             git_args=["--username", "joe"],
+            fetch_args=[],
+            chunk_size=None,
+            progress=None,
         )
 
-    @mock.patch('GitSvnHack.commands.GitSvnRepo')
-    @mock.patch('GitSvnHack.commands.SvnRepo')
+    @mock.patch('GitSvnHack.repository.GitSvnRepo')
+    @mock.patch('GitSvnHack.repository.SvnRepo')
     def test_clone_minimal(self, mock_SvnRepo, mock_GitSvnRepo):
         """Test clone command with minimal arguments.
 
@@ -256,12 +306,333 @@ class TestClone(unittest.TestCase):
             name="unknown",
             path="foo",
             svn_repo=mock_SvnRepo.return_value,
-            ignore_revs=[],
+            ignore_revs=RevisionSet(),
+            base_revision=None,
         )
         mock_GitSvnRepo.return_value.clone.assert_called_once_with(
             revision=None,
             git_args=["-s"],
+            fetch_args=[],
+            chunk_size=None,
+            progress=None,
+        )
+
+
+    @mock.patch('GitSvnHack.repository.GitSvnRepo')
+    @mock.patch('GitSvnHack.repository.SvnRepo')
+    def test_clone_chunk_size(self, mock_SvnRepo, mock_GitSvnRepo):
+        """Test that --chunk-size is passed to GitSvnRepo.clone."""
+        args = [
+            "file://foo", "-s", "--chunk-size", "1000",
+        ]
+        clone(args)
+        mock_GitSvnRepo.return_value.clone.assert_called_once_with(
+            revision=None,
+            git_args=["-s"],
+            fetch_args=[],
+            chunk_size=1000,
+            progress=None,
+        )
+
+    @mock.patch('GitSvnHack.repository.GitSvnRepo')
+    @mock.patch('GitSvnHack.repository.SvnRepo')
+    def test_clone_fetch_args(self, mock_SvnRepo, mock_GitSvnRepo):
+        """Test that options only fetching accepts are kept apart."""
+        clone(["file://foo", "-s", "-A", "authors.txt", "--use-log-author",
+               "--username", "joe", "--chunk-size", "10"])
+        clone_args = mock_GitSvnRepo.return_value.clone.call_args[1]
+        self.assertEqual(clone_args["git_args"], ["-s", "--username", "joe"])
+        self.assertEqual(clone_args["fetch_args"],
+                         ["-A", "authors.txt", "--use-log-author"])
+
+    @mock.patch('GitSvnHack.repository.GitSvnRepo')
+    @mock.patch('GitSvnHack.repository.SvnRepo')
+    def test_clone_progress(self, mock_SvnRepo, mock_GitSvnRepo):
+        """Test that --progress passes a FetchProgress to clone."""
+        clone(["file://foo", "-s", "--progress"])
+        clone_args = mock_GitSvnRepo.return_value.clone.call_args[1]
+        self.assertIsInstance(clone_args["progress"], FetchProgress)
+        self.assertEqual(clone_args["git_args"], ["-s"])
+
+    @mock.patch('GitSvnHack.repository.GitSvnRepo')
+    @mock.patch('GitSvnHack.repository.SvnRepo')
+    def test_clone_since_rev(self, mock_SvnRepo, mock_GitSvnRepo):
+        """Test that --since-rev sets the base revision, by number or tag."""
+        clone(["file://foo", "-s", "--since-rev", "120"])
+        self.assertEqual(mock_GitSvnRepo.call_args[1]["base_revision"], 120)
+        mock_SvnRepo.return_value.get_tag_revision.return_value = 95
+        clone(["file://foo", "-s", "--since-rev=v1.0"])
+        mock_SvnRepo.return_value.get_tag_revision.assert_called_once_with(
+            "v1.0"
+        )
+        self.assertEqual(mock_GitSvnRepo.call_args[1]["base_revision"], 95)
+        self.assertEqual(mock_GitSvnRepo.return_value.clone.call_args[1]
+                         ["git_args"], ["-s"])
+
+    @mock.patch('GitSvnHack.repository.GitSvnRepo')
+    @mock.patch('GitSvnHack.repository.SvnRepo')
+    def test_clone_last(self, mock_SvnRepo, mock_GitSvnRepo):
+        """Test that --last N keeps the last N revisions."""
+        mock_SvnRepo.return_value.get_current_revision.return_value = 500
+        clone(["file://foo", "-s", "--last", "100"])
+        self.assertEqual(mock_GitSvnRepo.call_args[1]["base_revision"], 401)
+        clone(["file://foo", "-s", "--last", "1000"])
+        self.assertEqual(mock_GitSvnRepo.call_args[1]["base_revision"], 1)
+
+
+class TestSyncAll(unittest.TestCase):
+
+    """Test the sync-all command."""
+
+    @mock.patch('GitSvnHack.sync.RepoSyncer')
+    @mock.patch('GitSvnHack.parsedef.GitSvnDefParser')
+    def test_sync_all(self, mock_DefParser, mock_RepoSyncer):
+        """Test that sync-all syncs every repo in the definition file."""
+        mock_result = mock.Mock()
+        mock_result.succeeded = True
+        mock_result.wall_time = 1.0
+        mock_result.fetch_plan = None
+        mock_RepoSyncer.return_value.sync.return_value = [mock_result]
+        args = ["-j", "8", "--host-limit", "2", "defs.cfg"]
+        with mock.patch('GitSvnHack.commands.print'):
+            sync_all(args)
+        mock_DefParser.return_value.read.assert_called_once_with(
+            "defs.cfg"
         )
+        mock_RepoSyncer.assert_called_once_with(
+            max_workers=8,
+            host_limit=2,
+        )
+        mock_RepoSyncer.return_value.sync.assert_called_once_with(
+            mock_DefParser.return_value.get_repos.return_value,
+        )
+
+    @mock.patch('GitSvnHack.sync.RepoSyncer')
+    @mock.patch('GitSvnHack.parsedef.GitSvnDefParser')
+    def test_sync_all_failure(self, mock_DefParser, mock_RepoSyncer):
+        """Test that sync-all exits with an error if a repo failed."""
+        mock_result = mock.Mock()
+        mock_result.succeeded = False
+        mock_result.wall_time = 1.0
+        mock_result.fetch_plan = None
+        mock_RepoSyncer.return_value.sync.return_value = [mock_result]
+        with mock.patch('GitSvnHack.commands.print'):
+            with self.assertRaises(SystemExit):
+                sync_all(["defs.cfg"])
+
+
+class TestWatch(unittest.TestCase):
+
+    """Test the watch command."""
+
+    @mock.patch('GitSvnHack.daemon.SyncDaemon')
+    @mock.patch('GitSvnHack.sync.RepoSyncer')
+    @mock.patch('GitSvnHack.parsedef.GitSvnDefParser')
+    def test_watch(self, mock_DefParser, mock_RepoSyncer, mock_SyncDaemon):
+        """Test that watch runs a daemon over the definition file."""
+        mock_SyncDaemon.return_value.run.side_effect = KeyboardInterrupt
+        watch(["-j", "2", "--interval", "30", "--state", "state.json",
+               "defs.cfg"])
+        mock_DefParser.return_value.read.assert_called_once_with(
+            "defs.cfg"
+        )
+        mock_RepoSyncer.assert_called_once_with(
+            max_workers=2,
+            host_limit=None,
+        )
+        mock_SyncDaemon.assert_called_once_with(
+            mock_DefParser.return_value.get_repos.return_value,
+            interval=30,
+            max_backoff=3600,
+            syncer=mock_RepoSyncer.return_value,
+            state_path="state.json",
+        )
+        self.assertEqual(mock_SyncDaemon.return_value.run.call_count, 1)
+
+
+class TestCheck(unittest.TestCase):
+
+    """Test the check command."""
+
+    def make_repos(self, mock_DefParser, *names):
+        repos = []
+        for name in names:
+            repo = mock.Mock()
+            repo.name = name
+            repos.append(repo)
+        mock_DefParser.return_value.get_repos.return_value = repos
+        return repos
+
+    @mock.patch('GitSvnHack.check.RepoChecker')
+    @mock.patch('GitSvnHack.parsedef.GitSvnDefParser')
+    def test_check(self, mock_DefParser, mock_RepoChecker):
+        """Test that check only checks the named repos."""
+        repos = self.make_repos(mock_DefParser, "foo", "bar", "baz")
+        mock_RepoChecker.return_value.check.return_value = []
+        with mock.patch('GitSvnHack.commands.print'):
+            check(["-j", "2", "--recheck", "defs.cfg", "foo", "baz"])
+        mock_DefParser.return_value.read.assert_called_once_with(
+            "defs.cfg"
+        )
+        self.assertEqual(
+            mock_RepoChecker.call_args_list,
+            [mock.call(repo, max_workers=2, content=False)
+             for repo in (repos[0], repos[2])]
+        )
+        mock_RepoChecker.return_value.check.assert_called_with(
+            use_cache=False
+        )
+
+    @mock.patch('GitSvnHack.check.RepoChecker')
+    @mock.patch('GitSvnHack.parsedef.GitSvnDefParser')
+    def test_check_mismatch(self, mock_DefParser, mock_RepoChecker):
+        """Test that check exits with an error if a tree differs."""
+        self.make_repos(mock_DefParser, "foo")
+        mock_result = mock.Mock()
+        mock_result.name = "1.0"
+        mock_result.succeeded = False
+        mock_result.error = None
+        mock_result.problems = ["a.txt: not in Git"]
+        mock_RepoChecker.return_value.check.return_value = [mock_result]
+        with mock.patch('GitSvnHack.commands.print'):
+            with self.assertRaises(SystemExit):
+                check(["--content", "defs.cfg"])
+        self.assertTrue(mock_RepoChecker.call_args[1]["content"])
+
+
+class TestSuggestIgnoreRevs(unittest.TestCase):
+
+    """Test the suggest-ignore-revs command."""
+
+    @mock.patch('GitSvnHack.ignorescan.IgnoreRevsScanner')
+    @mock.patch('GitSvnHack.parsedef.GitSvnDefParser')
+    def test_suggest_ignore_revs(self, mock_DefParser, mock_Scanner):
+        """Test that suggestions are only written with --write."""
+        repos = []
+        for name in ("foo", "bar"):
+            repo = mock.Mock()
+            repo.name = name
+            repos.append(repo)
+        mock_def_parser = mock_DefParser.return_value
+        mock_def_parser.get_repos.return_value = repos
+        mock_scan = mock_Scanner.return_value.scan
+        with mock.patch('GitSvnHack.ignorescan.format_suggestions',
+                        return_value=[]):
+            suggest_ignore_revs(["--max-paths", "500", "--pattern", "*.iso",
+                                 "--pattern", "*.zip", "defs.cfg", "bar"])
+            self.assertFalse(mock_def_parser.update_ignore_revs.called)
+            suggest_ignore_revs(["--write", "defs.cfg"])
+        self.assertEqual(mock_Scanner.call_args_list, [
+            mock.call(max_paths=500, path_patterns=["*.iso", "*.zip"]),
+            mock.call(max_paths=None, path_patterns=[]),
+        ])
+        self.assertEqual(mock_scan.call_args_list,
+                         [mock.call(repos[1]), mock.call(repos[0]),
+                          mock.call(repos[1])])
+        mock_def_parser.update_ignore_revs.assert_called_once_with(
+            "defs.cfg", [mock_scan.return_value.merged_repo.return_value]*2
+        )
+
+
+class TestUnclonedRepo(unittest.TestCase):
+
+    """Test commands on a defined repo that hasn't been cloned yet."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.repo_path = os.path.join(self.temp_dir, "foo")
+        self.def_path = os.path.join(self.temp_dir, "defs.cfg")
+        with open(self.def_path, "w") as def_file:
+            def_file.write("[foo]\n"
+                           "path = "+self.repo_path+"\n"
+                           "svn_url = svn://host/repo/proj\n"
+                           "svn_trunk = trunk,tags/*\n")
+        self.server = FakeSvnServer()
+        self.server.commit("joe", ("A", "dir", "/proj/trunk"))
+        self.server.commit("bob", ("M", "file", "/other/b.c"))
+        self.old_runner = get_default_runner()
+        set_default_runner(self.server)
+
+    def tearDown(self):
+        set_default_runner(self.old_runner)
+        shutil.rmtree(self.temp_dir)
+
+    def test_suggest_then_sync(self):
+        """Test that suggest-ignore-revs leaves the repo to be cloned."""
+        with mock.patch('GitSvnHack.commands.print'):
+            suggest_ignore_revs([self.def_path])
+        self.assertEqual(self.server.logs, [(1, 2)])
+        self.assertFalse(os.path.exists(self.repo_path))
+        with mock.patch.object(GitSvnRepo, "clone",
+                               return_value=None) as clone, \
+             mock.patch.object(GitSvnRepo, "rebase") as rebase, \
+             mock.patch('GitSvnHack.commands.print'):
+            sync_all([self.def_path])
+        self.assertEqual(clone.call_count, 1)
+        self.assertFalse(rebase.called)
+
+
+class TestMain(unittest.TestCase):
+
+    """Test the main dispatch function."""
+
+    def test_main_dispatch(self):
+        """Test that wrapped commands are dispatched by name."""
+        mock_clone = mock.Mock()
+        with mock.patch.dict('GitSvnHack.commands._commands',
+                             {"clone": mock_clone}):
+            main(["clone", "file://foo", "-s"])
+        mock_clone.assert_called_once_with(["file://foo", "-s"])
+
+    @mock.patch('os.execvp')
+    def test_main_default(self, mock_exec):
+        """Test that other commands are passed to git svn."""
+        main(["--version"])
+        mock_exec.assert_called_once_with("git", ["git", "svn", "--version"])
+
+    @mock.patch('os.execvp')
+    def test_main_no_args(self, mock_exec):
+        """Test that no arguments runs git svn alone."""
+        main([])
+        mock_exec.assert_called_once_with("git", ["git", "svn"])
+
+    @mock.patch('GitSvnHack.runner.set_default_runner')
+    @mock.patch('GitSvnHack.runner.CommandRunner')
+    def test_main_profile(self, mock_CommandRunner, mock_set_runner):
+        """Test that --profile and --trace install a CommandRunner."""
+        mock_CommandRunner.return_value.summary.return_value = ["summary"]
+        mock_init = mock.Mock()
+        with mock.patch.dict('GitSvnHack.commands._commands',
+                             {"init": mock_init}):
+            with mock.patch('GitSvnHack.commands.print') as mock_print:
+                main(["--profile=5", "--trace", "trace.json",
+                      "init", "file://foo"])
+        mock_CommandRunner.assert_called_once_with(trace_path="trace.json",
+                                                   max_records=None)
+        mock_set_runner.assert_called_once_with(
+            mock_CommandRunner.return_value
+        )
+        mock_init.assert_called_once_with(["file://foo"])
+        mock_CommandRunner.return_value.summary.assert_called_once_with(5)
+        mock_print.assert_called_once_with("summary", file=sys.stderr)
+
+
+    @mock.patch('os.execvp')
+    @mock.patch('GitSvnHack.runner.set_default_runner')
+    @mock.patch('GitSvnHack.runner.CommandRunner')
+    def test_main_trace_default(self, mock_CommandRunner, mock_set_runner,
+                                mock_exec):
+        """Test that traced git svn commands run as child processes."""
+        mock_runner = mock_CommandRunner.return_value
+        mock_runner.check_call.side_effect = \
+            subprocess.CalledProcessError(2, ["git", "svn", "log"])
+        with self.assertRaises(SystemExit) as cm:
+            main(["--trace=trace.json", "log"])
+        self.assertEqual(cm.exception.code, 2)
+        mock_CommandRunner.assert_called_once_with(trace_path="trace.json",
+                                                   max_records=0)
+        mock_runner.check_call.assert_called_once_with(["git", "svn", "log"])
+        self.assertFalse(mock_exec.called)
 
 
 class TestDefault(unittest.TestCase):
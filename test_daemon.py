@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""Unit test module for daemon.py"""
+
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from GitSvnHack.daemon import SyncDaemon
+from GitSvnHack.repository import SvnRepo
+from GitSvnHack.svninfo import SvnInfo
+from GitSvnHack.sync import SyncResult
+
+
+class FakeGitSvnRepo:
+
+    """Stand-in for GitSvnRepo with a fixed fetched revision."""
+
+    def __init__(self, name, path, svn_url, svn_revision=0):
+        self.name = name
+        self.path = path
+        self.svn_repo = SvnRepo(name="svn_"+name, path=svn_url,
+                                trunk_head="trunk", trunk_tags="tags/*")
+        self.svn_revision = svn_revision
+
+    def exists(self):
+        return os.path.isdir(self.path)
+
+    def get_svn_revision(self, **args):
+        return self.svn_revision
+
+
+class FakeInfoCache:
+
+    """Stand-in for SvnInfoCache returning set last changed revisions."""
+
+    def __init__(self):
+        self.revisions = {}
+        self.queries = []
+        self.fail_hosts = set()
+
+    def query(self, urls, **args):
+        self.queries.append(list(urls))
+        for url in urls:
+            if url.split("/")[2] in self.fail_hosts:
+                raise subprocess.CalledProcessError(1, ["svn"])
+        return dict((url, SvnInfo(url, url, "uuid", 100,
+                                  self.revisions[url]))
+                    for url in urls if url in self.revisions)
+
+
+class FakeSyncer:
+
+    """Stand-in for RepoSyncer that records which repos were synced."""
+
+    def __init__(self):
+        self.synced = []
+        self.fail = set()
+
+    def sync(self, repos, **args):
+        self.synced.append([repo.name for repo in repos])
+        return [SyncResult(repo, "rebase", 0.1,
+                           RuntimeError("oops") if repo.name in self.fail
+                           else None)
+                for repo in repos]
+
+
+class TestSyncDaemon(unittest.TestCase):
+
+    """Test the SyncDaemon class."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.now = 1000.0
+        self.info_cache = FakeInfoCache()
+        self.syncer = FakeSyncer()
+        self.repos = []
+        for name, host, svn_revision in (("foo", "a", 10), ("bar", "a", 7),
+                                         ("baz", "b", 3)):
+            path = os.path.join(self.temp_dir, name)
+            os.mkdir(path)
+            url = "svn://"+host+"/"+name
+            self.repos.append(FakeGitSvnRepo(name, path, url, svn_revision))
+            self.info_cache.revisions[url] = svn_revision
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def make_daemon(self, **args):
+        return SyncDaemon(self.repos, interval=10, max_backoff=35,
+                          syncer=self.syncer, info_cache=self.info_cache,
+                          clock=lambda: self.now, **args)
+
+    def test_no_changes(self):
+        """Check that up-to-date repos are not synced."""
+        daemon = self.make_daemon()
+        self.assertEqual(daemon.poll_once(), [])
+        self.assertEqual(self.syncer.synced, [])
+
+    def test_one_query_per_host(self):
+        """Check that each server gets a single query."""
+        self.make_daemon().poll_once()
+        self.assertEqual(sorted(self.info_cache.queries),
+                         [["svn://a/foo", "svn://a/bar"], ["svn://b/baz"]])
+
+    def test_changed(self):
+        """Check that only changed repos are synced, once per change."""
+        daemon = self.make_daemon()
+        self.info_cache.revisions["svn://a/bar"] = 12
+        results = daemon.poll_once()
+        self.assertEqual(self.syncer.synced, [["bar"]])
+        self.assertEqual(results[0].repo.name, "bar")
+        daemon.poll_once()
+        self.assertEqual(self.syncer.synced, [["bar"]])
+
+    def test_missing_repo(self):
+        """Check that repos that were never cloned are synced."""
+        shutil.rmtree(self.repos[2].path)
+        self.make_daemon().poll_once()
+        self.assertEqual(self.syncer.synced, [["baz"]])
+
+    def test_repo_backoff(self):
+        """Check that failed syncs are retried with growing delays."""
+        daemon = self.make_daemon()
+        self.info_cache.revisions["svn://a/foo"] = 20
+        self.syncer.fail.add("foo")
+        retries = []
+        for i in range(80):
+            if daemon.poll_once():
+                retries.append(self.now)
+            self.now += 1
+        # Delays of 10, 20, then 35 seconds.
+        self.assertEqual([t - 1000.0 for t in retries],
+                         [0, 10, 30, 65])
+
+    def test_host_backoff(self):
+        """Check that a failing server is skipped for a while."""
+        daemon = self.make_daemon()
+        self.info_cache.fail_hosts.add("a")
+        daemon.poll_once()
+        self.assertEqual(len(self.info_cache.queries), 2)
+        self.now += 5
+        daemon.poll_once()
+        self.assertEqual(self.info_cache.queries[-1], ["svn://b/baz"])
+        self.now += 10
+        self.info_cache.fail_hosts.clear()
+        self.info_cache.revisions["svn://a/foo"] = 11
+        daemon.poll_once()
+        self.assertEqual(self.syncer.synced, [["foo"]])
+
+    def test_state(self):
+        """Check that last seen revisions survive a restart."""
+        state_path = os.path.join(self.temp_dir, "state.json")
+        self.info_cache.revisions["svn://a/foo"] = 20
+        self.make_daemon(state_path=state_path).poll_once()
+        with open(state_path) as state_file:
+            self.assertEqual(json.load(state_file), {"foo": 20})
+        self.make_daemon(state_path=state_path).poll_once()
+        self.assertEqual(self.syncer.synced, [["foo"]])
+
+    def test_run(self):
+        """Check that run polls, sleeps and reports results."""
+        sleeps = []
+        reports = []
+        daemon = SyncDaemon(self.repos, interval=10, syncer=self.syncer,
+                            info_cache=self.info_cache,
+                            sleep=sleeps.append)
+        self.info_cache.revisions["svn://b/baz"] = 5
+        daemon.run(iterations=3, result_callback=reports.append)
+        self.assertEqual(sleeps, [10, 10])
+        self.assertEqual(len(reports), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
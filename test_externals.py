@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""Unit test module for externals.py"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from GitSvnHack.externals import ExternalsCache, SvnExternal, \
+    parse_externals
+from GitSvnHack.svninfo import SvnInfo
+from GitSvnHack.test_svnprops import log_xml, propget_xml
+
+# In Python 3.2, there is no unittest.mock, but the old mock library may be
+# installed:
+if sys.version_info[0:1] < (3,3):
+    import mock
+else:
+    import unittest.mock
+
+
+_root = "svn://host/repo"
+_trunk = _root+"/trunk"
+
+
+class TestParseExternals(unittest.TestCase):
+
+    """Test the parse_externals function."""
+
+    def parse(self, value, owner=_trunk+"/sub"):
+        return [external.to_dict()
+                for external in parse_externals(owner, value, _root)]
+
+    def test_new_format(self):
+        """Check definitions with the URL first."""
+        externals = self.parse(
+            "# Comment\n"
+            "-r 10 svn://other/lib@8 lib\n"
+            "\n"
+            "-r12 http://example.com/x 'local dir'\n"
+        )
+        self.assertEqual(externals, [
+            {"owner": _trunk+"/sub", "local_path": "lib",
+             "url": "svn://other/lib", "revision": 10, "peg_revision": 8},
+            {"owner": _trunk+"/sub", "local_path": "local dir",
+             "url": "http://example.com/x", "revision": 12,
+             "peg_revision": None},
+        ])
+
+    def test_old_format(self):
+        """Check definitions with the local path first."""
+        externals = self.parse("lib -r 3 svn://other/lib\nx svn://o/x")
+        self.assertEqual(
+            [(e["local_path"], e["url"], e["revision"]) for e in externals],
+            [("lib", "svn://other/lib", 3), ("x", "svn://o/x", None)]
+        )
+
+    def test_relative_urls(self):
+        """Check that relative URLs are made absolute."""
+        externals = self.parse(
+            "^/lib a\n"
+            "^/../other/lib b\n"
+            "../lib c\n"
+            "//mirror/repo/lib d\n"
+            "/repo/tags/1.0 e\n"
+        )
+        self.assertEqual([e["url"] for e in externals], [
+            _root+"/lib",
+            "svn://host/other/lib",
+            _trunk+"/lib",
+            "svn://mirror/repo/lib",
+            _root+"/tags/1.0",
+        ])
+
+    def test_unpinned(self):
+        """Check that non-numeric revisions leave externals unpinned."""
+        externals = parse_externals(_trunk, "-r HEAD ^/lib lib", _root)
+        self.assertIsNone(externals[0].operative_revision)
+        externals = parse_externals(_trunk, "^/lib@7 lib", _root)
+        self.assertEqual(externals[0].operative_revision, 7)
+
+    def test_invalid(self):
+        """Check that ValueError is raised for invalid definitions."""
+        with self.assertRaises(ValueError):
+            parse_externals(_trunk, "^/lib", _root)
+
+    def test_dict_round_trip(self):
+        """Check conversion to and from dictionaries."""
+        external = SvnExternal(_trunk, "lib", _root+"/lib", 5, 4)
+        new_external = SvnExternal.from_dict(external.to_dict())
+        self.assertEqual(new_external.to_dict(), external.to_dict())
+
+
+class FakeSvn:
+
+    """Stand-in for the svn commands used by ExternalsCache.
+
+    Public instance variables:
+    trees - Dictionary mapping revisions to {owner URL: value}
+            dictionaries, giving svn:externals for the whole repository.
+    logs - Dictionary mapping revisions to lists of changed paths.
+    calls - List of the svn command lines run.
+
+    """
+
+    def __init__(self):
+        self.trees = {}
+        self.logs = {}
+        self.calls = []
+
+    def check_output(self, argv, **args):
+        self.calls.append(argv)
+        target, sep, revision = argv[-1].rpartition("@")
+        revision = int(revision)
+        if argv[1] == "propget":
+            recursive = "-R" in argv
+            return propget_xml(dict(
+                (owner, value)
+                for owner, value in self.trees[revision].items()
+                if owner == target or
+                (recursive and owner.startswith(target+"/"))
+            ))
+        first, last = [int(r) for r in argv[argv.index("-r")+1].split(":")]
+        return log_xml(*[(r, self.logs.get(r, []))
+                         for r in range(first, last+1)])
+
+
+class TestExternalsCache(unittest.TestCase):
+
+    """Test the ExternalsCache class."""
+
+    def setUp(self):
+        self.svn = FakeSvn()
+        self.info_cache = mock.Mock()
+        self.info_cache.query.side_effect = lambda urls, **args: dict(
+            (url, SvnInfo(url, _root, "uuid-1", 100, 90)) for url in urls
+        )
+        self.info_cache.get_revision.return_value = 50
+        self.cache = ExternalsCache(runner=self.svn,
+                                    info_cache=self.info_cache)
+        self.svn.trees[10] = {
+            _trunk: "^/libs/a a",
+            _trunk+"/sub": "^/libs/b b",
+            _trunk+"/old": "^/libs/c c",
+        }
+
+    def get_urls(self, revision, url=_trunk):
+        return [external.url
+                for external in self.cache.get_externals(url, revision)]
+
+    def test_get_externals(self):
+        """Check that a tree is read with one process, and cached."""
+        self.assertEqual(self.get_urls(10), [
+            _root+"/libs/a", _root+"/libs/c", _root+"/libs/b",
+        ])
+        self.assertEqual(self.get_urls(10), [
+            _root+"/libs/a", _root+"/libs/c", _root+"/libs/b",
+        ])
+        self.assertEqual(self.svn.calls, [
+            ["svn", "propget", "--xml", "svn:externals", "-R",
+             _trunk+"@10"],
+        ])
+
+    def test_incremental(self):
+        """Check that only changed directories are read again."""
+        self.get_urls(10)
+        self.svn.trees[12] = {
+            _trunk: "^/libs/a a",
+            _trunk+"/sub": "^/libs/b2 b",
+            _trunk+"/new": "^/libs/d d",
+            _trunk+"/new/deep": "^/libs/e e",
+            _root+"/branches/x": "^/libs/f f",
+        }
+        self.svn.logs[11] = [("D", "dir", "/trunk/old"),
+                             ("A", "dir", "/trunk/new"),
+                             ("A", "dir", "/trunk/new/deep")]
+        self.svn.logs[12] = [("M", "dir", "/trunk/sub"),
+                             ("M", "file", "/trunk/file.c"),
+                             ("A", "dir", "/branches/x")]
+        del self.svn.calls[:]
+        self.assertEqual(self.get_urls(12), [
+            _root+"/libs/a", _root+"/libs/d", _root+"/libs/e",
+            _root+"/libs/b2",
+        ])
+        self.assertEqual(self.svn.calls, [
+            ["svn", "log", "-v", "--xml", "-r", "11:12", _trunk+"@12"],
+            ["svn", "propget", "--xml", "svn:externals", "-R",
+             _trunk+"/new@12"],
+            ["svn", "propget", "--xml", "svn:externals", _trunk+"/sub@12"],
+        ])
+
+    def test_parent_copied(self):
+        """Check that the tree is read again if a parent was replaced."""
+        self.get_urls(10, url=_trunk+"/sub")
+        self.svn.trees[11] = {_trunk+"/sub": "^/libs/x x"}
+        self.svn.logs[11] = [("R", "dir", "/trunk")]
+        self.assertEqual(self.get_urls(11, url=_trunk+"/sub"),
+                         [_root+"/libs/x"])
+        self.assertEqual(self.svn.calls[-1],
+                         ["svn", "propget", "--xml", "svn:externals", "-R",
+                          _trunk+"/sub@11"])
+
+    def test_get_graph(self):
+        """Check that externals of externals are followed."""
+        self.svn.trees[10] = {
+            _trunk: "^/libs/a a\n-r 7 ^/libs/b b\nsvn://other/c c",
+            _root+"/libs/a": "^/libs/b@7 b",
+        }
+        self.svn.trees[7] = {}
+        self.svn.trees[50] = {}
+        graph = self.cache.get_graph(_trunk, 10)
+        self.assertEqual(
+            dict((node, [(external.local_path, target)
+                         for external, target in edges])
+                 for node, edges in graph.items()),
+            {
+                (_trunk, 10): [("a", (_root+"/libs/a", 10)),
+                               ("b", (_root+"/libs/b", 7)),
+                               ("c", ("svn://other/c", 50))],
+                (_root+"/libs/a", 10): [("b", (_root+"/libs/b", 7))],
+                (_root+"/libs/b", 7): [],
+                ("svn://other/c", 50): [],
+            }
+        )
+
+    def test_deleted_owner(self):
+        """Check that owners are not looked up, as they may be gone."""
+        self.info_cache.query.side_effect = lambda urls, **args: dict(
+            (url, SvnInfo(url, _root, "uuid-1", 100, 90))
+            for url in urls if url == _trunk
+        )
+        self.svn.trees[10] = {_trunk+"/old": "^/libs/c c"}
+        self.svn.trees[50] = {}
+        graph = self.cache.get_graph(_trunk, 10)
+        self.assertEqual([target for external, target in graph[(_trunk, 10)]],
+                         [(_root+"/libs/c", 10)])
+        for call in self.info_cache.query.call_args_list:
+            self.assertEqual(call[0][0], [_trunk])
+
+    def test_persist(self):
+        """Check that the cache is saved to and loaded from disk."""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            cache_path = os.path.join(temp_dir, "externals.json")
+            ExternalsCache(path=cache_path, runner=self.svn,
+                           info_cache=self.info_cache).get_externals(
+                               _trunk, 10)
+            cache = ExternalsCache(path=cache_path, runner=self.svn,
+                                   info_cache=self.info_cache)
+            self.assertEqual(len(cache.get_externals(_trunk, 10)), 3)
+            self.assertEqual(len(self.svn.calls), 1)
+            cache.invalidate()
+            self.assertFalse(os.path.exists(cache_path))
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Unit test module for fixtures.py"""
+
+import io
+import re
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from GitSvnHack.fixtures import SvnDumpBuilder, SvnRepoFixture
+from GitSvnHack.repository import SvnRepo
+
+
+def dump_records(builder):
+    """Split a builder's dump into a list of header dictionaries."""
+    dump_file = io.BytesIO()
+    builder.write(dump_file)
+    records = []
+    for line in dump_file.getvalue().decode().splitlines():
+        match = re.match("^([A-Za-z0-9-]+): (.*)$", line)
+        if match is None:
+            continue
+        if match.group(1) in ("Revision-number", "Node-path",
+                              "SVN-fs-dump-format-version"):
+            records.append({})
+        records[-1][match.group(1)] = match.group(2)
+    return records
+
+
+class TestSvnDumpBuilder(unittest.TestCase):
+
+    """Test the SvnDumpBuilder class."""
+
+    def test_empty(self):
+        """Check that a new dump has only revision 0."""
+        builder = SvnDumpBuilder(uuid="uuid-1")
+        self.assertEqual(builder.revision, 0)
+        records = dump_records(builder)
+        self.assertEqual(records[0], {"SVN-fs-dump-format-version": "2",
+                                      "UUID": "uuid-1"})
+        self.assertEqual(records[1]["Revision-number"], "0")
+        self.assertEqual(len(records), 2)
+
+    def test_parents(self):
+        """Check that missing parent directories are added first."""
+        builder = SvnDumpBuilder()
+        builder.add_file("a/b/c", "text")
+        self.assertEqual(builder.commit("msg"), 1)
+        nodes = [record for record in dump_records(builder)
+                 if "Node-path" in record]
+        self.assertEqual([node["Node-path"] for node in nodes],
+                         ["a", "a/b", "a/b/c"])
+        self.assertEqual(nodes[2]["Node-kind"], "file")
+        self.assertEqual(nodes[2]["Text-content-length"], "4")
+        self.assertEqual(nodes[2]["Content-length"], str(4+10))
+
+    def test_copy_and_delete(self):
+        """Check that copies and deletes update the known paths."""
+        builder = SvnDumpBuilder()
+        builder.add_file("trunk/foo", "foo")
+        builder.commit()
+        builder.copy("trunk", "tags/v1")
+        builder.delete("trunk/foo")
+        self.assertTrue(builder.exists("tags/v1/foo"))
+        self.assertFalse(builder.exists("trunk/foo"))
+        self.assertTrue(builder.exists("trunk"))
+        builder.commit()
+        copy_node = [record for record in dump_records(builder)
+                     if record.get("Node-path") == "tags/v1"][0]
+        self.assertEqual(copy_node["Node-copyfrom-rev"], "1")
+        self.assertEqual(copy_node["Node-copyfrom-path"], "trunk")
+
+    def test_deterministic(self):
+        """Check that the same history gives the same dump."""
+        dumps = []
+        for i in range(2):
+            builder = SvnDumpBuilder(uuid="uuid-1")
+            builder.add_file("foo", "foo")
+            builder.commit("msg")
+            dump_file = io.BytesIO()
+            builder.write(dump_file)
+            dumps.append(dump_file.getvalue())
+        self.assertEqual(dumps[0], dumps[1])
+
+
+class TestSvnRepoFixture(unittest.TestCase):
+
+    """Test the SvnRepoFixture class."""
+
+    def setUp(self):
+        self.repo_dir = tempfile.mkdtemp()
+        self.svn_repo = SvnRepo(name="test_repo",
+                                path="file://"+self.repo_dir,
+                                trunk_head="trunk",
+                                trunk_tags="tags/{v1,v2}/*")
+
+    def tearDown(self):
+        shutil.rmtree(self.repo_dir)
+
+    def test_layout(self):
+        """Check that revisions match those of the SvnRepo methods."""
+        fixture = SvnRepoFixture(self.svn_repo)
+        self.assertEqual(fixture.revision, 2)
+        self.assertTrue(fixture.exists("trunk"))
+        self.assertTrue(fixture.exists("tags"))
+        self.assertEqual(fixture.trunk_import("foo", "bar"), 3)
+        self.assertEqual(fixture.trunk_import("foo", "baz"), 4)
+        self.assertEqual(fixture.make_trunk_tag("v1/one"), 5)
+        self.assertTrue(fixture.exists("tags/v1/one/foo"))
+        self.assertEqual(fixture.trunk_rm("foo"), 6)
+        self.assertFalse(fixture.exists("trunk/foo"))
+
+    def test_load(self):
+        """Check that a loaded fixture can be read with svn."""
+        fixture = SvnRepoFixture(self.svn_repo)
+        fixture.trunk_import("foo", "bar\n")
+        fixture.make_trunk_tag("v1/one")
+        fixture.load()
+        self.assertEqual(self.svn_repo.get_current_revision(), 4)
+        svn_cat = subprocess.check_output(
+            ["svn", "cat", self.svn_repo.path+"/tags/v1/one/foo"],
+            universal_newlines=True,
+        )
+        self.assertEqual(svn_cat, "bar\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
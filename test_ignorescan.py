@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Unit test module for ignorescan.py"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from GitSvnHack.ignorescan import IgnoreRevsScanner, format_suggestions
+from GitSvnHack.options import GitSvnOptions
+from GitSvnHack.repository import GitSvnRepo, SvnRepo
+from GitSvnHack.revisions import RevisionSet
+from GitSvnHack.svnlog import SvnLogCache
+from GitSvnHack.test_svnlog import FakeSvnServer
+
+# In Python 3.2, there is no unittest.mock, but the old mock library may be
+# installed:
+if sys.version_info[0:1] < (3,3):
+    import mock
+else:
+    import unittest.mock
+
+
+_url = "svn://host/repo/proj"
+
+
+class TestIgnoreRevsScanner(unittest.TestCase):
+
+    """Test the IgnoreRevsScanner class."""
+
+    def setUp(self):
+        self.server = FakeSvnServer()
+        self.server.commit("joe", ("A", "dir", "/proj"))
+        self.server.commit("joe", ("A", "dir", "/proj/trunk"),
+                           ("A", "dir", "/proj/tags"))
+        self.server.commit("ann", ("M", "file", "/proj/branches/x/a.c"))
+        self.server.commit("bob", ("M", "file", "/other/b.c"))
+        self.server.commit("ann", ("M", "file", "/proj/trunk/a.c"))
+        self.server.commit("ann", ("A", "file", "/proj/trunk/dist/cd.iso"))
+        self.server.commit("joe", ("A", "dir", "/proj/tags/1.0",
+                                   "/proj/trunk", 5))
+        self.server.commit("bob", ("M", "file", "/proj/trunk/a.c"),
+                           ("M", "file", "/proj/trunk/b.c"),
+                           ("M", "file", "/proj/trunk/c.c"))
+        self.server.commit("bob", ("M", "file", "/proj/branches/x/a.c"))
+        self.server.commit("bob", ("M", "file", "/other/b.c"))
+
+    def make_repo(self, base_revision=None, log_cache=None):
+        svn_repo = SvnRepo(name="svn_proj", path=_url, trunk_head="trunk",
+                           trunk_tags="tags/*", runner=self.server,
+                           log_cache=log_cache)
+        svn_repo.get_root = mock.Mock(return_value="svn://host/repo")
+        return GitSvnRepo(name="proj", path="/tmp/proj", svn_repo=svn_repo,
+                          ignore_revs=RevisionSet([4]),
+                          base_revision=base_revision, runner=self.server)
+
+    def test_out_of_scope(self):
+        """Check that revisions outside the trunk and tags are suggested."""
+        suggestion = IgnoreRevsScanner().scan(self.make_repo())
+        self.assertEqual((suggestion.start, suggestion.end), (1, 10))
+        self.assertEqual(str(suggestion.revisions), "3-4,9-10")
+        self.assertEqual(suggestion.flagged, [])
+        self.assertEqual(self.server.logs, [(1, 10)])
+
+    def test_heuristics(self):
+        """Check that large revisions and matching paths are suggested."""
+        scanner = IgnoreRevsScanner(max_paths=2, path_patterns=["*.iso"])
+        suggestion = scanner.scan(self.make_repo(base_revision=3), end=9)
+        self.assertEqual(str(suggestion.revisions), "3-4,6,8-9")
+        self.assertEqual(suggestion.flagged, [
+            (6, "adds trunk/dist/cd.iso"),
+            (8, "changes 3 paths"),
+        ])
+        self.assertEqual(self.server.logs, [(3, 9)])
+        self.assertEqual(format_suggestions([suggestion]), [
+            "proj: r3-r9: suggest ignore_revs 3-4,6,8-9",
+            "  r6 adds trunk/dist/cd.iso",
+            "  r8 changes 3 paths",
+        ])
+
+    def test_merged_repo(self):
+        """Check that suggestions are added to the existing ignore_revs."""
+        repo = self.make_repo(base_revision=2).replace(
+            options=GitSvnOptions(authors_file="authors.txt"),
+            remote_name="proj", prefix="proj/"
+        )
+        merged = IgnoreRevsScanner().scan(repo, end=8).merged_repo()
+        self.assertEqual(str(merged.ignore_revs), "3-4")
+        self.assertEqual(str(repo.ignore_revs), "4")
+        self.assertEqual(merged.base_revision, 2)
+        self.assertIs(merged.svn_repo, repo.svn_repo)
+        self.assertIs(merged.options, repo.options)
+        self.assertEqual((merged.remote_name, merged.prefix),
+                         ("proj", "proj/"))
+        self.assertIs(merged.runner, self.server)
+
+    def test_log_cache(self):
+        """Check that the log cache is used if there is one."""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            log_cache = SvnLogCache(_url, os.path.join(temp_dir, "log"),
+                                    runner=self.server)
+            log_cache.update(end=6)
+            suggestion = IgnoreRevsScanner().scan(
+                self.make_repo(log_cache=log_cache))
+            self.assertEqual(str(suggestion.revisions), "3-4,9-10")
+            self.assertEqual(self.server.logs, [(1, 6), (7, 10)])
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Unit test module for __init__.py"""
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+import GitSvnHack
+from GitSvnHack import commands
+
+
+# Script run in a fresh interpreter: run git-svnhack with os.execvp
+# replaced, and print the exec arguments and the GitSvnHack modules
+# imported by then.
+_probe_script = """
+import json, os, runpy, sys
+def fake_execvp(file, args):
+    modules = sorted(name for name in sys.modules
+                     if name.startswith("GitSvnHack"))
+    print(json.dumps([args, modules]))
+    sys.exit(0)
+os.execvp = fake_execvp
+sys.argv = sys.argv[1:]
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+
+class TestEntryPoint(unittest.TestCase):
+
+    """Test the git-svnhack script in the package __init__.py."""
+
+    def run_script(self, arguments):
+        script_path = os.path.join(os.path.dirname(GitSvnHack.__file__),
+                                   "__init__.py")
+        output = subprocess.check_output(
+            [sys.executable, "-c", _probe_script, script_path]+arguments,
+            universal_newlines=True,
+        )
+        return json.loads(output)
+
+    def test_pass_through_imports(self):
+        """Check that pass-through commands import nothing else."""
+        args, modules = self.run_script(["log", "--oneline"])
+        self.assertEqual(args, ["git", "svn", "log", "--oneline"])
+        self.assertEqual(modules, ["GitSvnHack", "GitSvnHack.cmdnames"])
+
+    def test_commands_imports(self):
+        """Check that the commands module leaves the rest to each command."""
+        output = subprocess.check_output(
+            [sys.executable, "-c",
+             "import json, sys\n"
+             "import GitSvnHack.commands\n"
+             "print(json.dumps(sorted(name for name in sys.modules\n"
+             "                        if name.startswith('GitSvnHack'))))"],
+            universal_newlines=True,
+        )
+        self.assertEqual(json.loads(output),
+                         ["GitSvnHack", "GitSvnHack.cmdnames",
+                          "GitSvnHack.commands"])
+
+    def test_is_pass_through(self):
+        """Check which arguments skip the commands module."""
+        self.assertTrue(GitSvnHack._is_pass_through([]))
+        self.assertTrue(GitSvnHack._is_pass_through(["fetch", "clone"]))
+        self.assertFalse(GitSvnHack._is_pass_through(["clone", "url"]))
+        self.assertFalse(GitSvnHack._is_pass_through(["--profile=5",
+                                                      "fetch"]))
+        self.assertFalse(GitSvnHack._is_pass_through(["--trace", "t.json",
+                                                      "fetch"]))
+
+    def test_wrapped_commands(self):
+        """Check that the fast path knows every wrapped command."""
+        self.assertEqual(GitSvnHack._wrapped_commands,
+                         frozenset(commands._commands))
+        self.assertEqual(commands._commands["suggest-ignore-revs"],
+                         commands.suggest_ignore_revs)
+
+
+if __name__ == "__main__":
+    unittest.main()
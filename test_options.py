@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Unit test module for options.py"""
+
+import pickle
+import unittest
+
+from GitSvnHack.options import GitSvnOptions
+
+
+class TestGitSvnOptions(unittest.TestCase):
+
+    """Test the GitSvnOptions class."""
+
+    def setUp(self):
+        self.options = GitSvnOptions(authors_file="authors.txt",
+                                     use_svm_props=True, username="me",
+                                     log_window_size=500)
+
+    def test_attributes(self):
+        """Check that options are read back, with defaults for the rest."""
+        self.assertEqual(self.options.authors_file, "authors.txt")
+        self.assertTrue(self.options.use_svm_props)
+        self.assertFalse(self.options.localtime)
+        self.assertIsNone(self.options.template)
+
+    def test_unknown_option(self):
+        """Check that misspelled options are rejected."""
+        with self.assertRaises(TypeError):
+            GitSvnOptions(author_file="authors.txt")
+
+    def test_args_for(self):
+        """Check that each command only gets the options it accepts."""
+        self.assertEqual(self.options.args_for("init"),
+                         ["--use-svm-props", "--username=me"])
+        self.assertEqual(self.options.args_for("fetch"),
+                         ["--username=me", "--authors-file=authors.txt",
+                          "--log-window-size=500"])
+        self.assertEqual(self.options.args_for("clone"),
+                         ["--use-svm-props", "--username=me",
+                          "--authors-file=authors.txt",
+                          "--log-window-size=500"])
+        with self.assertRaises(ValueError):
+            self.options.args_for("rebase")
+
+    def test_args_for_parent(self):
+        """Check that "--parent" is only given to "git svn fetch"."""
+        options = GitSvnOptions(parent=True)
+        self.assertEqual(options.args_for("fetch"), ["--parent"])
+        self.assertEqual(options.args_for("clone"), [])
+        self.assertEqual(options.args_for("init"), [])
+
+    def test_args_for_copy(self):
+        """Check that callers can't change the cached arguments."""
+        self.options.args_for("init").append("--bogus")
+        self.assertNotIn("--bogus", self.options.args_for("init"))
+
+    def test_replace(self):
+        """Check that replace returns a changed copy."""
+        options = self.options.replace(username=None, quiet=True)
+        self.assertIsNone(options.username)
+        self.assertTrue(options.quiet)
+        self.assertEqual(self.options.username, "me")
+        self.assertNotEqual(options, self.options)
+
+    def test_to_dict(self):
+        """Check that only options that are set are listed."""
+        self.assertEqual(self.options.to_dict(), {
+            "authors_file": "authors.txt",
+            "use_svm_props": True,
+            "username": "me",
+            "log_window_size": 500,
+        })
+        self.assertEqual(GitSvnOptions(**self.options.to_dict()),
+                         self.options)
+
+    def test_pickle(self):
+        """Check that options survive pickling."""
+        self.options.args_for("fetch")
+        options = pickle.loads(pickle.dumps(self.options))
+        self.assertEqual(options, self.options)
+        self.assertEqual(options.args_for("fetch"),
+                         self.options.args_for("fetch"))
+
+
+if __name__ == "__main__":
+    unittest.main()
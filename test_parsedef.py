@@ -7,6 +7,8 @@ import unittest
 
 from GitSvnHack.parsedef import GitSvnDefParser
 from GitSvnHack.repository import SvnRepo, GitSvnRepo
+from GitSvnHack.revisions import RevisionSet
+from GitSvnHack.svninfo import SvnInfoCache
 
 # For Python 3.2, need to add some things that are already in 3.3:
 import sys
@@ -100,6 +102,62 @@ class TestGitSvnDefRead(TestConfigBase):
             self.assertCountEqual(repo.ignore_revs,
                                   [int(s) for s in rd["ignore_revs"]])
 
+    def test_get_repos_info_cache(self):
+        """Test that an SvnInfoCache is shared by all repos."""
+        self.git_svn_def.read(self.cfg_name)
+        info_cache = SvnInfoCache()
+        repos = self.git_svn_def.get_repos(info_cache=info_cache)
+        for repo in repos:
+            self.assertIs(repo.svn_repo.info_cache, info_cache)
+
+    def test_get_repos_log_cache(self):
+        """Test that each repo gets a log cache outside its path."""
+        self.git_svn_def.read(self.cfg_name)
+        repos = self.git_svn_def.get_repos()
+        cache_dir = os.path.join(
+            os.path.dirname(os.path.abspath(self.cfg_name)), ".svnhack-cache"
+        )
+        self.assertEqual(self.git_svn_def.cache_dir, cache_dir)
+        for repo, rd in zip(repos, self.repo_dicts):
+            log_cache = repo.svn_repo.log_cache
+            self.assertEqual(log_cache.url, rd["svn_url"])
+            self.assertEqual(log_cache.path,
+                             os.path.join(cache_dir,
+                                          rd["name"]+".svnlog.jsonl"))
+
+    def test_get_repos_ranges(self):
+        """Test that ranges and empty values are read from ignore_revs."""
+        with open(self.cfg_name, "a") as cfg_file:
+            cfg_file.write("\n[range_repo]\n"
+                           "path = /path/to/range_repo\n"
+                           "svn_url = file://svn_origin\n"
+                           "svn_trunk = trunk,trunk_tags/*\n"
+                           "ignore_revs = 4, 1200-4800\n"
+                           "[empty_repo]\n"
+                           "path = /path/to/empty_repo\n"
+                           "svn_url = file://svn_origin\n"
+                           "svn_trunk = trunk,trunk_tags/*\n"
+                           "ignore_revs =\n")
+        self.git_svn_def.read(self.cfg_name)
+        repos = self.git_svn_def.get_repos()
+        self.assertEqual(repos[-2].ignore_revs.ranges(),
+                         [(4, 4), (1200, 4800)])
+        self.assertEqual(len(repos[-1].ignore_revs), 0)
+
+    def test_get_repos_mirror(self):
+        """Test that svn_mirror sets the mirror path of the SvnRepo."""
+        with open(self.cfg_name, "a") as cfg_file:
+            cfg_file.write("\n[mirror_repo]\n"
+                           "path = /path/to/mirror_repo\n"
+                           "svn_url = file://svn_origin\n"
+                           "svn_trunk = trunk,trunk_tags/*\n"
+                           "svn_mirror = /path/to/mirror\n")
+        self.git_svn_def.read(self.cfg_name)
+        repos = self.git_svn_def.get_repos()
+        self.assertEqual(repos[-1].svn_repo.mirror_path, "/path/to/mirror")
+        self.assertIsNone(repos[0].svn_repo.mirror_path)
+        self.assertIsNone(repos[0].base_revision)
+
     def test_no_files(self):
         """Test that the get_repos method on zero files yields an
         empty list."""
@@ -152,11 +210,140 @@ class TestGitSvnDefWrite(unittest.TestCase):
         self.assertEqual(repo.svn_repo.name, "svn_"+self.rd["name"])
         self.assertEqual(repo.svn_repo.path, self.rd["svn_url"])
         self.assertEqual(repo.svn_repo.trunk_branch.head,
-                         self.rd["svn_url"]+"/"+self.rd["svn_trunk_head"])
+                         self.rd["svn_trunk_head"])
         self.assertEqual(repo.svn_repo.trunk_branch.tags,
-                         self.rd["svn_url"]+"/"+self.rd["svn_trunk_tags"])
+                         self.rd["svn_trunk_tags"])
         self.assertCountEqual(repo.ignore_revs, self.rd["ignore_revs"])
 
+    def test_rewrite(self):
+        """Test that a definition read from a file can be written back."""
+        self.git_svn_def.set_repos([self.git_svn_repo])
+        self.git_svn_def.write(self.temp_name)
+        new_parser = GitSvnDefParser()
+        new_parser.read(self.temp_name)
+        repo = new_parser.get_repos()[0]
+        new_parser.set_repos([GitSvnRepo(
+            name=repo.name,
+            path=repo.path,
+            ignore_revs=RevisionSet.from_string("4,6-9"),
+            svn_repo=repo.svn_repo,
+        )])
+        new_parser.write(self.temp_name)
+        new_parser = GitSvnDefParser()
+        new_parser.read(self.temp_name)
+        repos = new_parser.get_repos()
+        self.assertEqual(len(repos), 1)
+        self.assertEqual(repos[0].ignore_revs,
+                         RevisionSet.from_string("4,6-9"))
+        self.assertEqual(repos[0].svn_repo.trunk_head,
+                         self.rd["svn_url"]+"/"+self.rd["svn_trunk_head"])
+
+    def test_write_ranges(self):
+        """Test that ignored revision ranges are written compactly."""
+        self.git_svn_def.set_repos([GitSvnRepo(
+            name="range_repo",
+            path="foo",
+            ignore_revs=RevisionSet.from_string("4,1200-4800"),
+            svn_repo=self.git_svn_repo.svn_repo,
+        )])
+        self.git_svn_def.write(self.temp_name)
+        with open(self.temp_name) as def_file:
+            self.assertIn("ignore_revs = 4,1200-4800", def_file.read())
+        new_parser = GitSvnDefParser()
+        new_parser.read(self.temp_name)
+        repo = new_parser.get_repos()[0]
+        self.assertEqual(repo.ignore_revs,
+                         RevisionSet.from_string("4,1200-4800"))
+
+    def test_write_base_revision(self):
+        """Test that the base revision survives writing and reading."""
+        self.git_svn_def.set_repos([GitSvnRepo(
+            name="shallow_repo",
+            path="foo",
+            base_revision=1200,
+            svn_repo=self.git_svn_repo.svn_repo,
+        )])
+        self.git_svn_def.write(self.temp_name)
+        new_parser = GitSvnDefParser()
+        new_parser.read(self.temp_name)
+        self.assertEqual(new_parser.get_repos()[0].base_revision, 1200)
+
+
+    def test_write_dollar(self):
+        """Test that "$" in values is written so that it reads back."""
+        self.git_svn_def.set_repos([GitSvnRepo(
+            name="dollar_repo",
+            path="/srv/$HOME/foo",
+            svn_repo=self.git_svn_repo.svn_repo,
+        )])
+        self.git_svn_def.write(self.temp_name)
+        new_parser = GitSvnDefParser()
+        new_parser.read(self.temp_name)
+        self.assertEqual(new_parser.get_repos()[0].path, "/srv/$HOME/foo")
+
+
+class TestUpdateIgnoreRevs(TestConfigBase):
+
+    """Test GitSvnDefParser.update_ignore_revs."""
+
+    file_string = """# Projects on the main server.
+[DEFAULT]
+root = svn://host/repo
+
+[foo]
+# Trunk only.
+svn_trunk = trunk,tags/*
+svn_url = ${root}/foo
+path = /git/foo
+ignore_revs = 4,
+  7
+
+[bar]
+svn_trunk = trunk,tags/*
+svn_url = ${root}/bar
+path = /git/bar
+
+# Not scanned.
+[baz]
+svn_trunk = trunk,tags/*
+svn_url = ${root}/baz
+path = /git/baz
+ignore_revs = 9
+"""
+
+    def test_update(self):
+        """Test that only ignore_revs lines change."""
+        parser = GitSvnDefParser()
+        parser.read(self.cfg_name)
+        foo, bar, baz = parser.get_repos()
+        parser.update_ignore_revs(self.cfg_name, [
+            foo.replace(ignore_revs=RevisionSet.from_string("4,7,10-20")),
+            bar.replace(ignore_revs=RevisionSet([3])),
+        ])
+        with open(self.cfg_name) as def_file:
+            contents = def_file.read()
+        expected = self.file_string.replace(
+            "ignore_revs = 4,\n  7\n", "ignore_revs = 4,7,10-20\n"
+        ).replace(
+            "path = /git/bar\n", "path = /git/bar\nignore_revs = 3\n"
+        )
+        self.assertEqual(contents, expected)
+        self.assertEqual(str(parser.get_repos()[1].ignore_revs), "3")
+        new_parser = GitSvnDefParser()
+        new_parser.read(self.cfg_name)
+        self.assertEqual(new_parser.get_repos()[0].svn_repo.path,
+                         "svn://host/repo/foo")
+
+    def test_missing(self):
+        """Test that repos without a section are rejected."""
+        parser = GitSvnDefParser()
+        parser.read(self.cfg_name)
+        repo = parser.get_repos()[0].replace(name="qux")
+        with self.assertRaises(KeyError):
+            parser.update_ignore_revs(self.cfg_name, [repo])
+        with open(self.cfg_name) as def_file:
+            self.assertEqual(def_file.read(), self.file_string)
+
 
 if __name__ == "__main__":
     unittest.main()
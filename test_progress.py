@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Unit test module for progress.py"""
+
+import io
+import unittest
+
+from GitSvnHack.progress import FetchProgress, parse_fetch_line
+
+
+_commit = "0123456789abcdef0123456789abcdef01234567"
+
+
+class FakeClock:
+
+    """Clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestParseFetchLine(unittest.TestCase):
+
+    """Test the parse_fetch_line function."""
+
+    def test_parse_fetch_line(self):
+        """Check that commit lines are parsed, with or without a ref."""
+        self.assertEqual(
+            parse_fetch_line("r12 = "+_commit+" (refs/remotes/trunk)\n"),
+            (12, _commit, "refs/remotes/trunk")
+        )
+        self.assertEqual(parse_fetch_line("r12 = "+_commit+" (trunk)\n"),
+                         (12, _commit, "trunk"))
+        self.assertEqual(parse_fetch_line("r12 = "+_commit+"\n"),
+                         (12, _commit, None))
+
+    def test_other_lines(self):
+        """Check that other output is not mistaken for commits."""
+        self.assertIsNone(parse_fetch_line("\tA\tfoo\n"))
+        self.assertIsNone(parse_fetch_line("r12 = abc (trunk)\n"))
+        self.assertIsNone(parse_fetch_line("Checked out HEAD:\n"))
+
+
+class TestFetchProgress(unittest.TestCase):
+
+    """Test the FetchProgress class."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.updates = []
+        self.output = io.StringIO()
+        self.progress = FetchProgress(callback=self.updates.append,
+                                      output=self.output, clock=self.clock)
+
+    def feed_revision(self, revision):
+        return self.progress.feed(
+            "r{0} = {1} (refs/remotes/trunk)\n".format(revision, _commit)
+        )
+
+    def test_rate_and_eta(self):
+        """Check the rate and estimate after some revisions arrive."""
+        self.progress.start(100, 300)
+        self.assertIsNone(self.progress.rate)
+        self.clock.now += 10
+        self.feed_revision(150)
+        self.assertEqual(self.progress.current_revision, 150)
+        self.assertAlmostEqual(self.progress.rate, 5.0)
+        self.assertAlmostEqual(self.progress.eta, 30.0)
+        self.assertEqual(self.progress.format(),
+                         "r150/300, 5.0 rev/s, ETA 0:00:30")
+
+    def test_no_target(self):
+        """Check that there is no estimate without a target."""
+        self.feed_revision(5)
+        self.clock.now += 2
+        self.feed_revision(9)
+        self.assertEqual(self.progress.start_revision, 4)
+        self.assertAlmostEqual(self.progress.rate, 2.5)
+        self.assertIsNone(self.progress.eta)
+        self.assertEqual(self.progress.format(), "r9, 2.5 rev/s")
+
+    def test_several_commands(self):
+        """Check that a later start() keeps the original start point."""
+        self.progress.start(0, 50)
+        self.clock.now += 5
+        self.feed_revision(10)
+        self.progress.start(20, 100)
+        self.assertEqual(self.progress.start_revision, 0)
+        self.assertEqual(self.progress.target_revision, 100)
+        self.assertAlmostEqual(self.progress.rate, 2.0)
+
+    def test_callback_and_output(self):
+        """Check that commits are reported and all lines are copied."""
+        self.progress.feed("\tA\tfoo\n")
+        self.assertEqual(self.updates, [])
+        self.assertEqual(self.feed_revision(3), (3, _commit,
+                                                 "refs/remotes/trunk"))
+        self.assertEqual(self.updates, [self.progress])
+        self.assertEqual(self.progress.commits, 1)
+        self.assertTrue(self.output.getvalue().startswith("\tA\tfoo\n"))
+
+    def test_format_waiting(self):
+        """Check the description before any revision arrives."""
+        self.assertEqual(self.progress.format(),
+                         "waiting for the first revision")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,10 +8,17 @@ import shutil
 import subprocess
 import sys
 import tempfile
+import threading
+import time
 import unittest
 
+from GitSvnHack.fixtures import SvnDumpBuilder, SvnRepoFixture
+from GitSvnHack.options import GitSvnOptions
+from GitSvnHack.progress import FetchProgress
 from GitSvnHack.repository import Repo, SvnBranch, SvnRepo, \
     GitRepo, GitSvnRepo
+from GitSvnHack.revisions import RevisionSet
+from GitSvnHack.runner import CommandRunner, get_default_runner
 
 # Could do something sophisticated or elegant, but easiest to just
 # wrap Subversion's CLI.
@@ -21,6 +28,13 @@ if sys.version_info[0:1] < (3,3):
     subprocess.DEVNULL = os.open(os.devnull,os.O_WRONLY)
     FileNotFoundError = OSError
 
+# In Python 3.2, there is no unittest.mock, but the old mock library may be
+# installed:
+if sys.version_info[0:1] < (3,3):
+    import mock
+else:
+    import unittest.mock
+
 
 class TempFile:
     """Context manager class for files that exist only for one test, and
@@ -95,6 +109,11 @@ class TestStaticRepo(unittest.TestCase):
         """Test that Repo objects retain paths from __init__."""
         self.assertEqual(self.my_repo.path, self.repo_path)
 
+    def test_runner(self):
+        """Test that Repo objects use the default runner if not given
+        one."""
+        self.assertIs(self.my_repo.runner, get_default_runner())
+
 class TestRepo(unittest.TestCase):
     """Test the "Repo" class."""
 
@@ -131,6 +150,20 @@ class TestSvnBranch(unittest.TestCase):
         """Test that branch objects retain tag path expression."""
         self.assertEqual(self.my_branch.tags, self.tag_expr)
 
+    def test_tags_root(self):
+        """Test that globs and braces are removed from the tags root."""
+        self.assertEqual(self.my_branch.tags_root, "trunk_tags")
+        brace_branch = self.branch_class(self.head_path,
+                                         "tags/{v1,v2}/*")
+        self.assertEqual(brace_branch.tags_root, "tags")
+
+    def test_no_tags(self):
+        """Test that a branch without tags only has a head path."""
+        self.assertEqual(self.my_branch.paths, ["trunk", "trunk_tags"])
+        no_tags_branch = self.branch_class(self.head_path, None)
+        self.assertIsNone(no_tags_branch.tags_root)
+        self.assertEqual(no_tags_branch.paths, ["trunk"])
+
 
 # This is used for manipulating paths in some tests below.
 def get_path_start(string):
@@ -313,6 +346,22 @@ class TestStaticGitRepo(TestStaticRepo):
         )
 
 
+def git_commit(repo_path, message):
+    """Make an empty commit in a Git repository and return its hash."""
+    subprocess.check_call(
+        ["git", "-c", "user.name=Test", "-c", "user.email=test@example.com",
+         "commit", "-q", "--allow-empty", "-m", message],
+        cwd=repo_path,
+        **_git_cmd_args
+    )
+    return subprocess.check_output(
+        ["git", "rev-parse", "HEAD"],
+        cwd=repo_path,
+        universal_newlines=True,
+        env={},
+    ).strip()
+
+
 class TestGitRepo(TestRepo):
 
     """Test the "GitRepo" class."""
@@ -328,38 +377,87 @@ class TestGitRepo(TestRepo):
         super().tearDown(**args)
 
 
+class TestGitRepoRefs(TestGitRepo):
+
+    """Test reading refs with the "GitRepo" class."""
+
+    def setUp(self, **args):
+        super().setUp(**args)
+        if self.repo_class is GitRepo:
+            self.my_repo.init(**_git_cmd_args)
+
+    def test_git_dir(self):
+        """Check that git_dir points into the working tree."""
+        self.assertEqual(self.my_repo.git_dir,
+                         os.path.join(self.repo_path, ".git"))
+
+    def test_exists(self):
+        """Check that only a real Git directory counts as existing."""
+        self.assertTrue(self.my_repo.exists())
+        other_path = os.path.join(self.repo_path, "other")
+        os.makedirs(os.path.join(other_path, ".git", "svnhack"))
+        self.assertFalse(GitRepo(name="other", path=other_path).exists())
+
+    def test_read_ref(self):
+        """Check that loose refs are read."""
+        commit = git_commit(self.repo_path, "First commit.")
+        subprocess.check_call(
+            ["git", "update-ref", "refs/remotes/trunk", commit],
+            cwd=self.repo_path,
+            **_git_cmd_args
+        )
+        self.assertEqual(self.my_repo.read_ref("refs/remotes/trunk"),
+                         commit)
+
+    def test_read_packed_ref(self):
+        """Check that packed refs are read."""
+        commit = git_commit(self.repo_path, "First commit.")
+        subprocess.check_call(
+            ["git", "update-ref", "refs/remotes/trunk", commit],
+            cwd=self.repo_path,
+            **_git_cmd_args
+        )
+        subprocess.check_call(
+            ["git", "pack-refs", "--all"],
+            cwd=self.repo_path,
+            **_git_cmd_args
+        )
+        self.assertEqual(self.my_repo.read_ref("refs/remotes/trunk"),
+                         commit)
+
+    def test_read_ref_missing(self):
+        """Check that a missing ref yields None."""
+        self.assertIsNone(self.my_repo.read_ref("refs/remotes/trunk"))
+
+
 @contextlib.contextmanager
 def SvnTestRepo():
     """Context manager for a Subversion test repo. This is set up for
     convenience in testing GitSvnRepo."""
 
-    # Use SvnRepo object to initialize the repo in a temporary directory.
+    # Describe the history with a fixture, which is loaded in one go.
     svn_test_repo = SvnRepo(name="test_repo",
                             path="file://"+tempfile.mkdtemp(),
                             trunk_head="trunk",
                             trunk_tags="trunk_tags/*")
-    svn_test_repo.create()
+    fixture = SvnRepoFixture(svn_test_repo)
 
-    # For now, just assume that the above is revision 2. Then this is
-    # revision 3.
-    with TempFile() as bad_file:
-        with bad_file.open("w") as bad:
-            bad.write("BADTOTHEBONE\n")
-        svn_test_repo.trunk_import(bad_file.path, "bad", "Evil commit.")
+    # The fixture starts with revisions 1 and 2, like SvnRepo.create(), so
+    # this is revision 3.
+    fixture.trunk_import("bad", "BADTOTHEBONE\n", "Evil commit.")
 
     # Make a trunk tag.
-    svn_test_repo.make_trunk_tag("bad_tag", "Making bad trunk tag.")
+    fixture.make_trunk_tag("bad_tag", "Making bad trunk tag.")
 
-    svn_test_repo.trunk_rm("bad", "Undo evil.")
+    fixture.trunk_rm("bad", "Undo evil.")
 
     # Add a file.
-    with TempFile() as foo_file:
-        with foo_file.open("w") as foo:
-            foo.write("bar1\n")
-        svn_test_repo.trunk_import(foo_file.path, "foo", "Adding foo.")
+    fixture.trunk_import("foo", "bar1\n", "Adding foo.")
 
     # Make a trunk tag.
-    svn_test_repo.make_trunk_tag("v1", "Making first trunk tag.")
+    fixture.make_trunk_tag("v1", "Making first trunk tag.")
+
+    fixture.load()
 
     # *Finally*, we can return the SvnRepo object.
     yield svn_test_repo
@@ -447,6 +545,372 @@ class TestStaticGitSvnRepo(TestStaticGitRepo):
             )
 
 
+class TestSvnRepoMirror(unittest.TestCase):
+
+    """Test the mirror settings of "SvnRepo" without Subversion."""
+
+    def setUp(self):
+        self.runner = mock.Mock()
+        self.runner.check_output.return_value = (
+            '<?xml version="1.0"?>\n<info>\n'
+            '<entry kind="dir" path="foo" revision="10">\n'
+            '<url>svn://host/repo/foo</url>\n'
+            '<repository>\n<root>svn://host/repo</root>\n'
+            '<uuid>uuid-1</uuid>\n</repository>\n'
+            '<commit revision="7"></commit>\n</entry>\n</info>\n'
+        )
+        self.svn_repo = SvnRepo(name="foo", path="svn://host/repo/foo",
+                                trunk_head="trunk", trunk_tags="tags/*",
+                                mirror_path="/mirrors/repo",
+                                runner=self.runner)
+
+    def test_no_mirror(self):
+        """Check that repositories without a mirror fetch directly."""
+        svn_repo = SvnRepo(name="foo", path="svn://host/repo/foo",
+                           trunk_head="trunk", trunk_tags="tags/*")
+        self.assertIsNone(svn_repo.mirror_url)
+        self.assertEqual(svn_repo.fetch_url, "svn://host/repo/foo")
+        git_svn_repo = GitSvnRepo(name="foo", path="/path/to/foo",
+                                  svn_repo=svn_repo)
+        self.assertEqual(git_svn_repo._rewrite_root_args(), [])
+
+    def test_fetch_url(self):
+        """Check that the project's space is found within the mirror."""
+        self.assertEqual(self.svn_repo.mirror_url, "file:///mirrors/repo")
+        self.assertEqual(self.svn_repo.fetch_url,
+                         "file:///mirrors/repo/foo")
+        self.assertEqual(self.svn_repo.get_root(), "svn://host/repo")
+        self.runner.check_output.assert_called_once_with(
+            ["svn", "info", "--xml", "svn://host/repo/foo"],
+            universal_newlines=True,
+        )
+
+    def test_clone_argv(self):
+        """Check that git-svn clones from the mirror and rewrites URLs."""
+        git_svn_repo = GitSvnRepo(name="foo", path="/path/to/foo",
+                                  svn_repo=self.svn_repo)
+        self.assertEqual(
+            git_svn_repo.clone_argv("HEAD", []),
+            ["git", "svn", "clone", "file:///mirrors/repo/foo",
+             "-T", "trunk", "-t", "tags/*", "-r", "BASE:HEAD",
+             "--rewrite-root=svn://host/repo", "--rewrite-uuid=uuid-1",
+             "/path/to/foo"]
+        )
+
+    def test_rewrite_args(self):
+        """Check the rewrite options when the URL isn't shortened."""
+        options = GitSvnOptions(no_minimize_url=True, rewrite_uuid="u-2")
+        git_svn_repo = GitSvnRepo(name="foo", path="/path/to/foo",
+                                  svn_repo=self.svn_repo, options=options)
+        self.assertEqual(git_svn_repo._rewrite_root_args(),
+                         ["--rewrite-root=svn://host/repo/foo"])
+
+    def test_options_argv(self):
+        """Check that typed options go to each git-svn command."""
+        options = GitSvnOptions(authors_file="authors.txt", shared="group")
+        git_svn_repo = GitSvnRepo(name="foo", path="/path/to/foo",
+                                  svn_repo=self.svn_repo, options=options,
+                                  runner=self.runner)
+        self.assertIs(git_svn_repo.options, options)
+        self.assertEqual(
+            git_svn_repo.clone_argv(5, ["-q"])[-4:],
+            ["--shared=group", "--authors-file=authors.txt",
+             "/path/to/foo", "-q"]
+        )
+        self.assertEqual(
+            git_svn_repo.fetch_argv(1, 5),
+            ["git", "svn", "fetch", "-r", "1:5",
+             "--authors-file=authors.txt"]
+        )
+        git_svn_repo.init(cwd="/tmp")
+        self.runner.check_call.assert_called_once_with(
+            ["git", "svn", "init", "file:///mirrors/repo/foo",
+             "-T", "trunk", "-t", "tags/*",
+             "--rewrite-root=svn://host/repo", "--rewrite-uuid=uuid-1",
+             "--shared=group", "/path/to/foo"],
+            cwd="/tmp",
+        )
+
+
+class TestMirrorSubdirectory(unittest.TestCase):
+
+    """Clone through a mirror a project below the repository root."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        upstream_path = os.path.join(self.temp_dir, "upstream")
+        self.builder = SvnDumpBuilder()
+        self.builder.add_dir("proj/trunk")
+        self.builder.add_dir("proj/tags")
+        self.builder.commit("Creating project.")
+        self.builder.add_file("proj/trunk/foo", "bar\n")
+        self.builder.commit("Adding foo.")
+        self.builder.load(upstream_path, **_git_cmd_args)
+        self.upstream_url = "file://"+upstream_path
+        self.svn_repo = SvnRepo(
+            name="proj", path=self.upstream_url+"/proj",
+            trunk_head="trunk", trunk_tags="tags/*",
+            mirror_path=os.path.join(self.temp_dir, "mirror"),
+        )
+        self.repo = GitSvnRepo(name="proj",
+                               path=os.path.join(self.temp_dir, "git"),
+                               svn_repo=self.svn_repo)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_git_svn_id(self):
+        """Check that commits name the upstream project and UUID."""
+        self.repo.clone(**_git_cmd_args)
+        message = subprocess.check_output(
+            ["git", "log", "-1", "--format=%B", self.repo.trunk_ref],
+            cwd=self.repo.path, universal_newlines=True
+        )
+        self.assertIn(
+            "git-svn-id: {0}/proj/trunk@2 {1}".format(self.upstream_url,
+                                                     self.builder.uuid),
+            message
+        )
+        mirror_uuid = subprocess.check_output(
+            ["svnlook", "uuid", self.svn_repo.mirror_path],
+            universal_newlines=True
+        ).strip()
+        self.assertEqual(mirror_uuid, self.builder.uuid)
+
+
+class TestBaseRevision(unittest.TestCase):
+
+    """Test partial history clones without Subversion."""
+
+    def setUp(self):
+        self.runner = mock.Mock()
+        self.svn_repo = SvnRepo(name="foo", path="svn://host/repo/foo",
+                                trunk_head="trunk", trunk_tags="tags/*",
+                                runner=self.runner)
+
+    def make_repo(self, **args):
+        return GitSvnRepo(name="foo", path="/path/to/foo",
+                          svn_repo=self.svn_repo, runner=self.runner,
+                          **args)
+
+    def test_clone_argv(self):
+        """Check that clones start at the base revision."""
+        self.assertEqual(self.make_repo().clone_argv(20, [])[8:10],
+                         ["-r", "BASE:20"])
+        repo = self.make_repo(base_revision=10)
+        self.assertEqual(repo.clone_argv(20, [])[8:10], ["-r", "10:20"])
+        repo = self.make_repo(base_revision=10,
+                              ignore_revs=RevisionSet([10, 11]))
+        self.assertEqual(repo.clone_argv(20, [])[8:10], ["-r", "12:20"])
+
+    def test_chunked_clone_args(self):
+        """Check that fetch options skip init and reach every fetch."""
+        repo = self.make_repo()
+        with mock.patch.object(GitSvnRepo, "update_rev_index"):
+            repo.clone(revision=20, git_args=["--username=joe"],
+                       fetch_args=["--authors-file=a.txt"], chunk_size=10,
+                       sync_mirror=False)
+        argvs = [call[0][0] for call in self.runner.check_call.call_args_list]
+        inits = [argv for argv in argvs if argv[1:3] == ["svn", "init"]]
+        fetches = [argv for argv in argvs if argv[1:3] == ["svn", "fetch"]]
+        self.assertEqual(len(inits), 1)
+        self.assertIn("--username=joe", inits[0])
+        self.assertNotIn("--authors-file=a.txt", inits[0])
+        self.assertEqual([argv[3:] for argv in fetches],
+                         [["-r", "1:10", "--authors-file=a.txt"],
+                          ["-r", "11:20", "--authors-file=a.txt"]])
+
+    def test_chunked_clone_after_init(self):
+        """Check that a clone stopped after "git svn init" can resume."""
+        repo = self.make_repo()
+        with mock.patch.object(GitSvnRepo, "update_rev_index"), \
+             mock.patch.object(GitSvnRepo, "_has_svn_remote",
+                               return_value=True):
+            repo.clone(revision=20, chunk_size=10, sync_mirror=False)
+        argvs = [call[0][0] for call in self.runner.check_call.call_args_list]
+        self.assertNotIn(["svn", "init"], [argv[1:3] for argv in argvs])
+        self.assertIn(["git", "svn", "fetch", "-r", "1:10"], argvs)
+
+    def test_clone_revisions(self):
+        """Check that ignored revisions before the floor don't matter."""
+        repo = self.make_repo(base_revision=10,
+                              ignore_revs=RevisionSet([4, 15]))
+        self.assertEqual(repo.clone_revisions(None), (14, "HEAD"))
+        self.assertEqual(repo.clone_revisions(12), (12, None))
+        repo = self.make_repo(base_revision=10,
+                              ignore_revs=RevisionSet([4]))
+        self.assertEqual(repo.clone_revisions(None), ("HEAD", None))
+
+    def test_clone_too_old(self):
+        """Check that revisions before the floor can't be cloned."""
+        with self.assertRaises(ValueError):
+            self.make_repo(base_revision=10).clone(revision=5)
+        self.assertFalse(self.runner.check_call.called)
+
+    def test_rebase_start(self):
+        """Check that rebases of empty repositories start at the floor."""
+        repo = self.make_repo(base_revision=10)
+        self.assertEqual(repo.rebase_start(0), 10)
+        self.assertEqual(repo.rebase_start(12), 13)
+        self.assertEqual(self.make_repo().rebase_start(0), 1)
+
+    def test_get_tag_revision(self):
+        """Check that tags resolve to the revision they were copied from."""
+        self.runner.check_output.return_value = (
+            '<?xml version="1.0"?>\n<log>\n'
+            '<logentry revision="31"><paths>\n'
+            '<path action="M" kind="file">/foo/tags/v1/a</path>\n'
+            '</paths></logentry>\n'
+            '<logentry revision="30"><paths>\n'
+            '<path action="A" kind="dir" copyfrom-path="/foo/trunk"'
+            ' copyfrom-rev="28">/foo/tags/v1</path>\n'
+            '</paths></logentry>\n</log>\n'
+        )
+        self.assertEqual(self.svn_repo.get_tag_revision("v1"), 28)
+        self.runner.check_output.assert_called_once_with(
+            ["svn", "log", "--xml", "-v", "--stop-on-copy",
+             "svn://host/repo/foo/tags/v1"],
+            universal_newlines=True,
+        )
+
+
+class TestRemotes(unittest.TestCase):
+
+    """Test repositories with several git-svn remotes, without Subversion."""
+
+    def setUp(self):
+        self.runner = mock.Mock()
+        self.runner.check_output.return_value = ""
+        get_root = mock.patch.object(SvnRepo, "get_root",
+                                     return_value="svn://host")
+        get_root.start()
+        self.addCleanup(get_root.stop)
+        get_uuid = mock.patch.object(SvnRepo, "get_uuid",
+                                     return_value="uuid-1")
+        get_uuid.start()
+        self.addCleanup(get_uuid.stop)
+        self.path = "/path/to/product"
+        self.lib = GitSvnRepo(
+            name="lib", path=self.path, runner=self.runner,
+            svn_repo=SvnRepo(name="lib_svn", path="svn://host/lib",
+                             trunk_head="trunk", trunk_tags="tags/*",
+                             mirror_path="/mirrors/host",
+                             runner=self.runner),
+            remote_name="lib", prefix="lib/",
+        )
+        self.app = GitSvnRepo(
+            name="app", path=self.path, runner=self.runner,
+            svn_repo=SvnRepo(name="app_svn", path="svn://host/app",
+                             trunk_head="trunk", trunk_tags="tags/*",
+                             mirror_path="/mirrors/host",
+                             runner=self.runner),
+            remotes=[self.lib],
+        )
+
+    def test_refs(self):
+        """Check that each remote has its own refs and revision index."""
+        self.assertEqual(self.app.trunk_ref, "refs/remotes/trunk")
+        self.assertEqual(self.lib.trunk_ref, "refs/remotes/lib/trunk")
+        self.assertNotEqual(self.app.rev_index.path, self.lib.rev_index.path)
+        self.assertEqual(self.app.remotes, (self.lib,))
+
+    def test_bad_remotes(self):
+        """Check that remotes must share the path, but not the prefix."""
+        with self.assertRaises(ValueError):
+            GitSvnRepo(name="app", path="/elsewhere",
+                       svn_repo=self.app.svn_repo, remotes=[self.lib])
+        with self.assertRaises(ValueError):
+            GitSvnRepo(name="app", path=self.path, prefix="lib/",
+                       svn_repo=self.app.svn_repo, remotes=[self.lib])
+
+    def test_argv(self):
+        """Check that remote commands select the remote and prefix."""
+        self.lib.init()
+        init_argv = self.runner.check_call.call_args[0][0]
+        self.assertIn("--svn-remote=lib", init_argv)
+        self.assertIn("--prefix=lib/", init_argv)
+        self.assertEqual(self.lib.fetch_argv(1, 5)[:5],
+                         ["git", "svn", "fetch", "--svn-remote=lib", "-r"])
+        self.assertEqual(self.app.fetch_argv(1, 5)[:4],
+                         ["git", "svn", "fetch", "-r"])
+
+    def test_fetches_take_turns(self):
+        """Check that git-svn fetches in one repository don't overlap."""
+        running = []
+        overlaps = []
+        lock = threading.Lock()
+        def check_call(argv, **args):
+            if argv[2:3] != ["fetch"]:
+                return
+            with lock:
+                running.append(argv)
+                overlaps.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(argv)
+        self.runner.check_call.side_effect = check_call
+        with mock.patch.object(SvnRepo, "sync_mirror"):
+            self.app.rebase()
+        self.assertEqual(overlaps, [1, 1])
+
+    def test_rebase(self):
+        """Check that every remote fetches before the one rebase."""
+        with mock.patch.object(SvnRepo, "sync_mirror") as mock_sync:
+            self.app.rebase()
+        self.assertEqual(mock_sync.call_count, 1)
+        argvs = [call[0][0] for call in self.runner.check_call.call_args_list]
+        fetches = [argv for argv in argvs if argv[2:3] == ["fetch"]]
+        self.assertEqual(len(fetches), 2)
+        self.assertEqual(sum("--svn-remote=lib" in argv for argv in fetches),
+                         1)
+        self.assertEqual(argvs[-1], ["git", "svn", "rebase", "--local"])
+        self.assertEqual(argvs.count(argvs[-1]), 1)
+
+    def test_clone(self):
+        """Check that other remotes are added after the clone."""
+        self.app.clone(sync_mirror=False)
+        argvs = [call[0][0] for call in self.runner.check_call.call_args_list]
+        self.assertEqual(argvs[0][:3], ["git", "svn", "clone"])
+        self.assertEqual(argvs[1][:3], ["git", "svn", "init"])
+        self.assertIn("--svn-remote=lib", argvs[1])
+        self.assertEqual(argvs[2][:4],
+                         ["git", "svn", "fetch", "--svn-remote=lib"])
+
+
+class TestRemotesConcurrent(unittest.TestCase):
+
+    """Fetch two Subversion remotes into one repository at once."""
+
+    def setUp(self):
+        self.svn_test_repos = [SvnTestRepo(), SvnTestRepo()]
+        app_svn, lib_svn = [svn_test_repo.__enter__()
+                            for svn_test_repo in self.svn_test_repos]
+        self.repo_path = tempfile.mkdtemp()
+        self.lib = GitSvnRepo(name="lib", path=self.repo_path,
+                              svn_repo=lib_svn, remote_name="lib",
+                              prefix="lib/")
+        self.app = GitSvnRepo(name="app", path=self.repo_path,
+                              svn_repo=app_svn, remotes=[self.lib])
+
+    def tearDown(self):
+        shutil.rmtree(self.repo_path)
+        for svn_test_repo in self.svn_test_repos:
+            svn_test_repo.__exit__(None, None, None)
+
+    def test_rebase(self):
+        """Check that both remotes are fetched by one rebase."""
+        self.app.clone(revision=3, **_git_cmd_args)
+        self.app.rebase(**_git_cmd_args)
+        for repo in (self.app, self.lib):
+            subprocess.check_call(
+                ["git", "show-ref", "-q", "--verify",
+                 "refs/remotes/"+repo.prefix+"tags/v1"],
+                cwd=self.repo_path,
+                **_git_cmd_args
+            )
+        self.assertEqual(self.lib.get_svn_revision(**_git_cmd_args), 6)
+
+
 class TestGitSvnRepoBase(TestGitRepo):
     """Base class for classes to test "GitSvnRepo".
 
@@ -475,6 +939,114 @@ class TestGitSvnRepoBase(TestGitRepo):
     def tearDown(self, **args):
         super().tearDown(**args)
 
+class TestGitSvnRepoRevIndex(TestGitRepo):
+
+    """Test the revision index of "GitSvnRepo" without Subversion.
+
+    The commits that git-svn would create are simulated with plain git.
+
+    """
+
+    repo_class = GitSvnRepo
+
+    def setUp(self, **args):
+        args.setdefault("svn_repo", SvnRepo(name="fake_svn",
+                                            path="file:///fake",
+                                            trunk_head="trunk",
+                                            trunk_tags="tags/*"))
+        super().setUp(**args)
+        GitRepo.init(self.my_repo, **_git_cmd_args)
+
+    def svn_commit(self, revision):
+        """Simulate a git-svn commit for a trunk revision."""
+        commit = git_commit(
+            self.repo_path,
+            "Trunk change.\n\ngit-svn-id: file:///fake/trunk@" +
+            str(revision)+" 01234567-89ab-cdef-0123-456789abcdef",
+        )
+        subprocess.check_call(
+            ["git", "update-ref", "refs/remotes/trunk", commit],
+            cwd=self.repo_path,
+            **_git_cmd_args
+        )
+        return commit
+
+    def test_get_svn_revision_no_trunk(self):
+        """Check that a repository without a trunk is at revision 0."""
+        self.assertEqual(self.my_repo.get_svn_revision(**_git_cmd_args), 0)
+
+    def test_update_rev_index(self):
+        """Check that the index is filled in from git-svn-id lines."""
+        commit3 = self.svn_commit(3)
+        commit5 = self.svn_commit(5)
+        self.my_repo.update_rev_index(**_git_cmd_args)
+        self.assertEqual(self.my_repo.rev_index.get_commit(3), commit3)
+        self.assertEqual(self.my_repo.rev_index.get_commit(5), commit5)
+        commit8 = self.svn_commit(8)
+        self.my_repo.update_rev_index(**_git_cmd_args)
+        self.assertEqual(self.my_repo.rev_index.get_commit(8), commit8)
+        self.assertEqual(self.my_repo.rev_index.last_revision(), 8)
+
+    def test_get_svn_revision(self):
+        """Check that the trunk revision is found via the index."""
+        self.svn_commit(3)
+        self.assertEqual(self.my_repo.get_svn_revision(**_git_cmd_args), 3)
+        self.svn_commit(6)
+        self.assertEqual(self.my_repo.get_svn_revision(**_git_cmd_args), 6)
+
+    def test_runner(self):
+        """Check that commands are run through the repo's runner."""
+        runner = CommandRunner()
+        repo = GitSvnRepo(name=self.repo_name, path=self.repo_path,
+                          svn_repo=self.my_repo.svn_repo, runner=runner)
+        self.svn_commit(3)
+        repo.update_rev_index(**_git_cmd_args)
+        self.assertEqual([record.name for record in runner.records],
+                         ["git log"])
+
+    def test_clone_checkpoint(self):
+        """Check that chunked clone checkpoints are stored in the config."""
+        self.assertIsNone(
+            self.my_repo.get_clone_checkpoint(**_git_cmd_args)
+        )
+        self.my_repo._set_clone_checkpoint(1000, **_git_cmd_args)
+        self.assertEqual(
+            self.my_repo.get_clone_checkpoint(**_git_cmd_args), 1000
+        )
+        self.my_repo._set_clone_checkpoint(None, **_git_cmd_args)
+        self.assertIsNone(
+            self.my_repo.get_clone_checkpoint(**_git_cmd_args)
+        )
+
+    def test_fetch_progress(self):
+        """Check that streamed trunk commits are indexed immediately."""
+        commit3 = self.svn_commit(3)
+        output = "r3 = {0} (refs/remotes/trunk)\\n" \
+                 "r4 = {0} (refs/remotes/tags/v1)\\n".format(commit3)
+        progress = FetchProgress()
+        self.my_repo._run_fetch(
+            [sys.executable, "-c", "print('"+output+"', end='')"],
+            progress,
+        )
+        self.assertEqual(progress.current_revision, 4)
+        self.assertEqual(progress.commits, 2)
+        self.assertEqual(self.my_repo.rev_index.get_commit(3), commit3)
+        self.assertEqual(self.my_repo.rev_index.last_revision(), 3)
+
+    def test_get_svn_revision_reset(self):
+        """Check that a stale index is rebuilt after trunk is rewound."""
+        commit3 = self.svn_commit(3)
+        self.svn_commit(6)
+        self.my_repo.update_rev_index(**_git_cmd_args)
+        subprocess.check_call(
+            ["git", "update-ref", "refs/remotes/trunk", commit3],
+            cwd=self.repo_path,
+            **_git_cmd_args
+        )
+        self.assertEqual(self.my_repo.get_svn_revision(**_git_cmd_args), 3)
+        self.assertEqual(self.my_repo.rev_index.last_revision(), 3)
+
+
 class TestGitSvnRepo(TestGitSvnRepoBase):
 
     """Tests for GitSvnRepo using one ignored revision."""
@@ -493,6 +1065,36 @@ class TestGitSvnRepo(TestGitSvnRepoBase):
         self.assertIn("bad", sub_dirs)
         self.assertNotIn("foo", sub_dirs)
 
+    def test_clone_chunked(self):
+        """Test that a chunked clone fetches everything but ignore_revs."""
+        self.my_repo.clone(chunk_size=2, **_git_cmd_args)
+
+        self.assertIsNone(
+            self.my_repo.get_clone_checkpoint(**_git_cmd_args)
+        )
+        with self.assertRaises(subprocess.CalledProcessError):
+            subprocess.check_call(
+                ["git", "show-ref", "-q", "--verify",
+                 "refs/remotes/tags/bad_tag"],
+                cwd=self.repo_path,
+                **_git_cmd_args
+            )
+        sub_dirs = os.listdir(self.repo_path)
+        self.assertNotIn("bad", sub_dirs)
+        self.assertIn("foo", sub_dirs)
+
+    def test_clone_chunked_resume(self):
+        """Test that a chunked clone resumes from its checkpoint."""
+        self.my_repo.init(**_git_cmd_args)
+        self.my_repo._set_clone_checkpoint(3, **_git_cmd_args)
+        self.my_repo.clone(chunk_size=2, **_git_cmd_args)
+
+        # Revisions up to the checkpoint are assumed to be fetched, so the
+        # bad file from revision 3 never appears.
+        self.assertEqual(self.my_repo.get_svn_revision(**_git_cmd_args), 6)
+        sub_dirs = os.listdir(self.repo_path)
+        self.assertIn("foo", sub_dirs)
+
     def test_rebase(self):
         """Test that GitSvnRepo.rebase() updates the repository."""
         self.my_repo.init(
@@ -517,6 +1119,31 @@ class TestGitSvnRepo(TestGitSvnRepoBase):
         self.assertIn("foo", sub_dirs)
 
 
+    def test_rebase_mirror(self):
+        """Test that a rebase fetches via a mirror, keeping upstream URLs."""
+        mirror_dir = tempfile.mkdtemp()
+        try:
+            svn_repo = SvnRepo(name="mirrored", path=self.my_svn_repo.path,
+                               trunk_head="trunk", trunk_tags="trunk_tags/*",
+                               mirror_path=os.path.join(mirror_dir, "m"))
+            repo = GitSvnRepo(name=self.repo_name, path=self.repo_path,
+                              svn_repo=svn_repo,
+                              ignore_revs=self.ignore_revs)
+            repo.init(**_git_cmd_args)
+            repo.rebase(**_git_cmd_args)
+            self.assertTrue(os.path.isdir(svn_repo.mirror_path))
+            git_log = subprocess.check_output(
+                ["git", "log", "-1", "--format=%B", "refs/remotes/trunk"],
+                cwd=self.repo_path,
+                universal_newlines=True,
+                env={},
+            )
+            self.assertIn("git-svn-id: "+svn_repo.path+"/trunk@", git_log)
+            self.assertIn("foo", os.listdir(self.repo_path))
+        finally:
+            shutil.rmtree(mirror_dir)
+
+
 class TestGitSvnRepo2(TestGitSvnRepoBase):
 
     """Test the "GitSvnRepo" class with multiple ignore_revs."""
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Unit test module for revindex.py"""
+
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from GitSvnHack.revindex import RevIndex
+
+
+class TestRevIndex(unittest.TestCase):
+
+    """Test the RevIndex class."""
+
+    commits = {
+        3: "1111111111111111111111111111111111111111",
+        5: "2222222222222222222222222222222222222222",
+        6: "abcdef0123456789abcdef0123456789abcdef01",
+    }
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.temp_dir, "svnhack", "idx")
+        self.rev_index = RevIndex(self.index_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_path(self):
+        """Check that the index path is retained."""
+        self.assertEqual(self.rev_index.path, self.index_path)
+
+    def test_empty(self):
+        """Check lookups on an index that has not been written."""
+        self.assertEqual(self.rev_index.last_revision(), 0)
+        self.assertIsNone(self.rev_index.get_commit(3))
+        self.assertIsNone(self.rev_index.get_revision(self.commits[3]))
+
+    def test_update(self):
+        """Check that entries can be looked up in both directions."""
+        self.rev_index.update(sorted(self.commits.items()))
+        self.assertEqual(self.rev_index.last_revision(), 6)
+        for revision, commit in self.commits.items():
+            self.assertEqual(self.rev_index.get_commit(revision), commit)
+            self.assertEqual(self.rev_index.get_revision(commit), revision)
+
+    def test_holes(self):
+        """Check that revisions without commits are not found."""
+        self.rev_index.update(sorted(self.commits.items()))
+        for revision in (0, 1, 2, 4, 7, 100, -1):
+            self.assertIsNone(self.rev_index.get_commit(revision))
+        self.assertIsNone(self.rev_index.get_revision("3"*40))
+
+    def test_find_commit(self):
+        """Check that revisions without commits find an earlier commit."""
+        self.assertIsNone(self.rev_index.find_commit(3))
+        self.rev_index.update(sorted(self.commits.items()))
+        self.assertIsNone(self.rev_index.find_commit(2))
+        self.assertEqual(self.rev_index.find_commit(3), self.commits[3])
+        self.assertEqual(self.rev_index.find_commit(4), self.commits[3])
+        self.assertEqual(self.rev_index.find_commit(100), self.commits[6])
+
+    def test_incremental_update(self):
+        """Check that later updates extend the index."""
+        self.rev_index.update([(3, self.commits[3])])
+        self.assertEqual(self.rev_index.last_revision(), 3)
+        self.rev_index.update([(5, self.commits[5]), (6, self.commits[6])])
+        self.assertEqual(self.rev_index.last_revision(), 6)
+        self.assertEqual(self.rev_index.get_commit(3), self.commits[3])
+        self.assertEqual(os.path.getsize(self.index_path), 7*20)
+
+    def test_unaligned_match(self):
+        """Check that hash bytes spanning two slots are not matched."""
+        self.rev_index.update([(1, "00"*10+"ab"*10), (2, "cd"*10+"00"*10)])
+        self.assertIsNone(self.rev_index.get_revision("ab"*10+"cd"*10))
+
+    def test_truncate(self):
+        """Check that truncate removes later entries only."""
+        self.rev_index.update(sorted(self.commits.items()))
+        self.rev_index.truncate(5)
+        self.assertEqual(self.rev_index.last_revision(), 5)
+        self.assertEqual(self.rev_index.get_commit(3), self.commits[3])
+        self.assertIsNone(self.rev_index.get_commit(6))
+        self.rev_index.truncate(8)
+        self.assertEqual(self.rev_index.last_revision(), 5)
+
+    def test_clear(self):
+        """Check that clear removes all entries."""
+        self.rev_index.update(sorted(self.commits.items()))
+        self.rev_index.clear()
+        self.assertEqual(self.rev_index.last_revision(), 0)
+        self.assertIsNone(self.rev_index.get_commit(3))
+
+    def test_pickle(self):
+        """Check that RevIndex objects can be pickled."""
+        self.rev_index.update(sorted(self.commits.items()))
+        new_index = pickle.loads(pickle.dumps(self.rev_index))
+        self.assertEqual(new_index.get_commit(5), self.commits[5])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Unit test module for revisions.py"""
+
+import unittest
+
+from GitSvnHack.revisions import FetchPlan, RevisionSet
+
+
+class TestRevisionSet(unittest.TestCase):
+
+    """Test the RevisionSet class."""
+
+    def test_from_ints(self):
+        """Check that consecutive revisions are merged into ranges."""
+        rev_set = RevisionSet([7, 4, 5, 6, 10, 4])
+        self.assertEqual(rev_set.ranges(), [(4, 7), (10, 10)])
+        self.assertEqual(list(rev_set), [4, 5, 6, 7, 10])
+        self.assertEqual(len(rev_set), 5)
+
+    def test_copy(self):
+        """Check that a RevisionSet can be copied."""
+        rev_set = RevisionSet([4, 5])
+        rev_copy = RevisionSet(rev_set)
+        rev_copy.add_range(10, 12)
+        self.assertEqual(rev_set.ranges(), [(4, 5)])
+
+    def test_from_string(self):
+        """Check parsing of revisions and ranges."""
+        rev_set = RevisionSet.from_string("4, 1200-4800,7")
+        self.assertEqual(rev_set.ranges(), [(4, 4), (7, 7), (1200, 4800)])
+        self.assertEqual(len(rev_set), 3603)
+
+    def test_from_string_empty(self):
+        """Check that an empty string yields an empty set."""
+        rev_set = RevisionSet.from_string("")
+        self.assertFalse(rev_set)
+        self.assertIsNone(rev_set.first())
+
+    def test_from_string_invalid(self):
+        """Check that bad strings raise ValueError."""
+        with self.assertRaises(ValueError):
+            RevisionSet.from_string("4,x")
+        with self.assertRaises(ValueError):
+            RevisionSet.from_string("10-5")
+
+    def test_str(self):
+        """Check that the string form round-trips."""
+        string = "4,7,1200-4800"
+        self.assertEqual(str(RevisionSet.from_string(string)), string)
+
+    def test_add_range_merge(self):
+        """Check that overlapping and adjacent ranges are merged."""
+        rev_set = RevisionSet.from_string("1-3,10-12,20")
+        rev_set.add_range(4, 10)
+        self.assertEqual(rev_set.ranges(), [(1, 12), (20, 20)])
+        rev_set.add_range(15, 16)
+        self.assertEqual(rev_set.ranges(), [(1, 12), (15, 16), (20, 20)])
+        rev_set.add_range(0, 30)
+        self.assertEqual(rev_set.ranges(), [(0, 30)])
+
+    def test_contains(self):
+        """Check membership tests."""
+        rev_set = RevisionSet.from_string("4,1200-4800")
+        self.assertIn(4, rev_set)
+        self.assertIn(1200, rev_set)
+        self.assertIn(3000, rev_set)
+        self.assertIn(4800, rev_set)
+        self.assertNotIn(3, rev_set)
+        self.assertNotIn(5, rev_set)
+        self.assertNotIn(4801, rev_set)
+
+    def test_first(self):
+        """Check that first returns the lowest revision."""
+        self.assertEqual(RevisionSet([9, 3]).first(), 3)
+
+    def test_equality(self):
+        """Check comparison between RevisionSets."""
+        self.assertEqual(RevisionSet([4, 5]), RevisionSet.from_string("4-5"))
+        self.assertNotEqual(RevisionSet([4]), RevisionSet([5]))
+
+    def test_windows(self):
+        """Check the windows between ignored revisions."""
+        rev_set = RevisionSet.from_string("4,7,1200-4800")
+        self.assertEqual(rev_set.windows(2),
+                         [(2, 3), (5, 6), (8, 1199), (4801, "HEAD")])
+        self.assertEqual(rev_set.windows(2, 1500),
+                         [(2, 3), (5, 6), (8, 1199)])
+        self.assertEqual(rev_set.windows(2, 5000),
+                         [(2, 3), (5, 6), (8, 1199), (4801, 5000)])
+
+    def test_windows_start_inside(self):
+        """Check windows starting inside or after ignored ranges."""
+        rev_set = RevisionSet.from_string("4,7,1200-4800")
+        self.assertEqual(rev_set.windows(3000), [(4801, "HEAD")])
+        self.assertEqual(rev_set.windows(4), [(5, 6), (8, 1199),
+                                              (4801, "HEAD")])
+        self.assertEqual(rev_set.windows(6000, 7000), [(6000, 7000)])
+        self.assertEqual(rev_set.windows(1200, 4800), [])
+
+    def test_windows_empty(self):
+        """Check windows when nothing is ignored."""
+        self.assertEqual(RevisionSet().windows(5), [(5, "HEAD")])
+        self.assertEqual(RevisionSet().windows(5, 9), [(5, 9)])
+
+
+class TestFetchPlan(unittest.TestCase):
+
+    """Test the FetchPlan class."""
+
+    ignore_revs = RevisionSet.from_string("4,7,10-12")
+
+    def test_naive(self):
+        """Check that without log information, every window is fetched."""
+        plan = FetchPlan(self.ignore_revs, 2)
+        self.assertEqual(plan.windows,
+                         [(2, 3), (5, 6), (8, 9), (13, "HEAD")])
+        self.assertEqual(plan.naive_count, 4)
+        self.assertEqual(plan.saved_launches, 0)
+
+    def test_drop_empty(self):
+        """Check that windows without changes are dropped."""
+        plan = FetchPlan(self.ignore_revs, 2, None, [3, 4, 7, 9, 11])
+        self.assertEqual(plan.windows, [(2, 3), (8, 9)])
+        self.assertEqual(plan.saved_launches, 1)
+
+    def test_merge(self):
+        """Check that windows separated by unchanged revisions merge."""
+        plan = FetchPlan(self.ignore_revs, 2, None, [3, 5, 7, 9, 14])
+        self.assertEqual(plan.windows, [(2, 6), (8, "HEAD")])
+        plan = FetchPlan(self.ignore_revs, 2, None, [3, 5, 9, 14])
+        self.assertEqual(plan.windows, [(2, "HEAD")])
+        self.assertEqual(plan.saved_launches, 2)
+
+    def test_merge_across_empty_window(self):
+        """Check merging across a dropped window."""
+        plan = FetchPlan(self.ignore_revs, 2, 20, [3, 15])
+        self.assertEqual(plan.windows, [(2, 20)])
+
+    def test_no_changes(self):
+        """Check that nothing is fetched if nothing changed."""
+        plan = FetchPlan(self.ignore_revs, 2, 20, [])
+        self.assertEqual(plan.windows, [])
+        self.assertEqual(plan.saved_launches, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""Unit test module for runner.py"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from GitSvnHack.runner import CommandRecord, CommandRunner, \
+    get_default_runner, set_default_runner
+
+
+class TestCommandRecord(unittest.TestCase):
+
+    """Test the CommandRecord class."""
+
+    def make_record(self, argv):
+        return CommandRecord(argv, "/tmp", 0.0, 1.5, 0, None)
+
+    def test_name(self):
+        """Check that similar commands get the same name."""
+        self.assertEqual(
+            self.make_record(["git", "svn", "fetch", "-r", "1:2"]).name,
+            "git svn fetch"
+        )
+        self.assertEqual(
+            self.make_record(["git", "log", "--reverse", "HEAD"]).name,
+            "git log"
+        )
+        self.assertEqual(
+            self.make_record(["svn", "info", "file:///foo"]).name,
+            "svn info"
+        )
+        self.assertEqual(self.make_record(["git", "svn"]).name, "git svn")
+
+    def test_to_dict(self):
+        """Check conversion to a dictionary."""
+        record = self.make_record(["git", "init"])
+        self.assertEqual(record.to_dict(), {
+            "argv": ["git", "init"],
+            "cwd": "/tmp",
+            "start_time": 0.0,
+            "wall_time": 1.5,
+            "returncode": 0,
+            "output_bytes": None,
+        })
+
+
+class TestCommandRunner(unittest.TestCase):
+
+    """Test the CommandRunner class."""
+
+    def setUp(self):
+        fd, self.trace_path = tempfile.mkstemp()
+        os.close(fd)
+        self.runner = CommandRunner(trace_path=self.trace_path)
+
+    def tearDown(self):
+        os.remove(self.trace_path)
+
+    def python_argv(self, code):
+        return [sys.executable, "-c", code]
+
+    def test_check_call(self):
+        """Check that successful calls are recorded."""
+        argv = self.python_argv("pass")
+        self.assertEqual(self.runner.check_call(argv), 0)
+        record = self.runner.records[0]
+        self.assertEqual(record.argv, argv)
+        self.assertEqual(record.returncode, 0)
+        self.assertIsNone(record.output_bytes)
+        self.assertGreaterEqual(record.wall_time, 0)
+
+    def test_check_call_failure(self):
+        """Check that failed calls raise and are recorded."""
+        with self.assertRaises(subprocess.CalledProcessError):
+            self.runner.check_call(self.python_argv("exit(3)"))
+        self.assertEqual(self.runner.records[0].returncode, 3)
+
+    def test_check_call_missing(self):
+        """Check that commands that can't be started are recorded."""
+        with self.assertRaises(OSError):
+            self.runner.check_call(["/nonexistent/command"])
+        self.assertIsNone(self.runner.records[0].returncode)
+
+    def test_check_output(self):
+        """Check that output is returned and its size recorded."""
+        output = self.runner.check_output(
+            self.python_argv("print('hello')"),
+            cwd=tempfile.gettempdir(),
+            universal_newlines=True,
+        )
+        self.assertEqual(output, "hello\n")
+        record = self.runner.records[0]
+        self.assertEqual(record.output_bytes, 6)
+        self.assertEqual(record.cwd, tempfile.gettempdir())
+
+    def test_check_output_failure(self):
+        """Check that failed commands raise and are recorded."""
+        with self.assertRaises(subprocess.CalledProcessError):
+            self.runner.check_output(
+                self.python_argv("print('oops'); exit(2)")
+            )
+        record = self.runner.records[0]
+        self.assertEqual(record.returncode, 2)
+        self.assertEqual(record.output_bytes, len(b"oops"+os.linesep.encode()))
+
+    def test_trace(self):
+        """Check that the trace file has one JSON line per command."""
+        self.runner.check_call(self.python_argv("pass"))
+        self.runner.check_output(self.python_argv("print(1)"))
+        with open(self.trace_path) as trace_file:
+            lines = [json.loads(line) for line in trace_file]
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines[1]["argv"], self.python_argv("print(1)"))
+        self.assertEqual(lines[1]["returncode"], 0)
+
+    def test_check_lines(self):
+        """Check that output lines are passed on as they are read."""
+        lines = []
+        self.runner.check_lines(
+            self.python_argv("print('one'); print('two')"), lines.append
+        )
+        self.assertEqual(lines, ["one\n", "two\n"])
+        self.assertEqual(self.runner.records[0].output_bytes, 8)
+
+    def test_check_lines_undecodable(self):
+        """Check that bytes that are not UTF-8 don't stop the output."""
+        lines = []
+        self.runner.check_lines(
+            self.python_argv("import sys; "
+                             "sys.stdout.buffer.write(b'a\\xff\\r\\nb\\n')"),
+            lines.append
+        )
+        self.assertEqual(lines, ["a\ufffd\n", "b\n"])
+        self.assertEqual(self.runner.records[0].output_bytes, 6)
+
+    def test_check_lines_failure(self):
+        """Check that failed commands raise after their output is read."""
+        lines = []
+        with self.assertRaises(subprocess.CalledProcessError):
+            self.runner.check_lines(
+                self.python_argv("print('oops'); exit(2)"), lines.append
+            )
+        self.assertEqual(lines, ["oops\n"])
+        self.assertEqual(self.runner.records[0].returncode, 2)
+
+    def test_check_lines_callback_error(self):
+        """Check that an exception in the callback kills the command."""
+        def stop(line):
+            raise KeyboardInterrupt()
+        with self.assertRaises(KeyboardInterrupt):
+            self.runner.check_lines(
+                self.python_argv("import time; print('go', flush=True); "
+                                 "time.sleep(60)"),
+                stop
+            )
+        self.assertNotEqual(self.runner.records[0].returncode, 0)
+        self.assertLess(self.runner.records[0].wall_time, 30)
+
+    def test_add_record(self):
+        """Check that records added directly are kept and traced."""
+        record = CommandRecord(["git", "init"], None, 0.0, 0.5, 0, None)
+        self.runner.add_record(record)
+        self.assertIs(self.runner.records[0], record)
+        with open(self.trace_path) as trace_file:
+            self.assertEqual(json.loads(trace_file.read()),
+                             record.to_dict())
+
+    def test_max_records(self):
+        """Check that only the most recent records are kept if limited."""
+        runner = CommandRunner(max_records=2)
+        records = [CommandRecord(["git", str(i)], None, 0.0, 0.5, 0, None)
+                   for i in range(3)]
+        for record in records:
+            runner.add_record(record)
+        self.assertEqual(runner.max_records, 2)
+        self.assertEqual(runner.records, records[1:])
+
+    def test_summary(self):
+        """Check that the summary groups commands by name."""
+        for i in range(3):
+            self.runner.check_call(self.python_argv("pass"))
+        lines = self.runner.summary(top=1)
+        self.assertEqual(lines[0].split()[0], "3")
+        self.assertIn("3", lines[2].split()[0])
+        self.assertEqual(len(lines), 5)
+
+
+class TestDefaultRunner(unittest.TestCase):
+
+    """Test getting and setting the default runner."""
+
+    def test_set_default_runner(self):
+        """Check that the default runner can be replaced."""
+        old_runner = get_default_runner()
+        new_runner = CommandRunner()
+        try:
+            set_default_runner(new_runner)
+            self.assertIs(get_default_runner(), new_runner)
+        finally:
+            set_default_runner(old_runner)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""Unit test module for submodules.py"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from GitSvnHack.externals import SvnExternal
+from GitSvnHack.repository import GitSvnRepo, SvnRepo
+from GitSvnHack.runner import CommandRunner
+from GitSvnHack.submodules import SubmodulePlanner
+
+# In Python 3.2, there is no unittest.mock, but the old mock library may be
+# installed:
+if sys.version_info[0:1] < (3,3):
+    import mock
+else:
+    import unittest.mock
+
+
+_root = "svn://host/repo"
+
+
+class FakeExternalsCache:
+
+    """Stand-in for ExternalsCache with fixed externals per trunk URL."""
+
+    def __init__(self, externals):
+        self.externals = externals
+        self.queries = []
+        self.roots = []
+
+    def get_externals(self, url, revision, **args):
+        self.queries.append((url, revision))
+        return self.externals.get(url, [])
+
+    def get_root(self, url, **args):
+        return _root
+
+    def get_target_revision(self, external, revision, root, **args):
+        self.roots.append(root)
+        if external.operative_revision is not None:
+            return external.operative_revision
+        return revision
+
+
+class TestSubmodulePlanner(unittest.TestCase):
+
+    """Test the SubmodulePlanner class."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.runner = mock.Mock()
+        self.repos = [self.make_repo("foo", 20), self.make_repo("bar", 30)]
+        foo_trunk = _root+"/foo/trunk"
+        bar_trunk = _root+"/bar/trunk"
+        self.cache = FakeExternalsCache({
+            foo_trunk: [
+                SvnExternal(foo_trunk, "lib", _root+"/libs/a", 12),
+                SvnExternal(foo_trunk+"/src", "b", _root+"/libs/b"),
+            ],
+            bar_trunk: [
+                SvnExternal(bar_trunk, "a", _root+"/libs/a", 15),
+            ],
+        })
+        self.planner = SubmodulePlanner(
+            os.path.join(self.temp_dir, "externals"),
+            externals_cache=self.cache, max_workers=2
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def make_repo(self, name, revision):
+        svn_repo = SvnRepo(name=name, path=_root+"/"+name,
+                           trunk_head="trunk", trunk_tags="tags/*")
+        repo = GitSvnRepo(name=name, path=os.path.join(self.temp_dir, name),
+                          svn_repo=svn_repo, runner=self.runner)
+        repo.get_svn_revision = mock.Mock(return_value=revision)
+        return repo
+
+    def test_plan(self):
+        """Check that externals are deduplicated by URL."""
+        clones = self.planner.plan(self.repos)
+        self.assertEqual(self.cache.queries, [(_root+"/foo/trunk", 20),
+                                              (_root+"/bar/trunk", 30)])
+        self.assertEqual(self.cache.roots, [_root]*3)
+        self.assertEqual([clone.url for clone in clones],
+                         [_root+"/libs/a", _root+"/libs/b"])
+        self.assertEqual(
+            [(use.repo.name, use.path, use.revision)
+             for use in clones[0].uses],
+            [("foo", "lib", 12), ("bar", "a", 15)]
+        )
+        self.assertEqual(clones[0].revision, 15)
+        self.assertEqual(clones[1].uses[0].path, "src/b")
+        self.assertEqual(clones[1].revision, 20)
+        repo = clones[0].repo
+        self.assertEqual(repo.path, os.path.join(self.temp_dir, "externals",
+                                                 "host_repo_libs_a"))
+        self.assertEqual(repo.svn_repo.path, _root+"/libs")
+        self.assertEqual(repo.svn_repo.trunk_branch.head, "a")
+        self.assertIsNone(repo.svn_repo.trunk_tags)
+
+    def test_plan_layout(self):
+        """Check that only trunk externals are cloned with their tags."""
+        foo_trunk = _root+"/foo/trunk"
+        self.cache.externals[foo_trunk] = [
+            SvnExternal(foo_trunk, "c", _root+"/libs/c/trunk"),
+            SvnExternal(foo_trunk, "d", _root+"/libs/d/tags/1.0"),
+        ]
+        clones = self.planner.plan(self.repos[:1])
+        self.assertEqual([clone.repo.svn_repo.trunk_tags for clone in clones],
+                         [_root+"/libs/c/tags/*", None])
+        self.assertEqual(clones[1].repo.clone_argv(5, [])[:6],
+                         ["git", "svn", "clone", _root+"/libs/d/tags",
+                          "-T", "1.0"])
+        self.assertNotIn("-t", clones[1].repo.clone_argv(5, []))
+
+    def test_plan_name_collision(self):
+        """Check that URLs that would share a clone are rejected."""
+        foo_trunk = _root+"/foo/trunk"
+        self.cache.externals[foo_trunk] = [
+            SvnExternal(foo_trunk, "x", _root+"/libs/a+b"),
+            SvnExternal(foo_trunk, "y", _root+"/libs/a_b"),
+        ]
+        with self.assertRaises(ValueError):
+            self.planner.plan(self.repos[:1])
+
+    def test_clone_all(self):
+        """Check that each clone is made once, up to the latest revision."""
+        clones = self.planner.plan(self.repos)
+        with mock.patch.object(GitSvnRepo, "clone") as clone:
+            clone.side_effect = [None, RuntimeError("svn went away")]
+            results = self.planner.clone_all(clones)
+        self.assertEqual(sorted(call[1]["revision"]
+                                for call in clone.call_args_list),
+                         [15, 20])
+        self.assertEqual([result.action for result in results],
+                         ["clone", "clone"])
+        self.assertEqual(sum(1 for result in results if result.succeeded),
+                         1)
+
+    def test_rebase_existing(self):
+        """Check that existing clones are only rebased when behind."""
+        clones = self.planner.plan(self.repos)
+        for clone in clones:
+            subprocess.check_call(["git", "init", "-q", clone.repo.path])
+        with mock.patch.object(GitSvnRepo, "get_svn_revision") as current, \
+             mock.patch.object(GitSvnRepo, "rebase") as rebase:
+            current.return_value = 15
+            results = self.planner.clone_all(clones)
+        rebase.assert_called_once_with(revision=20)
+        self.assertEqual([result.action for result in results],
+                         ["rebase", "rebase"])
+
+    def test_submodule_url(self):
+        """Check that URLs are relative unless url_base is set."""
+        clones = self.planner.plan(self.repos)
+        self.assertEqual(
+            self.planner._submodule_url(clones[0], self.repos[0]),
+            "../externals/host_repo_libs_a"
+        )
+        planner = SubmodulePlanner(
+            os.path.join(self.temp_dir, "externals"),
+            url_base="https://git.example.com/ext/"
+        )
+        self.assertEqual(planner._submodule_url(clones[0], self.repos[0]),
+                         "https://git.example.com/ext/host_repo_libs_a")
+
+
+class TestAddSubmodules(unittest.TestCase):
+
+    """Test SubmodulePlanner.add_submodules on real repositories."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.env = dict(os.environ, GIT_AUTHOR_NAME="Test",
+                        GIT_AUTHOR_EMAIL="test@test",
+                        GIT_COMMITTER_NAME="Test",
+                        GIT_COMMITTER_EMAIL="test@test")
+        self.runner = CommandRunner()
+        foo_trunk = _root+"/foo/trunk"
+        self.repo = self.make_repo("foo", ["a.c"])
+        self.repo.get_svn_revision = mock.Mock(return_value=20)
+        self.planner = SubmodulePlanner(
+            os.path.join(self.temp_dir, "externals"),
+            externals_cache=FakeExternalsCache({foo_trunk: [
+                SvnExternal(foo_trunk, "lib", _root+"/libs/a", 12),
+            ]})
+        )
+        self.clones = self.planner.plan([self.repo])
+        lib_path = self.clones[0].repo.path
+        os.makedirs(lib_path)
+        self.lib = self.make_repo(lib_path, ["lib.c"])
+        self.lib_commit = self.git(lib_path, "rev-parse", "HEAD")
+        self.clones[0].repo.rev_index.update([(12, self.lib_commit)])
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def git(self, path, *argv):
+        return subprocess.check_output(
+            ("git",)+argv, cwd=path, env=self.env, universal_newlines=True
+        ).strip()
+
+    def make_repo(self, name, files):
+        path = os.path.join(self.temp_dir, name)
+        subprocess.check_call(["git", "init", "-q", path])
+        for file_name in files:
+            with open(os.path.join(path, file_name), "w") as new_file:
+                new_file.write(file_name+"\n")
+        self.git(path, "add", *files)
+        self.git(path, "commit", "-q", "-m", "Add files.")
+        svn_repo = SvnRepo(name=name, path=_root+"/"+name,
+                           trunk_head="trunk", trunk_tags="tags/*")
+        return GitSvnRepo(name=name, path=path, svn_repo=svn_repo,
+                          runner=self.runner)
+
+    def test_branch(self):
+        """Check that submodules are committed on a branch only."""
+        path = self.repo.path
+        head = self.git(path, "rev-parse", "HEAD")
+        self.assertEqual(self.planner.add_submodules(self.clones,
+                                                     env=self.env),
+                         [self.repo])
+        self.assertEqual(self.git(path, "rev-parse", "HEAD"), head)
+        self.assertEqual(self.git(path, "status", "--porcelain"), "")
+        self.assertEqual(self.git(path, "rev-parse", "svn-externals^"),
+                         head)
+        self.assertEqual(
+            self.git(path, "ls-tree", "svn-externals", "lib"),
+            "160000 commit {0}\tlib".format(self.lib_commit)
+        )
+        self.assertEqual(
+            self.git(path, "config", "--blob", "svn-externals:.gitmodules",
+                     "submodule.lib.url"),
+            "../externals/host_repo_libs_a"
+        )
+
+    def test_unchanged(self):
+        """Check that the branch is only moved if something changed."""
+        self.planner.add_submodules(self.clones, env=self.env)
+        branch = self.git(self.repo.path, "rev-parse", "svn-externals")
+        self.assertEqual(self.planner.add_submodules(self.clones,
+                                                     env=self.env), [])
+        self.assertEqual(
+            self.git(self.repo.path, "rev-parse", "svn-externals"), branch
+        )
+        self.git(self.repo.path, "commit", "-q", "--allow-empty", "-m",
+                 "Fetched.")
+        self.assertEqual(self.planner.add_submodules(self.clones,
+                                                     env=self.env),
+                         [self.repo])
+        self.assertEqual(
+            self.git(self.repo.path, "rev-parse", "svn-externals^"),
+            self.git(self.repo.path, "rev-parse", "HEAD")
+        )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Unit test module for svnignore.py"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from GitSvnHack.repository import GitSvnRepo, SvnRepo
+from GitSvnHack.svnignore import svn_ignore_to_gitignore
+from GitSvnHack.test_externals import FakeSvn
+
+# In Python 3.2, there is no unittest.mock, but the old mock library may be
+# installed:
+if sys.version_info[0:1] < (3,3):
+    import mock
+else:
+    import unittest.mock
+
+
+_trunk = "svn://host/repo/proj/trunk"
+
+
+class TestSvnIgnoreToGitignore(unittest.TestCase):
+
+    """Test the svn_ignore_to_gitignore function."""
+
+    def test_convert(self):
+        """Check that patterns are anchored and escaped."""
+        lines = svn_ignore_to_gitignore("*.o\n\n build \n#tmp\n").split("\n")
+        self.assertEqual(lines[1:], ["/.gitignore", "/*.o", "/build",
+                                     "/\\#tmp", ""])
+
+
+class TestSvnIgnoreConverter(unittest.TestCase):
+
+    """Test svn:ignore conversion through GitSvnRepo."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.temp_dir, "src"))
+        self.svn = FakeSvn()
+        svn_repo = SvnRepo(name="proj", path="svn://host/repo/proj",
+                           trunk_head="trunk", trunk_tags="tags/*",
+                           runner=self.svn)
+        svn_repo.get_root = mock.Mock(return_value="svn://host/repo")
+        self.repo = GitSvnRepo(name="proj", path=self.temp_dir,
+                               svn_repo=svn_repo, runner=self.svn)
+        self.repo.get_svn_revision = mock.Mock(return_value=10)
+        self.svn.trees[10] = {
+            _trunk: "*.o",
+            _trunk+"/src": "build",
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def read(self, rel_path):
+        with open(os.path.join(self.temp_dir, rel_path)) as gitignore:
+            return gitignore.read().splitlines()[2:]
+
+    def test_convert(self):
+        """Check that a .gitignore is written for each property."""
+        written, removed = self.repo.convert_svn_ignore()
+        self.assertEqual(written, [".gitignore", "src/.gitignore"])
+        self.assertEqual(removed, [])
+        self.assertEqual(self.read(".gitignore"), ["/*.o"])
+        self.assertEqual(self.read("src/.gitignore"), ["/build"])
+        self.assertEqual(self.svn.calls, [
+            ["svn", "propget", "--xml", "svn:ignore", "-R", _trunk+"@10"],
+        ])
+        self.assertEqual(self.repo.convert_svn_ignore(), ([], []))
+        self.assertEqual(len(self.svn.calls), 1)
+
+    def test_incremental(self):
+        """Check that only changed directories are read again."""
+        self.repo.convert_svn_ignore()
+        self.svn.trees[12] = {_trunk: "*.o\n*.a"}
+        self.svn.logs[11] = [("M", "dir", "/proj/trunk")]
+        self.svn.logs[12] = [("D", "dir", "/proj/trunk/src")]
+        self.repo.get_svn_revision.return_value = 12
+        del self.svn.calls[:]
+        written, removed = self.repo.convert_svn_ignore()
+        self.assertEqual(written, [".gitignore"])
+        self.assertEqual(removed, ["src/.gitignore"])
+        self.assertEqual(self.read(".gitignore"), ["/*.o", "/*.a"])
+        self.assertEqual(self.svn.calls, [
+            ["svn", "log", "-v", "--xml", "-r", "11:12", _trunk+"@12"],
+            ["svn", "propget", "--xml", "svn:ignore", _trunk+"@12"],
+        ])
+
+    def test_keep_own_gitignore(self):
+        """Check that .gitignore files that were not generated are kept."""
+        with open(os.path.join(self.temp_dir, ".gitignore"), "w") as own:
+            own.write("mine\n")
+        written, removed = self.repo.convert_svn_ignore()
+        self.assertEqual(written, ["src/.gitignore"])
+        with open(os.path.join(self.temp_dir, ".gitignore")) as own:
+            self.assertEqual(own.read(), "mine\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Unit test module for svninfo.py"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from GitSvnHack.repository import SvnRepo
+from GitSvnHack.svninfo import SvnInfo, SvnInfoCache, parse_info_xml
+
+# In Python 3.2, there is no unittest.mock, but the old mock library may be
+# installed:
+if sys.version_info[0:1] < (3,3):
+    import mock
+else:
+    import unittest.mock
+
+
+_info_entry = """<entry kind="dir" path="{name}" revision="{head}">
+<url>{root}/{name}</url>
+<relative-url>^/{name}</relative-url>
+<repository>
+<root>{root}</root>
+<uuid>{uuid}</uuid>
+</repository>
+<commit revision="{changed}">
+<author>joe</author>
+<date>2013-05-01T00:00:00.000000Z</date>
+</commit>
+</entry>
+"""
+
+def info_xml(*entries):
+    """Build "svn info --xml" output from (name, head, changed) tuples."""
+    return '<?xml version="1.0" encoding="UTF-8"?>\n<info>\n' + \
+        "".join(_info_entry.format(name=name, head=head, changed=changed,
+                                   root="svn://host/repo", uuid="uuid-1")
+                for name, head, changed in entries) + \
+        "</info>\n"
+
+
+class TestParseInfoXml(unittest.TestCase):
+
+    """Test the parse_info_xml function."""
+
+    def test_parse_info_xml(self):
+        """Check that every entry is parsed."""
+        infos = parse_info_xml(info_xml(("foo", 10, 7), ("bar", 10, 9)))
+        self.assertEqual(len(infos), 2)
+        self.assertEqual(infos[0].url, "svn://host/repo/foo")
+        self.assertEqual(infos[0].root, "svn://host/repo")
+        self.assertEqual(infos[0].uuid, "uuid-1")
+        self.assertEqual(infos[0].revision, 10)
+        self.assertEqual(infos[0].last_changed_rev, 7)
+        self.assertEqual(infos[1].last_changed_rev, 9)
+
+    def test_dict_round_trip(self):
+        """Check conversion to and from dictionaries."""
+        info = SvnInfo("svn://host/repo/foo", "svn://host/repo", "uuid-1",
+                       10, 7)
+        new_info = SvnInfo.from_dict(info.to_dict())
+        self.assertEqual(new_info.to_dict(), info.to_dict())
+
+
+class TestSvnInfoCache(unittest.TestCase):
+
+    """Test the SvnInfoCache class."""
+
+    def setUp(self):
+        self.runner = mock.Mock()
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_query_batch(self):
+        """Check that several URLs are queried with one process."""
+        self.runner.check_output.return_value = \
+            info_xml(("foo", 10, 7), ("bar", 10, 9))
+        cache = SvnInfoCache(runner=self.runner)
+        urls = ["svn://host/repo/foo", "svn://host/repo/bar"]
+        infos = cache.query(urls)
+        self.runner.check_output.assert_called_once_with(
+            ["svn", "info", "--xml"]+urls,
+            universal_newlines=True,
+        )
+        self.assertEqual(infos[urls[0]].last_changed_rev, 7)
+        self.assertEqual(infos[urls[1]].last_changed_rev, 9)
+
+    def test_query_cached(self):
+        """Check that fresh results are not queried again."""
+        self.runner.check_output.return_value = info_xml(("foo", 10, 7))
+        cache = SvnInfoCache(runner=self.runner)
+        cache.query(["svn://host/repo/foo"])
+        infos = cache.query(["svn://host/repo/foo/"])
+        self.assertEqual(self.runner.check_output.call_count, 1)
+        self.assertEqual(infos["svn://host/repo/foo/"].revision, 10)
+
+    def test_query_expired(self):
+        """Check that stale results are queried again."""
+        self.runner.check_output.return_value = info_xml(("foo", 10, 7))
+        cache = SvnInfoCache(ttl=-1, runner=self.runner)
+        cache.query(["svn://host/repo/foo"])
+        cache.query(["svn://host/repo/foo"])
+        self.assertEqual(self.runner.check_output.call_count, 2)
+
+    def test_query_partial_failure(self):
+        """Check that URLs that worked are returned if others failed."""
+        self.runner.check_output.side_effect = subprocess.CalledProcessError(
+            1, ["svn"], info_xml(("foo", 10, 7))
+        )
+        cache = SvnInfoCache(runner=self.runner)
+        infos = cache.query(["svn://host/repo/foo", "svn://host/repo/bad"])
+        self.assertEqual(list(infos.keys()), ["svn://host/repo/foo"])
+
+    def test_get_revision_shared_root(self):
+        """Check that URLs below a known root reuse its latest revision."""
+        self.runner.check_output.return_value = info_xml(("foo", 10, 7))
+        cache = SvnInfoCache(runner=self.runner)
+        self.assertEqual(cache.get_revision("svn://host/repo/foo"), 10)
+        self.assertEqual(cache.get_revision("svn://host/repo/bar"), 10)
+        self.assertEqual(self.runner.check_output.call_count, 1)
+
+    def test_get_revision_missing(self):
+        """Check that LookupError is raised if svn gives no answer."""
+        self.runner.check_output.return_value = info_xml()
+        cache = SvnInfoCache(runner=self.runner)
+        with self.assertRaises(LookupError):
+            cache.get_revision("svn://host/repo/foo")
+
+    def test_persist(self):
+        """Check that the cache is saved to and loaded from disk."""
+        cache_path = os.path.join(self.temp_dir, "info.json")
+        self.runner.check_output.return_value = info_xml(("foo", 10, 7))
+        SvnInfoCache(path=cache_path, runner=self.runner).query(
+            ["svn://host/repo/foo"]
+        )
+        cache = SvnInfoCache(path=cache_path, runner=self.runner)
+        self.assertEqual(cache.get_revision("svn://host/repo/bar"), 10)
+        self.assertEqual(self.runner.check_output.call_count, 1)
+        cache.invalidate()
+        self.assertFalse(os.path.exists(cache_path))
+
+    def test_svn_repo_info_cache(self):
+        """Check that SvnRepo.get_current_revision uses its cache."""
+        self.runner.check_output.return_value = info_xml(("foo", 10, 7))
+        cache = SvnInfoCache(runner=self.runner)
+        svn_repo = SvnRepo(name="foo", path="svn://host/repo/foo",
+                           trunk_head="trunk", trunk_tags="tags/*",
+                           info_cache=cache)
+        self.assertIs(svn_repo.info_cache, cache)
+        self.assertEqual(svn_repo.get_current_revision(), 10)
+        self.assertEqual(svn_repo.get_current_revision(), 10)
+        self.assertEqual(self.runner.check_output.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
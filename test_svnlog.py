@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""Unit test module for svnlog.py"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from GitSvnHack.repository import SvnRepo
+from GitSvnHack.svnlog import SvnLogCache, SvnLogEntry
+from GitSvnHack.test_svninfo import info_xml
+
+# In Python 3.2, there is no unittest.mock, but the old mock library may be
+# installed:
+if sys.version_info[0:1] < (3,3):
+    import mock
+else:
+    import unittest.mock
+
+
+_url = "svn://host/repo/proj"
+
+
+def log_xml(entries):
+    """Build "svn log --xml -v" output from SvnLogEntry objects."""
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<log>\n']
+    for entry in entries:
+        parts.append('<logentry revision="{0}">\n<author>{1}</author>\n'
+                     '<date>{2}</date>\n<paths>\n'.format(
+                         entry.revision, entry.author, entry.date))
+        for action, kind, path, copyfrom_path, copyfrom_rev in entry.paths:
+            copy = ""
+            if copyfrom_path is not None:
+                copy = ' copyfrom-path="{0}" copyfrom-rev="{1}"'.format(
+                    copyfrom_path, copyfrom_rev)
+            parts.append('<path action="{0}" kind="{1}"{2}>{3}</path>\n'
+                         .format(action, kind or "", copy, path))
+        parts.append("</paths>\n<msg>Change.</msg>\n</logentry>\n")
+    parts.append("</log>\n")
+    return "".join(parts)
+
+
+class FakeSvnServer:
+
+    """Stand-in for CommandRunner serving a fixed history.
+
+    Public instance variables:
+    entries - Dictionary mapping revisions to SvnLogEntry objects.
+    head - Latest revision.
+    logs - List of the revision ranges asked for with "svn log".
+
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.head = 0
+        self.logs = []
+
+    def commit(self, author, *paths):
+        self.head += 1
+        self.entries[self.head] = SvnLogEntry(
+            self.head, author, "2013-05-01T00:00:00.000000Z",
+            [path + (None, None) if len(path) == 3 else path
+             for path in paths]
+        )
+
+    def check_output(self, argv, **args):
+        return info_xml(("proj", self.head, self.head)).replace(
+            "svn://host/repo/proj", argv[-1])
+
+    def check_lines(self, argv, callback, **args):
+        start, end = [int(r) for r in argv[argv.index("-r")+1].split(":")]
+        self.logs.append((start, end))
+        entries = [self.entries[r] for r in range(start, end+1)
+                   if r in self.entries]
+        for line in log_xml(entries).splitlines(True):
+            callback(line)
+
+
+class TestSvnLogCache(unittest.TestCase):
+
+    """Test the SvnLogCache class."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.log_path = os.path.join(self.temp_dir, "svnhack", "log.jsonl")
+        self.server = FakeSvnServer()
+        self.server.commit("joe", ("A", "dir", "/proj/trunk"),
+                           ("A", "dir", "/proj/tags"))
+        self.server.commit("ann", ("M", "file", "/proj/trunk/a.c"))
+        self.server.commit("joe", ("A", "dir", "/proj/tags/1.0",
+                                   "/proj/trunk", 2))
+        self.server.commit("bob", ("M", "file", "/other/b.c"))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def make_cache(self):
+        return SvnLogCache(_url, self.log_path, runner=self.server)
+
+    def test_update(self):
+        """Check that only new revisions are downloaded."""
+        cache = self.make_cache()
+        self.assertEqual(cache.update(), 4)
+        self.assertEqual(cache.last_revision, 4)
+        self.assertEqual(cache.update(), 0)
+        self.server.head += 2
+        self.server.commit("ann", ("D", "dir", "/proj/tags/1.0"))
+        self.assertEqual(cache.update(), 1)
+        self.assertEqual(self.server.logs, [(1, 4), (5, 7)])
+        self.assertEqual(cache.update(end=5), 0)
+
+    def test_persist(self):
+        """Check that the log is loaded again from its file."""
+        self.make_cache().update(end=3)
+        cache = self.make_cache()
+        self.assertEqual(cache.last_revision, 3)
+        self.assertEqual(list(cache.get_entries(3))[0].paths,
+                         [("A", "dir", "/proj/tags/1.0", "/proj/trunk", 2)])
+        cache.update()
+        self.assertEqual(self.server.logs[-1], (4, 4))
+
+    def test_torn_write(self):
+        """Check that a line cut short by an interruption is skipped."""
+        self.make_cache().update(end=2)
+        with open(self.log_path, "a") as log_file:
+            log_file.write('{"revision": 3, "auth')
+        cache = self.make_cache()
+        self.assertEqual(cache.last_revision, 2)
+        self.assertEqual(cache.update(), 2)
+        self.assertEqual([entry.revision for entry
+                          in self.make_cache().get_entries()], [1, 2, 3, 4])
+
+    def test_entries_from_file(self):
+        """Check that entries are read from the file as they are needed."""
+        cache = self.make_cache()
+        cache.update(end=2)
+        entries = cache.get_entries()
+        self.assertIs(iter(entries), entries)
+        cache.update()
+        self.assertEqual([entry.revision for entry in entries], [1, 2])
+        self.assertEqual([entry.revision for entry in cache.get_entries(2)],
+                         [2, 3, 4])
+        self.assertEqual(list(cache.get_entries(5)), [])
+        """Check the indexed queries."""
+        cache = self.make_cache()
+        cache.update()
+        self.assertEqual(cache.get_revisions(["/proj/trunk"]), [1, 2])
+        self.assertEqual(cache.get_revisions(["/proj/trunk/"], start=2),
+                         [2])
+        self.assertEqual(cache.get_revisions(["/proj"], end=3), [1, 2, 3])
+        self.assertEqual(cache.get_revisions(["/proj/trunk", "/other"]),
+                         [1, 2, 4])
+        self.assertEqual(cache.get_revisions(["/pro"]), [])
+        self.assertEqual(cache.get_revisions(["/"]), [1, 2, 3, 4])
+        self.assertEqual([entry.revision
+                          for entry in cache.get_entries(2, 3)], [2, 3])
+        self.assertEqual(cache.get_authors(), set(["joe", "ann", "bob"]))
+
+    def test_svn_repo(self):
+        """Check that SvnRepo.get_changed_revisions uses its log cache."""
+        svn_repo = SvnRepo(name="proj", path=_url, trunk_head="trunk",
+                           trunk_tags="tags/*", runner=self.server,
+                           log_cache=self.make_cache())
+        svn_repo.get_root = mock.Mock(return_value="svn://host/repo")
+        self.assertEqual(svn_repo.get_changed_revisions(2), [2, 3])
+        self.assertEqual(svn_repo.get_changed_revisions(1, 2), [1, 2])
+        self.assertEqual(self.server.logs, [(1, 4)])
+
+
+if __name__ == "__main__":
+    unittest.main()
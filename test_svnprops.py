@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Unit test module for svnprops.py"""
+
+import sys
+import unittest
+
+from GitSvnHack.svnprops import get_property, parse_dir_changes, \
+    parse_propget_xml
+
+# In Python 3.2, there is no unittest.mock, but the old mock library may be
+# installed:
+if sys.version_info[0:1] < (3,3):
+    import mock
+else:
+    import unittest.mock
+
+
+def propget_xml(values):
+    """Build "svn propget --xml" output from a {path: value} dictionary."""
+    return '<?xml version="1.0" encoding="UTF-8"?>\n<properties>\n' + \
+        "".join('<target path="{0}">\n<property name="svn:externals">'
+                '{1}</property>\n</target>\n'.format(path, value)
+                for path, value in sorted(values.items())) + \
+        "</properties>\n"
+
+def log_xml(*entries):
+    """Build "svn log -v --xml" output from (revision, paths) tuples.
+
+    Each of the paths is an (action, kind, path) tuple.
+
+    """
+    return '<?xml version="1.0" encoding="UTF-8"?>\n<log>\n' + \
+        "".join('<logentry revision="{0}">\n<paths>\n{1}</paths>\n'
+                '</logentry>\n'.format(
+                    revision,
+                    "".join('<path action="{0}" kind="{1}">{2}</path>\n'
+                            .format(action, kind, path)
+                            for action, kind, path in paths)
+                )
+                for revision, paths in entries) + \
+        "</log>\n"
+
+
+class TestParsePropgetXml(unittest.TestCase):
+
+    """Test the parse_propget_xml function."""
+
+    def test_parse(self):
+        """Check that every target is parsed."""
+        values = parse_propget_xml(propget_xml({
+            "svn://host/repo/trunk": "^/lib lib",
+            "svn://host/repo/trunk/sub": "",
+        }))
+        self.assertEqual(values, {
+            "svn://host/repo/trunk": "^/lib lib",
+            "svn://host/repo/trunk/sub": "",
+        })
+
+    def test_empty(self):
+        """Check that no targets give an empty dictionary."""
+        self.assertEqual(parse_propget_xml(propget_xml({})), {})
+
+
+class TestGetProperty(unittest.TestCase):
+
+    """Test the get_property function."""
+
+    def test_recursive(self):
+        """Check that a whole tree is read with one process."""
+        runner = mock.Mock()
+        runner.check_output.return_value = propget_xml({"svn://a/b": "x"})
+        values = get_property(runner, "svn:externals", "svn://a/b", 5,
+                              stdout=None)
+        runner.check_output.assert_called_once_with(
+            ["svn", "propget", "--xml", "svn:externals", "-R",
+             "svn://a/b@5"],
+            universal_newlines=True,
+        )
+        self.assertEqual(values, {"svn://a/b": "x"})
+
+    def test_not_recursive(self):
+        """Check reading a single directory at HEAD."""
+        runner = mock.Mock()
+        runner.check_output.return_value = propget_xml({})
+        get_property(runner, "svn:ignore", "svn://a/b", recursive=False)
+        runner.check_output.assert_called_once_with(
+            ["svn", "propget", "--xml", "svn:ignore", "svn://a/b"],
+            universal_newlines=True,
+        )
+
+
+class TestParseDirChanges(unittest.TestCase):
+
+    """Test the parse_dir_changes function."""
+
+    def test_actions(self):
+        """Check the net change of each directory."""
+        changes = parse_dir_changes(log_xml(
+            (12, [("M", "dir", "/trunk"), ("D", "dir", "/trunk/old"),
+                  ("M", "dir", "/trunk/new")]),
+            (11, [("A", "dir", "/trunk/new"), ("M", "dir", "/trunk/old"),
+                  ("R", "", "/trunk/lib")]),
+            (13, [("M", "file", "/trunk/file.c")]),
+        ))
+        self.assertEqual(changes, {
+            "/trunk": "M",
+            "/trunk/old": "D",
+            "/trunk/new": "A",
+            "/trunk/lib": "A",
+        })
+
+    def test_readded(self):
+        """Check that a directory deleted and added again counts as added."""
+        changes = parse_dir_changes(log_xml(
+            (4, [("D", "dir", "/trunk/lib")]),
+            (5, [("A", "dir", "/trunk/lib")]),
+        ))
+        self.assertEqual(changes, {"/trunk/lib": "A"})
+
+
+if __name__ == "__main__":
+    unittest.main()
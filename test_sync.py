@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""Unit test module for sync.py"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from GitSvnHack.repository import SvnRepo
+from GitSvnHack.revisions import FetchPlan, RevisionSet
+from GitSvnHack.sync import RepoSyncer, SyncResult, format_summary, svn_host
+
+
+class FakeGitSvnRepo:
+
+    """Stand-in for GitSvnRepo that records concurrent operations."""
+
+    def __init__(self, name, path, svn_url, tracker, fail=False,
+                 mirror_path=None):
+        self.name = name
+        self.path = path
+        self.svn_repo = SvnRepo(name="svn_"+name, path=svn_url,
+                                trunk_head="trunk", trunk_tags="tags/*",
+                                mirror_path=mirror_path)
+        self._tracker = tracker
+        self.remotes = ()
+        self._fail = fail
+
+    def _operation(self, action, **args):
+        self._tracker.enter(self, action)
+        self._tracker.sync_mirror_args[self.name] = args.get("sync_mirror")
+        try:
+            time.sleep(0.05)
+            if self._fail:
+                raise RuntimeError("svn server went away")
+        finally:
+            self._tracker.leave(self)
+
+    def exists(self):
+        return os.path.isdir(self.path)
+
+    def clone(self, **args):
+        self._operation("clone", **args)
+
+    def rebase(self, **args):
+        self._operation("rebase", **args)
+
+
+class ConcurrencyTracker:
+
+    """Track the maximum number of concurrent operations per host."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.active = {}
+        self.max_active = {}
+        self.max_total = 0
+        self.actions = {}
+        self.sync_mirror_args = {}
+        self.started = []
+
+    def enter(self, repo, action):
+        host = svn_host(repo.svn_repo)
+        with self._lock:
+            self.actions[repo.name] = action
+            self.started.append(repo.name)
+            self.active[host] = self.active.get(host, 0) + 1
+            self.max_active[host] = max(self.max_active.get(host, 0),
+                                        self.active[host])
+            self.max_total = max(self.max_total,
+                                 sum(self.active.values()))
+
+    def leave(self, repo):
+        host = svn_host(repo.svn_repo)
+        with self._lock:
+            self.active[host] -= 1
+
+
+class TestSvnHost(unittest.TestCase):
+
+    """Test the svn_host function."""
+
+    def test_svn_host(self):
+        """Check that the host is extracted from the repository URL."""
+        svn_repo = SvnRepo(name="foo", path="svn://svn.example.com/foo",
+                           trunk_head="trunk", trunk_tags="tags/*")
+        self.assertEqual(svn_host(svn_repo), "svn.example.com")
+
+    def test_svn_host_file(self):
+        """Check that local repositories have an empty host."""
+        svn_repo = SvnRepo(name="foo", path="file:///tmp/foo",
+                           trunk_head="trunk", trunk_tags="tags/*")
+        self.assertEqual(svn_host(svn_repo), "")
+
+
+class TestRepoSyncer(unittest.TestCase):
+
+    """Test the RepoSyncer class."""
+
+    def setUp(self):
+        self.tracker = ConcurrencyTracker()
+        self.existing_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.existing_dir)
+
+    def make_repos(self, hosts, fail=(), mirrors={}):
+        repos = []
+        for i, host in enumerate(hosts):
+            name = "repo"+str(i)
+            repos.append(FakeGitSvnRepo(
+                name, "/nonexistent/"+name, "svn://"+host+"/"+name,
+                self.tracker, fail=name in fail, mirror_path=mirrors.get(i),
+            ))
+        return repos
+
+    def test_sync_order(self):
+        """Check that results are returned in input order."""
+        repos = self.make_repos(["a", "b", "c", "d"])
+        results = RepoSyncer(max_workers=4).sync(repos)
+        self.assertEqual([r.repo for r in results], repos)
+        self.assertTrue(all(r.succeeded for r in results))
+
+    def test_max_workers(self):
+        """Check that the worker pool bounds total concurrency."""
+        repos = self.make_repos(["a", "b", "c", "d", "e", "f"])
+        RepoSyncer(max_workers=2).sync(repos)
+        self.assertLessEqual(self.tracker.max_total, 2)
+
+    def test_host_limit(self):
+        """Check that concurrency is limited per Subversion host."""
+        repos = self.make_repos(["a", "a", "a", "a", "b", "b"])
+        RepoSyncer(max_workers=6, host_limit=1).sync(repos)
+        self.assertEqual(self.tracker.max_active["a"], 1)
+        self.assertEqual(self.tracker.max_active["b"], 1)
+
+    def test_busy_host(self):
+        """Check that a busy host doesn't hold up workers for others."""
+        repos = self.make_repos(["a", "a", "a", "b"])
+        RepoSyncer(max_workers=2, host_limit=1).sync(repos)
+        self.assertEqual(self.tracker.max_active["a"], 1)
+        self.assertEqual(sorted(self.tracker.started[:2]),
+                         ["repo0", "repo3"])
+
+    def test_clone_or_rebase(self):
+        """Check that existing repositories are rebased, others cloned."""
+        repos = self.make_repos(["a", "b"])
+        repos[0].path = self.existing_dir
+        results = RepoSyncer().sync(repos)
+        self.assertEqual(results[0].action, "rebase")
+        self.assertEqual(results[1].action, "clone")
+        self.assertEqual(self.tracker.actions,
+                         {"repo0": "rebase", "repo1": "clone"})
+
+    def test_failure(self):
+        """Check that one failure does not stop the other repositories."""
+        repos = self.make_repos(["a", "a", "a"], fail=("repo1",))
+        results = RepoSyncer(max_workers=1).sync(repos)
+        self.assertEqual([r.succeeded for r in results],
+                         [True, False, True])
+        self.assertIsInstance(results[1].error, RuntimeError)
+        self.assertGreater(results[1].wall_time, 0)
+
+    def test_mirrors(self):
+        """Check that each mirror is updated once before the repos."""
+        repos = self.make_repos(["a", "a", "a"],
+                                mirrors={0: "/mirrors/a", 1: "/mirrors/a/"})
+        mirror_syncs = []
+        for repo in repos[:2]:
+            repo.svn_repo.sync_mirror = \
+                lambda **args: mirror_syncs.append(args)
+        results = RepoSyncer().sync(repos, env={})
+        self.assertEqual(mirror_syncs, [{"env": {}}])
+        self.assertTrue(all(r.succeeded for r in results))
+        self.assertEqual(self.tracker.sync_mirror_args,
+                         {"repo0": False, "repo1": False, "repo2": False})
+
+    def test_mirror_failure(self):
+        """Check that repos using a broken mirror fail without running."""
+        repos = self.make_repos(["a", "a"], mirrors={0: "/mirrors/a"})
+        def fail_sync(**args):
+            raise RuntimeError("mirror is locked")
+        repos[0].svn_repo.sync_mirror = fail_sync
+        results = RepoSyncer().sync(repos)
+        self.assertIsInstance(results[0].error, RuntimeError)
+        self.assertTrue(results[1].succeeded)
+        self.assertNotIn("repo0", self.tracker.actions)
+
+
+class TestFormatSummary(unittest.TestCase):
+
+    """Test the format_summary function."""
+
+    def test_format_summary(self):
+        """Check that each repository and the totals are reported."""
+        repos = [FakeGitSvnRepo("foo", "foo", "svn://a/foo", None),
+                 FakeGitSvnRepo("bar", "bar", "svn://a/bar", None)]
+        plan = FetchPlan(RevisionSet([4, 6, 8]), 2, None, [2, 3, 9])
+        results = [SyncResult(repos[0], "rebase", 1.0, fetch_plan=plan),
+                   SyncResult(repos[1], "clone", 2.5,
+                              RuntimeError("oops"))]
+        lines = format_summary(results)
+        self.assertEqual(lines[0], "foo: rebase 1.0s ok (saved 2 fetches)")
+        self.assertEqual(lines[1], "bar: clone 2.5s FAILED: oops")
+        self.assertEqual(lines[2], "2 repositories, 1 failed, 2.5s elapsed")
+        self.assertEqual(format_summary(results, elapsed=4.0)[2],
+                         "2 repositories, 1 failed, 4.0s elapsed")
+
+    def test_elapsed(self):
+        """Check that overlapping repositories are not added up."""
+        repos = [FakeGitSvnRepo("foo", "foo", "svn://a/foo", None),
+                 FakeGitSvnRepo("bar", "bar", "svn://a/bar", None)]
+        results = [SyncResult(repos[0], "rebase", 2.0, start_time=100.0),
+                   SyncResult(repos[1], "rebase", 2.0, start_time=101.0)]
+        self.assertEqual(format_summary(results)[2],
+                         "2 repositories, 0 failed, 3.0s elapsed")
+
+
+if __name__ == "__main__":
+    unittest.main()